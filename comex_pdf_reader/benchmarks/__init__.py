@@ -0,0 +1,2 @@
+# benchmarks/
+"""Medições de desempenho dos parsers (sem Streamlit), rodadas à mão ou no CI."""
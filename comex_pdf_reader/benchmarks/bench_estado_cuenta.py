@@ -0,0 +1,77 @@
+# benchmarks/bench_estado_cuenta.py
+"""
+Tempo do parser de Estado de Cuenta (services/estado_cuenta_service) sobre
+"Listado de Saldos" sintéticos, no tamanho de uma listagem consolidada de
+várias empresas: texto já decodificado (parse_estado_cuenta_txt) e bytes do
+upload lidos em blocos (ler_estado_cuenta).
+
+Exemplo (a partir da raiz do repositório):
+    python -m comex_pdf_reader.benchmarks.bench_estado_cuenta --linhas 10000 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RAIZ not in sys.path:
+    sys.path.insert(0, _RAIZ)
+
+CABECALHO = [
+    " Electrolux del Peru S.A.                     Scala GL0062           Página 1",
+    "  Listado de Saldos   Período 09/2025",
+    "=" * 120,
+    "  CTA      Descripción                               Sal OB        Saldo OB         Período        Saldo CB",
+    "-" * 120,
+]
+DESCRICOES = [
+    "CUENTAS POR PAGAR COMERCIALES", "Gastos de importación", "DUA - Percepción IGV",
+    "Fletes y seguros", "Anticipos a proveedores", "Provisión vacaciones",
+]
+
+
+def _valor(r: random.Random) -> str:
+    s = f"{r.choice([0.0, r.uniform(0, 900), r.uniform(0, 5e7)]):,.2f}"
+    return s + "-" if r.random() < 0.25 else s
+
+
+def gerar_estado_cuenta(linhas: int, semente: int = 23) -> str:
+    """Texto de um Listado de Saldos com `linhas` contas (cabeçalho repetido a cada 55)."""
+    r = random.Random(semente)
+    out = list(CABECALHO)
+    for i in range(linhas):
+        if i and i % 55 == 0:
+            out += ["", CABECALHO[0].replace("Página 1", f"Página {i // 55 + 1}"), CABECALHO[2], CABECALHO[4]]
+        out.append(
+            f"  {r.randint(100000, 999999)}   {r.choice(DESCRICOES):<40}"
+            f"{_valor(r):>14}  {_valor(r):>14}  {_valor(r):>14}  {_valor(r):>14}"
+        )
+    out += ["-" * 120, f"  T O T A L {'':<38}{_valor(r):>14}  {_valor(r):>14}  {_valor(r):>14}  {_valor(r):>14}"]
+    return "\n".join(out)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tempo do parser de Estado de Cuenta em listagens sintéticas.")
+    parser.add_argument("--linhas", nargs="+", type=int, default=[10_000, 100_000, 500_000],
+                        help="contas por listagem (padrão: 10000 100000 500000)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="melhor de N rodadas (padrão: 3)")
+    args = parser.parse_args(argv)
+
+    from services.estado_cuenta_service import ler_estado_cuenta, parse_estado_cuenta_txt
+
+    for n in args.linhas:
+        texto = gerar_estado_cuenta(n)
+        raw = texto.encode("latin-1")
+        for rotulo, fn, arg in (("texto", parse_estado_cuenta_txt, texto), ("bytes", ler_estado_cuenta, raw)):
+            melhor = float("inf")
+            for _ in range(args.repeticoes):
+                t0 = time.perf_counter()
+                df = fn(arg)
+                melhor = min(melhor, time.perf_counter() - t0)
+            print(f"  {n:>8} linhas  {rotulo}  {melhor:6.2f}s  ({n / melhor:,.0f} linhas/s, {len(df)} contas)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+# benchmarks/bench_gl0061.py
+"""
+Tempo do parser GL0061 (services/gl0061_service.parse_cuenta_gl) sobre dumps
+sintéticos no layout de colunas fixas do relatório, do tamanho de um
+fechamento de mês.
+
+Com --arquivos N, mede também a leitura de N contas pelo modo "Cuenta"
+(ler_arquivos_gl: pool de processos + cache por conteúdo, num cache vazio
+temporário): a frio, de novo com os mesmos arquivos e com uma conta a mais.
+
+Exemplos (a partir da raiz do repositório):
+    python -m comex_pdf_reader.benchmarks.bench_gl0061 --linhas 10000 300000
+    python -m comex_pdf_reader.benchmarks.bench_gl0061 --linhas 10000 --arquivos 40
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RAIZ not in sys.path:
+    sys.path.insert(0, _RAIZ)
+
+CABECALHO = [
+    " Electrolux del Peru S.A.                     Scala GL0061           Página 1",
+    "  Nº de cta.   421201   CUENTAS POR PAGAR COMERCIALES",
+    "  Moneda: PEN",
+    "-" * 110,
+]
+RODAPE = ["-" * 110, " T O T A L                                   1,000.00   2,000.00   1,000.00-"]
+TEXTOS = ["FACTURA PROVEEDOR", "AJUSTE TC", "DUA 118-2024-10", "NC 00012", "PAGO", ""]
+
+
+def _valor(r: random.Random) -> str:
+    s = f"{r.choice([0.0, r.uniform(0, 500), r.uniform(0, 2e6)]):,.2f}"
+    return s + "-" if r.random() < 0.2 else s
+
+
+def gerar_gl0061(linhas: int, semente: int = 21) -> str:
+    """Texto de um GL0061 com `linhas` movimentos (e quebras de página a cada 60)."""
+    r = random.Random(semente)
+    out = list(CABECALHO)
+    for i in range(linhas):
+        if i and i % 60 == 0:
+            out += ["", CABECALHO[0].replace("Página 1", f"Página {i // 60 + 1}"), CABECALHO[3]]
+        out.append(
+            f"{r.randint(0, 99999):05d}{r.randint(0, 9999999):<8}{r.randint(0, 99999):<10}"
+            f"{r.choice(['GL', 'AP  1']):<8}{r.randint(1, 28):02d}/{r.randint(1, 12):02d}/{r.randint(23, 26)} "
+            f"{r.randint(0, 999999999):010d}   {_valor(r)}   {_valor(r)}   {_valor(r)}   {r.choice(TEXTOS)}"
+        )
+    return "\n".join(out + RODAPE)
+
+
+class _Arquivo:
+    """Imita o UploadedFile do Streamlit (.name / .getvalue())."""
+
+    def __init__(self, name: str, dados: bytes):
+        self.name = name
+        self._dados = dados
+
+    def getvalue(self) -> bytes:
+        return self._dados
+
+
+def _contas(n: int, linhas: int) -> list:
+    """n dumps GL0061 de contas diferentes (CTA e sementes distintas)."""
+    arquivos = []
+    for i in range(n):
+        texto = gerar_gl0061(linhas, semente=100 + i).replace("421201", f"{421201 + i:06d}", 1)
+        arquivos.append(_Arquivo(f"GL0061_{i:03d}.txt", texto.encode("latin-1")))
+    return arquivos
+
+
+def medir_arquivos(n: int, linhas: int, workers=None) -> None:
+    """Leitura de n contas a frio, a quente e com uma conta a mais."""
+    from services.gl0061_service import ler_arquivos_gl
+
+    arquivos = _contas(n + 1, linhas)
+    rodadas = [("a frio", arquivos[:n]), ("a quente", arquivos[:n]), ("+1 conta", arquivos)]
+    for rotulo, lote in rodadas:
+        t0 = time.perf_counter()
+        total = sum(len(df) for _nome, df, _erro in ler_arquivos_gl(lote, max_workers=workers))
+        print(f"  {len(lote):>4} arquivos x {linhas} linhas  {rotulo:<9} "
+              f"{time.perf_counter() - t0:6.2f}s  ({total} movimentos)")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Tempo do parser GL0061 em dumps sintéticos.")
+    parser.add_argument("--linhas", nargs="+", type=int, default=[10_000, 100_000, 300_000],
+                        help="movimentos por dump (padrão: 10000 100000 300000)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="melhor de N rodadas (padrão: 3)")
+    parser.add_argument("--arquivos", type=int, default=0,
+                        help="mede também a leitura de N contas com pool + cache (usa a 1ª --linhas)")
+    parser.add_argument("--workers", type=int, default=None, help="processos para --arquivos")
+    args = parser.parse_args(argv)
+
+    if args.arquivos:
+        # Cache só desta rodada (o caminho é lido ao importar o cache_service)
+        tmp = tempfile.TemporaryDirectory(prefix="comex_bench_gl_")
+        os.environ["COMEX_PDF_CACHE_DIR"] = tmp.name
+        os.environ["COMEX_PDF_CACHE"] = "1"
+
+    from services.gl0061_service import parse_cuenta_gl
+
+    for n in args.linhas:
+        texto = gerar_gl0061(n)
+        melhor = float("inf")
+        for _ in range(args.repeticoes):
+            t0 = time.perf_counter()
+            df = parse_cuenta_gl(texto)
+            melhor = min(melhor, time.perf_counter() - t0)
+        print(f"  {n:>8} linhas  {melhor:6.2f}s  ({n / melhor:,.0f} linhas/s, {len(df)} movimentos)")
+
+    if args.arquivos:
+        medir_arquivos(args.arquivos, args.linhas[0], args.workers)
+        tmp.cleanup()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,250 @@
+# benchmarks/bench_pipelines.py
+"""
+Benchmark dos quatro pipelines (externos, adicionales, duas, percepcion) sobre
+o corpus sintético de benchmarks/corpus.py, com gate de regressão.
+
+Para cada fluxo e tamanho (padrão 10/100/1000 PDFs) roda, num processo
+separado e com cache de PDFs vazio:
+  - extracao: decodificação dos PDFs (cli.pre_extrair, pool de processos);
+  - pipeline: process_*_streamlit com o cache já quente (só o parsing),
+    com o detalhe por etapa de services/perfil_service.py;
+e reporta arquivos/s, pico de RSS, tempo por etapa e acurácia contra o
+gabarito do corpus, em JSON.
+
+Exemplos (a partir da raiz do repositório):
+    python -m comex_pdf_reader.benchmarks.bench_pipelines --saida bench.json
+    python -m comex_pdf_reader.benchmarks.bench_pipelines --tamanhos 10 100 \\
+        --baseline bench.json --tolerancia 0.25   # sai com 1 se regredir
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RAIZ not in sys.path:
+    sys.path.insert(0, _RAIZ)
+
+FLUXOS = ["externos", "adicionales", "duas", "percepcion"]
+TAMANHOS = [10, 100, 1000]
+VERSAO_RELATORIO = 1
+ARQUIVO_GABARITO = "gabarito.json"
+
+# Coluna com o nome do arquivo na saída de cada fluxo
+COLUNA_ARQUIVO = {"percepcion": "Source_File"}
+TOLERANCIA_VALOR = 0.005
+
+
+# ==========================================================
+# Medição (roda no processo filho)
+# ==========================================================
+
+def pico_rss_mb():
+    """(pico do próprio processo, pico dos filhos já encerrados) em MB; None sem `resource`."""
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None, None
+    fator = 1 if sys.platform == "darwin" else 1024  # ru_maxrss: bytes no macOS, KB no Linux
+    proprio = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * fator
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * fator
+    return round(proprio / 2**20, 1), round(filhos / 2**20, 1)
+
+
+def _confere(obtido, esperado) -> bool:
+    if isinstance(esperado, float):
+        try:
+            return abs(float(obtido) - esperado) < TOLERANCIA_VALOR
+        except (TypeError, ValueError):
+            return False
+    return str(obtido).strip() == str(esperado)
+
+
+def acuracia(df, gabaritos, fluxo):
+    """(fração dos campos do gabarito que o pipeline acertou, campos errados)."""
+    coluna = COLUNA_ARQUIVO.get(fluxo, "source_file")
+    linhas = {} if df is None else {
+        nome: linha for nome, linha in zip(df[coluna], df.to_dict("records"))
+    }
+    total = erros = 0
+    for nome, gabarito in gabaritos.items():
+        linha = linhas.get(nome, {})
+        for campo, esperado in gabarito.items():
+            total += 1
+            if not _confere(linha.get(campo), esperado):
+                erros += 1
+    return (1.0 if total == 0 else round((total - erros) / total, 4)), erros
+
+
+def medir(fluxo, n, pasta, workers=None) -> dict:
+    """Uma rodada: extração a frio + pipeline a quente sobre os n primeiros PDFs de `pasta`."""
+    import cli
+    from services.perfil_service import perfil_execucao
+
+    with open(os.path.join(pasta, ARQUIVO_GABARITO), encoding="utf-8") as fh:
+        gabaritos = json.load(fh)
+    nomes = sorted(gabaritos)[:n]
+    arquivos = [cli.ArquivoLocal(os.path.join(pasta, nome)) for nome in nomes]
+
+    etapas = {}
+    inicio = time.perf_counter()
+    cli.pre_extrair(fluxo, arquivos, max_workers=workers)
+    etapas["extracao"] = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    with perfil_execucao(fluxo, log=None) as perfil:
+        df = cli.rodar_pipeline(fluxo, arquivos, max_workers=workers)
+    etapas["pipeline"] = time.perf_counter() - inicio
+
+    segundos = sum(etapas.values())
+    acerto, errados = acuracia(df, {nome: gabaritos[nome] for nome in nomes}, fluxo)
+    proprio, filhos = pico_rss_mb()
+    return {
+        "fluxo": fluxo,
+        "arquivos": n,
+        "segundos": round(segundos, 4),
+        "arquivos_por_segundo": round(n / segundos, 2) if segundos else None,
+        "pico_rss_mb": proprio,
+        "pico_rss_filhos_mb": filhos,
+        "etapas": {nome: round(t, 4) for nome, t in etapas.items()},
+        "etapas_pipeline": perfil.como_dict()["etapas"],
+        "linhas_saida": 0 if df is None else int(len(df)),
+        "acuracia": acerto,
+        "campos_errados": errados,
+    }
+
+
+# ==========================================================
+# Orquestração (processo principal)
+# ==========================================================
+
+def _rodar_isolado(fluxo, n, pasta, workers):
+    """Roda `medir` num processo novo: pico de RSS e cache de PDFs só desta rodada."""
+    with tempfile.TemporaryDirectory(prefix="comex_bench_") as tmp:
+        saida = os.path.join(tmp, "resultado.json")
+        env = dict(os.environ, COMEX_PDF_CACHE_DIR=os.path.join(tmp, "cache"), COMEX_PDF_CACHE="1")
+        cmd = [sys.executable, os.path.abspath(__file__), "--_medir", fluxo, str(n), pasta, saida]
+        if workers:
+            cmd += ["--workers", str(workers)]
+        proc = subprocess.run(cmd, env=env, cwd=_RAIZ, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        if proc.returncode != 0:
+            raise RuntimeError(f"Falha no benchmark {fluxo}/{n}:\n{proc.stderr[-2000:]}")
+        with open(saida, encoding="utf-8") as fh:
+            return json.load(fh)
+
+
+def executar(fluxos, tamanhos, pasta_corpus, semente=17, workers=None) -> dict:
+    from benchmarks.corpus import gerar_corpus
+
+    resultados = []
+    for fluxo in fluxos:
+        pasta = os.path.join(pasta_corpus, fluxo)
+        gabaritos = gerar_corpus(fluxo, max(tamanhos), pasta, semente=semente)
+        with open(os.path.join(pasta, ARQUIVO_GABARITO), "w", encoding="utf-8") as fh:
+            json.dump(gabaritos, fh, ensure_ascii=False)
+
+        for n in sorted(tamanhos):
+            r = _rodar_isolado(fluxo, n, pasta, workers)
+            print(
+                f"{fluxo:<12} {n:>5} PDFs  {r['arquivos_por_segundo']:>8} arq/s  "
+                f"RSS {r['pico_rss_mb']} MB  acurácia {r['acuracia']:.2%}  "
+                + "  ".join(f"{k} {v:.2f}s" for k, v in r["etapas"].items()),
+                file=sys.stderr,
+            )
+            resultados.append(r)
+
+    return {
+        "versao": VERSAO_RELATORIO,
+        "ambiente": {
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "parametros": {"semente": semente, "workers": workers},
+        "resultados": resultados,
+    }
+
+
+# ==========================================================
+# Gate de regressão
+# ==========================================================
+
+def comparar(atual: dict, baseline: dict, tolerancia: float = 0.25) -> list:
+    """
+    Regressões de `atual` contra `baseline`, por (fluxo, arquivos):
+      - arquivos/s abaixo de baseline x (1 - tolerancia);
+      - pico de RSS acima de baseline x (1 + tolerancia);
+      - qualquer queda de acurácia.
+    Combinações que só existem de um lado são ignoradas.
+    """
+    base = {(r["fluxo"], r["arquivos"]): r for r in baseline.get("resultados", [])}
+    problemas = []
+    for r in atual.get("resultados", []):
+        b = base.get((r["fluxo"], r["arquivos"]))
+        if b is None:
+            continue
+        rotulo = f"{r['fluxo']}/{r['arquivos']}"
+        if b.get("arquivos_por_segundo") and r["arquivos_por_segundo"] < b["arquivos_por_segundo"] * (1 - tolerancia):
+            problemas.append(
+                f"{rotulo}: {r['arquivos_por_segundo']} arq/s (baseline {b['arquivos_por_segundo']})"
+            )
+        if b.get("pico_rss_mb") and r.get("pico_rss_mb") and r["pico_rss_mb"] > b["pico_rss_mb"] * (1 + tolerancia):
+            problemas.append(f"{rotulo}: pico RSS {r['pico_rss_mb']} MB (baseline {b['pico_rss_mb']} MB)")
+        if r["acuracia"] < b["acuracia"]:
+            problemas.append(f"{rotulo}: acurácia {r['acuracia']:.2%} (baseline {b['acuracia']:.2%})")
+    return problemas
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m comex_pdf_reader.benchmarks.bench_pipelines",
+        description="Throughput, memória e acurácia dos pipelines sobre PDFs sintéticos.",
+    )
+    parser.add_argument("--fluxos", nargs="+", choices=FLUXOS, default=FLUXOS)
+    parser.add_argument("--tamanhos", nargs="+", type=int, default=TAMANHOS, help="PDFs por rodada (padrão: 10 100 1000)")
+    parser.add_argument("--saida", help="Grava o relatório JSON neste arquivo (senão, stdout)")
+    parser.add_argument("--baseline", help="Relatório JSON anterior: reprova (exit 1) se houver regressão")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Folga de throughput/RSS contra o baseline (padrão: 0.25)")
+    parser.add_argument("--corpus", help="Pasta para os PDFs sintéticos (padrão: temporária)")
+    parser.add_argument("--semente", type=int, default=17)
+    parser.add_argument("--workers", type=int, default=None, help="Processos para ler os PDFs")
+    parser.add_argument("--_medir", nargs=4, metavar=("FLUXO", "N", "PASTA", "SAIDA"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args._medir:
+        fluxo, n, pasta, saida = args._medir
+        resultado = medir(fluxo, int(n), pasta, workers=args.workers)
+        with open(saida, "w", encoding="utf-8") as fh:
+            json.dump(resultado, fh)
+        return 0
+
+    if args.corpus:
+        relatorio = executar(args.fluxos, args.tamanhos, args.corpus, args.semente, args.workers)
+    else:
+        with tempfile.TemporaryDirectory(prefix="comex_corpus_") as pasta:
+            relatorio = executar(args.fluxos, args.tamanhos, pasta, args.semente, args.workers)
+
+    texto = json.dumps(relatorio, indent=2, ensure_ascii=False)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as fh:
+            fh.write(texto)
+    else:
+        print(texto)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as fh:
+            problemas = comparar(relatorio, json.load(fh), args.tolerancia)
+        for p in problemas:
+            print(f"REGRESSÃO {p}", file=sys.stderr)
+        if problemas:
+            return 1
+        print("Sem regressões contra o baseline.", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
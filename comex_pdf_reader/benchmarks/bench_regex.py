@@ -0,0 +1,126 @@
+# benchmarks/bench_regex.py
+"""
+Microbenchmark do custo de regex por documento: padrões em texto literal
+(re.search(r"...", s) / laço de re.sub por mês, como os parsers faziam) x o
+registro compilado de services/regex_utils.py.
+
+Exemplo (a partir da raiz do repositório):
+    python -m comex_pdf_reader.benchmarks.bench_regex --docs 2000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+_RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _RAIZ not in sys.path:
+    sys.path.insert(0, _RAIZ)
+
+from services import regex_utils  # noqa: E402
+from services.externos_utils import MESES_ABREV  # noqa: E402
+from services.regex_utils import compilar_meses  # noqa: E402
+
+# Trechos típicos dos PDFs (faturas externas, adicionales, percepciones)
+TRECHOS = [
+    "FACTURA COMERCIAL No: EH12345678", "CREDIT NOTE MD-2024-0031", "DATE: 12/03/24",
+    "12 de marzo de 2024", "05-ene-24", "12/Mar/2024", "2024-03-12", "Sep.12,2024",
+    "1st January 2025", "03.04.2025", "TOTAL USD 12,345.67", "R.U.C. 20512345678",
+    "F001-00012345", "F. DE EMISION: 2024-05-06", "MONEDA: DOLARES AMERICANOS",
+    "NUMERO DE LIQUIDACION : 118-016559-26", "C.D.A. 118 - 2024 - 10 - 123456",
+    "DE FECHA: 12/03/2024", "Descripción de la mercadería", "Cantidad 10 Precio 99.90",
+]
+
+
+def gerar_documentos(n_docs: int, linhas: int, semente: int = 16):
+    r = random.Random(semente)
+    return [
+        [" ".join(r.choice(TRECHOS) for _ in range(r.randint(1, 3))) for _ in range(linhas)]
+        for _ in range(n_docs)
+    ]
+
+
+def _registro():
+    """Todos os padrões compilados do registro (as tuplas entram item a item)."""
+    padroes = []
+    for nome in sorted(vars(regex_utils)):
+        valor = getattr(regex_utils, nome)
+        if not nome.startswith("RE_"):
+            continue
+        for p in valor if isinstance(valor, tuple) else (valor,):
+            padroes.append(p)
+    return padroes
+
+
+# ----------------------------------------------------------
+# Antes / depois
+# ----------------------------------------------------------
+
+def buscas_literais(docs, padroes):
+    textos = [(p.pattern, p.flags & ~re.UNICODE) for p in padroes]
+    for linhas in docs:
+        for ln in linhas:
+            for padrao, flags in textos:
+                re.search(padrao, ln, flags)
+
+
+def buscas_compiladas(docs, padroes):
+    for linhas in docs:
+        for ln in linhas:
+            for p in padroes:
+                p.search(ln)
+
+
+def meses_em_laco(docs):
+    for linhas in docs:
+        for ln in linhas:
+            s = ln
+            for pt, en in MESES_ABREV.items():
+                s = re.sub(rf"(?i)\b{pt}\b", en, s)
+
+
+def meses_alternacao(docs):
+    traduzir = compilar_meses(MESES_ABREV, ignorar_caixa=True)
+    for linhas in docs:
+        for ln in linhas:
+            traduzir(ln)
+
+
+def _cronometrar(fn, *args, repeticoes: int = 3) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        t0 = time.perf_counter()
+        fn(*args)
+        melhor = min(melhor, time.perf_counter() - t0)
+    return melhor
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Custo de regex por documento: literal x registro compilado.")
+    parser.add_argument("--docs", type=int, default=500, help="documentos sintéticos (padrão: 500)")
+    parser.add_argument("--linhas", type=int, default=40, help="linhas por documento (padrão: 40)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="melhor de N rodadas (padrão: 3)")
+    args = parser.parse_args(argv)
+
+    docs = gerar_documentos(args.docs, args.linhas)
+    padroes = _registro()
+
+    casos = [
+        (f"{len(padroes)} padrões por linha", buscas_literais, buscas_compiladas, (docs, padroes)),
+        (f"tradução de {len(MESES_ABREV)} meses", meses_em_laco, meses_alternacao, (docs,)),
+    ]
+    print(f"{args.docs} documentos x {args.linhas} linhas (melhor de {args.repeticoes})")
+    for nome, antes, depois, params in casos:
+        t_antes = _cronometrar(antes, *params, repeticoes=args.repeticoes)
+        t_depois = _cronometrar(depois, *params, repeticoes=args.repeticoes)
+        por_doc = 1e6 / args.docs
+        print(
+            f"  {nome:<28} antes {t_antes * por_doc:8.1f} µs/doc   "
+            f"depois {t_depois * por_doc:8.1f} µs/doc   ({t_antes / t_depois:.1f}x)"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,403 @@
+# benchmarks/corpus.py
+"""
+Corpus sintético de PDFs para os benchmarks dos quatro fluxos.
+
+Cada layout devolve (linhas do PDF, gabarito): o gabarito é o que o pipeline
+tem que entregar para aquele documento (colunas da saída final), e serve
+para o benchmark medir também a acurácia — uma mudança de parser que deixa
+tudo mais rápido mas quebra um fornecedor tem que reprovar.
+
+Os layouts imitam a estrutura de linhas que as regras de externos_utils /
+adicionales_utils / percepcion_service esperam; os valores são aleatórios
+(semente fixa), então o mesmo (fluxo, n, semente) gera sempre os mesmos PDFs.
+"""
+import os
+import random
+from datetime import date, timedelta
+from typing import Callable, Dict, List, Tuple
+
+import fitz  # PyMuPDF
+
+Gabarito = Dict[str, object]
+Layout = Callable[[random.Random], Tuple[List[str], Gabarito]]
+
+MESES_ES = ["enero", "febrero", "marzo", "abril", "mayo", "junio", "julio",
+            "agosto", "septiembre", "octubre", "noviembre", "diciembre"]
+MESES_ES_ABREV = ["ene", "feb", "mar", "abr", "may", "jun",
+                  "jul", "ago", "sep", "oct", "nov", "dic"]
+MESES_EN = ["January", "February", "March", "April", "May", "June", "July",
+            "August", "September", "October", "November", "December"]
+PRODUTOS = ["REFRIGERATOR", "CHEST FREEZER", "STOVE", "COOKER", "OVEN",
+            "WASHING MACHINE", "AIR CONDITIONER"]
+
+
+# ----------------------------------------------------------
+# Valores aleatórios
+# ----------------------------------------------------------
+
+def _data(r: random.Random) -> date:
+    return date(2023, 1, 1) + timedelta(days=r.randint(0, 3 * 365))
+
+
+def _valor(r: random.Random) -> float:
+    return round(r.uniform(100, 250_000), 2)
+
+
+def _milhares(v: float) -> str:
+    return f"{v:,.2f}"
+
+
+def _digitos(r: random.Random, n: int) -> str:
+    return "".join(r.choice("0123456789") for _ in range(n))
+
+
+def _produto(r: random.Random) -> str:
+    return f"{r.choice(PRODUTOS)} MODEL {r.choice('ABCDEFGH')}{_digitos(r, 3)}"
+
+
+def _externo(fornecedor: str, factura: str, d: date, valor: float) -> Gabarito:
+    return {
+        "Proveedor Iscala": fornecedor,
+        "Factura": factura,
+        "Fecha de Emisión": d.strftime("%d/%m/%Y"),
+        "Amount": valor,
+    }
+
+
+# ==========================================================
+# Externos (um layout por "Proveedor Iscala")
+# ==========================================================
+
+def _sei(r):
+    fac, d, v = _digitos(r, 9), _data(r), _valor(r)
+    linhas = [
+        "INVOICE", "Electrolux Intressenter AB", "Invoice number", fac,
+        f"Customer no {_digitos(r, 5)}", "Invoice date", d.strftime("%d.%m.%Y"),
+        _produto(r), "Total amount(U.S Dollar)", _milhares(v),
+    ]
+    return linhas, _externo("SEI", fac, d, v)
+
+
+def _sge(r):
+    fac, d, v = _digitos(r, 9), _data(r), _valor(r)
+    linhas = [
+        "Invoice", "Electrolux S.E.A. Pte Ltd", "Invoice No", fac, "Page 1 of 1",
+        "Invoice Date", d.strftime("%d.%m.%Y"), _produto(r),
+        "TOTAL AMOUNT(U.S DOLLAR)", _milhares(v),
+    ]
+    return linhas, _externo("SGE", fac, d, v)
+
+
+def _snowky(r):
+    fac, d, v = f"SK{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "Hefei Snowky Electric Co., Ltd.", "COMMERCIAL INVOICE", "INVOICE NO.", fac,
+        "DATE:", d.strftime("%d.%m.%Y"), _produto(r), f"TOTAL US$ {_milhares(v)}",
+        "QUANTITIES & DESCRIPTIONS",
+    ]
+    return linhas, _externo("SNOWKY", fac, d, v)
+
+
+def _5be(r):
+    fac, d, v = f"HM{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "HOMA APPLIANCES CO., LTD", f"INVOICE NO.{fac}",
+        f"DATE: {d.day:02d}-{MESES_EN[d.month - 1][:3]}-{d.year}",
+        _produto(r), _milhares(v), "SHIPPING MARKS:", "N/M",
+    ]
+    return linhas, _externo("5BE", fac, d, v)
+
+
+def _us1239(r):
+    fac, d, v = f"EH{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        f"ELECTROLUX HOME PRODUCTS, INC. {d.strftime('%m/%d/%y')}", "RUC: 20100073308",
+        "Customer", fac, _produto(r), f"GRAND TOTAL USA $ {_milhares(v)}",
+    ]
+    return linhas, _externo("US1239", fac, d, v)
+
+
+def _clh(r):
+    fac, d, v = _digitos(r, 7), _data(r), _valor(r)
+    linhas = [
+        "ELECTROLUX DE CHILE S.A.", "ELECTRONIC EXPORT INVOICE", "N°", fac,
+        f"Santiago, {d.day} de {MESES_ES[d.month - 1]} de {d.year}",
+        _produto(r), "TOTAL FOB", _milhares(v),
+    ]
+    return linhas, _externo("CLH", fac, d, v)
+
+
+def _7dq(r):
+    fac, cliente, d, v = _digitos(r, 8), f"C{_digitos(r, 5)}", _data(r), _valor(r)
+    linhas = [
+        fac, "Trade Air System S.L.", "Customer Number", cliente, "INVOICE",
+        f"Date {d.strftime('%d/%m/%Y')}", _produto(r), _milhares(v), "USD",
+        "PAYMENT CONDITIONS : 60 DAYS",
+    ]
+    # A regra junta: linha após "Customer Number" + 5ª linha + 1ª linha
+    return linhas, _externo("7DQ", f"{cliente}INVOICE{fac}", d, v)
+
+
+def _5ju(r):
+    fac, d, v = f"JH{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "JIANGMEN JINHUAN ELECTRIC APPLIANCES", "Invoice #.:", fac,
+        f"{d.day:02d}-{MESES_ES_ABREV[d.month - 1]}-{d:%y}", "DESCRIPTION",
+        _produto(r), _milhares(v), "REMARKS:",
+    ]
+    return linhas, _externo("5JU", fac, d, v)
+
+
+def _5wy(r):
+    fac, d, v = f"MDOK{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "MIDEA ELECTRIC TRADING (SINGAPORE) CO.", fac, d.strftime("%Y-%m-%d"),
+        "TOTAL", "USD", _milhares(v), _produto(r),
+    ]
+    return linhas, _externo("5WY", fac, d, v)
+
+
+def _7jr(r):
+    fac, d, v = f"MD{_digitos(r, 9)}", _data(r), _valor(r)
+    linhas = [
+        "FOSHAN SHUNDE MIDEA CONSUMER ELECTRIC", f"Invoice Number: {fac}",
+        d.strftime("%d/%m/%Y"), "TOTAL AMOUNT:", "USD", _milhares(v), _produto(r),
+    ]
+    return linhas, _externo("7JR", fac, d, v)
+
+
+def _5dl(r):
+    fac, d, v = f"XL{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "NINGBO XINLE HOUSEHOLD APPLIANCES CO., LTD", _milhares(v), "USD",
+        "COMMERCIAL INVOICE", "Invoice No.", "Date",
+        f"{d.day:02d}-{MESES_ES_ABREV[d.month - 1]}-{d:%y}", fac, _produto(r),
+    ]
+    return linhas, _externo("5DL", fac, d, v)
+
+
+def _brr(r):
+    fac, d, v = _digitos(r, 9), _data(r), _valor(r)
+    linhas = [
+        "ELECTROLUX DO BRASIL S.A.", f"FACTURA COMERCIAL {fac}", "FECHA",
+        f"{d.day:02d}/{MESES_ES[d.month - 1]}/{d.year}", _produto(r), "TOTAL FOB",
+        _milhares(v),
+    ]
+    return linhas, _externo("BRR", fac, d, v)
+
+
+def _5du(r):
+    fac, d, v = f"GZ{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "GUANGDONG GALANZ ENTERPRISES CO.,LTD", f"INV. NO:{fac}",
+        f"DATE:{MESES_EN[d.month - 1][:3]}.{d.day},{d.year}", _milhares(v), "USD",
+        "TOTAL:", _produto(r),
+    ]
+    return linhas, _externo("5DU", fac, d, v)
+
+
+def _ningbo_hua(r):
+    fac, d, v = f"HC{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "NINGBO HUACAI ELECTRIC APPLIANCES CO., LTD", f"INVOICE NO: {fac}",
+        f"DATE: {d.day} {MESES_EN[d.month - 1]} {d.year}", _produto(r), _milhares(v),
+        "PAYMENT TERM: T/T 30 DAYS",
+    ]
+    return linhas, _externo("NINGBO HUA", fac, d, v)
+
+
+LAYOUTS_EXTERNOS: Dict[str, Layout] = {
+    "SEI": _sei, "SGE": _sge, "SNOWKY": _snowky, "5BE": _5be, "US1239": _us1239,
+    "CLH": _clh, "7DQ": _7dq, "5JU": _5ju, "5WY": _5wy, "7JR": _7jr, "5DL": _5dl,
+    "BRR": _brr, "5DU": _5du, "NINGBO HUA": _ningbo_hua,
+}
+
+
+# ==========================================================
+# Gastos Adicionales (agentes locais, por R.U.C)
+# ==========================================================
+
+def _adicional(fornecedor: str, factura: str, d: date, moeda: str, valor: float) -> Gabarito:
+    return {
+        "Proveedor Iscala": fornecedor,
+        "Factura": factura,
+        "Fecha de Emisión": d.strftime("%d/%m/%Y"),
+        "Moneda": moeda,
+        "Op. Gravada": valor,
+    }
+
+
+def _enchimento(r, n):
+    return [f"ITEM {_digitos(r, 3)} SERVICIO LOGISTICO" for _ in range(n)]
+
+
+def _adic_10001013(r):
+    fac, d, v = f"F001-{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "ALMACENES Y SERVICIOS DEL CALLAO S.A.C.", "R.U.C. N° 20100010131",
+        "FACTURA ELECTRÓNICA", fac, f"FECHA DE EMISIÓN: {d.strftime('%d/%m/%Y')}",
+        "MONEDA: DOLARES AMERICANOS", "DESCRIPCION", "SERVICIO DE ALMACENAJE",
+        _milhares(v), *_enchimento(r, 7), "SON: MONTO EN LETRAS",
+    ]
+    return linhas, _adicional("10001013", fac, d, "USD", v)
+
+
+def _adic_34764689(r):
+    fac, d, v = f"F002{_digitos(r, 9)}", _data(r), _valor(r)
+    linhas = [
+        "FACTURA ELECTRONICA", "AGENCIA MARITIMA DEL CALLAO S.A.", "RUC: 20347646891",
+        fac, "Fecha de Emisión", d.strftime("%Y-%m-%d"), "Moneda", "SOLES",
+        "Descripción", "SERVICIO DE TRANSPORTE", "Son: MONTO EN LETRAS", _milhares(v),
+    ]
+    return linhas, _adicional("34764689", fac, d, "PEN", v)
+
+
+def _adic_evergreen(r):
+    fac, d, v = f"F003-{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "EVERGREEN LINE", "RUC: 20100073308", fac, "FACTURA ELECTRÓNICA",
+        f"FECHA EMISIÓN(ISSUE DATE) : {d.strftime('%Y/%m/%d')}", "MONEDA: USD",
+        f"Total Amount(Monto total): USD {_milhares(v)}",
+    ]
+    return linhas, _adicional("EVERGREEN", fac, d, "USD", v)
+
+
+def _adic_msc(r):
+    fac, d, v = f"F{_digitos(r, 3)}-{_digitos(r, 8)}", _data(r), _valor(r)
+    linhas = [
+        "FACTURA ELECTRONICA", "MSC Mediterranean Shipping Company S.A.",
+        f"R.U.C. 20{_digitos(r, 9)}", fac, f"F. DE EMISION: {d.strftime('%Y-%m-%d')}",
+        "MONEDA: DOLARES AMERICANOS", "VALOR DE VENTA", _milhares(v),
+        *_enchimento(r, 4), "SON: MONTO EN LETRAS",
+    ]
+    return linhas, _adicional("MSC", fac, d, "USD", v)
+
+
+LAYOUTS_ADICIONALES: Dict[str, Layout] = {
+    "10001013": _adic_10001013, "34764689": _adic_34764689,
+    "EVERGREEN": _adic_evergreen, "MSC": _adic_msc,
+}
+
+
+# ==========================================================
+# Percepciones (comprovante SUNAT, 1ª página)
+# ==========================================================
+
+def _percepcion(r):
+    d, v = _data(r), _valor(r)
+    liq = f"118-{_digitos(r, 6)}"
+    cda_ano, cda_num = d.year, _digitos(r, 6)
+    linhas = [
+        "SUNAT", "COMPROBANTE DE PERCEPCIÓN",
+        f"NÚMERO DE LIQUIDACIÓN: {liq}-{d:%y}",
+        f"C.D.A.: 118-{cda_ano}-10-{cda_num}",
+        f"DE FECHA: {d.strftime('%d/%m/%Y')}",
+        "SUNAT PERCEPCION IGV", _milhares(v),
+    ]
+    return linhas, {
+        "No_Liquidacion": liq,
+        "CDA": f"118-{cda_num}",
+        "Fecha": d.strftime("%d%m%y"),
+        "Monto": v,
+    }
+
+
+# ==========================================================
+# DUAs (1ª tabela da 1ª página, desenhada com linhas)
+# ==========================================================
+
+LARGURAS_DUA = [170, 190, 60, 60, 60, 60, 60, 80]
+
+
+def _dua(r):
+    d = _data(r)
+    ad, mun, gene, perc = (_valor(r) for _ in range(4))
+    numero = _digitos(r, 6)
+    pec = f"PEC {_digitos(r, 5)}"
+    vazias = [""] * 5
+    tabela = [
+        ["XML CRAMIREZ", "", *vazias, ""],
+        [f"No ORDEN {d.year}-{_digitos(r, 4)}", f"No Declaración 118-{d.year}-10-{numero}", *vazias, ""],
+        ["4.1 Ad/Valorem", "", *vazias, _milhares(ad)],
+        ["4.5 Imp.Prom.Municipal", "", *vazias, _milhares(mun)],
+        ["4.6 Imp.Gene.a las Ventas", f"6.2 Fecha {d.strftime('%d/%m/%Y')}", *vazias, _milhares(gene)],
+        ["4.7 Derechos Antidumping", f"Percepción IGV S/: {_milhares(perc)}", *vazias, ""],
+        [f"IMPORTE TOTAL {pec}", "", *vazias, ""],
+    ]
+    return tabela, {
+        "Declaracion": f"118-{numero}",
+        "Fecha": d.strftime("%d%m%y"),
+        "Ad_Valorem": ad,
+        "Imp_Prom_Municipal": mun,
+        "Imp_Gene_a_las_Ventas": gene,
+        "Percepcion": perc,
+        "PEC": pec,
+    }
+
+
+# ==========================================================
+# Escrita dos PDFs
+# ==========================================================
+
+def pdf_de_linhas(linhas: List[str]) -> bytes:
+    with fitz.open() as doc:
+        page = doc.new_page(width=595, height=842)
+        y = 60
+        for linha in linhas:
+            page.insert_text((50, y), linha, fontsize=9)
+            y += 13
+        return doc.tobytes()
+
+
+def pdf_de_tabela(tabela: List[List[str]], larguras: List[int]) -> bytes:
+    with fitz.open() as doc:
+        page = doc.new_page(width=842, height=595)
+        x0, y0, altura = 30, 40, 18
+        xs = [x0]
+        for w in larguras:
+            xs.append(xs[-1] + w)
+        y1 = y0 + altura * len(tabela)
+        for k in range(len(tabela) + 1):
+            page.draw_line((xs[0], y0 + k * altura), (xs[-1], y0 + k * altura))
+        for x in xs:
+            page.draw_line((x, y0), (x, y1))
+        for k, linha in enumerate(tabela):
+            for j, celula in enumerate(linha):
+                if celula:
+                    page.insert_text((xs[j] + 3, y0 + k * altura + 12), celula, fontsize=7)
+        page.insert_text((x0, y1 + 40), "Documento sintetico para benchmark", fontsize=8)
+        return doc.tobytes()
+
+
+def _documento(fluxo: str, r: random.Random) -> Tuple[bytes, Gabarito]:
+    if fluxo == "externos":
+        linhas, gabarito = r.choice(list(LAYOUTS_EXTERNOS.values()))(r)
+        return pdf_de_linhas(linhas), gabarito
+    if fluxo == "adicionales":
+        linhas, gabarito = r.choice(list(LAYOUTS_ADICIONALES.values()))(r)
+        return pdf_de_linhas(linhas), gabarito
+    if fluxo == "percepcion":
+        linhas, gabarito = _percepcion(r)
+        return pdf_de_linhas(linhas), gabarito
+    if fluxo == "duas":
+        tabela, gabarito = _dua(r)
+        return pdf_de_tabela(tabela, LARGURAS_DUA), gabarito
+    raise ValueError(f"Fluxo desconhecido: {fluxo}")
+
+
+def gerar_corpus(fluxo: str, n: int, pasta: str, semente: int = 17) -> Dict[str, Gabarito]:
+    """
+    Grava `n` PDFs do fluxo em `pasta` e devolve {nome do arquivo: gabarito}.
+    Os nomes seguem a ordem de geração, então os k primeiros arquivos de um
+    corpus de n são os mesmos de um corpus de k (mesma semente).
+    """
+    os.makedirs(pasta, exist_ok=True)
+    r = random.Random(f"{fluxo}:{semente}")
+    gabaritos = {}
+    for i in range(n):
+        conteudo, gabarito = _documento(fluxo, r)
+        nome = f"{fluxo}_{i:05d}.pdf"
+        with open(os.path.join(pasta, nome), "wb") as fh:
+            fh.write(conteudo)
+        gabaritos[nome] = gabarito
+    return gabaritos
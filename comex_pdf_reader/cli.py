@@ -0,0 +1,226 @@
+# cli.py
+"""
+Execução em lote (sem Streamlit) dos pipelines Comex.
+
+Exemplos (a partir da raiz do repositório):
+    python -m comex_pdf_reader.cli externos --input pdfs/ --tasa tasa.parquet \\
+        --sharepoint all.xlsx --out externos.xlsx
+    python -m comex_pdf_reader.cli duas --input duas/ --tasa tasa.csv --out duas.csv
+
+A leitura dos PDFs roda num pool de processos e alimenta o cache em disco
+(services/cache_service.py); depois o pipeline de cada fluxo roda igual ao app.
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+# Os módulos do app usam imports absolutos ("from services...")
+_RAIZ = os.path.dirname(os.path.abspath(__file__))
+if _RAIZ not in sys.path:
+    sys.path.insert(0, _RAIZ)
+
+import pandas as pd  # noqa: E402
+
+FLUXOS = ["externos", "adicionales", "duas", "percepcion"]
+
+
+# ==========================================================
+# Entradas
+# ==========================================================
+
+class ArquivoLocal:
+    """Imita o UploadedFile do Streamlit (.name / .getvalue()) lendo do disco sob demanda."""
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.name = os.path.basename(caminho)
+
+    def getvalue(self) -> bytes:
+        with open(self.caminho, "rb") as fh:
+            return fh.read()
+
+
+def listar_pdfs(entradas):
+    caminhos = []
+    for entrada in entradas:
+        if os.path.isdir(entrada):
+            for raiz, _dirs, nomes in os.walk(entrada):
+                caminhos += [os.path.join(raiz, n) for n in nomes if n.lower().endswith(".pdf")]
+        elif os.path.isfile(entrada):
+            caminhos.append(entrada)
+        else:
+            raise FileNotFoundError(f"Entrada não encontrada: {entrada}")
+    return [ArquivoLocal(c) for c in sorted(caminhos)]
+
+
+def ler_tabela(caminho) -> pd.DataFrame:
+    ext = os.path.splitext(caminho)[1].lower()
+    if ext == ".parquet":
+        return pd.read_parquet(caminho)
+    if ext == ".csv":
+        return pd.read_csv(caminho)
+    if ext in (".xlsx", ".xls"):
+        return pd.read_excel(caminho)
+    raise ValueError(f"Formato não suportado: {caminho} (use .parquet, .csv ou .xlsx)")
+
+
+def gravar_tabela(df: pd.DataFrame, caminho) -> None:
+    ext = os.path.splitext(caminho)[1].lower()
+    if ext == ".parquet":
+        df.to_parquet(caminho, index=False)
+    elif ext == ".csv":
+        df.to_csv(caminho, index=False)
+    elif ext == ".xlsx":
+        df.to_excel(caminho, index=False)
+    else:
+        raise ValueError(f"Formato de saída não suportado: {caminho} (use .xlsx, .csv ou .parquet)")
+
+
+# ==========================================================
+# Tempos por etapa
+# ==========================================================
+
+@contextmanager
+def etapa(nome, tempos):
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        tempos.append((nome, time.perf_counter() - inicio))
+        print(f"[{tempos[-1][1]:8.2f}s] {nome}", file=sys.stderr)
+
+
+# ==========================================================
+# Pré-leitura dos PDFs em paralelo (aquece o cache)
+# ==========================================================
+
+def _extratores(fluxo):
+    """(função, nome no cache, versão, cacheável) do extrator de cada fluxo."""
+    if fluxo == "externos":
+        from services import externos_service as m
+        return (m._extract_text_from_pdf_bytes, m.NOME_CACHE_TEXTO,
+                m.VERSAO_EXTRATOR_TEXTO, m._texto_cacheavel)
+    if fluxo == "adicionales":
+        from services import adicionales_service as m
+        return (m._extract_text_from_pdf_bytes, m.NOME_CACHE_TEXTO,
+                m.VERSAO_EXTRATOR_TEXTO, m._texto_cacheavel)
+    if fluxo == "duas":
+        from services import duas_service as m
+        return (m._extract_first_table, m.NOME_CACHE_TABELA,
+                m.VERSAO_EXTRATOR_TABELA, m._tabela_cacheavel)
+    from services import percepcion_service as m
+    return (m._extract_first_page_lines_to_df, m.NOME_CACHE_LINHAS,
+            m.VERSAO_EXTRATOR_LINHAS, m._linhas_cacheaveis)
+
+
+def pre_extrair(fluxo, arquivos, max_workers=None) -> None:
+    """
+    Lê os PDFs em paralelo só para aquecer o cache em disco; o pipeline depois
+    relê tudo de lá. Com o cache desligado não há onde guardar o resultado
+    (cada PDF seria decodificado duas vezes), então não faz nada.
+    """
+    from services.cache_service import CACHE_ATIVO, mapear_com_cache
+
+    if not CACHE_ATIVO:
+        return
+
+    fn, nome, versao, cacheavel = _extratores(fluxo)
+    for _ in mapear_com_cache(fn, arquivos, nome, versao, cacheavel=cacheavel, max_workers=max_workers):
+        pass
+
+
+# ==========================================================
+# Execução
+# ==========================================================
+
+def rodar_pipeline(fluxo, arquivos, tasa_df=None, sharepoint_df=None, max_workers=None):
+    """Só o process_*_streamlit do fluxo (a leitura dos PDFs sai do cache, se já aquecido)."""
+    vazio = pd.DataFrame()
+    if fluxo == "externos":
+        from services.externos_service import process_externos_streamlit
+        return process_externos_streamlit(
+            arquivos, cambio_df=tasa_df, max_workers=max_workers,
+            sharepoint_df=vazio if sharepoint_df is None else sharepoint_df,
+        )
+    if fluxo == "adicionales":
+        from services.adicionales_service import process_adicionales_streamlit
+        return process_adicionales_streamlit(
+            arquivos, cambio_df=tasa_df,
+            sharepoint_df=vazio if sharepoint_df is None else sharepoint_df,
+        )
+    if fluxo == "duas":
+        from services.duas_service import process_duas_streamlit
+        return process_duas_streamlit(arquivos, cambio_df=tasa_df)
+    from services.percepcion_service import process_percepcion_streamlit
+    return process_percepcion_streamlit(arquivos)
+
+
+def executar(fluxo, arquivos, tasa_df=None, sharepoint_df=None, max_workers=None, tempos=None,
+             mostrar_perfil=False):
+    from services.cache_service import CACHE_ATIVO
+    from services.perfil_service import perfil_execucao
+
+    tempos = [] if tempos is None else tempos
+
+    if fluxo != "externos" and CACHE_ATIVO:
+        # Externos já lê em paralelo dentro do próprio pipeline; sem cache em
+        # disco a pré-leitura não chega ao pipeline (ver pre_extrair)
+        with etapa(f"leitura dos PDFs ({len(arquivos)} arquivos)", tempos):
+            pre_extrair(fluxo, arquivos, max_workers=max_workers)
+
+    # COMEX_PERFIL_LOG grava o perfil por etapa em JSONL, como no app
+    with etapa(f"pipeline {fluxo}", tempos), perfil_execucao(fluxo) as perfil:
+        df = rodar_pipeline(fluxo, arquivos, tasa_df, sharepoint_df, max_workers)
+    if mostrar_perfil:
+        resumo = perfil.resumo()
+        resumo["etapa"] = ["  " * n + e for n, e in zip(resumo["nivel"], resumo["etapa"])]
+        print(resumo.drop(columns="nivel").to_string(index=False), file=sys.stderr)
+    return df
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m comex_pdf_reader.cli",
+        description="Roda os pipelines Comex em lote, sem a interface Streamlit.",
+    )
+    parser.add_argument("fluxo", choices=FLUXOS)
+    parser.add_argument("--input", nargs="+", required=True, help="Pastas e/ou arquivos PDF")
+    parser.add_argument("--out", required=True, help="Saída: .xlsx, .csv ou .parquet")
+    parser.add_argument("--tasa", help="Tasa SUNAT (colunas Data, Venta): .parquet, .csv ou .xlsx")
+    parser.add_argument("--sharepoint", help="Excel do SharePoint (aba 'all')")
+    parser.add_argument("--workers", type=int, default=None, help="Processos para ler os PDFs")
+    parser.add_argument("--perfil", action="store_true", help="Mostra tempo/linhas/memória por etapa do pipeline")
+    args = parser.parse_args(argv)
+
+    tempos = []
+    with etapa("entradas", tempos):
+        arquivos = listar_pdfs(args.input)
+        tasa_df = ler_tabela(args.tasa) if args.tasa else None
+        sharepoint_df = None
+        if args.sharepoint:
+            from services.sharepoint_utils import carregar_sharepoint
+            sharepoint_df = carregar_sharepoint(
+                ArquivoLocal(args.sharepoint).getvalue(),
+                tasa_df=pd.DataFrame() if tasa_df is None else tasa_df,
+            )
+
+    if not arquivos:
+        print("Nenhum PDF encontrado.", file=sys.stderr)
+        return 1
+
+    df = executar(args.fluxo, arquivos, tasa_df, sharepoint_df, args.workers, tempos, args.perfil)
+    if df is None or df.empty:
+        print("Nenhum dado extraído.", file=sys.stderr)
+        return 1
+
+    with etapa(f"gravação ({len(df)} linhas)", tempos):
+        gravar_tabela(df, args.out)
+
+    print(f"[{sum(t for _, t in tempos):8.2f}s] total -> {args.out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,21 @@
 # services/adicionales_service.py
+import os
 from io import BytesIO
 from typing import List, Optional
 import pandas as pd
 import streamlit as st
 
+from services import adicionales_utils, regex_utils
+from services.cache_service import (
+    gravar_linhas_cache,
+    hash_bytes,
+    ler_linhas_cache,
+    montar_lote,
+    obter_com_cache,
+    versao_de_arquivos,
+)
+from services.perfil_service import etapa
+
 from services.adicionales_utils import (
     extrair_ruc, extrair_facturas, remover_ruc_indesejado, criar_coluna_proveedor_iscala,
     extrair_fecha_emision, normalizar_data, extrair_moneda, ajustar_e_padronizar_moneda,
@@ -14,6 +26,11 @@ from services.adicionales_utils import (
     remover_duplicatas_source_file, op_gravada_negativo_CN
 )
 
+# Suba a versão se mudar o que _extract_text_from_pdf_bytes devolve (invalida o cache)
+VERSAO_EXTRATOR_TEXTO = 1
+NOME_CACHE_TEXTO = "adicionales_texto"
+
+
 def _extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
     try:
         import fitz  # ✅ import local, só quando necessário
@@ -22,50 +39,111 @@ def _extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
             return text if text.strip() else "[PDF baseado em imagem - sem texto extraível]"
     except Exception as e:
         return f"[Erro ao abrir/ler o PDF: {e}]"
-        
-def process_adicionales_streamlit(
-    uploaded_files: List,
-    progress_widget=None,
-    status_widget=None,
-    cambio_df: Optional[pd.DataFrame] = None,
-) -> Optional[pd.DataFrame]:
-    if not uploaded_files:
-        return None
 
-    rows = []
-    total = len(uploaded_files)
-    for i, f in enumerate(uploaded_files, start=1):
-        fname = getattr(f, "name", f"arquivo_{i}.pdf")
-        text = _extract_text_from_pdf_bytes(f.getvalue())
-        rows.append({"source_file": fname, "conteudo_pdf": text})
 
-        if progress_widget:
-            pct = int(i / total * 100)
-            progress_widget.progress(pct, text=f"Lendo {fname} ({i}/{total})")
-        if status_widget:
-            status_widget.write(f"📄 Lido: **{fname}**")
+def _texto_cacheavel(texto: str) -> bool:
+    return not texto.startswith("[Erro ao abrir/ler o PDF")
+
+
+def _linha_cacheavel(linha: pd.DataFrame) -> bool:
+    return _texto_cacheavel(linha["conteudo_pdf"].iloc[0])
+
+
+# Linhas parseadas por PDF (antes de Tasa/SharePoint): a versão muda
+# sozinha quando muda o código das regras
+NOME_CACHE_LINHAS = "adicionales_linhas"
+VERSAO_PARSER = versao_de_arquivos(
+    os.path.abspath(__file__), adicionales_utils.__file__, regex_utils.__file__,
+)
+TAMANHO_LOTE = 10
 
-    df = pd.DataFrame(rows)
 
-    # --- Pipeline ---
-    df["R.U.C"] = df["conteudo_pdf"].apply(extrair_ruc)
+def _parsear_textos(df: pd.DataFrame) -> pd.DataFrame:
+    """Tudo o que depende só do texto dos PDFs (uma linha por arquivo)."""
+    with etapa("extrair R.U.C", df):
+        df["R.U.C"] = df["conteudo_pdf"].apply(extrair_ruc)
     df = remover_ruc_indesejado(df)
     df = criar_coluna_proveedor_iscala(df)
 
-    df["Factura"] = df["conteudo_pdf"].apply(extrair_facturas)
-    df["Fecha de Emisión"] = df["conteudo_pdf"].apply(extrair_fecha_emision).apply(normalizar_data)
+    with etapa("extrair Factura / Fecha de Emisión", df):
+        df["Factura"] = df["conteudo_pdf"].apply(extrair_facturas)
+        df["Fecha de Emisión"] = df["conteudo_pdf"].apply(extrair_fecha_emision).apply(normalizar_data)
 
-    df["Moneda"] = df["conteudo_pdf"].apply(extrair_moneda).apply(ajustar_e_padronizar_moneda)
-    df["Cod. Moneda"] = df["Moneda"].apply(codificar_moneda)
+    with etapa("extrair Moneda", df):
+        df["Moneda"] = df["conteudo_pdf"].apply(extrair_moneda).apply(ajustar_e_padronizar_moneda)
+        df["Cod. Moneda"] = df["Moneda"].apply(codificar_moneda)
 
-    df["Tipo Doc"] = df.apply(extrair_tipo_doc, axis=1)
+    with etapa("extrair Tipo Doc", df):
+        df["Tipo Doc"] = df.apply(extrair_tipo_doc, axis=1)
     df = padronizar_tipo_doc(df)
 
-    df["Op. Gravada"] = df.apply(extrair_op_gravada, axis=1).apply(limpar_op_gravada).apply(formatar_op_gravada)
+    with etapa("extrair Op. Gravada", df):
+        df["Op. Gravada"] = df.apply(extrair_op_gravada, axis=1).apply(limpar_op_gravada).apply(formatar_op_gravada)
     df = op_gravada_negativo_CN(df)
+    # Ausente vira None ou NaN conforme os vizinhos do lote; fixa NaN para a
+    # linha de um PDF ser a mesma parseada sozinha ou junto com outras
+    df["Op. Gravada"] = df["Op. Gravada"].astype(float)
+
+    with etapa("Cuenta / Error", df):
+        df["Cuenta"] = df["Cod. Moneda"].apply(atribuir_cuenta)
+        df["Error"] = df["Proveedor Iscala"].apply(error)
+    return df
+
 
-    df["Cuenta"] = df["Cod. Moneda"].apply(atribuir_cuenta)
-    df["Error"] = df["Proveedor Iscala"].apply(error)
+def process_adicionales_streamlit(
+    uploaded_files: List,
+    progress_widget=None,
+    status_widget=None,
+    cambio_df: Optional[pd.DataFrame] = None,
+    sharepoint_df: Optional[pd.DataFrame] = None,
+) -> Optional[pd.DataFrame]:
+    if not uploaded_files:
+        return None
+
+    total = len(uploaded_files)
+    nomes = [getattr(f, "name", f"arquivo_{i}.pdf") for i, f in enumerate(uploaded_files, start=1)]
+
+    # PDFs já parseados numa execução anterior (mesmos bytes) saem do cache,
+    # em qualquer posição do upload: só os novos/alterados são parseados
+    digests = [hash_bytes(f.getvalue()) for f in uploaded_files]
+    prontos = ler_linhas_cache(digests, NOME_CACHE_LINHAS, VERSAO_PARSER)
+
+    partes = []
+    for start in range(0, total, TAMANHO_LOTE):
+        posicoes = range(start, min(start + TAMANHO_LOTE, total))
+        novos = [idx for idx in posicoes if idx not in prontos]
+        rows = []
+        with etapa("leitura dos PDFs", [uploaded_files[idx] for idx in novos]) as registro:
+            for idx in posicoes:
+                fname = nomes[idx]
+                lido = idx not in prontos
+                if lido:
+                    text = obter_com_cache(
+                        _extract_text_from_pdf_bytes, uploaded_files[idx].getvalue(),
+                        NOME_CACHE_TEXTO, VERSAO_EXTRATOR_TEXTO, cacheavel=_texto_cacheavel,
+                    )
+                    rows.append({"source_file": fname, "conteudo_pdf": text})
+
+                if progress_widget:
+                    pct = int((idx + 1) / total * 100)
+                    progress_widget.progress(pct, text=f"Lendo {fname} ({idx + 1}/{total})")
+                if status_widget:
+                    status_widget.write(f"📄 {'Lido' if lido else 'Já processado'}: **{fname}**")
+            registro.saida(rows)
+
+        # --- Pipeline (parsing) ---
+        parte = None
+        if rows:
+            parte = _parsear_textos(pd.DataFrame(rows))
+            gravar_linhas_cache(
+                NOME_CACHE_LINHAS, VERSAO_PARSER, [digests[idx] for idx in novos], parte,
+                cacheavel=_linha_cacheavel,
+            )
+        if len(novos) < len(posicoes):
+            parte = montar_lote(posicoes, prontos, parte, nomes)
+        partes.append(parte)
+
+    df = pd.concat(partes, ignore_index=True)
 
     # Tasa (merge por data)
     df = adicionar_coluna_tasa(df, cambio_df=cambio_df)
@@ -81,7 +159,9 @@ def process_adicionales_streamlit(
 
     
     from services.adicionales_utils import adicionar_sharepoint_adicionales
-    sharepoint_df = st.session_state.get("sharepoint_df")
+    # Fora do app (ex.: CLI) o SharePoint vem por parâmetro
+    if sharepoint_df is None:
+        sharepoint_df = st.session_state.get("sharepoint_df")
     df = adicionar_sharepoint_adicionales(df, sharepoint_df)
 
     if progress_widget:
@@ -98,30 +178,31 @@ def process_adicionales_streamlit(
             df[src_col] = df[src_col].fillna("").replace("", None)
             df[dest_col] = df[dest_col].combine_first(df[src_col])
     
-    # 1) R.U.C ← fornecedor (coluna "proveedor" no SharePoint)
-    preencher_vazio("R.U.C", "proveedor")
-    
-    # 2) Proveedor Iscala ← proveedor
-    preencher_vazio("Proveedor Iscala", "proveedor")
-    
-    # 3) Factura ← numero_de_documento
-    preencher_vazio("Factura", "numero_de_documento")
-    
-    # 4) Tipo Doc ← tipo_doc
-    preencher_vazio("Tipo Doc", "tipo_doc")
-    
-    # 5) Fecha de Emisión ← Fecha_Emision
-    preencher_vazio("Fecha de Emisión", "Fecha_Emision")
-    
-    # 6) Moneda ← moneda
-    preencher_vazio("Moneda", "moneda")
-    
-    # 7) Amount / Op. Gravada ← importe_documento
-    if "Op. Gravada" in df.columns: 
-        preencher_vazio("Op. Gravada", "importe_documento")
-    
-    # 8) Tasa ← Tasa_Sharepoint
-    preencher_vazio("Tasa", "Tasa_Sharepoint")
+    with etapa("complementar campos vazios", df):
+        # 1) R.U.C ← fornecedor (coluna "proveedor" no SharePoint)
+        preencher_vazio("R.U.C", "proveedor")
+
+        # 2) Proveedor Iscala ← proveedor
+        preencher_vazio("Proveedor Iscala", "proveedor")
+
+        # 3) Factura ← numero_de_documento
+        preencher_vazio("Factura", "numero_de_documento")
+
+        # 4) Tipo Doc ← tipo_doc
+        preencher_vazio("Tipo Doc", "tipo_doc")
+
+        # 5) Fecha de Emisión ← Fecha_Emision
+        preencher_vazio("Fecha de Emisión", "Fecha_Emision")
+
+        # 6) Moneda ← moneda
+        preencher_vazio("Moneda", "moneda")
+
+        # 7) Amount / Op. Gravada ← importe_documento
+        if "Op. Gravada" in df.columns:
+            preencher_vazio("Op. Gravada", "importe_documento")
+
+        # 8) Tasa ← Tasa_Sharepoint
+        preencher_vazio("Tasa", "Tasa_Sharepoint")
 
     # (depois do seu bloco preencher_vazio(...))
 
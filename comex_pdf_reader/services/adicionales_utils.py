@@ -1,45 +1,52 @@
 
 # services/adicionales_utils.py
-import re
 import unicodedata
 from datetime import datetime
 import pandas as pd
 
+from services.sharepoint_utils import merge_por_substring
+from services.perfil_service import instrumentar
+from services.regex_utils import (
+    RE_DATA_DD_MMM_YYYY,
+    RE_DATA_DMY,
+    RE_DATA_DMY_BARRA,
+    RE_DATA_DMY_OU_YMD,
+    RE_DATA_YMD,
+    RE_DOLARES,
+    RE_ESPACOS,
+    RE_F_DE_EMISION,
+    RE_FACTURAS_ADICIONALES,
+    RE_FECHA_EMISION_DMY,
+    RE_FECHA_ISSUE_DATE,
+    RE_MONEDA_INLINE,
+    RE_NAO_VALOR,
+    RE_RUC,
+    RE_YMD_APOS_SEPARADOR,
+)
+
 # --- EXTRAÇÕES BÁSICAS ---
 
 def extrair_ruc(texto: str) -> str:
-    match1 = re.search(r'R\.U\.C.*?(\d{11})', texto)
-    if match1:
-        return match1.group(1).strip()
-    match2 = re.search(r'RUC:\s*(\d{11})', texto)
-    if match2:
-        return match2.group(1).strip()
-    match3 = re.search(r'RUC N°\s*(\d{11})', texto)
-    if match3:
-        return match3.group(1).strip()
+    for padrao in RE_RUC:
+        match = padrao.search(texto)
+        if match:
+            return match.group(1).strip()
     return ""
 
 def extrair_facturas(texto: str) -> str:
-    for pattern in [
-        r'F\d{3}[-\s]*\d{9}',
-        r'F\d{3}[-\s]*\d{8}',
-        r'F\d{3}[-\s]*\d{5,7}',
-        r'F\d{2}[-\s]*\d{5,7}',
-        r'INV-[A-Z]+-\d{8}',
-        r'Número de Invoice\(Invoice No\.\)\s*:\s*([A-Z]{4}\d{9})',
-        r'\bPECLLP\d{9}\b',
-        r'F\d{3}[-\s]*\d{4}',
-    ]:
-        m = re.search(pattern, texto)
+    for pattern in RE_FACTURAS_ADICIONALES:
+        m = pattern.search(texto)
         if m:
             g = m.group(1) if m.lastindex else m.group(0)
             return g.replace(" ", "").strip()
     return ""
 
+@instrumentar
 def remover_ruc_indesejado(df: pd.DataFrame, ruc_indesejado="20100073308") -> pd.DataFrame:
     df["R.U.C"] = df["R.U.C"].apply(lambda x: "" if x == ruc_indesejado else x)
     return df
 
+@instrumentar
 def criar_coluna_proveedor_iscala(df: pd.DataFrame) -> pd.DataFrame:
     def definir_valor(row):
         txt = row["conteudo_pdf"]
@@ -65,51 +72,51 @@ def extrair_fecha_emision(texto: str) -> str:
         linha = linhas[i].strip()
         linha_up = linha.upper()
 
-        m_emision = re.search(r'F\.?\s*DE\s+EMISI[ÓO]N\s*[:\-]?\s*(\d{4}[-/]\d{2}[-/]\d{2})', linhas[i], re.IGNORECASE)
+        m_emision = RE_F_DE_EMISION.search(linhas[i])
         if m_emision:
             return m_emision.group(1)
 
         if linha_up == "F. DE" and i + 1 < len(linhas):
             proxima = linhas[i + 1].strip()
-            m = re.search(r'[:\-]?\s*(\d{4}[-/]\d{2}[-/]\d{2})', proxima)
+            m = RE_YMD_APOS_SEPARADOR.search(proxima)
             if m:
                 return m.group(1)
 
         if "FECHA DE EMISIÓN" in linha_up or "FECHA DE EMISION" in linha_up:
-            m_inline = re.search(r'FECHA DE EMISI[ÓO]N[:\s]*([0-9]{2}[-/][0-9]{2}[-/][0-9]{4})', linha_up)
+            m_inline = RE_FECHA_EMISION_DMY.search(linha_up)
             if m_inline:
                 return m_inline.group(1)
             if i > 0:
                 prev = linhas[i - 1].strip()
-                if re.match(r'\d{2}[-/]\d{2}[-/]\d{4}', prev) or re.match(r'\d{4}[-/]\d{2}[-/]\d{2}', prev):
+                if RE_DATA_DMY.match(prev) or RE_DATA_YMD.match(prev):
                     return prev
 
         if linha_up == "FECHA" and i + 2 < len(linhas):
             if linhas[i + 1].strip().upper() == "EMISIÓN":
                 data_line = linhas[i + 2].strip()
-                m = re.search(r'\d{2}[-/]\d{2}[-/]\d{4}', data_line)
+                m = RE_DATA_DMY.search(data_line)
                 if m:
                     return m.group(0)
 
         if "R.U.C. N°" in linha_up and i + 1 < len(linhas):
             prox = linhas[i + 1].strip()
-            if re.match(r'\d{4}[-/]\d{2}[-/]\d{2}', prox):
+            if RE_DATA_YMD.match(prox):
                 return prox
 
         if "DOLARES AMERICANOS" in linha_up and i >= 2:
             cand = linhas[i - 2].strip()
-            if re.match(r'\d{2}[-/]\d{2}[-/]\d{4}', cand):
+            if RE_DATA_DMY.match(cand):
                 return cand
 
         if linha_up in ("FECHA DE EMISIÓN", "FECHA DE EMISION") and i > 0:
             prev = linhas[i - 1].strip()
-            if re.match(r'\d{4}[-/]\d{2}[-/]\d{2}', prev):
+            if RE_DATA_YMD.match(prev):
                 return prev
 
         if "FECHA EMISIÓN:" in linha_up or "FECHA DE EMISIÓN:" in linha_up:
             if i > 0:
                 acima = linhas[i - 1].strip()
-                m = re.search(r'\d{2}[-/]\d{2}[-/]\d{4}|\d{4}[-/]\d{2}[-/]\d{2}', acima)
+                m = RE_DATA_DMY_OU_YMD.search(acima)
                 if m:
                     return m.group(0)
 
@@ -117,24 +124,24 @@ def extrair_fecha_emision(texto: str) -> str:
             for offset in range(1, 17):
                 if i + offset < len(linhas):
                     ld = linhas[i + offset].strip()
-                    if re.match(r'\d{4}[-/]\d{2}[-/]\d{2}', ld):
+                    if RE_DATA_YMD.match(ld):
                         return ld
 
     for i in range(1, len(linhas)):
         if linhas[i].strip().upper() in ["FECHA:", "FECHA"]:
             ant = linhas[i - 1].strip()
-            m = re.search(r'\d{2}/\d{2}/\d{4}', ant)
+            m = RE_DATA_DMY_BARRA.search(ant)
             if m:
                 return m.group(0)
 
     for i in range(len(linhas) - 3):
         if "FACTURA" in linhas[i].strip().upper():
             ld = linhas[i + 3].strip()
-            m = re.match(r'\d{2}-[A-Z][a-z]{2}-\d{4}', ld)
+            m = RE_DATA_DD_MMM_YYYY.match(ld)
             if m:
                 return m.group(0)
 
-    m = re.search(r'FECHA EMISI[ÓO]N\(ISSUE DATE\)\s*[:\-]?\s*(\d{4}[-/]\d{2}[-/]\d{2})', texto.upper())
+    m = RE_FECHA_ISSUE_DATE.search(texto.upper())
     if m:
         return m.group(1)
     return ""
@@ -163,7 +170,7 @@ def extrair_moneda(texto: str) -> str:
         up = linha.upper()
 
         if any(p in up for p in palavras_chave):
-            m_inline = re.search(r'(MONEDA|CURRENCY)\s*[:\-]?\s*([A-Z\s]+)', up)
+            m_inline = RE_MONEDA_INLINE.search(up)
             if m_inline:
                 moeda = m_inline.group(2).strip()
                 if any(m in moeda for m in padroes_moeda):
@@ -183,7 +190,7 @@ def ajustar_e_padronizar_moneda(valor: str) -> str:
     if not isinstance(valor, str):
         return valor
     val = ''.join(c for c in unicodedata.normalize('NFD', valor) if unicodedata.category(c) != 'Mn').upper()
-    m = re.search(r'(DOLARES.*)', val)
+    m = RE_DOLARES.search(val)
     if m:
         val = m.group(1).strip()
     subs = {
@@ -296,7 +303,7 @@ def extrair_op_gravada(row) -> str:
 
 def limpar_op_gravada(valor):
     if isinstance(valor, str):
-        return re.sub(r'[^0-9,\.]', '', valor)
+        return RE_NAO_VALOR.sub('', valor)
     return valor
 
 def formatar_op_gravada(valor):
@@ -311,6 +318,7 @@ def formatar_op_gravada(valor):
             return None
     return valor
 
+@instrumentar
 def op_gravada_negativo_CN(df: pd.DataFrame) -> pd.DataFrame:
     if 'Tipo Doc' in df.columns and 'Op. Gravada' in df.columns:
         df['Op. Gravada'] = df.apply(
@@ -377,6 +385,7 @@ def extrair_tipo_doc(row) -> str:
         return linhas[6].strip()
     return ""
 
+@instrumentar
 def padronizar_tipo_doc(df: pd.DataFrame) -> pd.DataFrame:
     subs = {
         "FACTURA ELECTRÓNICA": "FACTURA",
@@ -395,6 +404,7 @@ def padronizar_tipo_doc(df: pd.DataFrame) -> pd.DataFrame:
 
 # --- OUTRAS REGRAS ---
 
+@instrumentar
 def Ajustar_nro_nota_credito(df: pd.DataFrame) -> pd.DataFrame:
     def limpar_valor(v: str) -> str:
         return (v.replace("Nro", "").replace("N°", "").replace(".", "").replace(" ", "").strip())
@@ -467,6 +477,7 @@ def _tipo_doc_padrao_adic(valor: str) -> str:
         return "NOTA_CREDITO"
     return ""
 
+@instrumentar
 def adicionar_cod_autorizacion_adicionales(df: pd.DataFrame) -> pd.DataFrame:
     """
     ADICIONALES — Idempotente:
@@ -489,6 +500,7 @@ def adicionar_cod_autorizacion_adicionales(df: pd.DataFrame) -> pd.DataFrame:
     df.loc[mask_vazio & (tipo_std == "NOTA_CREDITO"), "Cód. de Autorización"] = "07"
     return df
 
+@instrumentar
 def adicionar_tip_doc_adicionales(df: pd.DataFrame) -> pd.DataFrame:
     """
     ADICIONALES — Idempotente:
@@ -510,6 +522,7 @@ def adicionar_tip_doc_adicionales(df: pd.DataFrame) -> pd.DataFrame:
     df.loc[mask_vazio & (tipo_std == "NOTA_CREDITO"), "Tipo de Factura"] = "01"
     return df
 
+@instrumentar
 def organizar_colunas_adicionales(df: pd.DataFrame) -> pd.DataFrame:
     desejadas = [
         'source_file', 'conteudo_pdf', 'R.U.C', 'Proveedor Iscala', 'Factura', 'Tipo Doc',
@@ -519,12 +532,12 @@ def organizar_colunas_adicionales(df: pd.DataFrame) -> pd.DataFrame:
     presentes = [c for c in desejadas if c in df.columns]
     return df[presentes + [c for c in df.columns if c not in presentes]]
 
+@instrumentar
 def remover_duplicatas_source_file(df: pd.DataFrame) -> pd.DataFrame:
     return df.drop_duplicates(subset='source_file', keep='first')
 
 
 import pandas as pd
-import re
 
 
 def merge_sharepoint_adicionales(df_adic, df_sp):
@@ -541,32 +554,21 @@ def merge_sharepoint_adicionales(df_adic, df_sp):
     df_sp = df_sp.rename(columns=renames)
 
     # Função para limpar espaços invisíveis, múltiplos espaços e normalizar nomes
-    import re
     def normalizar_nome(s):
         if s is None:
             return ""
         s = str(s)
         s = s.replace("\u200b", "")      # zero-width space invisível
         s = s.replace("\u00a0", " ")     # no-break space
-        s = re.sub(r"\s+", " ", s)       # múltiplos espaços -> 1 espaço
+        s = RE_ESPACOS.sub(" ", s)       # múltiplos espaços -> 1 espaço
         return s.lower().strip()         # minúsculas e trim
 
     # Normaliza texto para comparação (AGORA SIM!)
     df_ext["key_ext"] = df_ext["source_file"].apply(normalizar_nome)
     df_sp["key_sp"]  = df_sp["name"].apply(normalizar_nome)
 
-    # Merge cartesiano
-    df_ext["_tmp"] = 1
-    df_sp["_tmp"] = 1
-    df_all = df_ext.merge(df_sp, on="_tmp")
-
-    # Compatibilidade textual
-    def match(row):
-        ext = row["key_ext"]
-        sp  = row["key_sp"]
-        return ext in sp or sp in ext
-
-    df_all = df_all[df_all.apply(match, axis=1)]
+    # Pares que casam por substring (ext in sp ou sp in ext), via índice
+    df_all = merge_por_substring(df_ext, df_sp, "key_ext", "key_sp")
 
     # Colunas extras a trazer
     colunas_extras = [
@@ -595,6 +597,7 @@ def merge_sharepoint_adicionales(df_adic, df_sp):
     
     return df_final
 
+@instrumentar
 def adicionar_sharepoint_adicionales(df_adic, df_sharepoint):
     if df_sharepoint is None or df_sharepoint.empty:
         return df_adic
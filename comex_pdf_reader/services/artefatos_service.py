@@ -0,0 +1,73 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable
+
+import pandas as pd
+
+# ==========================================================
+# Cache em memória dos arquivos de download (CSV / XLSX)
+# ==========================================================
+# Chave = impressão digital do DataFrame (conteúdo + colunas + dtypes) e o
+# tipo do artefato ("csv", "xlsx:Externos" ...). Os bytes são gerados uma
+# vez por resultado; reruns (cada clique, cada widget) e outras sessões com
+# o mesmo DataFrame reaproveitam o que já foi gerado.
+#
+# O cache é do processo (compartilhado entre sessões) e é LRU: ao passar do
+# limite, saem os artefatos usados há mais tempo.
+
+ARTEFATOS_MAX_BYTES = int(os.environ.get("COMEX_ARTEFATOS_MAX_MB", "256")) * 1024 * 1024
+ARTEFATOS_MAX_ITENS = int(os.environ.get("COMEX_ARTEFATOS_MAX_ITENS", "64"))
+
+_lock = threading.Lock()
+_artefatos: "OrderedDict[tuple, bytes]" = OrderedDict()
+_tamanho_atual = 0
+
+
+def impressao_digital(df: pd.DataFrame) -> str:
+    """SHA-256 do conteúdo do DataFrame (valores, índice, nomes e tipos das colunas)."""
+    h = hashlib.sha256()
+    h.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    try:
+        h.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    except TypeError:
+        # Células não hasheáveis (listas, dicts ...): cai para o texto do CSV
+        h.update(df.to_csv().encode("utf-8"))
+    return h.hexdigest()
+
+
+def _remover_excedente() -> None:
+    global _tamanho_atual
+    while _artefatos and (
+        _tamanho_atual > ARTEFATOS_MAX_BYTES or len(_artefatos) > ARTEFATOS_MAX_ITENS
+    ):
+        _chave, dados = _artefatos.popitem(last=False)
+        _tamanho_atual -= len(dados)
+
+
+def obter_artefato(digital: str, tipo: str, gerar: Callable[[], bytes]) -> bytes:
+    """Bytes do artefato `tipo` para o DataFrame `digital`; gera só se ainda não estiver no cache."""
+    global _tamanho_atual
+    chave = (digital, tipo)
+    with _lock:
+        dados = _artefatos.get(chave)
+        if dados is not None:
+            _artefatos.move_to_end(chave)
+            return dados
+
+    dados = gerar()  # fora do lock: um workbook grande não trava os outros downloads
+
+    with _lock:
+        if chave not in _artefatos:
+            _artefatos[chave] = dados
+            _tamanho_atual += len(dados)
+            _remover_excedente()
+    return dados
+
+
+def limpar_artefatos() -> None:
+    global _tamanho_atual
+    with _lock:
+        _artefatos.clear()
+        _tamanho_atual = 0
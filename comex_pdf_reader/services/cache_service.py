@@ -0,0 +1,263 @@
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from services.parallel_utils import mapear_em_ordem
+
+# ==========================================================
+# Cache em disco do que sai da DECODIFICAÇÃO dos PDFs
+# ==========================================================
+# Chave = SHA-256 dos bytes do arquivo + nome/versão do extrator.
+# Guarda só o resultado bruto (texto, linhas, tabela); o parsing continua
+# rodando sempre, então correções nas regras não exigem reabrir o PDF.
+# Ao mudar um extrator, suba a versão dele para invalidar as entradas antigas.
+#
+# LRU por mtime: leitura "toca" o arquivo; ao passar do limite, remove os
+# mais antigos até ficar em ~90% do limite.
+
+CACHE_DIR = os.environ.get("COMEX_PDF_CACHE_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "comex_pdf_reader"
+)
+CACHE_MAX_BYTES = int(os.environ.get("COMEX_PDF_CACHE_MAX_MB", "512")) * 1024 * 1024
+CACHE_ATIVO = os.environ.get("COMEX_PDF_CACHE", "1") != "0" and CACHE_MAX_BYTES > 0
+
+_AUSENTE = object()
+_lock = threading.Lock()
+_tamanho_atual: Optional[int] = None
+
+
+def hash_bytes(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _caminho(extrator: str, versao: int, digest: str) -> str:
+    return os.path.join(CACHE_DIR, extrator, digest[:2], f"{digest}_v{versao}.pkl")
+
+
+def _arquivos_cache():
+    for raiz, _dirs, nomes in os.walk(CACHE_DIR):
+        for nome in nomes:
+            if nome.endswith(".pkl"):
+                caminho = os.path.join(raiz, nome)
+                try:
+                    info = os.stat(caminho)
+                except OSError:
+                    continue
+                yield caminho, info.st_size, info.st_mtime
+
+
+def limitar_tamanho_cache(max_bytes: Optional[int] = None) -> None:
+    """Remove as entradas usadas há mais tempo até caber em ~90% do limite."""
+    global _tamanho_atual
+    limite = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    with _lock:
+        arquivos = sorted(_arquivos_cache(), key=lambda a: a[2])
+        total = sum(a[1] for a in arquivos)
+        alvo = int(limite * 0.9)
+        for caminho, tamanho, _mtime in arquivos:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+        _tamanho_atual = total
+
+
+def ler_cache(extrator: str, versao: int, digest: str):
+    """Devolve o valor guardado ou `_AUSENTE`. Qualquer falha de disco = miss."""
+    if not CACHE_ATIVO:
+        return _AUSENTE
+    caminho = _caminho(extrator, versao, digest)
+    try:
+        with open(caminho, "rb") as fh:
+            valor = pickle.load(fh)
+        os.utime(caminho)  # LRU
+        return valor
+    except FileNotFoundError:
+        return _AUSENTE
+    except Exception:
+        # Entrada corrompida/incompatível: descarta
+        try:
+            os.remove(caminho)
+        except OSError:
+            pass
+        return _AUSENTE
+
+
+def gravar_cache(extrator: str, versao: int, digest: str, valor) -> None:
+    global _tamanho_atual
+    if not CACHE_ATIVO:
+        return
+    caminho = _caminho(extrator, versao, digest)
+    tmp = None
+    try:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(caminho), suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump(valor, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, caminho)  # atômico: leitores nunca veem arquivo pela metade
+        tamanho = os.path.getsize(caminho)
+    except Exception:
+        # Cache é só otimização: falha de disco não pode derrubar o processamento
+        if tmp is not None:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+        return
+
+    with _lock:
+        if _tamanho_atual is None:
+            _tamanho_atual = sum(a[1] for a in _arquivos_cache())
+        else:
+            _tamanho_atual += tamanho
+        estourou = _tamanho_atual > CACHE_MAX_BYTES
+    if estourou:
+        limitar_tamanho_cache()
+
+
+def obter_com_cache(
+    fn: Callable,
+    pdf_bytes: bytes,
+    extrator: str,
+    versao: int,
+    cacheavel: Optional[Callable] = None,
+):
+    """
+    `fn(pdf_bytes)` com cache. `cacheavel(resultado)` decide se guarda
+    (ex.: não guardar mensagens de erro, para tentar de novo na próxima).
+    """
+    digest = hash_bytes(pdf_bytes)
+    valor = ler_cache(extrator, versao, digest)
+    if valor is not _AUSENTE:
+        return valor
+    valor = fn(pdf_bytes)
+    if cacheavel is None or cacheavel(valor):
+        gravar_cache(extrator, versao, digest, valor)
+    return valor
+
+
+def mapear_com_cache(
+    fn: Callable,
+    arquivos: List,
+    extrator: str,
+    versao: int,
+    cacheavel: Optional[Callable] = None,
+    max_workers: Optional[int] = None,
+    chaves: Optional[List[str]] = None,
+) -> Iterator:
+    """
+    Igual a `mapear_em_ordem(fn, bytes dos arquivos)`, mas os acertos do cache
+    são resolvidos aqui no processo principal e só os PDFs novos vão ao pool.
+    As gravações também acontecem aqui (os workers não tocam no cache).
+    `chaves`: hashes já calculados pelo chamador (na ordem de `arquivos`).
+    """
+    digests = []
+    faltando = []
+    valores = {}
+    for idx, f in enumerate(arquivos):
+        digest = chaves[idx] if chaves is not None else hash_bytes(f.getvalue())
+        digests.append(digest)
+        valor = ler_cache(extrator, versao, digest)
+        if valor is _AUSENTE:
+            faltando.append(idx)
+        else:
+            valores[idx] = valor
+
+    extraidos = mapear_em_ordem(
+        fn,
+        (arquivos[idx].getvalue() for idx in faltando),
+        max_workers=max_workers if len(faltando) > 1 else 1,
+    )
+    try:
+        for idx in range(len(arquivos)):
+            if idx in valores:
+                yield valores.pop(idx)
+                continue
+            valor = next(extraidos)
+            if cacheavel is None or cacheavel(valor):
+                gravar_cache(extrator, versao, digests[idx], valor)
+            yield valor
+    finally:
+        extraidos.close()
+
+
+
+# ==========================================================
+# Linhas já parseadas, por PDF
+# ==========================================================
+# O parsing (antes dos merges com Tasa/SharePoint) só depende do texto de
+# cada PDF. A linha de cada arquivo fica guardada pelo hash dos bytes dele:
+# numa nova execução, só os PDFs novos ou alterados são parseados, em
+# qualquer posição do upload (inserir, remover ou reordenar não invalida as
+# outras linhas). Os merges rodam de novo sobre o conjunto todo (são
+# baratos e dependem da Tasa/SharePoint atuais).
+#
+# Para `pd.concat` das linhas guardadas reproduzir a execução completa, o
+# parser tem de devolver as mesmas dtypes com uma linha ou com o lote
+# inteiro (ex.: ausente sempre NaN numa coluna numérica, nunca None).
+# A versão vem do código-fonte das regras: alterou uma regra, as linhas
+# guardadas deixam de valer sozinhas.
+
+
+def versao_de_arquivos(*caminhos: str) -> str:
+    """Hash curto do conteúdo dos arquivos de código que definem um estágio."""
+    h = hashlib.sha256()
+    for caminho in caminhos:
+        with open(caminho, "rb") as fh:
+            h.update(fh.read())
+    return h.hexdigest()[:12]
+
+
+def ler_linhas_cache(digests: List[str], extrator: str, versao: str) -> Dict[int, pd.DataFrame]:
+    """{posição do arquivo: linha parseada} para os arquivos que já estão no cache."""
+    prontos = {}
+    for idx, digest in enumerate(digests):
+        valor = ler_cache(extrator, versao, digest)
+        if valor is not _AUSENTE:
+            prontos[idx] = valor
+    return prontos
+
+
+def gravar_linhas_cache(
+    extrator: str,
+    versao: str,
+    digests: List[str],
+    df: pd.DataFrame,
+    cacheavel: Optional[Callable] = None,
+) -> None:
+    """Guarda cada linha de `df` (uma por arquivo, na ordem de `digests`)."""
+    for k, digest in enumerate(digests):
+        linha = df.iloc[[k]].reset_index(drop=True)
+        if cacheavel is None or cacheavel(linha):
+            gravar_cache(extrator, versao, digest, linha)
+
+
+def montar_lote(
+    posicoes: Iterable[int],
+    prontos: Dict[int, pd.DataFrame],
+    novas: Optional[pd.DataFrame],
+    nomes: List[str],
+) -> pd.DataFrame:
+    """
+    Linhas de um lote na ordem do upload: as do cache (retiradas de `prontos`)
+    e as recém-parseadas (`novas`, na ordem). O source_file das linhas do
+    cache passa a ser o nome atual (o mesmo PDF pode ter sido renomeado).
+    """
+    partes, k = [], 0
+    for idx in posicoes:
+        linha = prontos.pop(idx, None)
+        if linha is None:
+            linha = novas.iloc[[k]]
+            k += 1
+        else:
+            linha["source_file"] = nomes[idx]
+        partes.append(linha)
+    return pd.concat(partes, ignore_index=True)
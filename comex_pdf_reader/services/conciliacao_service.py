@@ -0,0 +1,281 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from services.artefatos_service import impressao_digital
+from services.regex_utils import RE_NAO_DIGITO
+
+# ==========================================================
+# Conciliação Estado de Cuenta x Plantilla de Gastos
+# ==========================================================
+# Usada pelos modos "Analise" e "Limpieza Plantilla" do Archivo de Gastos.
+#
+#   consolidar_estado(df_ec)                  -> Cuenta | Saldo_Estado_Cuenta
+#   consolidar_plantilla(df_pg, cuenta, amount, coluna_saldo)
+#                                             -> Cuenta | <coluna_saldo>
+#   comparar_saldos(ec_agg, pg_agg, tol)      -> Cuenta | saldos | Diferença | _div
+#   marcar_ajustadas(df_cmp, orig_agg, limpa_agg, tol) -> + Ajustada
+#   limpiar_plantilla_contra_cuenta(df_pg, df_cuenta)   -> (limpa, stats)
+#   limpiar_plantillas_contra_cuenta({nome: df_pg}, df_cuenta) -> ({nome: limpa}, stats)
+#
+# As consolidações (normalização das contas + groupby sobre as linhas
+# inteiras) ficam num cache em memória do processo, pela impressão digital
+# das colunas usadas: rerun da página, troca de tolerância ou de filtro
+# só refazem o merge/ordenação dos agregados (uma linha por conta).
+
+CONCILIACAO_MAX_ITENS = int(os.environ.get("COMEX_CONCILIACAO_MAX_ITENS", "32"))
+
+_lock = threading.Lock()
+_agregados: "OrderedDict[tuple, pd.DataFrame]" = OrderedDict()
+
+
+def _norm_conta(x) -> str:
+    s = RE_NAO_DIGITO.sub("", str(x))
+    s = s.lstrip("0")
+    return s if s else ""
+
+
+def normalizar_contas(valores: pd.Series) -> pd.Series:
+    """_norm_conta na coluna inteira: roda uma vez por texto distinto (factorize)."""
+    # str(x) por célula (astype não junta 1 e 1.0 como o factorize de objetos);
+    # ausentes ficam NaN -> código -1 -> "" (último item de `normalizados`)
+    codigos, unicos = pd.factorize(valores.astype(str))
+    normalizados = np.array([_norm_conta(u) for u in unicos] + [""], dtype=object)
+    return pd.Series(normalizados[codigos], index=valores.index, dtype="str")
+
+
+def encontrar_coluna(df: pd.DataFrame, alvo: str):
+    """Coluna cujo nome é `alvo` (sem caixa/espaços); senão a 1ª que o contenha."""
+    for c in df.columns:
+        if str(c).strip().lower() == alvo:
+            return c
+    cand = [c for c in df.columns if alvo in str(c).strip().lower()]
+    return cand[0] if cand else None
+
+
+def _agregado_em_cache(chave: tuple, calcular: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+    with _lock:
+        df = _agregados.get(chave)
+        if df is not None:
+            _agregados.move_to_end(chave)
+            return df.copy()
+
+    df = calcular()
+
+    with _lock:
+        _agregados[chave] = df
+        while len(_agregados) > CONCILIACAO_MAX_ITENS:
+            _agregados.popitem(last=False)
+    return df.copy()
+
+
+def _somar_por_conta(contas: pd.Series, valores: pd.Series, coluna_saldo: str) -> pd.DataFrame:
+    df = pd.DataFrame({
+        "Cuenta": normalizar_contas(contas),
+        coluna_saldo: pd.to_numeric(valores, errors="coerce").fillna(0.0),
+    })
+    df = df[df["Cuenta"].str.len() > 0]
+    return df.groupby("Cuenta", as_index=False)[coluna_saldo].sum()
+
+
+def consolidar_estado(df_ec: pd.DataFrame) -> pd.DataFrame:
+    """Soma do Período por CTA normalizada (precisa das colunas 'CTA' e 'Período')."""
+    dados = df_ec[["CTA", "Período"]]
+    return _agregado_em_cache(
+        ("estado", impressao_digital(dados)),
+        lambda: _somar_por_conta(dados["CTA"], dados["Período"], "Saldo_Estado_Cuenta"),
+    )
+
+
+def consolidar_plantilla(
+    df_pg: pd.DataFrame,
+    cuenta_col,
+    amount_col,
+    coluna_saldo: str = "Saldo_Plantilla_Gastos",
+) -> pd.DataFrame:
+    """Soma do Amount por Cuenta normalizada, na coluna `coluna_saldo`."""
+    dados = df_pg[[cuenta_col, amount_col]]
+    return _agregado_em_cache(
+        ("plantilla", coluna_saldo, impressao_digital(dados)),
+        lambda: _somar_por_conta(dados[cuenta_col], dados[amount_col], coluna_saldo),
+    )
+
+
+def comparar_saldos(df_ec_agg: pd.DataFrame, df_pg_agg: pd.DataFrame, tol: float) -> pd.DataFrame:
+    """Outer merge por Cuenta, Diferença (Plantilla - Estado) e _div pela tolerância, por nº de conta."""
+    df_cmp = pd.merge(df_ec_agg, df_pg_agg, on="Cuenta", how="outer")
+    for c in ["Saldo_Estado_Cuenta", "Saldo_Plantilla_Gastos"]:
+        df_cmp[c] = pd.to_numeric(df_cmp[c], errors="coerce").fillna(0.0)
+
+    df_cmp["Diferença"] = (df_cmp["Saldo_Plantilla_Gastos"] - df_cmp["Saldo_Estado_Cuenta"]).round(2)
+    df_cmp["_div"] = df_cmp["Diferença"].abs() > float(tol)
+
+    df_cmp["_cuenta_num"] = pd.to_numeric(df_cmp["Cuenta"], errors="coerce")
+    return df_cmp.sort_values(by="_cuenta_num", ascending=True).drop(columns=["_cuenta_num"]).reset_index(drop=True)
+
+
+def marcar_ajustadas(
+    df_cmp: pd.DataFrame,
+    df_pg_orig_agg: Optional[pd.DataFrame],
+    df_pg_clean_agg: pd.DataFrame,
+    tol: float,
+) -> pd.DataFrame:
+    """Coluna Ajustada: o saldo da conta mudou com a limpeza (além da tolerância)."""
+    if df_pg_orig_agg is None:
+        return df_cmp.assign(Ajustada=False)
+
+    df_cmp_adj = pd.merge(df_pg_orig_agg, df_pg_clean_agg, on="Cuenta", how="outer")
+    for c in ["Saldo_Plantilla_Original", "Saldo_Plantilla_Gastos"]:
+        df_cmp_adj[c] = pd.to_numeric(df_cmp_adj[c], errors="coerce").fillna(0.0)
+    contas_ajustadas = df_cmp_adj.assign(
+        Ajustada=(df_cmp_adj["Saldo_Plantilla_Original"] - df_cmp_adj["Saldo_Plantilla_Gastos"]).abs() > float(tol)
+    )[["Cuenta", "Ajustada"]]
+
+    if contas_ajustadas.empty:
+        return df_cmp.assign(Ajustada=False)
+    df_cmp = pd.merge(df_cmp, contas_ajustadas, on="Cuenta", how="left")
+    df_cmp["Ajustada"] = df_cmp["Ajustada"].fillna(False)
+    return df_cmp
+
+
+# ----------------------------------------------------------
+# Limpieza Plantilla Gastos (excedentes por Chave contra o GL0061)
+# ----------------------------------------------------------
+# Tudo por chave normalizada, em Series alinhadas pelo índice do
+# value_counts da Plantilla (mesma ordem em que o laço por chave andava):
+#   limite = ocorrências no GL0061 -> linhas além do limite saem;
+#   guard  = mesma contagem e soma dentro de tol_soma -> chave fica inteira.
+
+COLUNAS_STATS = ["Plantilla", "rows_original", "rows_clean", "rows_removed", "keys_with_removal"]
+
+
+def _norm_key_series(s: pd.Series) -> pd.Series:
+    return (
+        s.astype(str)
+         .str.replace("\u2212", "-", regex=False)
+         .str.replace("\xa0", " ", regex=False)
+         .str.replace(r"\s+", " ", regex=True)
+         .str.strip()
+    )
+
+
+def _resumo_cuenta(df_cuenta: pd.DataFrame, chave_col: str) -> Tuple[pd.Series, pd.Series]:
+    """(ocorrências, soma do Saldo Real) por chave normalizada do GL0061."""
+    chaves = _norm_key_series(df_cuenta[chave_col])
+    cnt_cuenta = chaves.value_counts()
+    sum_cuenta = pd.Series(dtype=float)
+    if "Saldo Real" in df_cuenta.columns:
+        sum_cuenta = pd.to_numeric(df_cuenta["Saldo Real"], errors="coerce").groupby(chaves).sum(min_count=1)
+    return cnt_cuenta, sum_cuenta
+
+
+def _limpar_plantilla(
+    df_pg: pd.DataFrame,
+    chave_col: str,
+    cnt_cuenta: pd.Series,
+    sum_cuenta: pd.Series,
+    tol_soma: float,
+) -> Tuple[pd.DataFrame, dict]:
+    df_pg = df_pg.copy()
+    df_pg["_key_norm"] = _norm_key_series(df_pg[chave_col])
+
+    cnt_pg = df_pg["_key_norm"].value_counts()
+    cct = cnt_cuenta.reindex(cnt_pg.index, fill_value=0)
+
+    amount_col = None
+    for c in df_pg.columns:
+        cl = str(c).strip().lower()
+        if cl == "amount" or "amount" in cl:
+            amount_col = c
+            break
+
+    sum_pg = pd.Series(dtype=float)
+    if amount_col is not None:
+        sum_pg = pd.to_numeric(df_pg[amount_col], errors="coerce").groupby(df_pg["_key_norm"]).sum(min_count=1)
+
+    rank = df_pg.groupby("_key_norm").cumcount() + 1
+    keep_limit = df_pg["_key_norm"].map(cnt_cuenta)
+
+    mask_keep = keep_limit.isna() | (rank <= keep_limit.fillna(np.inf))
+
+    if not sum_pg.empty and not sum_cuenta.empty:
+        # Soma ausente (tudo NaN) nunca "bate": a diferença vira NaN
+        spg = sum_pg.reindex(cnt_pg.index, fill_value=0.0)
+        scu = sum_cuenta.reindex(cnt_pg.index, fill_value=0.0)
+        bate = (cnt_pg == cct) & (cct > 0) & ((spg - scu).abs() <= tol_soma)
+        if bate.any():
+            mask_keep = mask_keep | df_pg["_key_norm"].isin(cnt_pg.index[bate])
+
+    df_clean = df_pg[mask_keep].copy().reset_index(drop=True)
+    df_clean.drop(columns=["_key_norm"], inplace=True, errors="ignore")
+
+    # Excedente por chave, exibida com a 1ª grafia original da Plantilla
+    excesso = (cnt_pg - cct)[(cnt_pg > cct) & (cct > 0)]
+    first_original_key = df_pg.groupby("_key_norm")[chave_col].first()
+    rotulos = [str(k) for k in first_original_key.reindex(excesso.index).tolist()]
+    removed_by_key = dict(zip(rotulos, excesso.astype(int).tolist()))
+
+    stats = {
+        "rows_original": int(len(df_pg)),
+        "rows_clean": int(len(df_clean)),
+        "rows_removed": int((~mask_keep).sum()),
+        "keys_with_removal": int(len(excesso)),
+        "removed_by_key": dict(sorted(removed_by_key.items(), key=lambda kv: kv[1], reverse=True)),
+    }
+    return df_clean, stats
+
+
+def limpiar_plantilla_contra_cuenta(
+    df_pg: pd.DataFrame,
+    df_cuenta: pd.DataFrame,
+    chave_col: str = "Chave",
+    tol_soma: float = 0.005
+) -> tuple[pd.DataFrame, dict]:
+    """
+    Remove excedentes na Plantilla por 'Chave' para igualar a contagem às ocorrências no GL0061.
+    - Só afeta chaves presentes na Cuenta.
+    - Mantém a ordem original.
+    - Guard: se contagem e soma por chave batem (dentro da tolerância), não remove nada.
+    """
+    if chave_col not in df_pg.columns:
+        raise ValueError("Plantilla de Gastos não contém a coluna 'Chave'. Rode a etapa da Plantilla antes.")
+    if chave_col not in df_cuenta.columns:
+        raise ValueError("Cuenta (GL0061) não contém a coluna 'Chave'. Rode a etapa de Cuenta antes.")
+
+    cnt_cuenta, sum_cuenta = _resumo_cuenta(df_cuenta, chave_col)
+    return _limpar_plantilla(df_pg, chave_col, cnt_cuenta, sum_cuenta, tol_soma)
+
+
+def limpiar_plantillas_contra_cuenta(
+    plantillas: Dict[str, pd.DataFrame],
+    df_cuenta: pd.DataFrame,
+    chave_col: str = "Chave",
+    tol_soma: float = 0.005,
+) -> Tuple[Dict[str, pd.DataFrame], pd.DataFrame]:
+    """
+    Mesma limpeza para várias Plantillas (meses, empresas) contra o mesmo GL0061,
+    que é normalizado/contado uma vez só. Cada Plantilla é limpa por conta própria.
+    Devolve ({nome: Plantilla limpa}, stats) com uma linha por Plantilla e os
+    excedentes por chave em "removed_by_key".
+    """
+    for nome, df_pg in plantillas.items():
+        if chave_col not in df_pg.columns:
+            raise ValueError(f"Plantilla de Gastos '{nome}' não contém a coluna 'Chave'. Rode a etapa da Plantilla antes.")
+    if chave_col not in df_cuenta.columns:
+        raise ValueError("Cuenta (GL0061) não contém a coluna 'Chave'. Rode a etapa de Cuenta antes.")
+
+    cnt_cuenta, sum_cuenta = _resumo_cuenta(df_cuenta, chave_col)
+    limpas, linhas = {}, []
+    for nome, df_pg in plantillas.items():
+        limpas[nome], stats = _limpar_plantilla(df_pg, chave_col, cnt_cuenta, sum_cuenta, tol_soma)
+        linhas.append({"Plantilla": nome, **stats})
+    return limpas, pd.DataFrame(linhas, columns=COLUNAS_STATS + ["removed_by_key"])
+
+
+def limpar_conciliacao() -> None:
+    with _lock:
+        _agregados.clear()
@@ -1,9 +1,12 @@
 
 # services/duas_service.py
+from functools import partial
 from io import BytesIO
 import pandas as pd
 import pdfplumber
 from typing import List, Optional
+from .cache_service import obter_com_cache
+from .perfil_service import instrumentar
 from .duas_utils import (
     aplicar_etapas
 )
@@ -46,6 +49,114 @@ def standardize_column_names(columns):
 
 # ---------------------- Extração + Pipeline ----------------------
 
+# Suba a versão se mudar o que _extract_first_table devolve (invalida o cache)
+VERSAO_EXTRATOR_TABELA = 1
+NOME_CACHE_TABELA = "duas_tabela"
+
+# Mesmas configurações que page.extract_tables() usa por padrão (estratégia
+# "lines"); explícitas para o caminho recortado dar exatamente o mesmo resultado.
+CONFIG_TABELA_DUA = {"vertical_strategy": "lines", "horizontal_strategy": "lines"}
+CONFIG_TEXTO_TABELA_DUA = {"x_tolerance": 3, "y_tolerance": 3}
+
+# Layout DUA: a tabela de conceitos é a primeira da página 1 e o resto da
+# página (outras tabelas, rodapé) nunca é usado. Guardamos até onde essa
+# tabela desce (fração da altura) e, nos PDFs seguintes, recortamos a página
+# do topo até ali + margem: menos objetos para o finder e para o extract.
+# O aprendido vive num dict `layout` criado por lote (nada global: não vaza
+# entre sessões/threads do Streamlit).
+MARGEM_RECORTE_DUA = 24  # pt
+_TOLERANCIA_BORDA = 4    # pt (>= snap/join/intersection tolerance do pdfplumber)
+
+
+def novo_layout_dua() -> dict:
+    """Estado do recorte para UM lote: fundo da tabela como fração da altura da página."""
+    return {"fundo": None}
+
+
+def _header_tem_concepto(table) -> bool:
+    """Mesmo critério de standardize_column_names para achar a coluna CONCEPTO."""
+    return any(
+        col and ('XML' in col or 'CRAMIREZ' in col or 'NTAPIA' in col)
+        for col in (table[0] if table else [])
+    )
+
+
+def _aprender_fundo(page, tabela_encontrada, layout: dict) -> None:
+    x0, top, x1, bottom = page.bbox
+    fracao = (tabela_encontrada.bbox[3] - top) / (bottom - top)
+    # Guarda o maior já visto: evita recortar curto demais para DUAs longas
+    if layout["fundo"] is None or fracao > layout["fundo"]:
+        layout["fundo"] = fracao
+
+
+def _primeira_tabela_recortada(page, layout: dict):
+    """
+    Caminho rápido: 1ª tabela do recorte [topo, fundo aprendido + margem].
+    Retorna None (=> usar a página inteira) se ainda não há layout aprendido,
+    se alguma linha vertical atravessa o fundo do recorte (tabela cortada) ou
+    se o cabeçalho não tem a coluna CONCEPTO.
+    """
+    if layout["fundo"] is None:
+        return None
+    x0, top, x1, bottom = page.bbox
+    fundo = top + layout["fundo"] * (bottom - top) + MARGEM_RECORTE_DUA
+    if fundo >= bottom:
+        return None
+
+    # Linha vertical atravessando o fundo do recorte => alguma tabela continua abaixo
+    for edge in page.edges:
+        if (
+            edge["orientation"] == "v"
+            and edge["top"] < fundo
+            and edge["bottom"] >= fundo - _TOLERANCIA_BORDA
+        ):
+            return None
+
+    recorte = page.crop((x0, top, x1, fundo))
+
+    tables = recorte.find_tables(CONFIG_TABELA_DUA)
+    if not tables:
+        return None
+    table = tables[0].extract(**CONFIG_TEXTO_TABELA_DUA)
+    if not _header_tem_concepto(table):
+        return None
+    return table
+
+
+def _extract_first_table(pdf_bytes: bytes, layout: Optional[dict] = None):
+    """
+    Decodifica só a PRIMEIRA tabela da PRIMEIRA página (crua, lista de linhas).
+    Retorna (tabela ou None, mensagem de erro ou None).
+    `layout` (de novo_layout_dua) é compartilhado só entre os PDFs do mesmo lote;
+    sem ele, o PDF é lido pela página inteira.
+    """
+    if layout is None:
+        layout = novo_layout_dua()
+    try:
+        with pdfplumber.open(BytesIO(pdf_bytes)) as pdf:
+            if len(pdf.pages) > 0:
+                page = pdf.pages[0]
+                table = _primeira_tabela_recortada(page, layout)
+                if table is not None:
+                    return table, None
+
+                # Página inteira (= page.extract_tables()[0], sem extrair as demais)
+                tables = page.find_tables(CONFIG_TABELA_DUA)
+                if tables:
+                    table = tables[0].extract(**CONFIG_TEXTO_TABELA_DUA)
+                    if _header_tem_concepto(table):
+                        _aprender_fundo(page, tables[0], layout)
+                    return table, None
+        return None, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _tabela_cacheavel(resultado) -> bool:
+    return resultado[1] is None
+
+
+@instrumentar
 def extract_table001_from_uploaded_files(
     uploaded_files: List, 
     progress_widget=None, 
@@ -59,31 +170,34 @@ def extract_table001_from_uploaded_files(
     if total == 0:
         return None
 
+    extrair = partial(_extract_first_table, layout=novo_layout_dua())
     for i, f in enumerate(uploaded_files, start=1):
         filename = getattr(f, "name", f"arquivo_{i}.pdf")
-        try:
-            with pdfplumber.open(BytesIO(f.getvalue())) as pdf:
-                if len(pdf.pages) > 0:
-                    page = pdf.pages[0]
-                    tables = page.extract_tables() or []
-                    if tables:
-                        table = tables[0]
-                        columns = make_unique_columns(table[0])
-                        columns = standardize_column_names(columns)
-                        df = pd.DataFrame(table[1:], columns=columns)
-                        df['source_file'] = filename
-                        if 'CONCEPTO' not in df.columns:
-                            df['CONCEPTO'] = ''
-                        df['Error'] = df['CONCEPTO'].apply(
-                            lambda x: "File can't be read" if pd.isna(x) or str(x).strip() == '' else ''
-                        )
-                        all_tables.append(df)
-        except Exception as e:
+        table, erro = obter_com_cache(
+            extrair, f.getvalue(),
+            NOME_CACHE_TABELA, VERSAO_EXTRATOR_TABELA,
+            cacheavel=_tabela_cacheavel,
+        )
+        if erro is None and table is not None:
+            try:
+                columns = make_unique_columns(table[0])
+                columns = standardize_column_names(columns)
+                df = pd.DataFrame(table[1:], columns=columns)
+                df['source_file'] = filename
+                if 'CONCEPTO' not in df.columns:
+                    df['CONCEPTO'] = ''
+                df['Error'] = df['CONCEPTO'].apply(
+                    lambda x: "File can't be read" if pd.isna(x) or str(x).strip() == '' else ''
+                )
+                all_tables.append(df)
+            except Exception as e:
+                erro = str(e)
+        if erro is not None:
             # Se der erro no PDF, cria uma linha com erro.
             err_df = pd.DataFrame([{
                 'source_file': filename,
                 'CONCEPTO': '',
-                'Error': f'Erro ao ler o PDF: {e}'
+                'Error': f'Erro ao ler o PDF: {erro}'
             }])
             all_tables.append(err_df)
 
@@ -1,145 +1,205 @@
 # services/duas_utils.py
-import re
+import numpy as np
 import pandas as pd
 from datetime import datetime
 
+from services.perfil_service import instrumentar
+
 # ---------------------- Funções de transformação (migradas/adaptadas) ----------------------
+#
+# Vetorizado: as células da tabela são "derretidas" UMA vez (montar_grade_longa)
+# e cada coluna (Declaracion, Fecha, Percepcion, PEC) é só um filtro sobre essa
+# grade: linhas-alvo (marcador no CONCEPTO) x célula que contém o rótulo,
+# ficando com a 1ª coluna da esquerda, como no loop linha a linha original.
+
+# Colunas do pipeline/metadados: não fazem parte da grade do PDF
+COLUNAS_FORA_DA_GRADE = [
+    'source_file', 'CONCEPTO', 'Error', 'Declaracion', 'Fecha', 'Ad_Valorem',
+    'Imp_Prom_Municipal', 'Imp_Gene_a_las_Ventas', 'Percepcion', 'PEC'
+]
+
+
+def _como_texto(serie):
+    """str(x) por elemento, em dtype object (regex/strip com a semântica do Python)."""
+    return serie.map(str).astype(object)
+
+
+def _coluna(df, col):
+    """Equivale a row.get(col, '') para a coluna inteira."""
+    if col in df.columns:
+        return df[col]
+    return pd.Series('', index=df.index, dtype=object)
+
+
+def _conceito_texto(df):
+    return _como_texto(_coluna(df, 'CONCEPTO'))
 
-def add_declaracion_column(df):
-    df['Declaracion'] = ''
-    for index, row in df.iterrows():
-        if 'No ORDEN' in str(row.get('CONCEPTO', '')):
-            for col in df.columns:
-                if col not in ['source_file', 'CONCEPTO', 'Error', 'Declaracion', 'Fecha', 'Ad_Valorem',
-                               'Imp_Prom_Municipal', 'Imp_Gene_a_las_Ventas', 'Percepcion', 'PEC']:
-                    if 'Declaraci' in str(row.get(col, '')):
-                        df.at[index, 'Declaracion'] = row[col]
-                        break
+
+@instrumentar
+def montar_grade_longa(df):
+    """
+    Uma linha por célula da grade: índice = posição da linha, 'ordem' = posição
+    da coluna, 'valor' = célula original, 'texto' = str(célula).
+    Fica ordenada coluna a coluna (a 1ª ocorrência por linha é a mais à esquerda).
+    """
+    cols = [c for c in df.columns if c not in COLUNAS_FORA_DA_GRADE]
+    grade = df[cols].set_axis(range(len(cols)), axis=1)
+    grade.index = range(len(df))
+    longa = grade.melt(ignore_index=False, var_name='ordem', value_name='valor')
+    longa['texto'] = _como_texto(longa['valor'])
+    return longa
+
+
+def _primeira_celula_com(df, grade, linhas_alvo, rotulo):
+    """Por linha-alvo, o valor da 1ª célula (da esquerda) cujo texto contém `rotulo`; senão ''."""
+    alvo = np.asarray(linhas_alvo, dtype=bool)
+    candidatas = grade[alvo[grade.index.to_numpy()]] if len(grade) else grade
+    achadas = candidatas[candidatas['texto'].str.contains(rotulo, regex=False)]
+    achadas = achadas[~achadas.index.duplicated(keep='first')]
+
+    valores = [''] * len(df)
+    for pos, valor in zip(achadas.index, achadas['valor']):
+        valores[pos] = valor
+    return pd.Series(valores, index=df.index)
+
+
+@instrumentar
+def add_declaracion_column(df, grade=None):
+    if grade is None:
+        grade = montar_grade_longa(df)
+    alvo = _conceito_texto(df).str.contains('No ORDEN', regex=False)
+    df['Declaracion'] = _primeira_celula_com(df, grade, alvo, 'Declaraci')
     return df
 
+@instrumentar
 def ajustar_valores_declaracion(df):
-    df['Declaracion'] = df['Declaracion'].apply(
-        lambda x: re.sub(r'No Declaración', '', str(x)).strip()
+    df['Declaracion'] = (
+        _como_texto(df['Declaracion'])
+        .str.replace(r'No Declaración', '', regex=True)
+        .str.strip()
+        .infer_objects()
     )
     return df
 
+@instrumentar
 def ajustar_valores_declaracion_final(df):
-    df['Declaracion'] = df['Declaracion'].apply(
-        lambda x: re.sub(r'^.*?(1\d{2})-\d{4}-10-(\d{6}).*$', r'\1-\2', str(x))
-        if re.search(r'1\d{2}-\d{4}-10-\d{6}', str(x)) else ''
+    texto = _como_texto(df['Declaracion'])
+    tem_numero = texto.str.contains(r'1\d{2}-\d{4}-10-\d{6}', regex=True)
+    df['Declaracion'] = (
+        texto.str.replace(r'^.*?(1\d{2})-\d{4}-10-(\d{6}).*$', r'\1-\2', regex=True)
+        .where(tem_numero, '')
+        .infer_objects()
     )
     return df
 
-def add_fecha_column(df):
-    df['Fecha'] = ''
-    for index, row in df.iterrows():
-        if '4.6 Imp.Gene' in str(row.get('CONCEPTO', '')):
-            for col in df.columns:
-                if col not in ['source_file', 'CONCEPTO', 'Error', 'Declaracion', 'Fecha', 'Ad_Valorem',
-                               'Imp_Prom_Municipal', 'Imp_Gene_a_las_Ventas', 'Percepcion', 'PEC']:
-                    if 'Fecha' in str(row.get(col, '')):
-                        df.at[index, 'Fecha'] = row[col]
-                        break
+@instrumentar
+def add_fecha_column(df, grade=None):
+    if grade is None:
+        grade = montar_grade_longa(df)
+    alvo = _conceito_texto(df).str.contains('4.6 Imp.Gene', regex=False)
+    df['Fecha'] = _primeira_celula_com(df, grade, alvo, 'Fecha')
     return df
 
+@instrumentar
 def ajustar_valores_fecha(df):
-    df['Fecha'] = df['Fecha'].apply(
-        lambda x: re.sub(r'6.2 Fecha', '', str(x)).strip()
+    df['Fecha'] = (
+        _como_texto(df['Fecha'])
+        .str.replace(r'6.2 Fecha', '', regex=True)
+        .str.strip()
+        .infer_objects()
     )
     return df
 
+def _valor_col7_ou_col6(df, marcador):
+    """Nas linhas com `marcador` no CONCEPTO: Col_7 se preenchida, senão Col_6; senão ''."""
+    alvo = _conceito_texto(df).str.contains(marcador, regex=False)
+    resultado = pd.Series('', index=df.index, dtype=object)
+    ja_preenchido = pd.Series(False, index=df.index)
+    for col in ['Col_7', 'Col_6']:
+        if col not in df.columns:
+            continue
+        serie = df[col]
+        preenchida = serie.notna() & (_como_texto(serie).str.strip() != '')
+        usar = alvo & preenchida & ~ja_preenchido
+        resultado[usar] = serie[usar]
+        ja_preenchido |= usar
+    return resultado.infer_objects()
+
+@instrumentar
 def add_ad_valorem_column(df):
-    df['Ad_Valorem'] = ''
-    for index, row in df.iterrows():
-        if '4.1 Ad/Valorem' in str(row.get('CONCEPTO', '')):
-            if pd.notna(row.get('Col_7')) and str(row.get('Col_7')).strip() != '':
-                df.at[index, 'Ad_Valorem'] = row['Col_7']
-            elif pd.notna(row.get('Col_6')) and str(row.get('Col_6')).strip() != '':
-                df.at[index, 'Ad_Valorem'] = row['Col_6']
+    df['Ad_Valorem'] = _valor_col7_ou_col6(df, '4.1 Ad/Valorem')
     return df
 
+@instrumentar
 def add_imp_prom_municipal_column(df):
-    df['Imp_Prom_Municipal'] = ''
-    for index, row in df.iterrows():
-        if '4.5 Imp.Prom.Municipal' in str(row.get('CONCEPTO', '')):
-            if pd.notna(row.get('Col_7')) and str(row.get('Col_7')).strip() != '':
-                df.at[index, 'Imp_Prom_Municipal'] = row['Col_7']
-            elif pd.notna(row.get('Col_6')) and str(row.get('Col_6')).strip() != '':
-                df.at[index, 'Imp_Prom_Municipal'] = row['Col_6']
+    df['Imp_Prom_Municipal'] = _valor_col7_ou_col6(df, '4.5 Imp.Prom.Municipal')
     return df
 
+@instrumentar
 def add_imp_gene_a_las_ventas_column(df):
-    df['Imp_Gene_a_las_Ventas'] = ''
-    for index, row in df.iterrows():
-        if '4.6 Imp.Gene.a las Ventas' in str(row.get('CONCEPTO', '')):
-            if pd.notna(row.get('Col_7')) and str(row.get('Col_7')).strip() != '':
-                df.at[index, 'Imp_Gene_a_las_Ventas'] = row['Col_7']
-            elif pd.notna(row.get('Col_6')) and str(row.get('Col_6')).strip() != '':
-                df.at[index, 'Imp_Gene_a_las_Ventas'] = row['Col_6']
+    df['Imp_Gene_a_las_Ventas'] = _valor_col7_ou_col6(df, '4.6 Imp.Gene.a las Ventas')
     return df
 
-def add_percepcion_column(df):
-    df['Percepcion'] = ''
-    for index, row in df.iterrows():
-        if '4.7 Derechos Antidumping' in str(row.get('CONCEPTO', '')):
-            for col in df.columns:
-                if col not in ['source_file', 'CONCEPTO', 'Error', 'Declaracion', 'Fecha', 'Ad_Valorem',
-                               'Imp_Prom_Municipal', 'Imp_Gene_a_las_Ventas', 'Percepcion', 'PEC']:
-                    if 'Percepción' in str(row.get(col, '')):
-                        df.at[index, 'Percepcion'] = row[col]
-                        break
+@instrumentar
+def add_percepcion_column(df, grade=None):
+    if grade is None:
+        grade = montar_grade_longa(df)
+    alvo = _conceito_texto(df).str.contains('4.7 Derechos Antidumping', regex=False)
+    df['Percepcion'] = _primeira_celula_com(df, grade, alvo, 'Percepción')
     return df
 
+@instrumentar
 def ajustar_valores_percepcion(df):
-    df['Percepcion'] = df['Percepcion'].apply(
-        lambda x: re.sub(r'Percepción IGV S/: ', '', str(x)).strip()
+    df['Percepcion'] = (
+        _como_texto(df['Percepcion'])
+        .str.replace(r'Percepción IGV S/: ', '', regex=True)
+        .str.strip()
+        .infer_objects()
     )
     return df
 
-def add_pec_column(df):
-    import re
-    df['PEC'] = ''
-    for index, row in df.iterrows():
-        conceito = str(row.get('CONCEPTO', '')).upper()
-
-        # Caso 1: quando a linha de CONCEPTO contém "IMPORTE"
-        if 'IMPORTE' in conceito:
-            match = re.search(r'PEC\s*\d+', str(row.get('CONCEPTO', '')))
-            if match:
-                df.at[index, 'PEC'] = match.group(0)
-
-        # Caso 2: quando aparece "MARITIMA" e ainda não preencheu PEC
-        elif 'MARITIMA' in conceito and not df.at[index, 'PEC']:
-            for col in df.columns:
-                if col not in [
-                    'source_file', 'CONCEPTO', 'Error', 'Declaracion', 'Fecha',
-                    'Ad_Valorem', 'Imp_Prom_Municipal', 'Imp_Gene_a_las_Ventas',
-                    'Percepcion', 'PEC'
-                ]:
-                    if 'PEC' in str(row.get(col, '')):
-                        df.at[index, 'PEC'] = row[col]
-                        break
-
-        # Caso 3: fallback — tenta extrair PEC do nome do arquivo, se ainda vazio
-        elif str(row.get('CONCEPTO', '')).strip() != '' and not df.at[index, 'PEC']:
-            match = re.search(r'PEC\s*\d+', str(row.get('source_file', '')))
-            if match:
-                df.at[index, 'PEC'] = match.group(0)
-
+@instrumentar
+def add_pec_column(df, grade=None):
+    conceito = _conceito_texto(df)
+    conceito_up = conceito.map(str.upper)
+    tem_importe = conceito_up.str.contains('IMPORTE', regex=False)
+    tem_maritima = conceito_up.str.contains('MARITIMA', regex=False)
+
+    # Caso 1: quando a linha de CONCEPTO contém "IMPORTE"
+    caso1 = conceito.str.extract(r'(PEC\s*\d+)', expand=False)
+
+    # Caso 2: quando aparece "MARITIMA" (e não "IMPORTE"): célula com "PEC"
+    alvo2 = ~tem_importe & tem_maritima
+    if alvo2.any():
+        if grade is None:
+            grade = montar_grade_longa(df)
+        caso2 = _primeira_celula_com(df, grade, alvo2, 'PEC')
+    else:
+        caso2 = pd.Series('', index=df.index, dtype=object)
+
+    # Caso 3: fallback — tenta extrair PEC do nome do arquivo
+    alvo3 = ~tem_importe & ~tem_maritima & (conceito.str.strip() != '')
+    caso3 = _como_texto(_coluna(df, 'source_file')).str.extract(r'(PEC\s*\d+)', expand=False)
+
+    pec = pd.Series('', index=df.index, dtype=object)
+    pec[tem_importe] = caso1[tem_importe].fillna('')
+    pec[alvo2] = caso2[alvo2]
+    pec[alvo3] = caso3[alvo3].fillna('')
+    df['PEC'] = pec.infer_objects()
     return df
 
+@instrumentar
 def ajustar_valores_pec(df):
-    def ajustar_pec(valor):
-        valor = str(valor)
-        match = re.search(r'PEC\s*\S*', valor)
-        if match:
-            pec_valor = match.group(0)
-            pec_valor = re.sub(r'^PEC(?!\s)', 'PEC ', pec_valor)
-            return pec_valor.strip()
-        return ''
-    df['PEC'] = df['PEC'].apply(ajustar_pec)
+    pec_valor = _como_texto(df['PEC']).str.extract(r'(PEC\s*\S*)', expand=False)
+    df['PEC'] = (
+        pec_valor.str.replace(r'^PEC(?!\s)', 'PEC ', regex=True)
+        .str.strip()
+        .fillna('')
+        .infer_objects()
+    )
     return df
 
+@instrumentar
 def remover_virgulas_valores(df):
     colunas = ['Ad_Valorem', 'Imp_Prom_Municipal', 'Imp_Gene_a_las_Ventas', 'Percepcion']
     for col in colunas:
@@ -147,6 +207,7 @@ def remover_virgulas_valores(df):
             df[col] = df[col].astype(str).str.replace(',', '', regex=False)
     return df
 
+@instrumentar
 def formatar_valores_para_float(df):
     colunas = ['Ad_Valorem', 'Imp_Prom_Municipal', 'Imp_Gene_a_las_Ventas', 'Percepcion']
     for col in colunas:
@@ -155,24 +216,26 @@ def formatar_valores_para_float(df):
             df[col] = pd.to_numeric(df[col], errors='coerce').round(2)
     return df
 
+@instrumentar
 def consolidar_dados(df):
-    def primeiro_valor_nao_vazio(series):
-        for valor in series:
-            if pd.notna(valor) and str(valor).strip() != '':
-                return valor
-        return ''
-    df_consolidado = df.groupby('source_file', as_index=False).agg({
-        'Declaracion': primeiro_valor_nao_vazio,
-        'Fecha': primeiro_valor_nao_vazio,
-        'Ad_Valorem': primeiro_valor_nao_vazio,
-        'Imp_Prom_Municipal': primeiro_valor_nao_vazio,
-        'Imp_Gene_a_las_Ventas': primeiro_valor_nao_vazio,
-        'Percepcion': primeiro_valor_nao_vazio,
-        'PEC': primeiro_valor_nao_vazio,
-        'Error': primeiro_valor_nao_vazio
-    })
+    # Primeiro valor não vazio (nem NaN nem só espaços) de cada coluna, por arquivo
+    colunas = [
+        'Declaracion', 'Fecha', 'Ad_Valorem', 'Imp_Prom_Municipal',
+        'Imp_Gene_a_las_Ventas', 'Percepcion', 'PEC', 'Error'
+    ]
+    valores = df[colunas]
+    preenchido = valores.notna() & valores.apply(lambda s: _como_texto(s).str.strip() != '')
+    valores = valores.where(preenchido)
+    valores.insert(0, 'source_file', df['source_file'])
+    df_consolidado = valores.groupby('source_file', as_index=False).first()
+    for col in colunas:
+        serie = df_consolidado[col]
+        if serie.isna().any():
+            serie = serie.astype(object).fillna('')
+        df_consolidado[col] = serie.infer_objects()
     return df_consolidado
 
+@instrumentar
 def adicionar_coluna_tasa(df, cambio_df):
     """
     Faz merge por data exata com o DF de câmbio (Tasa) vindo do tab 2.
@@ -208,12 +271,14 @@ def adicionar_coluna_tasa(df, cambio_df):
     df_temp.drop(columns=['Fecha_temp', 'Data'], inplace=True)
     return df_temp
 
+@instrumentar
 def adicionar_coluna_igv(df):
     # Item 3: tratar NaN como 0 na soma
     if 'Imp_Prom_Municipal' in df.columns and 'Imp_Gene_a_las_Ventas' in df.columns:
         df['IGV'] = df['Imp_Prom_Municipal'].fillna(0) + df['Imp_Gene_a_las_Ventas'].fillna(0)
     return df
 
+@instrumentar
 def adicionar_cod_proveedor(df):
     if 'Declaracion' in df.columns:
         df['COD PROVEEDOR'] = df['Declaracion'].apply(
@@ -221,6 +286,7 @@ def adicionar_cod_proveedor(df):
         )
     return df
 
+@instrumentar
 def adicionar_cod_moneda(df):
     if 'Declaracion' in df.columns:
         df['COD Moneda'] = df['Declaracion'].apply(
@@ -228,6 +294,7 @@ def adicionar_cod_moneda(df):
         )
     return df
 
+@instrumentar
 def adicionar_cod_autorizacion(df):
     if 'Declaracion' in df.columns:
         df['Cód. de Autorización'] = df['Declaracion'].apply(
@@ -235,6 +302,7 @@ def adicionar_cod_autorizacion(df):
         )
     return df
 
+@instrumentar
 def adicionar_tip_fac_duas(df):
     if 'Declaracion' in df.columns:
         df['Tipo de Factura'] = df['Declaracion'].apply(
@@ -242,6 +310,7 @@ def adicionar_tip_fac_duas(df):
         )
     return df
 
+@instrumentar
 def adicionar_cuenta(df):
     if 'Declaracion' in df.columns:
         df['Cuenta'] = df['Declaracion'].apply(
@@ -249,6 +318,7 @@ def adicionar_cuenta(df):
         )
     return df
 
+@instrumentar
 def remover_barras_fecha(df):
     # ajusta as datas para ddmmaa
     def formatar_e_remover_barras(data):
@@ -263,6 +333,7 @@ def remover_barras_fecha(df):
         df['Fecha'] = df['Fecha'].apply(formatar_e_remover_barras)
     return df
 
+@instrumentar
 def organizar_colunas(df):
     colunas_desejadas = [
         'source_file','COD PROVEEDOR', 'Declaracion', 'Fecha', 'Ad_Valorem',
@@ -278,17 +349,18 @@ def aplicar_etapas(df, cambio_df=None):
     """
     Orquestra a pipeline de transformação DUAS.
     """
-    df = add_declaracion_column(df)
+    grade = montar_grade_longa(df)  # células da tabela, derretidas uma única vez
+    df = add_declaracion_column(df, grade)
     df = ajustar_valores_declaracion(df)
     df = ajustar_valores_declaracion_final(df)
-    df = add_fecha_column(df)
+    df = add_fecha_column(df, grade)
     df = ajustar_valores_fecha(df)
     df = add_ad_valorem_column(df)
     df = add_imp_prom_municipal_column(df)
     df = add_imp_gene_a_las_ventas_column(df)
-    df = add_percepcion_column(df)
+    df = add_percepcion_column(df, grade)
     df = ajustar_valores_percepcion(df)
-    df = add_pec_column(df)
+    df = add_pec_column(df, grade)
     df = ajustar_valores_pec(df)
     df = remover_virgulas_valores(df)
     df = formatar_valores_para_float(df)
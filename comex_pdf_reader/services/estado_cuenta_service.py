@@ -0,0 +1,246 @@
+import codecs
+from typing import Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from services.regex_utils import NUM_ESTADO_CUENTA, RE_SALDOS_ESTADO_CUENTA, RE_TRECHO_ASCII
+
+# ==========================================================
+# Estado de Cuenta ("Listado de Saldos" em .txt)
+# ==========================================================
+# O texto é lido em blocos de ~TAMANHO_BLOCO (cortados em fim de linha) e
+# cada bloco vira uma Series: filtro de ruído e os 4 saldos do fim da linha
+# saem de um único str.extract, no motor nativo do pyarrow (RE2) se houver.
+# Listagens consolidadas de várias empresas não ficam inteiras em memória
+# como lista de linhas.
+#
+# RE2 e o `re` do Python só divergem em espaço/dígito fora do ASCII (\s, \d,
+# split/strip); linhas com esses caracteres (raras) seguem pelo caminho
+# linha a linha de antes, então o resultado é o mesmo.
+
+TAMANHO_BLOCO = 4 * 1024 * 1024  # caracteres (texto) ou bytes (arquivo) por bloco
+
+COLUNAS = ["CTA", "Descripción", "Sal OB", "Saldo OB", "Período", "Saldo CB"]
+_NUMEROS = ["Sal OB", "Saldo OB", "Período", "Saldo CB"]
+
+# Os 4 saldos com grupos nomeados (o extract do pyarrow exige nomes); o
+# primeiro casamento da linha é o mesmo do RE_SALDOS_ESTADO_CUENTA.search
+_NUM = NUM_ESTADO_CUENTA[1:-1]
+_PADRAO_SALDOS = rf"\s*(?P<n1>{_NUM})\s+(?P<n2>{_NUM})\s+(?P<n3>{_NUM})\s+(?P<n4>{_NUM})\s*$"
+
+try:
+    import pyarrow as _pa
+    _TEXTO_ARROW = pd.ArrowDtype(_pa.string())
+except (ImportError, AttributeError):  # sem pyarrow: o extract roda no `re` do Python
+    _TEXTO_ARROW = None
+
+_ESPECIAIS_ASCII = frozenset("\x1f")  # isspace() no Python, fora do \s do RE2
+
+
+def _clean_num(s: str) -> float | None:
+    """Converte strings como '12,345.67-' em float (negativo)."""
+    if s is None:
+        return None
+    s = str(s).strip()
+    if s == "":
+        return None
+    neg = s.endswith("-")
+    s = s[:-1] if neg else s
+    s = s.replace(",", "")
+    try:
+        v = float(s)
+        return -v if neg else v
+    except Exception:
+        return None
+
+
+def _e_cabecalho(ln: str) -> bool:
+    return "CTA" in ln and "Descripci" in ln
+
+
+def _e_especial(c: str) -> bool:
+    """Caractere em que \\s/\\d do RE2 e do `re` discordam (dentro de uma linha)."""
+    return c in _ESPECIAIS_ASCII or (c > "\x7f" and (c.isspace() or c.isdecimal() or c.isdigit()))
+
+
+# ----------------------------------------------------------
+# Linha a linha (linhas com caracteres especiais)
+# ----------------------------------------------------------
+
+def _parse_linha(ln: str) -> Optional[list]:
+    raw = ln.rstrip()
+    if not raw:
+        return None
+    if set(raw.strip()) in [{"="}, {"-"}] or "Scala" in raw or "Electrolux" in raw:
+        return None
+
+    m = RE_SALDOS_ESTADO_CUENTA.search(raw)
+    if not m:
+        return None
+
+    left = raw[: m.start()].rstrip()
+    if not left:
+        return None
+
+    parts = left.split()
+    cta = parts[0] if parts else ""
+    descr = left[len(cta):].strip() if parts else left.strip()
+
+    sal_ob, saldo_ob, periodo, saldo_cb = (_clean_num(x) for x in m.groups())
+    return [cta, descr, sal_ob, saldo_ob, periodo, saldo_cb]
+
+
+# ----------------------------------------------------------
+# Por coluna (um bloco de linhas)
+# ----------------------------------------------------------
+
+def _numeros(valores: pd.Series) -> pd.Series:
+    """'12,345.67-' -> -12345.67 na coluna inteira (como _clean_num)."""
+    negativo = valores.str.endswith("-")
+    # Já casaram com NUM_ESTADO_CUENTA (dígitos ASCII): a conversão direta não falha
+    num = valores.str.removesuffix("-").str.replace(",", "", regex=False).astype(float)
+    return num.where(~negativo, -num)
+
+
+def _extrair_saldos(s: pd.Series) -> pd.DataFrame:
+    """str.extract dos 4 saldos; com pyarrow, no motor nativo (o da coluna "str" usa o `re`)."""
+    if _TEXTO_ARROW is None:
+        return s.str.extract(_PADRAO_SALDOS)
+    return s.astype(_TEXTO_ARROW).str.extract(_PADRAO_SALDOS).astype("str")
+
+
+def _parse_bloco(linhas: List[str]) -> pd.DataFrame:
+    s = pd.Series(linhas, dtype="str").str.rstrip()
+    ruido = (
+        (s == "")
+        | s.str.strip().str.fullmatch(r"=+|-+")
+        | s.str.contains("Scala", regex=False)
+        | s.str.contains("Electrolux", regex=False)
+    )
+    s = s[~ruido]
+    saldos = _extrair_saldos(s)
+    casou = saldos["n1"].notna()
+    s, saldos = s[casou], saldos[casou]
+
+    # left = o que vem antes dos saldos (tira o mesmo primeiro casamento)
+    esq = s.str.replace(RE_SALDOS_ESTADO_CUENTA.pattern, "", n=1, regex=True).str.rstrip()
+    saldos, esq = saldos[esq != ""], esq[esq != ""]
+
+    # cta = 1º "pedaço" do split; descr = o que vem depois de len(cta) caracteres
+    cta = esq.str.lstrip().str.replace(r"\s.*", "", n=1, regex=True)
+    descr = esq.str.replace(r"^\S+", "", regex=True).str.strip()
+    recuada = esq.str.match(r"\s")
+    if recuada.any():  # com recuo, len(cta) não cobre o cta: mantém a conta de antes
+        descr.loc[recuada] = [e[len(c):].strip() for e, c in zip(esq[recuada].tolist(), cta[recuada].tolist())]
+
+    df = pd.DataFrame({"CTA": cta, "Descripción": descr})
+    for i, col in enumerate(_NUMEROS, start=1):
+        df[col] = _numeros(saldos[f"n{i}"])
+    return df.reset_index(drop=True)
+
+
+def _especiais(texto: str) -> set:
+    achados = {c for c in _ESPECIAIS_ASCII if c in texto}
+    if not texto.isascii():
+        achados.update(c for c in set(RE_TRECHO_ASCII.sub("", texto)) if _e_especial(c))
+    return achados
+
+
+def _parse_linhas(linhas: List[str], especiais: set) -> List[pd.DataFrame]:
+    """Linhas de um bloco -> DataFrames na ordem (as com `especiais` vão linha a linha)."""
+    if not especiais:
+        return [_parse_bloco(linhas)]
+
+    partes, normais = [], []
+    for ln in linhas:
+        if especiais.isdisjoint(ln):
+            normais.append(ln)
+            continue
+        if normais:
+            partes.append(_parse_bloco(normais))
+            normais = []
+        linha = _parse_linha(ln)
+        if linha is not None:
+            partes.append(pd.DataFrame([linha], columns=COLUNAS))
+    if normais:
+        partes.append(_parse_bloco(normais))
+    return partes
+
+
+# ----------------------------------------------------------
+# Leitura em blocos
+# ----------------------------------------------------------
+
+def _blocos_de_texto(texto: str, tamanho: int) -> Iterator[str]:
+    """Fatias de ~`tamanho` caracteres terminadas em "\\n" (uma linha maior vai inteira)."""
+    inicio, total = 0, len(texto)
+    while inicio < total:
+        fim = inicio + tamanho
+        if fim < total:
+            corte = texto.rfind("\n", inicio, fim)
+            if corte < 0:
+                corte = texto.find("\n", fim)
+            fim = total if corte < 0 else corte + 1
+        yield texto[inicio:fim]
+        inicio = fim
+
+
+def _blocos_de_bytes(raw: bytes, encoding: str, tamanho: int) -> Iterator[str]:
+    """Decodifica `raw` aos pedaços (memoryview, sem copiar o arquivo) e corta em fim de linha."""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    mv = memoryview(raw)
+    resto = ""
+    for inicio in range(0, len(mv), tamanho):
+        texto = resto + decoder.decode(mv[inicio:inicio + tamanho])
+        corte = texto.rfind("\n") + 1
+        resto = texto[corte:]
+        if corte:
+            yield texto[:corte]
+    resto += decoder.decode(b"", final=True)
+    if resto:
+        yield resto
+
+
+def _parse_blocos(blocos: Iterable[str]) -> pd.DataFrame:
+    partes: List[pd.DataFrame] = []
+    achou_cabecalho = False
+    for bloco in blocos:
+        linhas = bloco.splitlines()
+        if not achou_cabecalho:
+            # Só o que vem depois do 1º cabeçalho conta; sem cabeçalho, conta tudo
+            idx = next((i for i, ln in enumerate(linhas) if _e_cabecalho(ln)), None)
+            if idx is not None:
+                achou_cabecalho = True
+                partes = []
+                linhas = linhas[idx + 1:]
+        partes.extend(_parse_linhas(linhas, _especiais(bloco)))
+
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        df = pd.DataFrame([], columns=COLUNAS)
+        for c in _NUMEROS:
+            df[c] = pd.to_numeric(df[c], errors="coerce")
+        return df
+
+    df = pd.concat(partes, ignore_index=True)
+    for c in ("CTA", "Descripción"):
+        df[c] = df[c].astype("str")
+    for c in _NUMEROS:
+        df[c] = pd.to_numeric(df[c], errors="coerce").astype(float)
+    return df
+
+
+def parse_estado_cuenta_txt(texto: str, tamanho_bloco: int = TAMANHO_BLOCO) -> pd.DataFrame:
+    """
+    Lê um relatório 'Listado de Saldos' em texto e retorna um DataFrame com:
+    ['CTA','Descripción','Sal OB','Saldo OB','Período','Saldo CB']
+    """
+    return _parse_blocos(_blocos_de_texto(texto, tamanho_bloco))
+
+
+def ler_estado_cuenta(raw: bytes, tamanho_bloco: int = TAMANHO_BLOCO) -> pd.DataFrame:
+    """Igual a parse_estado_cuenta_txt sobre os bytes do upload (UTF-8, senão latin-1)."""
+    try:
+        return _parse_blocos(_blocos_de_bytes(raw, "utf-8", tamanho_bloco))
+    except UnicodeDecodeError:
+        return _parse_blocos(_blocos_de_bytes(raw, "latin-1", tamanho_bloco))
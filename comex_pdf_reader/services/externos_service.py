@@ -1,5 +1,6 @@
 from io import BytesIO
 import gc
+import os
 import pandas as pd
 import fitz  # PyMuPDF
 from typing import List, Optional
@@ -9,13 +10,10 @@ import streamlit as st
 from services.externos_utils import (
     identificar_Proveedor,
     adicionar_provedor_iscala,
-    extrair_factura,
+    extrair_campos_externos,
     ajustar_factura,
-    extrair_fecha,
     ajustar_coluna_fecha,
     adicionar_colunas_fixas,
-    adicionar_tipo_doc,
-    adicionar_amount,
     ajustar_amount,
     adicionar_erro,
     organizar_colunas_externos,
@@ -23,9 +21,21 @@ from services.externos_utils import (
     adicionar_tip_fac_ext,
     remover_duplicatas_source_file,
     op_gravada_negativo_CN_externos,
+    detectar_linea,
 )
+from services import externos_utils, regex_utils
+from services.cache_service import (
+    gravar_linhas_cache,
+    hash_bytes,
+    ler_linhas_cache,
+    mapear_com_cache,
+    montar_lote,
+    versao_de_arquivos,
+)
+from services.perfil_service import etapa, instrumentar
 
 
+@instrumentar
 def adicionar_coluna_tasa_externos(df, cambio_df):
     if cambio_df is None or cambio_df.empty or "Fecha de Emisión" not in df.columns:
         return df
@@ -46,12 +56,52 @@ def adicionar_coluna_tasa_externos(df, cambio_df):
     return dft
 
 
+# Suba a versão se mudar o que _extract_text_from_pdf_bytes devolve (invalida o cache)
+VERSAO_EXTRATOR_TEXTO = 1
+NOME_CACHE_TEXTO = "externos_texto"
+ERRO_LEITURA_PDF = "[Erro ao abrir/ler o PDF]"
+
+
 def _extract_text_from_pdf_bytes(pdf_bytes: bytes) -> str:
     try:
         with fitz.open(stream=BytesIO(pdf_bytes), filetype="pdf") as doc:
             return "".join(page.get_text() for page in doc)
     except Exception:
-        return "[Erro ao abrir/ler o PDF]"
+        return ERRO_LEITURA_PDF
+
+
+def _texto_cacheavel(texto: str) -> bool:
+    return texto != ERRO_LEITURA_PDF
+
+
+# Linhas parseadas por PDF (antes de Tasa/SharePoint): a versão muda sozinha
+# quando muda o código das regras
+NOME_CACHE_LINHAS = "externos_linhas"
+VERSAO_PARSER = versao_de_arquivos(
+    os.path.abspath(__file__), externos_utils.__file__, regex_utils.__file__,
+)
+
+
+def _parsear_textos(df: pd.DataFrame) -> pd.DataFrame:
+    """Tudo o que depende só do texto dos PDFs (uma linha por arquivo)."""
+    df = identificar_Proveedor(df)
+    df = adicionar_provedor_iscala(df)
+    # Factura, Fecha, Tipo Doc e Amount pela tabela de regras (uma passada por PDF)
+    df = extrair_campos_externos(df)
+    df = ajustar_factura(df)
+    df = ajustar_coluna_fecha(df)
+    df = adicionar_colunas_fixas(df)
+    df = ajustar_amount(df)
+    df = op_gravada_negativo_CN_externos(df)
+    df = adicionar_erro(df)
+    # Amount ausente vira None ou NaN conforme os vizinhos do lote; fixa NaN
+    # para a linha de um PDF ser a mesma parseada sozinha ou junto com outras
+    df["Amount"] = df["Amount"].astype(float)
+    return df
+
+
+def _linha_cacheavel(linha: pd.DataFrame) -> bool:
+    return _texto_cacheavel(linha["conteudo_pdf"].iloc[0])
 
 
 def process_externos_streamlit(
@@ -59,6 +109,8 @@ def process_externos_streamlit(
     progress_widget=None,
     status_widget=None,
     cambio_df: Optional[pd.DataFrame] = None,
+    max_workers: Optional[int] = None,
+    sharepoint_df: Optional[pd.DataFrame] = None,
 ):
     if not uploaded_files:
         return None
@@ -68,122 +120,131 @@ def process_externos_streamlit(
 
     dfs_resultado = []
 
-    for start in range(0, total, BATCH_SIZE):
-        batch = uploaded_files[start:start + BATCH_SIZE]
-        rows = []
-
-        for i, f in enumerate(batch, start=start + 1):
-            fname = getattr(f, "name", f"arquivo_{i}.pdf")
-            text = _extract_text_from_pdf_bytes(f.getvalue())
-            rows.append({"source_file": fname, "conteudo_pdf": text})
-
-            if progress_widget:
-                pct = int(i / total * 100)
-                progress_widget.progress(pct, text=f"Lendo {fname} ({i}/{total})")
-            if status_widget:
-                status_widget.write(f"📄 Lido: **{fname}**")
-
-        df = pd.DataFrame(rows)
-
-        # ========== PIPELINE PRINCIPAL (INALTERADO) ==========
-        df = identificar_Proveedor(df)
-        df = adicionar_provedor_iscala(df)
-        df = extrair_factura(df)
-        df = ajustar_factura(df)
-        df = extrair_fecha(df)
-        df = ajustar_coluna_fecha(df)
-        df = adicionar_colunas_fixas(df)
-        df = adicionar_tipo_doc(df)
-        df = adicionar_amount(df)
-        df = ajustar_amount(df)
-        df = op_gravada_negativo_CN_externos(df)
-        df = adicionar_erro(df)
-
-        # Tasa (opcional)
-        df = adicionar_coluna_tasa_externos(df, cambio_df=cambio_df)
-        if "Cod. Moneda" in df.columns:
-            df.loc[df["Cod. Moneda"] == "00", "Tasa"] = 1
-
-        # Códigos
-        df = adicionar_cod_autorizacion_ext(df)
-        df = adicionar_tip_fac_ext(df)
-
-        # =============================
-        # Merge PEC / dados do SharePoint
-        # =============================
-        from services.externos_utils import adicionar_pec_sharepoint
-
-        sharepoint_df = st.session_state.get("sharepoint_df")
-        df_sp = adicionar_pec_sharepoint(df, sharepoint_df)
-        df = df_sp[0] if isinstance(df_sp, tuple) else df_sp
-
-        # ------------------------------------------
-        # COMPLEMENTAR CAMPOS VAZIOS (EXTERNOS)
-        # ------------------------------------------
-        def preencher_vazio(dest_col, src_col):
-            if dest_col in df.columns and src_col in df.columns:
-                df[dest_col] = df[dest_col].combine_first(df[src_col])
-
-        preencher_vazio("R.U.C", "proveedor")
-        preencher_vazio("Proveedor Iscala", "proveedor")
-        preencher_vazio("Proveedor Iscala", "Proveedor")
-        preencher_vazio("Factura", "numero_de_documento")
-        preencher_vazio("Tipo Doc", "tipo_doc")
-        preencher_vazio("Fecha de Emisión", "Fecha_Emision")
-        preencher_vazio("Moneda", "moneda")
-        preencher_vazio("Amount", "importe_documento")
-        preencher_vazio("Tasa", "Tasa_Sharepoint")
-
-        # ✅ Recalcular códigos
-        df = adicionar_cod_autorizacion_ext(df)
-        df = adicionar_tip_fac_ext(df)
-
-        # =============================
-        # Heurística Lineaabajo (PDF)
-        # =============================
-        MAP_LINEA = {
-            "REFRIGERATOR": 36,
-            "CHEST FREEZER": 35,
-            "FREEZER": 35,
-            "STOVE": 38,
-            "COOKER": 22,
-            "OVEN": 38,
-            "WASHING MACHINE": 25,
-            "AIR CONDITIONER": 41,
-        }
-
-        def detectar_linea(txt):
-            if not isinstance(txt, str):
-                return None
-            up = txt.upper()
-            for k, v in MAP_LINEA.items():
-                if k in up:
-                    return v
-            return None
-
-        df["Lineaabajo"] = df["conteudo_pdf"].apply(detectar_linea)
-
-        # 1) Fallback usando Lineaabajo do SharePoint
-        if "Lineaabajo_sharepoint" in df.columns:
-            df["Lineaabajo"] = df["Lineaabajo"].combine_first(df["Lineaabajo_sharepoint"])
+    # PDFs já parseados numa execução anterior (mesmos bytes) não são lidos
+    # de novo, em qualquer posição do upload: só os novos/alterados rodam
+    nomes = [getattr(f, "name", f"arquivo_{i}.pdf") for i, f in enumerate(uploaded_files, start=1)]
+    digests = [hash_bytes(f.getvalue()) for f in uploaded_files]
+    prontos = ler_linhas_cache(digests, NOME_CACHE_LINHAS, VERSAO_PARSER)
+    faltando = [idx for idx in range(total) if idx not in prontos]
+
+    # Leitura dos PDFs em paralelo (pool de processos), na ordem do upload.
+    # Textos já vistos vêm do cache em disco; só os PDFs novos são decodificados.
+    textos = mapear_com_cache(
+        _extract_text_from_pdf_bytes,
+        [uploaded_files[idx] for idx in faltando],
+        NOME_CACHE_TEXTO,
+        VERSAO_EXTRATOR_TEXTO,
+        cacheavel=_texto_cacheavel,
+        max_workers=max_workers,
+        chaves=[digests[idx] for idx in faltando],  # já calculados acima
+    )
+
+    try:
+        for start in range(0, total, BATCH_SIZE):
+            posicoes = range(start, min(start + BATCH_SIZE, total))
+            novos = [idx for idx in posicoes if idx not in prontos]
+            rows = []
+
+            with etapa("leitura dos PDFs", [uploaded_files[idx] for idx in novos]) as registro:
+                for idx in posicoes:
+                    fname = nomes[idx]
+                    lido = idx not in prontos
+                    if lido:
+                        rows.append({"source_file": fname, "conteudo_pdf": next(textos)})
+
+                    if progress_widget:
+                        pct = int((idx + 1) / total * 100)
+                        progress_widget.progress(pct, text=f"Lendo {fname} ({idx + 1}/{total})")
+                    if status_widget:
+                        status_widget.write(f"📄 {'Lido' if lido else 'Já processado'}: **{fname}**")
+                registro.saida(rows)
+
+            # ========== PIPELINE PRINCIPAL (INALTERADO) ==========
+            df = None
+            if rows:
+                df = _parsear_textos(pd.DataFrame(rows))
+                gravar_linhas_cache(
+                    NOME_CACHE_LINHAS, VERSAO_PARSER, [digests[idx] for idx in novos], df,
+                    cacheavel=_linha_cacheavel,
+                )
+            if len(novos) < len(posicoes):
+                df = montar_lote(posicoes, prontos, df, nomes)
+
+            # Tasa (opcional)
+            df = adicionar_coluna_tasa_externos(df, cambio_df=cambio_df)
+            if "Cod. Moneda" in df.columns:
+                df.loc[df["Cod. Moneda"] == "00", "Tasa"] = 1
+
+            # Códigos
+            df = adicionar_cod_autorizacion_ext(df)
+            df = adicionar_tip_fac_ext(df)
+
+            # =============================
+            # Merge PEC / dados do SharePoint
+            # =============================
+            from services.externos_utils import adicionar_pec_sharepoint
+
+            # Fora do app (ex.: CLI) o SharePoint vem por parâmetro
+            if sharepoint_df is None:
+                sharepoint_df = st.session_state.get("sharepoint_df")
+            df_sp = adicionar_pec_sharepoint(df, sharepoint_df)
+            df = df_sp[0] if isinstance(df_sp, tuple) else df_sp
+
+            # ------------------------------------------
+            # COMPLEMENTAR CAMPOS VAZIOS (EXTERNOS)
+            # ------------------------------------------
+            def preencher_vazio(dest_col, src_col):
+                if dest_col in df.columns and src_col in df.columns:
+                    df[dest_col] = df[dest_col].combine_first(df[src_col])
+
+            with etapa("complementar campos vazios", df) as registro:
+                preencher_vazio("R.U.C", "proveedor")
+                preencher_vazio("Proveedor Iscala", "proveedor")
+                preencher_vazio("Proveedor Iscala", "Proveedor")
+                preencher_vazio("Factura", "numero_de_documento")
+                preencher_vazio("Tipo Doc", "tipo_doc")
+                preencher_vazio("Fecha de Emisión", "Fecha_Emision")
+                preencher_vazio("Moneda", "moneda")
+                preencher_vazio("Amount", "importe_documento")
+                preencher_vazio("Tasa", "Tasa_Sharepoint")
+                registro.saida(df)
+
+            # ✅ Recalcular códigos
+            df = adicionar_cod_autorizacion_ext(df)
+            df = adicionar_tip_fac_ext(df)
+
+            # =============================
+            # Heurística Lineaabajo (PDF)
+            # =============================
+            df["Lineaabajo"] = df["conteudo_pdf"].apply(detectar_linea)
+
+            # 1) Fallback usando Lineaabajo do SharePoint
+            if "Lineaabajo_sharepoint" in df.columns:
+                df["Lineaabajo"] = df["Lineaabajo"].combine_first(df["Lineaabajo_sharepoint"])
         
-        # 2) Fallback usando PG (se ainda vazio)
-        if "pg" in df.columns:
-            df["Lineaabajo"] = df["Lineaabajo"].combine_first(df["pg"])
+            # 2) Fallback usando PG (se ainda vazio)
+            if "pg" in df.columns:
+                df["Lineaabajo"] = df["Lineaabajo"].combine_first(df["pg"])
 
 
-        # Organiza e remove duplicatas
-        df = organizar_colunas_externos(df)
-        df = remover_duplicatas_source_file(df)
+            # Organiza e remove duplicatas
+            df = organizar_colunas_externos(df)
+            df = remover_duplicatas_source_file(df)
 
-        # Remove texto bruto
-        df = df.drop(columns=["conteudo_pdf"], errors="ignore")
+            # Remove texto bruto
+            df = df.drop(columns=["conteudo_pdf"], errors="ignore")
 
-        dfs_resultado.append(df)
+            dfs_resultado.append(df)
 
-        del rows
-        del df
-        gc.collect()
+            # Só vale a pena coletar depois de parsear (textos brutos do lote)
+            parseado = bool(rows)
+            del rows
+            del df
+            if parseado:
+                gc.collect()
+    finally:
+        # Fecha o pool também se o pipeline falhar no meio de um lote
+        textos.close()
 
     df_final = pd.concat(dfs_resultado, ignore_index=True)
 
@@ -4,35 +4,95 @@ import re
 import pandas as pd
 from datetime import datetime
 
-def identificar_Proveedor(df):
-    # Ordem de prioridade: os mais específicos primeiro
-    fornecedores = [
-        "Electrolux Intressenter AB",
-        "Electrolux S.E.A. Pte",
-        "ELECTROLUX DE CHILE",
-        "HOMA APPLIANCES CO",
-        "ELECTROLUX HOME PRODUCTS",
-        "MIDEA ELECTRIC TRADING",
-        "NINGBO XINLE HOUSEHOLD APPLIANCES CO",
-        "ELECTROLUX DO BRASIL",
-        "GUANGDONG GALANZ",
-        "NINGBO HUACAI ELECTRIC APPLIANCES CO",
-        "Hefei Snowky Electric",
-        "Trade Air System",
-        "JIANGMEN JINHUAN",
-        "FOSHAN SHUNDE MIDEA"
-    ]
+from services.perfil_service import instrumentar
+from services.sharepoint_utils import merge_por_substring
+from services.regex_utils import (
+    RE_DATA_5DU,
+    RE_DATA_5WY,
+    RE_DATA_7JR,
+    RE_DATA_BRR,
+    RE_DATA_CLH,
+    RE_DATA_DD_MES_BARRA,
+    RE_DATA_DD_MES_YY,
+    RE_DATA_DMY_BARRA_PALAVRA,
+    RE_DATA_ISO,
+    RE_DATA_ISO_PALAVRA,
+    RE_DATA_MDY_CURTA,
+    RE_DATA_PONTOS,
+    RE_DATA_TEXTUAL_EN,
+    RE_ESPACOS,
+    RE_FACTURA_BRR,
+    RE_FACTURA_EH,
+    RE_FACTURA_MD,
+    RE_LETRAS_MOEDA,
+    RE_NUMERO_COM_SEPARADORES,
+    RE_NUMEROS,
+    RE_PREFIXO_FACTURA,
+    RE_ROTULO_DATE,
+    RE_SEPARADOR_5DU,
+    RE_SEPARADOR_DATA,
+    compilar_meses,
+)
+
+# Ordem de prioridade: os mais específicos primeiro
+FORNECEDORES = [
+    "Electrolux Intressenter AB",
+    "Electrolux S.E.A. Pte",
+    "ELECTROLUX DE CHILE",
+    "HOMA APPLIANCES CO",
+    "ELECTROLUX HOME PRODUCTS",
+    "MIDEA ELECTRIC TRADING",
+    "NINGBO XINLE HOUSEHOLD APPLIANCES CO",
+    "ELECTROLUX DO BRASIL",
+    "GUANGDONG GALANZ",
+    "NINGBO HUACAI ELECTRIC APPLIANCES CO",
+    "Hefei Snowky Electric",
+    "Trade Air System",
+    "JIANGMEN JINHUAN",
+    "FOSHAN SHUNDE MIDEA"
+]
+
+# Heurística Lineaabajo (PDF): primeira palavra-chave (na ordem do dict) vence
+MAP_LINEA = {
+    "REFRIGERATOR": 36,
+    "CHEST FREEZER": 35,
+    "FREEZER": 35,
+    "STOVE": 38,
+    "COOKER": 22,
+    "OVEN": 38,
+    "WASHING MACHINE": 25,
+    "AIR CONDITIONER": 41,
+}
+
+_FORNECEDORES_MAIUSCULAS = [(f.upper(), f) for f in FORNECEDORES]
+
+
+def detectar_fornecedor(texto):
+    """Primeiro fornecedor (na ordem de FORNECEDORES) presente no texto, ou ""."""
+    texto = str(texto).upper()
+    for chave, fornecedor in _FORNECEDORES_MAIUSCULAS:
+        if chave in texto:
+            return fornecedor
+    return ""
 
-    def selecionar_Proveedor(texto):
-        texto = str(texto).upper()
-        for fornecedor in fornecedores:
-            if fornecedor.upper() in texto:
-                return fornecedor
-        return ""
 
-    df['Proveedor'] = df['conteudo_pdf'].apply(selecionar_Proveedor)
+def detectar_linea(texto):
+    """Lineaabajo pela primeira palavra-chave do MAP_LINEA presente no texto."""
+    if not isinstance(texto, str):
+        return None
+    up = texto.upper()
+    for k, v in MAP_LINEA.items():
+        if k in up:
+            return v
+    return None
+
+
+@instrumentar
+def identificar_Proveedor(df):
+    df['Proveedor'] = df['conteudo_pdf'].apply(detectar_fornecedor)
     return df
 
+@instrumentar
 def adicionar_provedor_iscala(df):
     depara = {
         "Electrolux Intressenter AB": "SEI",
@@ -60,961 +120,821 @@ def adicionar_provedor_iscala(df):
     df['Proveedor Iscala'] = df['Proveedor'].apply(mapear_provedor)
     return df
 
-def extrair_factura(df):
-    def buscar_factura(row):
-        texto = row['conteudo_pdf']
-        provedor = row['Proveedor Iscala']
-        linhas = texto.splitlines()
+# ===========================================================
+# MOTOR DE REGRAS POR FORNECEDOR (Factura, Fecha, Tipo Doc, Amount)
+# ===========================================================
+# Cada documento é tokenizado UMA vez (linhas + linhas em maiúsculas) e as
+# regras do fornecedor, indexadas pelo código "Proveedor Iscala", extraem os
+# quatro campos sobre essas mesmas linhas.
 
-        try:
-            if provedor == "SEI":
-                for i, linha in enumerate(linhas):
-                    linha_upper = linha.upper()
-                    if "INVOICE DATE" in linha_upper:
-                        return linhas[i - 2].strip() if i >= 2 else ""
-                    elif "CREDIT NOTE DATE" in linha_upper:
-                        if i >= 2:
-                            linha_alvo = linhas[i - 2]
-                            numeros = re.findall(r'\d+', linha_alvo)
-                            return ' '.join(numeros) if numeros else linha_alvo.strip()
-                    elif "DOCUMENT DATE:" in linha_upper:
-                        return linhas[i - 1].strip() if i >= 1 else ""
-
-            elif provedor == "SNOWKY":
-                for i, linha in enumerate(linhas):
-                    if "INVOICE NO." in linha:
-                        return linhas[i + 1] if i + 1 < len(linhas) else ""
-
-            elif provedor == "5BE":
-                for linha in linhas:
-                    if "INVOICE NO." in linha:
-                        partes = linha.split("INVOICE NO.")
-                        return partes[1].strip() if len(partes) > 1 else linha.strip()
-
-
-            elif provedor == "US1239":
-                for i, linha in enumerate(linhas):
-                    if "RUC:" in linha.upper() and i + 2 < len(linhas):
-                        linha_alvo = linhas[i + 2].strip()
-                        match = re.search(r'\bEH\d{8}\b', linha_alvo)
-                        if match:
-                            return match.group(0)
-
-                for i, linha in enumerate(linhas):
-                    if "INVOICE AND PACKING LIST" in linha.upper():
-                        if i + 1 < len(linhas):
-                            return linhas[i + 1].strip()
-
-                for i, linha in enumerate(linhas):
-                    if "ELECTROLUX HOME PRODUCTS INTERNATIONAL" in linha.upper():
-                        if i - 1 >= 0:
-                            return linhas[i - 1].strip()
-
-                return ""  # Caso nenhuma das lógicas encontre algo
-
-
-            elif provedor == "CLH":
-                for i, linha in enumerate(linhas):
-                    if "ELECTRONIC EXPORT INVOICE" in linha.upper():
-                        return linhas[i + 2] if i + 2 < len(linhas) else ""
-                    elif "NOTA DE CRÉDITO" in linha.upper():
-                        return linhas[i + 5] if i + 5 < len(linhas) else ""
-
-            elif provedor == "7DQ":
-                linha_customer = ""
-                for i, linha in enumerate(linhas):
-                    if "Customer Number" in linha:
-                        linha_customer = linhas[i + 1] if i + 1 < len(linhas) else ""
-                        break
-                linha_quinta = linhas[4] if len(linhas) > 4 else ""
-                linha_primeira = linhas[0] if linhas else ""
-                return f"{linha_customer} {linha_quinta} {linha_primeira}".strip()
-
-            elif provedor == "5JU":
-                for i, linha in enumerate(linhas):
-                    if "Invoice #.:" in linha:
-                        return linhas[i + 1] if i + 1 < len(linhas) else ""
-                    elif "CN No.:" in linha:
-                        partes = linha.split("CN No.:")
-                        if len(partes) > 1:
-                            return partes[1].strip()
-
-            elif provedor == "5WY":
-                for linha in linhas:
-                    if "MDOK" in linha or "MDR" in linha:
-                        return linha.strip()
-
-            elif provedor == "7JR":
-                for linha in linhas:
-                    if "MD" in linha:
-                        match = re.search(r"(MD.*)", linha)
-                        if match:
-                            return match.group(1).strip()
-                        return linha.strip()
-                    
-            elif provedor == "5DL":
-                for i, linha in enumerate(linhas):
-                    if "Invoice No." in linha:
-                        return linhas[i + 3] if i + 3 < len(linhas) else ""
-
-            elif provedor == "BRR":
-                for i, linha in enumerate(linhas):
-                    if "FACTURA COMERCIAL" in linha.upper() or "CREDIT NOTE" in linha.upper():
-                        partes = re.split(r"FACTURA COMERCIAL|CREDIT NOTE", linha, flags=re.IGNORECASE)
-                        resultado = partes[1].strip() if len(partes) > 1 else ""
-                        if resultado:
-                            return resultado
-                        elif i + 1 < len(linhas):
-                            return linhas[i + 1].strip()
-
-
-            elif provedor == "5DU":
-                for linha in linhas:
-                    if "INV. NO:" in linha:
-                        partes = linha.split("INV. NO:")
-                        return partes[1].strip() if len(partes) > 1 else linha.strip()
-
-            elif provedor == "NINGBO HUA":
-                for i, linha in enumerate(linhas):
-                    linha_upper = linha.upper()
-                    if "INVOICE NO" in linha_upper:
-                        partes = linha_upper.split("INVOICE NO")
-                        return partes[1].strip() if len(partes) > 1 else linha.strip()
-                    elif "CREDIT NOTE" in linha_upper:
-                        indice_desejado = i + 6
-                        if indice_desejado < len(linhas):
-                            return linhas[indice_desejado].strip()
-
-            elif provedor == "SGE":
-                for i, linha in enumerate(linhas):
-                    if "Invoice Date" in linha:
-                        return linhas[i - 2].strip() if i >= 2 else ""
-                    elif "Credit Note Date" in linha:
-                        if i >= 2:
-                            linha_alvo = linhas[i - 2]
-                            numeros = re.findall(r'\d+', linha_alvo)
-                            return ' '.join(numeros) if numeros else linha_alvo.strip()
-
-        except Exception as e:
-            return f"[Erro ao extrair: {e}]"
+class _Documento:
+    """Texto do PDF já quebrado em linhas (original, maiúsculas e minúsculas)."""
+
+    __slots__ = ("linhas", "upper", "_lower")
 
+    def __init__(self, texto):
+        self.linhas = texto.splitlines()
+        self.upper = [linha.upper() for linha in self.linhas]
+        self._lower = None
+
+    @property
+    def lower(self):
+        if self._lower is None:
+            self._lower = [linha.lower() for linha in self.linhas]
+        return self._lower
+
+
+# ----------------------------------------------------------
+# Construtores de regras
+# ----------------------------------------------------------
+# Uma "ação" recebe (doc, i) — i = linha onde o marcador foi achado — e devolve:
+#   str  -> valor final do campo
+#   None -> ignora esta linha e continua procurando
+
+def _rel(desloc, guarda="intervalo", strip=True, exigir=False):
+    """
+    Devolve a linha i + desloc.
+      guarda="intervalo": fora do documento -> ""
+      guarda="pular":     fora do documento -> continua procurando
+      guarda="livre":     só checa o limite superior (índice negativo "dá a volta",
+                          como em `linhas[i - 2] if i - 2 < len(linhas) else ""`)
+      exigir=True:        valor vazio -> continua procurando
+    """
+    def acao(doc, i):
+        j = i + desloc
+        n = len(doc.linhas)
+        if guarda == "livre":
+            if j >= n:
+                return ""
+        elif not 0 <= j < n:
+            return "" if guarda == "intervalo" else None
+        valor = doc.linhas[j].strip() if strip else doc.linhas[j]
+        if exigir and not valor:
+            return None
+        return valor
+    return acao
+
+
+def _apos_chave(chave, upper=False):
+    """Texto depois do marcador na própria linha (split pelo marcador)."""
+    def acao(doc, i):
+        fonte = doc.upper[i] if upper else doc.linhas[i]
+        partes = fonte.split(chave)
+        return partes[1].strip() if len(partes) > 1 else doc.linhas[i].strip()
+    return acao
+
+
+def _numeros_da_linha(desloc):
+    """Números da linha i + desloc unidos por espaço (ou a linha inteira)."""
+    def acao(doc, i):
+        if i + desloc < 0:
+            return None
+        linha_alvo = doc.linhas[i + desloc]
+        numeros = RE_NUMEROS.findall(linha_alvo)
+        return ' '.join(numeros) if numeros else linha_alvo.strip()
+    return acao
+
+
+def _chave(chave, acao, bruto=False):
+    """Marcador: `chave` procurada na linha em maiúsculas (ou na original, se bruto)."""
+    return (chave, acao, bruto)
+
+
+def _buscas(*buscas):
+    """
+    Cada busca é uma lista de marcadores. Dentro de uma busca, a primeira linha
+    que contém algum marcador decide (marcadores testados na ordem). Se a busca
+    não achar nada, tenta a próxima. Sem resultado -> "".
+    """
+    def regra(doc):
+        for marcadores in buscas:
+            for i in range(len(doc.linhas)):
+                for chave, acao, bruto in marcadores:
+                    fonte = doc.linhas if bruto else doc.upper
+                    if chave in fonte[i]:
+                        valor = acao(doc, i)
+                        if valor is not None:
+                            return valor
+                        break
         return ""
+    return regra
 
-    df['Factura'] = df.apply(buscar_factura, axis=1)
-    return df
 
-def ajustar_factura(df):
-    import re
+def _tipo_por_marcador(chave):
+    def regra(doc):
+        if any(chave in linha for linha in doc.upper):
+            return "CREDIT NOTE"
+        return "INVOICE"
+    return regra
 
-    def limpar(texto):
-        if not isinstance(texto, str):
-            return texto
-        texto = texto.upper()
-        texto = re.sub(r'\b(Nº|NO|N°|Nº\.|N°\.|Nº:|NO:)\b', '', texto)  # Remove prefixos
-        texto = texto.replace(":", "")
-        texto = texto.replace("：", "")
-        texto = texto.replace(".", "")
-        texto = texto.replace(",", "")
-        texto = texto.replace(" ", "")
-        return texto.strip()
 
-    df['Factura'] = df['Factura'].apply(limpar)
-    return df
+def _strptime_ddmmyy(data_bruta, formatos):
+    for fmt in formatos:
+        try:
+            return datetime.strptime(data_bruta, fmt).strftime("%d%m%y")
+        except ValueError:
+            continue
+    return None
+
+
+# ----------------------------------------------------------
+# Traduções de meses PT/ES -> EN (para %b)
+# ----------------------------------------------------------
+MESES_ABREV = {
+    "jan": "Jan", "ene": "Jan",
+    "fev": "Feb", "feb": "Feb",
+    "mar": "Mar",
+    "abr": "Apr",
+    "mai": "May", "may": "May",
+    "jun": "Jun",
+    "jul": "Jul",
+    "ago": "Aug",
+    "set": "Sep", "sep": "Sep",
+    "out": "Oct", "oct": "Oct",
+    "nov": "Nov",
+    "dez": "Dec", "dic": "Dec"
+}
+_traduzir_meses_abrev = compilar_meses(MESES_ABREV, ignorar_caixa=True)
+
+MESES_COMPLETO = {
+    # Português abreviado e por extenso
+    "jan": "Jan", "janeiro": "Jan",
+    "fev": "Feb", "fevereiro": "Feb",
+    "mar": "Mar", "março": "Mar",
+    "abr": "Apr", "abril": "Apr",
+    "mai": "May", "maio": "May",
+    "jun": "Jun", "junho": "Jun",
+    "jul": "Jul", "julho": "Jul",
+    "ago": "Aug", "agosto": "Aug",
+    "set": "Sep", "setembro": "Sep",
+    "out": "Oct", "outubro": "Oct",
+    "nov": "Nov", "novembro": "Nov",
+    "dez": "Dec", "dezembro": "Dec",
+    # Espanhol abreviado e por extenso
+    "ene": "Jan", "enero": "Jan",
+    "feb": "Feb", "febrero": "Feb",
+    "marzo": "Mar",
+    "may": "May", "mayo": "May",
+    "junio": "Jun",
+    "julio": "Jul",
+    "sep": "Sep", "sept": "Sep", "septiembre": "Sep",
+    "oct": "Oct", "octubre": "Oct",
+    "noviembre": "Nov",
+    "dic": "Dec", "diciembre": "Dec"
+}
+
+MESES_PONTO = {
+    # Traduções de abreviações com ponto
+    "jan.": "Jan", "feb.": "Feb", "mar.": "Mar", "apr.": "Apr",
+    "may.": "May", "jun.": "Jun", "jul.": "Jul", "aug.": "Aug",
+    "sep.": "Sep", "oct.": "Oct", "nov.": "Nov", "dec.": "Dec"
+}
+
+
+# ----------------------------------------------------------
+# Regras de Factura com lógica própria
+# ----------------------------------------------------------
+def _factura_7dq(doc):
+    linhas = doc.linhas
+    linha_customer = ""
+    for i, linha in enumerate(linhas):
+        if "Customer Number" in linha:
+            linha_customer = linhas[i + 1] if i + 1 < len(linhas) else ""
+            break
+    linha_quinta = linhas[4] if len(linhas) > 4 else ""
+    linha_primeira = linhas[0] if linhas else ""
+    return f"{linha_customer} {linha_quinta} {linha_primeira}".strip()
+
+
+def _factura_eh_us1239(doc, i):
+    if i + 2 >= len(doc.linhas):
+        return None
+    match = RE_FACTURA_EH.search(doc.linhas[i + 2].strip())
+    return match.group(0) if match else None
+
+
+def _factura_md_7jr(doc, i):
+    linha = doc.linhas[i]
+    match = RE_FACTURA_MD.search(linha)
+    if match:
+        return match.group(1).strip()
+    return linha.strip()
+
+
+def _factura_brr(doc, i):
+    partes = RE_FACTURA_BRR.split(doc.linhas[i])
+    resultado = partes[1].strip() if len(partes) > 1 else ""
+    if resultado:
+        return resultado
+    if i + 1 < len(doc.linhas):
+        return doc.linhas[i + 1].strip()
+    return None
+
+
+# ----------------------------------------------------------
+# Regras de Fecha (uma por fornecedor)
+# ----------------------------------------------------------
+def _fecha_sei(doc):
+    linhas = doc.linhas
+    for i, linha_upper in enumerate(doc.upper):
+        if ("INVOICE DATE" in linha_upper or "CREDIT NOTE DATE" in linha_upper or "DOCUMENT DATE:" in linha_upper) and i + 1 < len(linhas):
+            data_bruta = linhas[i + 1].strip()
+            return _strptime_ddmmyy(data_bruta, ("%d.%m.%Y", "%Y.%m.%d")) or data_bruta
+    return ""
 
-def extrair_fecha(df):
-    def extrair_data(row):
-        provedor = row.get("Proveedor Iscala", "").strip().upper()
-        linhas = row.get("conteudo_pdf", "").splitlines()
-
-        # 🔹 Regra 1: SEI
-        if provedor == "SEI":
-            for i, linha in enumerate(linhas):
-                linha_upper = linha.upper()
-                if ("INVOICE DATE" in linha_upper or "CREDIT NOTE DATE" in linha_upper or "DOCUMENT DATE:" in linha_upper) and i + 1 < len(linhas):
-                    data_bruta = linhas[i + 1].strip()
-                    for fmt in ("%d.%m.%Y", "%Y.%m.%d"):
-                        try:
-                            return datetime.strptime(data_bruta, fmt).strftime("%d%m%y")
-                        except ValueError:
-                            continue
-                    return data_bruta
 
-        # 🔹 Regra 2: SNOWKY
-        elif provedor == "SNOWKY":
-            for i, linha in enumerate(linhas):
-                if "DATE:" in linha.upper() and i + 1 < len(linhas):
-                    data_bruta = linhas[i + 1].strip()
-                    for fmt in ("%d.%m.%Y", "%Y.%m.%d"):
-                        try:
-                            return datetime.strptime(data_bruta, fmt).strftime("%d%m%y")
-                        except ValueError:
-                            continue
-                    return data_bruta
+def _fecha_snowky(doc):
+    linhas = doc.linhas
+    for i, linha_upper in enumerate(doc.upper):
+        if "DATE:" in linha_upper and i + 1 < len(linhas):
+            data_bruta = linhas[i + 1].strip()
+            return _strptime_ddmmyy(data_bruta, ("%d.%m.%Y", "%Y.%m.%d")) or data_bruta
+    return ""
 
-        # 🔹 Regra ajustada: 5BE
-        
-        elif provedor == "5BE":
-            # Traduções de meses PT/ES -> EN (abreviado)
-            meses_traducao = {
-                "jan": "Jan", "ene": "Jan",
-                "fev": "Feb", "feb": "Feb",
-                "mar": "Mar",
-                "abr": "Apr",
-                "mai": "May", "may": "May",
-                "jun": "Jun",
-                "jul": "Jul",
-                "ago": "Aug",
-                "set": "Sep", "sep": "Sep",
-                "out": "Oct", "oct": "Oct",
-                "nov": "Nov",
-                "dez": "Dec", "dic": "Dec"
-            }
-
-            def tenta_parse(s: str):
-                """Tenta converter uma string de data em 'ddmmyy', cobrindo mês textual e formatos numéricos."""
-                s = s.strip()
-                # Normaliza meses por extenso (se houver)
-                for pt, en in meses_traducao.items():
-                    s = re.sub(rf"(?i)\b{pt}\b", en, s)
-
-                # Formatos candidatos (mês textual, numéricos e ISO)
-                formatos = (
-                    # mês textual abreviado (Jan/Feb…)
-                    "%d-%b-%y", "%d/%b/%y",
-                    "%d-%b-%Y", "%d/%b/%Y",
-
-                    # totalmente numéricos (dia primeiro)
-                    "%d/%m/%Y", "%d-%m-%Y",
-                    "%d/%m/%y",  "%d-%m-%y",
-
-                    # ISO (ano primeiro)
-                    "%Y-%m-%d", "%Y/%m/%d",
-                )
-                # 1) tentativa direta
-                for fmt in formatos:
-                    try:
-                        return datetime.strptime(s, fmt).strftime("%d%m%y")
-                    except Exception:
-                        pass
-
-                # 2) fallback por regex: isola a "parte de data" e tenta novamente
-                padroes = [
-                    r"\b\d{4}-\d{2}-\d{2}\b",      # ISO YYYY-MM-DD
-                    r"\b\d{4}/\d{2}/\d{2}\b",      # ISO YYYY/MM/DD
-                    r"\b\d{1,2}/\d{1,2}/\d{2,4}\b",
-                    r"\b\d{1,2}-\d{1,2}-\d{2,4}\b",
-                    r"\b\d{1,2}/[A-Za-z]{3}/\d{2,4}\b",
-                    r"\b\d{1,2}-[A-Za-z]{3}-\d{2,4}\b",
-                ]
-                for pat in padroes:
-                    m = re.search(pat, s)
-                    if m:
-                        s2 = m.group(0).strip()
-                        for fmt in formatos:
-                            try:
-                                return datetime.strptime(s2, fmt).strftime("%d%m%y")
-                            except Exception:
-                                pass
-                return None  # não conseguiu interpretar
-
-            # Procurar por "DATE" (com ou sem dois pontos) e aceitar valor na mesma linha ou na linha de baixo
-            linhas_upper = [ln.upper() for ln in linhas]
-            for i, ln_up in enumerate(linhas_upper):
-                if "DATE" in ln_up:  # cobre "DATE", "DATE:", "** DATE**", etc.
-                    # 1) Tenta mesma linha (após a palavra DATE opcionalmente seguida de ':')
-                    original_line = linhas[i]
-                    partes = re.split(r'(?i)DATE\s*:?', original_line, maxsplit=1)
-                    candidato_mesma = partes[1].strip() if len(partes) > 1 else ""
-
-                    # 2) Se vazio, tenta a linha imediatamente seguinte (como em vários 5BE)
-                    candidato_proxima = linhas[i + 1].strip() if (not candidato_mesma and i + 1 < len(linhas)) else ""
-
-                    # 3) Tenta parsear os candidatos
-                    for cand in (candidato_mesma, candidato_proxima):
-                        if cand:
-                            parsed = tenta_parse(cand)
-                            if parsed:
-                                return parsed
-
-            # Último recurso: varre todo o documento e devolve a primeira data válida encontrada
-            for ln in linhas:
-                parsed = tenta_parse(ln)
-                if parsed:
-                    return parsed
-
-            return ""  # mantém compatibilidade com o restante do pipeline
-
-
-        elif provedor == "US1239":
-            encontrou_ref_claim = any("REF CLAIM" in linha.upper() for linha in linhas)
-
-            def extrair_data_formatada(texto):
-                match = re.search(r'\b(\d{1,2}/\d{1,2}/\d{2})\b', texto)
-                if match:
-                    try:
-                        return datetime.strptime(match.group(1), "%m/%d/%y").strftime("%d%m%y")
-                    except ValueError:
-                        return None
-                return None
-
-            if encontrou_ref_claim:
-                for linha in linhas:
-                    data = extrair_data_formatada(linha)
-                    if data:
-                        return data
-            else:
-                for linha in linhas:
-                    if "ELECTROLUX HOME PRODUCTS" in linha.upper():
-                        data = extrair_data_formatada(linha)
-                        if data:
-                            return data
-
-            # Se nenhuma das opções anteriores retornar uma data válida, busca a primeira data no documento
-            for linha in linhas:
-                data = extrair_data_formatada(linha)
+
+FORMATOS_5BE = (
+    # mês textual abreviado (Jan/Feb…)
+    "%d-%b-%y", "%d/%b/%y",
+    "%d-%b-%Y", "%d/%b/%Y",
+
+    # totalmente numéricos (dia primeiro)
+    "%d/%m/%Y", "%d-%m-%Y",
+    "%d/%m/%y",  "%d-%m-%y",
+
+    # ISO (ano primeiro)
+    "%Y-%m-%d", "%Y/%m/%d",
+)
+
+PADROES_DATA_5BE = [re.compile(p) for p in (
+    r"\b\d{4}-\d{2}-\d{2}\b",      # ISO YYYY-MM-DD
+    r"\b\d{4}/\d{2}/\d{2}\b",      # ISO YYYY/MM/DD
+    r"\b\d{1,2}/\d{1,2}/\d{2,4}\b",
+    r"\b\d{1,2}-\d{1,2}-\d{2,4}\b",
+    r"\b\d{1,2}/[A-Za-z]{3}/\d{2,4}\b",
+    r"\b\d{1,2}-[A-Za-z]{3}-\d{2,4}\b",
+)]
+
+
+def _tenta_parse_5be(s: str):
+    """Tenta converter uma string de data em 'ddmmyy', cobrindo mês textual e formatos numéricos."""
+    s = s.strip()
+    # Normaliza meses por extenso (se houver), todos numa passada só
+    s = _traduzir_meses_abrev(s)
+
+    # 1) tentativa direta
+    parsed = _strptime_ddmmyy(s, FORMATOS_5BE)
+    if parsed:
+        return parsed
+
+    # 2) fallback por regex: isola a "parte de data" e tenta novamente
+    for pat in PADROES_DATA_5BE:
+        m = pat.search(s)
+        if m:
+            parsed = _strptime_ddmmyy(m.group(0).strip(), FORMATOS_5BE)
+            if parsed:
+                return parsed
+    return None  # não conseguiu interpretar
+
+
+def _fecha_5be(doc):
+    linhas = doc.linhas
+    # Procurar por "DATE" (com ou sem dois pontos) e aceitar valor na mesma linha ou na linha de baixo
+    for i, ln_up in enumerate(doc.upper):
+        if "DATE" in ln_up:  # cobre "DATE", "DATE:", "** DATE**", etc.
+            # 1) Tenta mesma linha (após a palavra DATE opcionalmente seguida de ':')
+            partes = RE_ROTULO_DATE.split(linhas[i], maxsplit=1)
+            candidato_mesma = partes[1].strip() if len(partes) > 1 else ""
+
+            # 2) Se vazio, tenta a linha imediatamente seguinte (como em vários 5BE)
+            candidato_proxima = linhas[i + 1].strip() if (not candidato_mesma and i + 1 < len(linhas)) else ""
+
+            # 3) Tenta parsear os candidatos
+            for cand in (candidato_mesma, candidato_proxima):
+                if cand:
+                    parsed = _tenta_parse_5be(cand)
+                    if parsed:
+                        return parsed
+
+    # Último recurso: varre todo o documento e devolve a primeira data válida encontrada
+    for ln in linhas:
+        parsed = _tenta_parse_5be(ln)
+        if parsed:
+            return parsed
+
+    return ""  # mantém compatibilidade com o restante do pipeline
+
+
+def _data_mdy_us1239(texto):
+    match = RE_DATA_MDY_CURTA.search(texto)
+    if match:
+        try:
+            return datetime.strptime(match.group(1), "%m/%d/%y").strftime("%d%m%y")
+        except ValueError:
+            return None
+    return None
+
+
+def _fecha_us1239(doc):
+    linhas = doc.linhas
+    if any("REF CLAIM" in linha for linha in doc.upper):
+        for linha in linhas:
+            data = _data_mdy_us1239(linha)
+            if data:
+                return data
+    else:
+        for linha, linha_upper in zip(linhas, doc.upper):
+            if "ELECTROLUX HOME PRODUCTS" in linha_upper:
+                data = _data_mdy_us1239(linha)
                 if data:
                     return data
 
-
-        # 🔹 Regra 5: CLH
-        elif provedor == "CLH":
-            padrao_data = re.compile(r'\d{1,2} de [A-Za-zçÇñÑ]{3,15} de \d{4}')
-            meses_traducao = {
-                # Português abreviado e por extenso
-                "jan": "Jan", "janeiro": "Jan",
-                "fev": "Feb", "fevereiro": "Feb",
-                "mar": "Mar", "março": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "mai": "May", "maio": "May",
-                "jun": "Jun", "junho": "Jun",
-                "jul": "Jul", "julho": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "set": "Sep", "setembro": "Sep",
-                "out": "Oct", "outubro": "Oct",
-                "nov": "Nov", "novembro": "Nov",
-                "dez": "Dec", "dezembro": "Dec",
-                # Espanhol abreviado e por extenso
-                "ene": "Jan", "enero": "Jan",
-                "feb": "Feb", "febrero": "Feb",
-                "mar": "Mar", "marzo": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "may": "May", "mayo": "May",
-                "jun": "Jun", "junio": "Jun",
-                "jul": "Jul", "julio": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "sep": "Sep", "sept": "Sep", "septiembre": "Sep",
-                "oct": "Oct", "octubre": "Oct",
-                "nov": "Nov", "noviembre": "Nov",
-                "dic": "Dec", "diciembre": "Dec"
-            }
-            for linha in linhas:
-                match = padrao_data.search(linha.lower())
-                if match:
-                    data_bruta = match.group(0)
-                    for mes_local, mes_en in meses_traducao.items():
-                        if f" de {mes_local} de " in data_bruta:
-                            data_convertida = data_bruta.replace(f" de {mes_local} de ", f" de {mes_en} de ")
-                            try:
-                                return datetime.strptime(data_convertida, "%d de %b de %Y").strftime("%d%m%y")
-                            except ValueError:
-                                return data_bruta
-                    return data_bruta
+    # Se nenhuma das opções anteriores retornar uma data válida, busca a primeira data no documento
+    for linha in linhas:
+        data = _data_mdy_us1239(linha)
+        if data:
+            return data
+    return ""
 
 
-        # 🔹 Regra 6: 7DQ
-        elif provedor == "7DQ":
-            padrao_data = re.compile(r'\b\d{2}/\d{2}/\d{4}\b')
-            for linha in linhas:
-                match = padrao_data.search(linha)
-                if match:
+def _fecha_clh(doc):
+    padrao_data = RE_DATA_CLH
+    for linha_lower in doc.lower:
+        match = padrao_data.search(linha_lower)
+        if match:
+            data_bruta = match.group(0)
+            for mes_local, mes_en in MESES_COMPLETO.items():
+                if f" de {mes_local} de " in data_bruta:
+                    data_convertida = data_bruta.replace(f" de {mes_local} de ", f" de {mes_en} de ")
                     try:
-                        return datetime.strptime(match.group(0), "%d/%m/%Y").strftime("%d%m%y")
+                        return datetime.strptime(data_convertida, "%d de %b de %Y").strftime("%d%m%y")
                     except ValueError:
-                        return match.group(0)
-        # 🔹 Regra 7: 5JU
-        elif provedor == "5JU":
-            meses_traducao = {
-                # Português abreviado e por extenso
-                "jan": "Jan", "janeiro": "Jan",
-                "fev": "Feb", "fevereiro": "Feb",
-                "mar": "Mar", "março": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "mai": "May", "maio": "May",
-                "jun": "Jun", "junho": "Jun",
-                "jul": "Jul", "julho": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "set": "Sep", "setembro": "Sep",
-                "out": "Oct", "outubro": "Oct",
-                "nov": "Nov", "novembro": "Nov",
-                "dez": "Dec", "dezembro": "Dec",
-                # Espanhol abreviado e por extenso
-                "ene": "Jan", "enero": "Jan",
-                "feb": "Feb", "febrero": "Feb",
-                "mar": "Mar", "marzo": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "may": "May", "mayo": "May",
-                "jun": "Jun", "junio": "Jun",
-                "jul": "Jul", "julio": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "sep": "Sep", "sept": "Sep", "septiembre": "Sep",
-                "oct": "Oct", "octubre": "Oct",
-                "nov": "Nov", "noviembre": "Nov",
-                "dic": "Dec", "diciembre": "Dec"
-            }
-
-            if any("CN NO" in linha.upper() for linha in linhas):
-                for linha in linhas:
-                    if "DATE:" in linha.upper():
-                        partes = linha.upper().split("DATE:")
-                        if len(partes) > 1:
-                            data_bruta = partes[1].strip()
-                            partes_data = re.split(r"[-/]", data_bruta)
-                            if len(partes_data) == 3:
-                                dia, mes, ano = partes_data
-                                mes_lower = mes.lower()
-                                mes_en = meses_traducao.get(mes_lower, mes.capitalize())
-                                data_convertida = f"{dia}-{mes_en}-{ano}"
-                                try:
-                                    return datetime.strptime(data_convertida, "%d-%b-%Y").strftime("%d%m%y")
-                                except ValueError:
-                                    return data_bruta
-            else:
-                padrao_data = re.compile(r'\b\d{1,2}-[A-Za-zçÇñÑ]{3,9}-\d{2}\b')
-                for i, linha in enumerate(linhas):
-                    if "DESCRIPTION" in linha.upper() and i > 0:
-                        linha_anterior = linhas[i - 1]
-                        match = padrao_data.search(linha_anterior)
-                        if match:
-                            data_bruta = match.group(0)
-                            partes = data_bruta.split("-")
-                            if len(partes) == 3:
-                                dia, mes, ano = partes
-                                mes_lower = mes.lower()
-                                if mes_lower in meses_traducao:
-                                    mes_en = meses_traducao[mes_lower]
-                                    data_convertida = f"{dia}-{mes_en}-{ano}"
-                                    try:
-                                        return datetime.strptime(data_convertida, "%d-%b-%y").strftime("%d%m%y")
-                                    except ValueError:
-                                        return data_bruta
-                            return data_bruta
+                        return data_bruta
+            return data_bruta
+    return ""
 
 
-        # 🔹 Regra 8: 5WY
-        elif provedor == "5WY":
-            padrao_data = re.compile(r'\b\d{1,2}/[A-Za-z]{3}/\d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b|\b\d{4}-\d{2}-\d{2}\b')
-            meses_traducao = {
-                "jan": "Jan", "ene": "Jan",
-                "fev": "Feb", "feb": "Feb",
-                "mar": "Mar",
-                "abr": "Apr",
-                "mai": "May", "may": "May",
-                "jun": "Jun",
-                "jul": "Jul",
-                "ago": "Aug",
-                "set": "Sep", "sep": "Sep",
-                "out": "Oct", "oct": "Oct",
-                "nov": "Nov",
-                "dez": "Dec", "dic": "Dec"
-            }
-            for linha in linhas:
-                match = padrao_data.search(linha)
-                if match:
-                    data_bruta = match.group(0)
-                    if re.search(r'\d{4}-\d{2}-\d{2}', data_bruta):
-                        try:
-                            return datetime.strptime(data_bruta, "%Y-%m-%d").strftime("%d%m%y")
-                        except ValueError:
-                            return data_bruta
-                    elif re.search(r'\d{1,2}/[A-Za-z]{3}/\d{4}', data_bruta):
-                        partes = data_bruta.split("/")
-                        dia, mes, ano = partes
-                        mes_lower = mes.lower()
-                        mes_en = meses_traducao.get(mes_lower, mes)
-                        data_convertida = f"{dia}/{mes_en}/{ano}"
-                        try:
-                            return datetime.strptime(data_convertida, "%d/%b/%Y").strftime("%d%m%y")
-                        except ValueError:
-                            return data_bruta
-                    else:
-                        try:
-                            return datetime.strptime(data_bruta, "%d/%m/%Y").strftime("%d%m%y")
-                        except ValueError:
-                            return data_bruta
+def _fecha_7dq(doc):
+    padrao_data = RE_DATA_DMY_BARRA_PALAVRA
+    for linha in doc.linhas:
+        match = padrao_data.search(linha)
+        if match:
+            try:
+                return datetime.strptime(match.group(0), "%d/%m/%Y").strftime("%d%m%y")
+            except ValueError:
+                return match.group(0)
+    return ""
 
 
-        # 🔹 Regra 9: 7JR
-        elif provedor == "7JR":
-            padrao_data = re.compile(r'\b\d{1,2}/[A-Za-z]{3}/\d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b')
-            meses_traducao = {
-                # Português e Espanhol abreviado
-                "jan": "Jan", "ene": "Jan",
-                "fev": "Feb", "feb": "Feb",
-                "mar": "Mar",
-                "abr": "Apr",
-                "mai": "May", "may": "May",
-                "jun": "Jun",
-                "jul": "Jul",
-                "ago": "Aug",
-                "set": "Sep", "sep": "Sep",
-                "out": "Oct", "oct": "Oct",
-                "nov": "Nov",
-                "dez": "Dec", "dic": "Dec"
-            }
-            for linha in linhas:
-                match = padrao_data.search(linha)
-                if match:
-                    data_bruta = match.group(0)
-                    # Verifica se o mês é texto (ex: Jan)
-                    if re.search(r'\d{1,2}/[A-Za-z]{3}/\d{4}', data_bruta):
-                        partes = data_bruta.split("/")
-                        dia, mes, ano = partes
-                        mes_lower = mes.lower()
-                        mes_en = meses_traducao.get(mes_lower, mes)
-                        data_convertida = f"{dia}/{mes_en}/{ano}"
+def _fecha_5ju(doc):
+    linhas = doc.linhas
+    if any("CN NO" in linha for linha in doc.upper):
+        for linha_upper in doc.upper:
+            if "DATE:" in linha_upper:
+                partes = linha_upper.split("DATE:")
+                if len(partes) > 1:
+                    data_bruta = partes[1].strip()
+                    partes_data = RE_SEPARADOR_DATA.split(data_bruta)
+                    if len(partes_data) == 3:
+                        dia, mes, ano = partes_data
+                        mes_en = MESES_COMPLETO.get(mes.lower(), mes.capitalize())
+                        data_convertida = f"{dia}-{mes_en}-{ano}"
                         try:
-                            return datetime.strptime(data_convertida, "%d/%b/%Y").strftime("%d%m%y")
+                            return datetime.strptime(data_convertida, "%d-%b-%Y").strftime("%d%m%y")
                         except ValueError:
                             return data_bruta
-                    else:
-                        try:
-                            return datetime.strptime(data_bruta, "%d/%m/%Y").strftime("%d%m%y")
-                        except ValueError:
-                            return data_bruta
-
-        # 🔹 Regra 10: 5DL
-        elif provedor == "5DL":
-            meses_traducao = {
-                # Português abreviado e por extenso
-                "jan": "Jan", "janeiro": "Jan",
-                "fev": "Feb", "fevereiro": "Feb",
-                "mar": "Mar", "março": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "mai": "May", "maio": "May",
-                "jun": "Jun", "junho": "Jun",
-                "jul": "Jul", "julho": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "set": "Sep", "setembro": "Sep",
-                "out": "Oct", "outubro": "Oct",
-                "nov": "Nov", "novembro": "Nov",
-                "dez": "Dec", "dezembro": "Dec",
-                # Espanhol abreviado e por extenso
-                "ene": "Jan", "enero": "Jan",
-                "feb": "Feb", "febrero": "Feb",
-                "mar": "Mar", "marzo": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "may": "May", "mayo": "May",
-                "jun": "Jun", "junio": "Jun",
-                "jul": "Jul", "julio": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "sep": "Sep", "sept": "Sep", "septiembre": "Sep",
-                "oct": "Oct", "octubre": "Oct",
-                "nov": "Nov", "noviembre": "Nov",
-                "dic": "Dec", "diciembre": "Dec"
-            }
-            padrao_data = re.compile(r'\b\d{1,2}-[A-Za-zçÇñÑ]{3,9}-\d{2}\b')
-            for linha in linhas:
-                match = padrao_data.search(linha)
+    else:
+        padrao_data = RE_DATA_DD_MES_YY
+        for i, linha_upper in enumerate(doc.upper):
+            if "DESCRIPTION" in linha_upper and i > 0:
+                match = padrao_data.search(linhas[i - 1])
                 if match:
                     data_bruta = match.group(0)
                     partes = data_bruta.split("-")
                     if len(partes) == 3:
                         dia, mes, ano = partes
                         mes_lower = mes.lower()
-                        if mes_lower in meses_traducao:
-                            mes_en = meses_traducao[mes_lower]
-                            data_convertida = f"{dia}-{mes_en}-{ano}"
+                        if mes_lower in MESES_COMPLETO:
+                            data_convertida = f"{dia}-{MESES_COMPLETO[mes_lower]}-{ano}"
                             try:
                                 return datetime.strptime(data_convertida, "%d-%b-%y").strftime("%d%m%y")
                             except ValueError:
                                 return data_bruta
                     return data_bruta
+    return ""
 
-        elif provedor == "BRR":
-            meses_traducao = {
-                # Português abreviado e por extenso
-                "jan": "Jan", "janeiro": "Jan",
-                "fev": "Feb", "fevereiro": "Feb",
-                "mar": "Mar", "março": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "mai": "May", "maio": "May",
-                "jun": "Jun", "junho": "Jun",
-                "jul": "Jul", "julho": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "set": "Sep", "setembro": "Sep",
-                "out": "Oct", "outubro": "Oct",
-                "nov": "Nov", "novembro": "Nov",
-                "dez": "Dec", "dezembro": "Dec",
-                # Espanhol abreviado e por extenso
-                "ene": "Jan", "enero": "Jan",
-                "feb": "Feb", "febrero": "Feb",
-                "mar": "Mar", "marzo": "Mar",
-                "abr": "Apr", "abril": "Apr",
-                "may": "May", "mayo": "May",
-                "jun": "Jun", "junio": "Jun",
-                "jul": "Jul", "julio": "Jul",
-                "ago": "Aug", "agosto": "Aug",
-                "sep": "Sep", "sept": "Sep", "septiembre": "Sep",
-                "oct": "Oct", "octubre": "Oct",
-                "nov": "Nov", "noviembre": "Nov",
-                "dic": "Dec", "diciembre": "Dec"
-            }
-
-            if any("CREDIT NOTE" in linha.upper() for linha in linhas):
-                padrao_ddmmyyyy = re.compile(r'\b\d{2}/\d{2}/\d{4}\b')
-                for linha in linhas:
-                    match = padrao_ddmmyyyy.search(linha)
-                    if match:
-                        try:
-                            return datetime.strptime(match.group(0), "%d/%m/%Y").strftime("%d%m%y")
-                        except ValueError:
-                            return match.group(0)
+
+def _data_mes_texto_barra(data_bruta):
+    """dd/Mmm/yyyy com mês PT/ES/EN -> ddmmyy (ou o texto original)."""
+    dia, mes, ano = data_bruta.split("/")
+    mes_en = MESES_ABREV.get(mes.lower(), mes)
+    try:
+        return datetime.strptime(f"{dia}/{mes_en}/{ano}", "%d/%b/%Y").strftime("%d%m%y")
+    except ValueError:
+        return data_bruta
+
+
+def _fecha_5wy(doc):
+    padrao_data = RE_DATA_5WY
+    for linha in doc.linhas:
+        match = padrao_data.search(linha)
+        if match:
+            data_bruta = match.group(0)
+            if RE_DATA_ISO.search(data_bruta):
+                try:
+                    return datetime.strptime(data_bruta, "%Y-%m-%d").strftime("%d%m%y")
+                except ValueError:
+                    return data_bruta
+            elif RE_DATA_DD_MES_BARRA.search(data_bruta):
+                return _data_mes_texto_barra(data_bruta)
             else:
-                padrao_data = re.compile(r'\b\d{1,2}/[A-Za-zñÑ]{3,15}/\d{4}\b')
-                for i, linha in enumerate(linhas):
-                    if "FECHA" in linha.upper() and i + 1 < len(linhas):
-                        linha_abaixo = linhas[i + 1]
-                        match = padrao_data.search(linha_abaixo)
-                        if match:
-                            data_bruta = match.group(0)
-                            partes = data_bruta.split("/")
-                            if len(partes) == 3:
-                                dia, mes, ano = partes
-                                mes_lower = mes.lower()
-                                if mes_lower in meses_traducao:
-                                    mes_en = meses_traducao[mes_lower]
-                                    data_convertida = f"{dia}/{mes_en}/{ano}"
-                                    try:
-                                        return datetime.strptime(data_convertida, "%d/%b/%Y").strftime("%d%m%y")
-                                    except ValueError:
-                                        return data_bruta
-                            return data_bruta
+                try:
+                    return datetime.strptime(data_bruta, "%d/%m/%Y").strftime("%d%m%y")
+                except ValueError:
+                    return data_bruta
+    return ""
+
+
+def _fecha_7jr(doc):
+    padrao_data = RE_DATA_7JR
+    for linha in doc.linhas:
+        match = padrao_data.search(linha)
+        if match:
+            data_bruta = match.group(0)
+            # Verifica se o mês é texto (ex: Jan)
+            if RE_DATA_DD_MES_BARRA.search(data_bruta):
+                return _data_mes_texto_barra(data_bruta)
+            try:
+                return datetime.strptime(data_bruta, "%d/%m/%Y").strftime("%d%m%y")
+            except ValueError:
+                return data_bruta
+    return ""
 
 
-        # 🔹 Regra 12: 5DU
-        elif provedor == "5DU":
-            meses_traducao = {
-                # Traduções de abreviações com ponto
-                "jan.": "Jan", "feb.": "Feb", "mar.": "Mar", "apr.": "Apr",
-                "may.": "May", "jun.": "Jun", "jul.": "Jul", "aug.": "Aug",
-                "sep.": "Sep", "oct.": "Oct", "nov.": "Nov", "dec.": "Dec"
-            }
-            padrao_data = re.compile(r'\b[A-Za-z]{3,4}\.\d{1,2},\d{4}\b')
-            for linha in linhas:
-                if "DATE:" in linha.upper():
-                    match = padrao_data.search(linha)
-                    if match:
-                        data_bruta = match.group(0)
-                        partes = re.split(r'[.,]', data_bruta)
-                        if len(partes) == 3:
-                            mes, dia, ano = partes
-                            mes_lower = mes.lower() + "."
-                            mes_en = meses_traducao.get(mes_lower, mes.capitalize())
-                            data_convertida = f"{dia.zfill(2)}-{mes_en}-{ano}"
+def _fecha_5dl(doc):
+    padrao_data = RE_DATA_DD_MES_YY
+    for linha in doc.linhas:
+        match = padrao_data.search(linha)
+        if match:
+            data_bruta = match.group(0)
+            partes = data_bruta.split("-")
+            if len(partes) == 3:
+                dia, mes, ano = partes
+                mes_lower = mes.lower()
+                if mes_lower in MESES_COMPLETO:
+                    data_convertida = f"{dia}-{MESES_COMPLETO[mes_lower]}-{ano}"
+                    try:
+                        return datetime.strptime(data_convertida, "%d-%b-%y").strftime("%d%m%y")
+                    except ValueError:
+                        return data_bruta
+            return data_bruta
+    return ""
+
+
+def _fecha_brr(doc):
+    linhas = doc.linhas
+    if any("CREDIT NOTE" in linha for linha in doc.upper):
+        padrao_ddmmyyyy = RE_DATA_DMY_BARRA_PALAVRA
+        for linha in linhas:
+            match = padrao_ddmmyyyy.search(linha)
+            if match:
+                try:
+                    return datetime.strptime(match.group(0), "%d/%m/%Y").strftime("%d%m%y")
+                except ValueError:
+                    return match.group(0)
+    else:
+        padrao_data = RE_DATA_BRR
+        for i, linha_upper in enumerate(doc.upper):
+            if "FECHA" in linha_upper and i + 1 < len(linhas):
+                match = padrao_data.search(linhas[i + 1])
+                if match:
+                    data_bruta = match.group(0)
+                    partes = data_bruta.split("/")
+                    if len(partes) == 3:
+                        dia, mes, ano = partes
+                        mes_lower = mes.lower()
+                        if mes_lower in MESES_COMPLETO:
+                            data_convertida = f"{dia}/{MESES_COMPLETO[mes_lower]}/{ano}"
                             try:
-                                return datetime.strptime(data_convertida, "%d-%b-%Y").strftime("%d%m%y")
+                                return datetime.strptime(data_convertida, "%d/%b/%Y").strftime("%d%m%y")
                             except ValueError:
                                 return data_bruta
-                    return ""
-                
-        # 🔹 Regra 13: NINGBO HUA
-        elif provedor == "NINGBO HUA":
-            padrao_iso = re.compile(r'\b\d{4}-\d{2}-\d{2}\b')
-            padrao_textual = re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)?\s*,?\s*(January|February|March|April|May|June|July|August|September|October|November|December)\s+(\d{4})\b', re.IGNORECASE)
-
-            for linha in linhas:
-                match_iso = padrao_iso.search(linha)
-                if match_iso:
-                    try:
-                        return datetime.strptime(match_iso.group(0), "%Y-%m-%d").strftime("%d%m%y")
-                    except ValueError:
-                        return match_iso.group(0)
+                    return data_bruta
+    return ""
+
 
-                match_textual = padrao_textual.search(linha)
-                if match_textual:
-                    dia, mes, ano = match_textual.groups()
+def _fecha_5du(doc):
+    padrao_data = RE_DATA_5DU
+    for linha, linha_upper in zip(doc.linhas, doc.upper):
+        if "DATE:" in linha_upper:
+            match = padrao_data.search(linha)
+            if match:
+                data_bruta = match.group(0)
+                partes = RE_SEPARADOR_5DU.split(data_bruta)
+                if len(partes) == 3:
+                    mes, dia, ano = partes
+                    mes_en = MESES_PONTO.get(mes.lower() + ".", mes.capitalize())
+                    data_convertida = f"{dia.zfill(2)}-{mes_en}-{ano}"
                     try:
-                        data = datetime.strptime(f"{dia} {mes} {ano}", "%d %B %Y")
-                        return data.strftime("%d%m%y")
+                        return datetime.strptime(data_convertida, "%d-%b-%Y").strftime("%d%m%y")
                     except ValueError:
-                        return f"{dia} {mes} {ano}"
-
-                    
-        # 🔹 Regra 14: SGE
-        elif provedor == "SGE":
-            padrao_data = re.compile(r'\b\d{2}\.\d{2}\.\d{4}\b')
-            for i, linha in enumerate(linhas):
-                linha_upper = linha.upper()
-                if ("INVOICE DATE" in linha_upper or "CREDIT NOTE DATE" in linha_upper) and i + 1 < len(linhas):
-                    linha_abaixo = linhas[i + 1]
-                    match = padrao_data.search(linha_abaixo)
-                    if match:
-                        try:
-                            return datetime.strptime(match.group(0), "%d.%m.%Y").strftime("%d%m%y")
-                        except ValueError:
-                            return match.group(0)
+                        return data_bruta
+            return ""
+    return ""
 
-                    
-        return ""
-    df["Fecha de Emisión"] = df.apply(extrair_data, axis=1)
-    return df
 
-def ajustar_coluna_fecha(df):
+def _fecha_ningbo_hua(doc):
+    padrao_iso = RE_DATA_ISO_PALAVRA
+    padrao_textual = RE_DATA_TEXTUAL_EN
+
+    for linha in doc.linhas:
+        match_iso = padrao_iso.search(linha)
+        if match_iso:
+            try:
+                return datetime.strptime(match_iso.group(0), "%Y-%m-%d").strftime("%d%m%y")
+            except ValueError:
+                return match_iso.group(0)
+
+        match_textual = padrao_textual.search(linha)
+        if match_textual:
+            dia, mes, ano = match_textual.groups()
+            try:
+                return datetime.strptime(f"{dia} {mes} {ano}", "%d %B %Y").strftime("%d%m%y")
+            except ValueError:
+                return f"{dia} {mes} {ano}"
+    return ""
 
-    def converter_data(data_str):
-        if pd.isna(data_str) or len(data_str) != 6:
-            return data_str
-        try:
-            dia = data_str[:2]
-            mes = data_str[2:4]
-            ano = data_str[4:]
-            ano_completo = '20' + ano if int(ano) < 50 else '19' + ano
-            return f"{dia}/{mes}/{ano_completo}"
-        except Exception:
-            return data_str
 
-    df['Fecha de Emisión'] = df['Fecha de Emisión'].apply(converter_data)
-    return df
+def _fecha_sge(doc):
+    padrao_data = RE_DATA_PONTOS
+    linhas = doc.linhas
+    for i, linha_upper in enumerate(doc.upper):
+        if ("INVOICE DATE" in linha_upper or "CREDIT NOTE DATE" in linha_upper) and i + 1 < len(linhas):
+            match = padrao_data.search(linhas[i + 1])
+            if match:
+                try:
+                    return datetime.strptime(match.group(0), "%d.%m.%Y").strftime("%d%m%y")
+                except ValueError:
+                    return match.group(0)
+    return ""
 
-def adicionar_tipo_doc(df):
-    def classificar_tipo_doc(row):
-        provedor = row.get("Proveedor Iscala", "").strip().upper()
-        linhas = row.get("conteudo_pdf", "").splitlines()
-        
-        if provedor == "SEI":
-            return linhas[0].strip().upper() if linhas else ""
-        
-        elif provedor == "SGE":
-            return linhas[0].strip() if linhas else ""
-        
-        elif provedor == "5BE":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE"
-        
-        elif provedor == "5DL":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE"
 
-        elif provedor == "5DU":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE"
-            
-        elif provedor == "5JU":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE"
+# ----------------------------------------------------------
+# Regras de Amount com lógica própria
+# ----------------------------------------------------------
+def _amount_snowky(doc, i):
+    for offset in range(1, 11):
+        idx = i - offset
+        if idx >= 0:
+            linha_acima = doc.linhas[idx].strip()
+            if "US$" in linha_acima.upper():
+                return linha_acima
+    return ""
 
-        elif provedor == "5WY":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE"        
 
-        elif provedor == "7DQ":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
+def _amount_ningbo_hua(doc, i):
+    if i >= 2:
+        return doc.linhas[i - 2].strip()
+    elif i >= 1:
+        return doc.linhas[i - 1].strip()
+    return None
+
+
+def _amount_ultimo_numero(doc, i):
+    numeros = RE_NUMERO_COM_SEPARADORES.findall(doc.linhas[i])
+    return numeros[-1] if numeros else None  # Pega o último número da linha
+
+
+# ----------------------------------------------------------
+# Tabela de regras por "Proveedor Iscala"
+# ----------------------------------------------------------
+REGRAS_FORNECEDOR = {
+    "SEI": {
+        "Factura": _buscas([
+            _chave("INVOICE DATE", _rel(-2)),
+            _chave("CREDIT NOTE DATE", _numeros_da_linha(-2)),
+            _chave("DOCUMENT DATE:", _rel(-1)),
+        ]),
+        "Fecha de Emisión": _fecha_sei,
+        "Tipo Doc": lambda doc: doc.linhas[0].strip().upper() if doc.linhas else "",
+        "Amount": _buscas(
+            [_chave("TOTAL AMOUNT(U.S DOLLAR)", _rel(1))],
+            [_chave("TOTAL NET IN DOC. CURRENCY", _rel(1))],
+        ),
+    },
+    "SGE": {
+        "Factura": _buscas([
+            _chave("Invoice Date", _rel(-2), bruto=True),
+            _chave("Credit Note Date", _numeros_da_linha(-2), bruto=True),
+        ]),
+        "Fecha de Emisión": _fecha_sge,
+        "Tipo Doc": lambda doc: doc.linhas[0].strip() if doc.linhas else "",
+        "Amount": _buscas([_chave("TOTAL AMOUNT(U.S DOLLAR)", _rel(1))]),
+    },
+    "SNOWKY": {
+        "Factura": _buscas([_chave("INVOICE NO.", _rel(1, strip=False), bruto=True)]),
+        "Fecha de Emisión": _fecha_snowky,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas([_chave("QUANTITIES & DESCRIPTIONS", _amount_snowky)]),
+    },
+    "5BE": {
+        "Factura": _buscas([_chave("INVOICE NO.", _apos_chave("INVOICE NO."), bruto=True)]),
+        "Fecha de Emisión": _fecha_5be,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas(
+            [_chave("SHIPPING MARKS:", _rel(-1, guarda="livre"))],
+            [_chave("HOMA APPLIANCES CO", _rel(-2))],
+        ),
+    },
+    "US1239": {
+        "Factura": _buscas(
+            [_chave("RUC:", _factura_eh_us1239)],
+            [_chave("INVOICE AND PACKING LIST", _rel(1, guarda="pular"))],
+            [_chave("ELECTROLUX HOME PRODUCTS INTERNATIONAL", _rel(-1, guarda="pular"))],
+        ),
+        "Fecha de Emisión": _fecha_us1239,
+        "Tipo Doc": _tipo_por_marcador("REF CLAIM"),
+        "Amount": _buscas([
+            _chave("GRAND TOTAL USA $", _amount_ultimo_numero),
+            _chave("TOTALS", _amount_ultimo_numero),
+            _chave("TOTAL VALUE", _amount_ultimo_numero),
+        ]),
+    },
+    "CLH": {
+        "Factura": _buscas([
+            _chave("ELECTRONIC EXPORT INVOICE", _rel(2, strip=False)),
+            _chave("NOTA DE CRÉDITO", _rel(5, strip=False)),
+        ]),
+        "Fecha de Emisión": _fecha_clh,
+        "Tipo Doc": _tipo_por_marcador("NOTA DE CRÉDITO"),
+        "Amount": _buscas([_chave("TOTAL FOB", _rel(1))]),
+    },
+    "7DQ": {
+        "Factura": _factura_7dq,
+        "Fecha de Emisión": _fecha_7dq,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas([_chave("PAYMENT CONDITIONS :", _rel(-2, guarda="livre"))]),
+    },
+    "5JU": {
+        "Factura": _buscas([
+            _chave("Invoice #.:", _rel(1, strip=False), bruto=True),
+            _chave("CN No.:", _apos_chave("CN No.:"), bruto=True),
+        ]),
+        "Fecha de Emisión": _fecha_5ju,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas(
+            [_chave("REMARKS:", _rel(-1))],
+            [_chave("CREDIT NOTE", _rel(-4))],
+        ),
+    },
+    "5WY": {
+        "Factura": _buscas([
+            _chave("MDOK", _rel(0), bruto=True),
+            _chave("MDR", _rel(0), bruto=True),
+        ]),
+        "Fecha de Emisión": _fecha_5wy,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas([_chave("TOTAL", _rel(2))]),
+    },
+    "7JR": {
+        "Factura": _buscas([_chave("MD", _factura_md_7jr, bruto=True)]),
+        "Fecha de Emisión": _fecha_7jr,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas(
+            [_chave("TOTAL AMOUNT:", _rel(2))],
+            [_chave("REMARK:", _rel(-1, guarda="pular"))],
+        ),
+    },
+    "5DL": {
+        "Factura": _buscas([_chave("Invoice No.", _rel(3, strip=False), bruto=True)]),
+        "Fecha de Emisión": _fecha_5dl,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas([_chave("COMMERCIAL INVOICE", _rel(-2, guarda="livre"))]),
+    },
+    "BRR": {
+        "Factura": _buscas([
+            _chave("FACTURA COMERCIAL", _factura_brr),
+            _chave("CREDIT NOTE", _factura_brr),
+        ]),
+        "Fecha de Emisión": _fecha_brr,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas(
+            [_chave("COSTOS INTERNOS", _rel(4, guarda="pular", exigir=True))],
+            [_chave("TOTAL IN FAVOUR", _rel(2, guarda="pular", exigir=True))],
+            [_chave("TOTAL FOB", _rel(1))],
+        ),
+    },
+    "5DU": {
+        "Factura": _buscas([_chave("INV. NO:", _apos_chave("INV. NO:"), bruto=True)]),
+        "Fecha de Emisión": _fecha_5du,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas([_chave("TOTAL:", _rel(-2, guarda="livre"))]),
+    },
+    "NINGBO HUA": {
+        "Factura": _buscas([
+            _chave("INVOICE NO", _apos_chave("INVOICE NO", upper=True)),
+            _chave("CREDIT NOTE", _rel(6, guarda="pular")),
+        ]),
+        "Fecha de Emisión": _fecha_ningbo_hua,
+        "Tipo Doc": _tipo_por_marcador("CREDIT NOTE"),
+        "Amount": _buscas(
+            [_chave("PAYMENT TERM", _rel(-1))],
+            [_chave("AMOUNT IN WORDS", _amount_ningbo_hua)],
+        ),
+    },
+}
+
+CAMPOS_REGRAS = ("Factura", "Fecha de Emisión", "Tipo Doc", "Amount")
+
+
+def _extrair_factura_segura(regra, doc):
+    try:
+        return regra(doc)
+    except Exception as e:
+        return f"[Erro ao extrair: {e}]"
+
+
+def _aplicar_regras(df, campos):
+    """Aplica a tabela de regras, tokenizando cada documento uma única vez."""
+    valores = {campo: [] for campo in campos}
+    for texto, provedor in zip(df["conteudo_pdf"], df["Proveedor Iscala"]):
+        regras = REGRAS_FORNECEDOR.get(provedor.strip().upper(), {})
+        doc = _Documento(texto)
+        for campo in campos:
+            regra = regras.get(campo)
+            if regra is None:
+                valores[campo].append("")
+            elif campo == "Factura":
+                valores[campo].append(_extrair_factura_segura(regra, doc))
             else:
-                return "INVOICE"         
+                valores[campo].append(regra(doc))
+    for campo in campos:
+        df[campo] = pd.Series(valores[campo], index=df.index)
+    return df
 
-        elif provedor == "7JR":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE" 
 
-        elif provedor == "BRR":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE" 
+@instrumentar
+def extrair_campos_externos(df):
+    """Factura, Fecha de Emisión, Tipo Doc e Amount numa única passada por documento."""
+    return _aplicar_regras(df, CAMPOS_REGRAS)
 
-        elif provedor == "BRR":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE" 
 
-        elif provedor == "CLH":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("NOTA DE CRÉDITO" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE" 
+def extrair_factura(df):
+    return _aplicar_regras(df, ("Factura",))
 
-        elif provedor == "NINGBO HUA":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE" 
 
-        elif provedor == "SNOWKY":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("CREDIT NOTE" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE" 
+def extrair_fecha(df):
+    return _aplicar_regras(df, ("Fecha de Emisión",))
+
+
+def adicionar_tipo_doc(df):
+    return _aplicar_regras(df, ("Tipo Doc",))
 
-        elif provedor == "US1239":
-            linhas_upper = [linha.upper() for linha in linhas]
-            if any("REF CLAIM" in linha for linha in linhas_upper):
-                return "CREDIT NOTE"
-            else:
-                return "INVOICE"                                                          
-        return ""
-    df["Tipo Doc"] = df.apply(classificar_tipo_doc, axis=1)
-    return df
 
 def adicionar_amount(df):
-    def extrair_amount(row):
-        provedor = row.get("Proveedor Iscala", "").strip().upper()
-        linhas = row.get("conteudo_pdf", "").splitlines()
-
-        if provedor == "SEI":
-            for i, linha in enumerate(linhas):
-                if "TOTAL AMOUNT(U.S DOLLAR)" in linha.upper():
-                    return linhas[i + 1].strip() if i + 1 < len(linhas) else ""
-           
-            # Caso não encontre "TOTAL AMOUNT(U.S DOLLAR)", procurar "Total Net in Doc. Currency"
-            for i, linha in enumerate(linhas):
-                if "TOTAL NET IN DOC. CURRENCY" in linha.upper():
-                    return linhas[i + 1].strip() if i + 1 < len(linhas) else ""
-
-        if provedor == "SGE":
-            for i, linha in enumerate(linhas):
-                if "TOTAL AMOUNT(U.S DOLLAR)" in linha.upper():
-                    return linhas[i + 1].strip() if i + 1 < len(linhas) else ""
-                       
-
-        if provedor == "SNOWKY":
-            for i, linha in enumerate(linhas):
-                if "QUANTITIES & DESCRIPTIONS" in linha.upper():
-                    for offset in range(1, 11):
-                        idx = i - offset
-                        if idx >= 0:
-                            linha_acima = linhas[idx].strip()
-                            if "US$" in linha_acima.upper():
-                                return linha_acima
-                    return ""
-
-        if provedor == "5BE":
-            for i, linha in enumerate(linhas):
-                if "SHIPPING MARKS:" in linha.upper():
-                    return linhas[i - 1].strip() if i - 1 < len(linhas) else ""
-
-            for i, linha in enumerate(linhas):
-                if "HOMA APPLIANCES CO" in linha.upper():
-                    return linhas[i - 2].strip() if i - 2 >= 0 else ""
-    
-        if provedor == "5JU":
-            for i, linha in enumerate(linhas):
-                if "REMARKS:" in linha.upper():
-                    return linhas[i - 1].strip() if i > 0 else ""
-            
-            # Se não encontrar "REMARKS:", procurar "CREDIT NOTE"
-            for i, linha in enumerate(linhas):
-                if "CREDIT NOTE" in linha.upper():
-                    return linhas[i - 4].strip() if i >= 4 else ""
-
-        if provedor == "5DL":
-            for i, linha in enumerate(linhas):
-                if "COMMERCIAL INVOICE" in linha.upper():
-                    return linhas[i - 2].strip() if i - 2 < len(linhas) else ""
-
-        if provedor == "5DU":
-            for i, linha in enumerate(linhas):
-                if "TOTAL:" in linha.upper():
-                    return linhas[i - 2].strip() if i - 2 < len(linhas) else ""
-
-        if provedor == "5WY":
-            for i, linha in enumerate(linhas):
-                if "TOTAL" in linha.upper():
-                    return linhas[i + 2].strip() if i + 2 < len(linhas) else ""
-
-        if provedor == "7DQ":
-            for i, linha in enumerate(linhas):
-                if "PAYMENT CONDITIONS :" in linha.upper():
-                    return linhas[i - 2].strip() if i - 2 < len(linhas) else ""
-
-        if provedor == "7JR":
-            for i, linha in enumerate(linhas):
-                if "TOTAL AMOUNT:" in linha.upper():
-                    return linhas[i + 2].strip() if i + 2 < len(linhas) else ""
-            for i, linha in enumerate(linhas):
-                if "REMARK:" in linha.upper() and i > 0:
-                    return linhas[i - 1].strip()
-
-
-        if provedor == "BRR":
-            for i, linha in enumerate(linhas):
-                if "COSTOS INTERNOS" in linha.upper():
-                    valor = linhas[i + 4].strip() if i + 4 < len(linhas) else ""
-                    if valor:
-                        return valor
-            for i, linha in enumerate(linhas):
-                if "TOTAL IN FAVOUR" in linha.upper():
-                    valor = linhas[i + 2].strip() if i + 2 < len(linhas) else ""
-                    if valor:
-                        return valor
-            for i, linha in enumerate(linhas):
-                if "TOTAL FOB" in linha.upper():
-                    return linhas[i + 1].strip() if i + 1 < len(linhas) else ""
-
-        if provedor == "CLH":
-            for i, linha in enumerate(linhas):
-                if "TOTAL FOB" in linha.upper():
-                    return linhas[i + 1].strip() if i + 1 < len(linhas) else ""
-
-        if provedor == "NINGBO HUA":
-            for i, linha in enumerate(linhas):
-                if "PAYMENT TERM" in linha.upper():
-                    return linhas[i - 1].strip() if i > 0 else ""
-            
-            for i, linha in enumerate(linhas):
-                if "AMOUNT IN WORDS" in linha.upper():
-                    if i >= 2:
-                        return linhas[i - 2].strip()
-                    elif i >= 1:
-                        return linhas[i - 1].strip()
-
-        elif provedor == "US1239":
-            for linha in linhas:
-                linha_upper = linha.upper()
-                if "GRAND TOTAL USA $" in linha_upper or "TOTALS" in linha_upper or "TOTAL VALUE" in linha_upper:
-                    numeros = re.findall(r"\d[\d.,]*", linha)
-                    if numeros:
-                        return numeros[-1]  # Pega o último número da linha
-
-                # Outras regras podem ser adicionadas aqui futuramente
-        return ""
-            
-    df["Amount"] = df.apply(extrair_amount, axis=1)
+    return _aplicar_regras(df, ("Amount",))
+
+@instrumentar
+def ajustar_factura(df):
+    def limpar(texto):
+        if not isinstance(texto, str):
+            return texto
+        texto = texto.upper()
+        texto = RE_PREFIXO_FACTURA.sub('', texto)  # Remove prefixos
+        texto = texto.replace(":", "")
+        texto = texto.replace("：", "")
+        texto = texto.replace(".", "")
+        texto = texto.replace(",", "")
+        texto = texto.replace(" ", "")
+        return texto.strip()
+
+    df['Factura'] = df['Factura'].apply(limpar)
     return df
 
-def ajustar_amount(df):
-    import re
+@instrumentar
+def ajustar_coluna_fecha(df):
 
+    def converter_data(data_str):
+        if pd.isna(data_str) or len(data_str) != 6:
+            return data_str
+        try:
+            dia = data_str[:2]
+            mes = data_str[2:4]
+            ano = data_str[4:]
+            ano_completo = '20' + ano if int(ano) < 50 else '19' + ano
+            return f"{dia}/{mes}/{ano_completo}"
+        except Exception:
+            return data_str
+
+    df['Fecha de Emisión'] = df['Fecha de Emisión'].apply(converter_data)
+    return df
+
+@instrumentar
+def ajustar_amount(df):
     def limpar_amount(valor):
         if not isinstance(valor, str):
             valor = str(valor)
         # Remove letras, símbolo de dólar, hífens
-        valor = re.sub(r'[A-Za-z$-]', '', valor).strip()
+        valor = RE_LETRAS_MOEDA.sub('', valor).strip()
 
         # Regras de separadores
         if "," in valor and "." in valor:
@@ -1034,6 +954,7 @@ def ajustar_amount(df):
     df["Amount"] = df["Amount"].apply(limpar_amount)
     return df
 
+@instrumentar
 def adicionar_erro(df):
     def verificar_erro(Proveedor):
         return "Document can't be read" if not Proveedor.strip() else ""
@@ -1041,6 +962,7 @@ def adicionar_erro(df):
     df["Error"] = df["Proveedor"].apply(verificar_erro)
     return df
 
+@instrumentar
 def adicionar_colunas_fixas(df):
 
     df['Moneda'] = 'USD'
@@ -1085,6 +1007,7 @@ def _tipo_doc_padrao(valor: str) -> str:
         return "CREDIT NOTE"
     return ""
 
+@instrumentar
 def adicionar_cod_autorizacion_ext(df: pd.DataFrame) -> pd.DataFrame:
     """
     Preenche Cód. de Autorización conforme Tipo Doc, apenas onde está vazio.
@@ -1109,6 +1032,7 @@ def adicionar_cod_autorizacion_ext(df: pd.DataFrame) -> pd.DataFrame:
     df.loc[mask_vazio & (tipo_std == "CREDIT NOTE"), "Cód. de Autorización"] = "97"
     return df
 
+@instrumentar
 def adicionar_tip_fac_ext(df: pd.DataFrame) -> pd.DataFrame:
     """
     Preenche Tipo de Factura conforme Tipo Doc, apenas onde está vazio.
@@ -1132,6 +1056,7 @@ def adicionar_tip_fac_ext(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+@instrumentar
 def remover_duplicatas_source_file(df):
 
     if 'source_file' in df.columns:
@@ -1140,6 +1065,7 @@ def remover_duplicatas_source_file(df):
         print("⚠️ Coluna 'source_file' não encontrada no DataFrame.")
         return df
 
+@instrumentar
 def organizar_colunas_externos(df):
 
     colunas_desejadas = ['source_file','conteudo_pdf', 'Proveedor', 'Proveedor Iscala', 'Factura','Tipo Doc' ,'Cód. de Autorización','Tipo de Factura','Fecha de Emisión','Moneda', 
@@ -1151,6 +1077,7 @@ def organizar_colunas_externos(df):
     
     return df
 
+@instrumentar
 def op_gravada_negativo_CN_externos(df):
     if 'Tipo Doc' in df.columns and 'Amount' in df.columns:
         df['Amount'] = df.apply(
@@ -1182,8 +1109,6 @@ def merge_pec_fast(df_externos, df_sharepoint):
     # ============================
     # Função para normalizar nomes
     # ============================
-    import re
-
     def normalizar_nome(s):
         if s is None:
             return ""
@@ -1194,7 +1119,7 @@ def merge_pec_fast(df_externos, df_sharepoint):
         s = s.replace("\u00a0", " ")  # no-break space (NBSP)
 
         # Remover múltiplos espaços
-        s = re.sub(r"\s+", " ", s)
+        s = RE_ESPACOS.sub(" ", s)
 
         # Normalizar
         return s.strip().lower()
@@ -1203,18 +1128,8 @@ def merge_pec_fast(df_externos, df_sharepoint):
     df_ext["key_ext"] = df_ext["source_file"].apply(normalizar_nome)
     df_sp["key_sp"]  = df_sp["name"].apply(normalizar_nome)
 
-    # Merge cartesiano
-    df_ext["_tmp"] = 1
-    df_sp["_tmp"] = 1
-    df_all = df_ext.merge(df_sp, on="_tmp")
-
-    # Comparação linha a linha
-    def match(row):
-        ext = row["key_ext"]
-        sp  = row["key_sp"]
-        return ext in sp or sp in ext
-
-    df_all = df_all[df_all.apply(match, axis=1)]
+    # Pares que casam por substring (ext in sp ou sp in ext), via índice
+    df_all = merge_por_substring(df_ext, df_sp, "key_ext", "key_sp")
 
     # ===============================
     # Seleciona TODAS as colunas extras
@@ -1246,6 +1161,7 @@ def merge_pec_fast(df_externos, df_sharepoint):
 
 
 
+@instrumentar
 def adicionar_pec_sharepoint(df_externos, df_sharepoint):
     if df_sharepoint is None or df_sharepoint.empty:
         return df_externos
@@ -0,0 +1,198 @@
+import os
+from typing import Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from services import regex_utils
+from services.cache_service import mapear_com_cache, versao_de_arquivos
+from services.regex_utils import (
+    RE_DECIMAL,
+    RE_GL_CTA_CABECALHO,
+    RE_GL_FECHA,
+    RE_GL_IGNORAR,
+    RE_GL_VALOR,
+    RE_NAO_DIGITO,
+)
+
+# ==========================================================
+# GL0061 (modo "Cuenta" do Archivo de Gastos)
+# ==========================================================
+# Vários arquivos de conta são lidos num pool de processos (fora do script
+# do Streamlit) e o DataFrame de cada um fica no cache em disco pelo hash
+# dos bytes: reenviar o conjunto com uma conta a mais custa um parse só.
+# A versão do cache vem do código do parser (este módulo + regex_utils).
+
+NOME_CACHE_GL = "gl0061_linhas"
+VERSAO_PARSER_GL = versao_de_arquivos(os.path.abspath(__file__), regex_utils.__file__)
+
+
+# ----------------------------------------------------------
+# Parser (colunas fixas)
+# ----------------------------------------------------------
+
+def _gl_numeros(valores: pd.Series) -> pd.Series:
+    """"9,200.29-" -> -9200.29 (sinal no final); o que não for número vira 0.0."""
+    valores = valores.str.strip()
+    negativo = valores.str.endswith("-")
+    valores = valores.str.removesuffix("-").str.replace(",", "", regex=False)
+    num = pd.to_numeric(valores, errors="coerce").fillna(0.0).astype(float)
+    return num.where(~negativo, -num)
+
+
+def _gl_datas(valores: pd.Series) -> pd.Series:
+    """
+    dd/mm/aa -> date. O formato fixo converte tudo de uma vez; só o que não
+    casar com ele passa pela inferência (dayfirst) de antes, bem mais lenta.
+    """
+    datas = pd.to_datetime(valores, format="%d/%m/%y", errors="coerce")
+    falhas = datas.isna() & valores.notna()
+    if falhas.any():
+        datas[falhas] = pd.to_datetime(valores[falhas], errors="coerce", dayfirst=True)
+    return datas.dt.date
+
+
+def parse_cuenta_gl(texto: str) -> pd.DataFrame:
+    """
+    Parser para arquivos GL0061 (colunas fixas em linha), com:
+    CTA | CC | PROD | CNT | TDW | Fecha | Transacción | Debe | Haber | Saldo Real | Saldo | Texto
+
+    Ajustes:
+    - Debe/Haber aceitam número com negativo no final (ex.: "9,200.29-") e preservam o sinal.
+    - Colunar: filtro, fatias fixas e números rodam sobre a Series de linhas inteira
+      (dumps de fechamento têm centenas de milhares de linhas).
+    """
+    linhas = texto.splitlines()
+
+    cta_header = None
+    reg_header = RE_GL_CTA_CABECALHO
+    for ln in linhas[:50]:
+        m = reg_header.search(ln)
+        if m:
+            cta_header = m.group(1)
+            break
+    if not cta_header:
+        raise ValueError("CTA não encontrada no cabeçalho do arquivo GL0061.")
+
+    cols = [
+        "CTA", "CC", "PROD", "CNT", "TDW",
+        "Fecha", "Transacción",
+        "Debe", "Haber",
+        "Saldo Real", "Saldo",
+        "Texto"
+    ]
+
+    # Linhas de movimento: sem cabeçalho/rodapé e com data (linha em branco não tem data).
+    # O padrão vai como texto para o filtro rodar no motor nativo da coluna (pyarrow)
+    s = pd.Series(linhas, dtype="str")
+    s = s[~s.str.contains(RE_GL_IGNORAR.pattern) & s.str.contains(RE_GL_FECHA.pattern)]
+
+    # Os 3 últimos números da linha = Debe, Haber, Saldo (linhas com menos ficam de fora)
+    achados = s.str.findall(RE_GL_VALOR)
+    com_tres = achados.str.len() >= 3
+    s, achados = s[com_tres], achados[com_tres]
+    if s.empty:
+        df = pd.DataFrame([], columns=cols)
+    else:
+        tres = pd.DataFrame(achados.str[-3:].tolist(), index=s.index, dtype="str")
+        debe = _gl_numeros(tres[0])
+        haber = _gl_numeros(tres[1])
+
+        cc = s.str.slice(0, 5).str.strip()
+        # Texto = o que vem depois da última ocorrência do Saldo impresso
+        texto_col = [
+            ln[ln.rfind(n) + len(n):].strip() for ln, n in zip(s.tolist(), tres[2].tolist())
+        ]
+        df = pd.DataFrame({
+            "CTA": cta_header,
+            "CC": cc.where(cc.str.isdigit(), ""),
+            "PROD": s.str.slice(5, 13).str.strip(),
+            "CNT": s.str.slice(13, 23).str.strip(),
+            "TDW": s.str.slice(23, 31).str.strip(),
+            "Fecha": s.str.slice(31, 40).str.strip(),
+            "Transacción": s.str.slice(40, 50).str.strip(),
+            "Debe": debe,
+            "Haber": haber,
+            # round() do Python (arredondamento exato), como no parser linha a linha
+            "Saldo Real": [round(v, 2) for v in (debe - haber).tolist()],
+            "Saldo": _gl_numeros(tres[2]),
+            "Texto": pd.Series(texto_col, index=s.index, dtype="str"),
+        }, columns=cols).reset_index(drop=True)
+
+    df["Fecha"] = _gl_datas(df["Fecha"])
+    return df
+
+
+# ----------------------------------------------------------
+# Chave (CTA|dd/mm/aaaa|Transacción com 9 dígitos|Saldo Real com 2 casas)
+# ----------------------------------------------------------
+
+def _transacao_9_digitos(valores: pd.Series, width: int = 9) -> pd.Series:
+    """Coluna inteira de _fmt_transno_keep_zeros (texto): "18528" -> "000018528"."""
+    s = valores.astype("str").fillna("").str.strip()
+    s_norm = s.str.replace(",", ".", regex=False)
+    decimal = s_norm.str.fullmatch(RE_DECIMAL.pattern)
+    # Padrão compilado: \D com a semântica do `re` (Unicode), como antes
+    digitos = s.str.replace(RE_NAO_DIGITO, "", regex=True)
+    if decimal.any():
+        inteiros = pd.to_numeric(s_norm[decimal]).astype("int64").astype("str")
+        digitos = digitos.mask(decimal, inteiros)
+    return digitos.str.zfill(width).where(digitos != "", "")
+
+
+def montar_chave_gl(df: pd.DataFrame) -> pd.Series:
+    """Mesma Chave das .apply por célula de antes, montada por coluna."""
+    vazio = pd.Series("", index=df.index, dtype="str")
+
+    cta = df["CTA"].astype("str").fillna("").str.strip() if "CTA" in df.columns else vazio
+    if "Fecha" in df.columns:
+        fecha = pd.to_datetime(df["Fecha"], errors="coerce").dt.strftime("%d/%m/%Y").fillna("")
+    else:
+        fecha = vazio
+    tran = _transacao_9_digitos(df["Transacción"]) if "Transacción" in df.columns else vazio
+    # f"{:.2f}" do Python (mesmo arredondamento e "-0.00" de antes)
+    sreal = df["Saldo Real"].map("{:.2f}".format).astype("str") if "Saldo Real" in df.columns else vazio
+
+    return cta + "|" + fecha + "|" + tran + "|" + sreal
+
+
+# ----------------------------------------------------------
+# Vários arquivos: pool de processos + cache por conteúdo
+# ----------------------------------------------------------
+
+def decodificar_texto(raw: bytes) -> str:
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return raw.decode("latin-1")
+
+
+def _parsear_bytes_gl(raw: bytes) -> Tuple[Optional[pd.DataFrame], Optional[Exception]]:
+    """Roda no worker: (df, None) ou (None, erro) — o erro volta para a página mostrar."""
+    try:
+        return parse_cuenta_gl(decodificar_texto(raw)), None
+    except Exception as e:
+        return None, e
+
+
+def _gl_cacheavel(resultado) -> bool:
+    return resultado[1] is None
+
+
+def ler_arquivos_gl(
+    uploaded_files: List,
+    max_workers: Optional[int] = None,
+) -> Iterator[Tuple[str, Optional[pd.DataFrame], Optional[Exception]]]:
+    """
+    (nome, df, erro) por arquivo, na ordem do upload. Arquivos já vistos (mesmos
+    bytes) saem do cache; só os novos são parseados, em paralelo.
+    """
+    resultados = mapear_com_cache(
+        _parsear_bytes_gl,
+        uploaded_files,
+        NOME_CACHE_GL,
+        VERSAO_PARSER_GL,
+        cacheavel=_gl_cacheavel,
+        max_workers=max_workers,
+    )
+    for f, (df, erro) in zip(uploaded_files, resultados):
+        yield getattr(f, "name", ""), df, erro
@@ -0,0 +1,295 @@
+import json
+import os
+import pickle
+import re
+import shutil
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from services.perfil_service import perfil_execucao
+
+# ==========================================================
+# Fila de processamento em segundo plano (jobs em disco)
+# ==========================================================
+# O botão "Executar" só grava os PDFs enviados numa pasta do job e devolve o
+# id; o pipeline roda num pool de threads do processo do Streamlit, fora do
+# script da página. Rerun, troca de aba ou refresh do navegador não matam o
+# trabalho: a página só relê o job.json (progresso) e, no fim, o resultado.
+#
+#   <COMEX_JOBS_DIR>/<job_id>/job.json        estado, progresso, mensagens
+#                            /entrada/00000.pdf PDFs enviados (nomes no job.json)
+#                            /contexto.pkl     Tasa / SharePoint do momento do envio
+#                            /resultado.pkl    {"df": ..., "perfil": ...}
+#
+# Se o servidor reiniciar no meio, o job fica "interrompido" e pode ser
+# retomado: os PDFs já decodificados saem do cache (services/cache_service.py).
+
+JOBS_DIR = os.environ.get("COMEX_JOBS_DIR") or os.path.join(
+    os.path.expanduser("~"), ".cache", "comex_jobs"
+)
+JOBS_WORKERS = max(1, int(os.environ.get("COMEX_JOBS_WORKERS", "2")))
+JOBS_DIAS = int(os.environ.get("COMEX_JOBS_DIAS", "3"))  # jobs mais velhos são apagados
+
+NA_FILA = "na fila"
+EXECUTANDO = "executando"
+CONCLUIDO = "concluido"
+ERRO = "erro"
+INTERROMPIDO = "interrompido"
+ATIVOS = (NA_FILA, EXECUTANDO)
+
+_INTERVALO_GRAVACAO = 0.5  # s entre gravações de progresso no job.json
+
+# Formato dos ids gerados em submeter(); o id também chega pela URL (?job=),
+# então nada fora disso vira caminho em disco
+_ID_JOB = re.compile(r"\d{8}-\d{6}-[0-9a-f]{8}")
+
+_PROCESSO = uuid.uuid4().hex  # identifica este processo: jobs "ativos" de outro morreram junto com ele
+_executor = ThreadPoolExecutor(max_workers=JOBS_WORKERS, thread_name_prefix="comex_job")
+_lock = threading.Lock()
+
+
+# ----------------------------------------------------------
+# Pipelines por ação (mesmas chaves de ACTIONS na página)
+# ----------------------------------------------------------
+
+def _pipeline(acao: str, arquivos, progresso, contexto: dict) -> Optional[pd.DataFrame]:
+    cambio_df = contexto.get("cambio_df")
+    # Fora do script do Streamlit não há session_state: o SharePoint vai por parâmetro
+    sharepoint_df = contexto.get("sharepoint_df")
+    if sharepoint_df is None:
+        sharepoint_df = pd.DataFrame()
+
+    if acao == "externos":
+        from services.externos_service import process_externos_streamlit
+        return process_externos_streamlit(
+            arquivos, progresso, progresso, cambio_df=cambio_df, sharepoint_df=sharepoint_df,
+        )
+    if acao == "gastos":
+        from services.adicionales_service import process_adicionales_streamlit
+        return process_adicionales_streamlit(
+            arquivos, progresso, progresso, cambio_df=cambio_df, sharepoint_df=sharepoint_df,
+        )
+    if acao == "duas":
+        from services.duas_service import process_duas_streamlit
+        return process_duas_streamlit(arquivos, progresso, progresso, cambio_df=cambio_df)
+    if acao == "percepciones":
+        from services.percepcion_service import process_percepcion_streamlit
+        return process_percepcion_streamlit(arquivos, progresso, progresso)
+    raise ValueError(f"Ação desconhecida: {acao}")
+
+
+class ArquivoDoJob:
+    """Imita o UploadedFile (.name / .getvalue()) lendo da pasta do job."""
+
+    def __init__(self, caminho: str, name: str):
+        self.caminho = caminho
+        self.name = name
+
+    def getvalue(self) -> bytes:
+        with open(self.caminho, "rb") as fh:
+            return fh.read()
+
+
+class _Progresso:
+    """Faz o papel de progress_widget e status_widget, gravando no job.json."""
+
+    def __init__(self, job: dict):
+        self.job = job
+        self._ultima = 0.0
+
+    def progress(self, pct, text=None) -> None:
+        self.job["pct"] = max(0, min(100, int(pct)))
+        if text:
+            self.job["mensagem"] = str(text)
+        self._gravar()
+
+    def write(self, msg) -> None:
+        self.job["mensagem"] = str(msg)
+        self._gravar()
+
+    success = info = warning = write
+
+    def _gravar(self) -> None:
+        agora = time.monotonic()
+        if agora - self._ultima >= _INTERVALO_GRAVACAO:
+            self._ultima = agora
+            _gravar_job(self.job)
+
+
+# ----------------------------------------------------------
+# job.json
+# ----------------------------------------------------------
+
+def id_valido(job_id) -> bool:
+    """Id no formato de submeter() e cuja pasta fica dentro de JOBS_DIR."""
+    if not isinstance(job_id, str) or not _ID_JOB.fullmatch(job_id):
+        return False
+    raiz = os.path.realpath(JOBS_DIR)
+    return os.path.dirname(os.path.realpath(os.path.join(raiz, job_id))) == raiz
+
+
+def _pasta(job_id: str) -> str:
+    if not id_valido(job_id):
+        raise ValueError(f"Id de job inválido: {job_id!r}")
+    return os.path.join(JOBS_DIR, job_id)
+
+
+def _gravar_job(job: dict) -> None:
+    job["atualizado"] = datetime.now().isoformat(timespec="seconds")
+    pasta = _pasta(job["id"])
+    fd, tmp = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as fh:
+        json.dump(job, fh, ensure_ascii=False)
+    os.replace(tmp, os.path.join(pasta, "job.json"))  # atômico: a página nunca lê pela metade
+
+
+def ler_job(job_id: str) -> Optional[dict]:
+    """Estado atual do job (None se não existir ou o id for inválido). Ativo de outro processo = interrompido."""
+    if not id_valido(job_id):
+        return None
+    try:
+        with open(os.path.join(_pasta(job_id), "job.json"), encoding="utf-8") as fh:
+            job = json.load(fh)
+    except (OSError, ValueError):
+        return None
+    if job["estado"] in ATIVOS and job.get("processo") != _PROCESSO:
+        job["estado"] = INTERROMPIDO
+    return job
+
+
+def listar_jobs(limite: int = 20) -> List[dict]:
+    """Jobs mais recentes primeiro."""
+    try:
+        ids = sorted(os.listdir(JOBS_DIR), reverse=True)
+    except OSError:
+        return []
+    jobs = []
+    for job_id in ids:
+        job = ler_job(job_id)
+        if job is not None:
+            jobs.append(job)
+            if len(jobs) >= limite:
+                break
+    return jobs
+
+
+def limpar_jobs_antigos(dias: int = JOBS_DIAS) -> None:
+    """Apaga as pastas de jobs terminados há mais de `dias` dias."""
+    limite = datetime.now() - timedelta(days=dias)
+    for job in listar_jobs(limite=10**6):
+        if job["estado"] in ATIVOS:
+            continue
+        try:
+            atualizado = datetime.fromisoformat(job.get("atualizado") or job["criado"])
+        except (KeyError, ValueError):
+            continue
+        if atualizado < limite:
+            shutil.rmtree(_pasta(job["id"]), ignore_errors=True)
+
+
+# ----------------------------------------------------------
+# Envio / execução
+# ----------------------------------------------------------
+
+def submeter(
+    acao: str,
+    uploaded_files: List,
+    cambio_df: Optional[pd.DataFrame] = None,
+    sharepoint_df: Optional[pd.DataFrame] = None,
+) -> str:
+    """Grava os PDFs e o contexto na pasta do job, enfileira e devolve o id."""
+    limpar_jobs_antigos()
+    job_id = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:8]}"
+    entrada = os.path.join(_pasta(job_id), "entrada")
+    os.makedirs(entrada)
+
+    nomes = []
+    for i, f in enumerate(uploaded_files):
+        with open(os.path.join(entrada, f"{i:05d}.pdf"), "wb") as fh:
+            fh.write(f.getvalue())
+        nomes.append(getattr(f, "name", f"arquivo_{i + 1}.pdf"))
+    with open(os.path.join(_pasta(job_id), "contexto.pkl"), "wb") as fh:
+        pickle.dump({"cambio_df": cambio_df, "sharepoint_df": sharepoint_df}, fh,
+                    protocol=pickle.HIGHEST_PROTOCOL)
+
+    job = {
+        "id": job_id,
+        "acao": acao,
+        "estado": NA_FILA,
+        "arquivos": nomes,
+        "total": len(nomes),
+        "pct": 0,
+        "mensagem": "",
+        "erro": None,
+        "linhas": None,
+        "criado": datetime.now().isoformat(timespec="seconds"),
+        "processo": _PROCESSO,
+    }
+    _gravar_job(job)
+    _executor.submit(_rodar, job_id)
+    return job_id
+
+
+def retomar(job_id: str) -> bool:
+    """Reenfileira um job interrompido ou com erro (os PDFs continuam na pasta dele)."""
+    with _lock:
+        job = ler_job(job_id)
+        if job is None or job["estado"] not in (INTERROMPIDO, ERRO):
+            return False
+        job.update(estado=NA_FILA, erro=None, processo=_PROCESSO, mensagem="Retomando...")
+        _gravar_job(job)
+    _executor.submit(_rodar, job_id)
+    return True
+
+
+def _rodar(job_id: str) -> None:
+    job = ler_job(job_id)
+    if job is None:
+        return
+    pasta = _pasta(job_id)
+    job.update(estado=EXECUTANDO, pct=0, mensagem=f"Iniciando ({job['total']} PDFs)...")
+    _gravar_job(job)
+    try:
+        with open(os.path.join(pasta, "contexto.pkl"), "rb") as fh:
+            contexto = pickle.load(fh)
+        arquivos = [
+            ArquivoDoJob(os.path.join(pasta, "entrada", f"{i:05d}.pdf"), nome)
+            for i, nome in enumerate(job["arquivos"])
+        ]
+        with perfil_execucao(job["acao"]) as perfil:
+            df = _pipeline(job["acao"], arquivos, _Progresso(job), contexto)
+
+        fd, tmp = tempfile.mkstemp(dir=pasta, suffix=".tmp")
+        with os.fdopen(fd, "wb") as fh:
+            pickle.dump({"df": df, "perfil": perfil}, fh, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, os.path.join(pasta, "resultado.pkl"))
+        job.update(estado=CONCLUIDO, pct=100, linhas=0 if df is None else int(len(df)))
+    except Exception as e:
+        job.update(estado=ERRO, erro=f"{type(e).__name__}: {e}", traceback=traceback.format_exc()[-4000:])
+    _gravar_job(job)
+
+
+def resultado_job(job_id: str) -> Optional[Dict]:
+    """{"df": DataFrame ou None, "perfil": Perfil} de um job concluído (None se não houver)."""
+    if not id_valido(job_id):
+        return None
+    try:
+        with open(os.path.join(_pasta(job_id), "resultado.pkl"), "rb") as fh:
+            return pickle.load(fh)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def descartar(job_id: str) -> None:
+    """Apaga a pasta de um job que não está rodando."""
+    job = ler_job(job_id)
+    if job is not None and job["estado"] not in ATIVOS:
+        shutil.rmtree(_pasta(job_id), ignore_errors=True)
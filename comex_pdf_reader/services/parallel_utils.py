@@ -0,0 +1,104 @@
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterable, Iterator, Optional
+
+# ==========================================================
+# Pool de processos para etapas CPU-bound (ex.: decodificar PDFs)
+# ==========================================================
+# Configurável por variável de ambiente para não precisar mexer no código
+# em máquinas com poucos núcleos ou pouca memória.
+MAX_WORKERS_PADRAO = int(os.environ.get("COMEX_PDF_WORKERS", "0")) or (os.cpu_count() or 1)
+MAX_BYTES_EM_VOO_PADRAO = int(os.environ.get("COMEX_PDF_MAX_MB_EM_VOO", "256")) * 1024 * 1024
+
+# "spawn" (não "fork"): o processo do Streamlit tem várias threads (scripts,
+# jobs) e um fork copiaria locks presos por elas. Os workers começam limpos e
+# importam `fn` pelo módulo, por isso ela tem de ser uma função de módulo.
+_CONTEXTO_MP = multiprocessing.get_context("spawn")
+
+
+def resolver_workers(max_workers: Optional[int] = None) -> int:
+    if max_workers is None:
+        max_workers = MAX_WORKERS_PADRAO
+    return max(1, int(max_workers))
+
+
+def mapear_em_ordem(
+    fn: Callable,
+    payloads: Iterable,
+    max_workers: Optional[int] = None,
+    max_bytes_em_voo: Optional[int] = None,
+    peso: Callable = len,
+) -> Iterator:
+    """
+    Aplica `fn` a cada payload em um pool de processos e devolve os
+    resultados na MESMA ordem de entrada, à medida que ficam prontos.
+
+    - `payloads` pode ser um gerador (ex.: bytes lidos sob demanda);
+      só é consumido enquanto o total em voo ficar abaixo de `max_bytes_em_voo`.
+    - `fn` precisa ser uma função de módulo (picklable).
+    - Com 1 worker, ou se o pool não puder ser criado, roda no próprio processo.
+    """
+    workers = resolver_workers(max_workers)
+    limite = max_bytes_em_voo or MAX_BYTES_EM_VOO_PADRAO
+    it = iter(payloads)
+
+    if workers <= 1:
+        for p in it:
+            yield fn(p)
+        return
+
+    try:
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=_CONTEXTO_MP)
+    except (OSError, NotImplementedError, PermissionError):
+        for p in it:
+            yield fn(p)
+        return
+
+    pendentes = deque()  # (future, payload, peso)
+    em_voo = 0
+    esgotado = False
+    quebrado = False
+
+    try:
+        while True:
+            # Enche a fila respeitando o limite de bytes (sempre ao menos 1 tarefa)
+            while not esgotado and not quebrado and (
+                not pendentes or (em_voo < limite and len(pendentes) < workers * 4)
+            ):
+                try:
+                    p = next(it)
+                except StopIteration:
+                    esgotado = True
+                    break
+                w = peso(p)
+                try:
+                    fut = executor.submit(fn, p)
+                except BrokenProcessPool:
+                    quebrado = True
+                    fut = None
+                pendentes.append((fut, p, w))
+                em_voo += w
+
+            if not pendentes:
+                if quebrado and not esgotado:
+                    # Pool caiu: termina o restante no próprio processo
+                    for p in it:
+                        yield fn(p)
+                break
+
+            fut, p, w = pendentes.popleft()
+            em_voo -= w
+            if fut is None:
+                yield fn(p)
+                continue
+            try:
+                resultado = fut.result()
+            except BrokenProcessPool:
+                quebrado = True
+                resultado = fn(p)
+            yield resultado
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
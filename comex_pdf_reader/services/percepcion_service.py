@@ -1,12 +1,29 @@
 # services/percepcion_service.py
 from io import BytesIO
 from typing import List, Optional
-import re
 from datetime import datetime
 import unicodedata
 import fitz  # PyMuPDF
 import pandas as pd
 
+from services.cache_service import obter_com_cache
+from services.perfil_service import etapa, instrumentar
+from services.regex_utils import (
+    RE_APOS_DOIS_PONTOS,
+    RE_CDA,
+    RE_DIGITO,
+    RE_ESPACOS,
+    RE_HIFEN_ESPACADO,
+    RE_OITO_DIGITOS,
+    RE_PERC_CDA_CURTO,
+    RE_PERC_DE_FECHA,
+    RE_SUFIXOS_LIQUIDACION,
+)
+
+# Suba a versão se mudar o que _extract_first_page_lines_to_df devolve (invalida o cache)
+VERSAO_EXTRATOR_LINHAS = 1
+NOME_CACHE_LINHAS = "percepcion_linhas"
+
 def _extract_first_page_lines_to_df(pdf_bytes: bytes) -> pd.DataFrame:
     try:
         doc = fitz.open(stream=BytesIO(pdf_bytes), filetype="pdf")
@@ -28,6 +45,10 @@ def _extract_first_page_lines_to_df(pdf_bytes: bytes) -> pd.DataFrame:
     except Exception:
         return pd.DataFrame()
 
+def _linhas_cacheaveis(df: pd.DataFrame) -> bool:
+    return not df.empty
+
+@instrumentar
 def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
     # ---------------------------
     # Helpers de normalização
@@ -37,7 +58,7 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
             return ""
         s = str(s)
         s = s.replace("\u200b", "").replace("\u00a0", " ")
-        s = re.sub(r"\s+", " ", s)
+        s = RE_ESPACOS.sub(" ", s)
         return s.strip()
 
     def _upper_no_accents(s: str) -> str:
@@ -57,7 +78,7 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
         s = _clean_invisibles(s)
         if not s:
             return False
-        return bool(re.search(r"\d", s)) and len(s) >= 8
+        return bool(RE_DIGITO.search(s)) and len(s) >= 8
 
     def extrair_valor(row, next_row=None):
         texto_raw = row.get("Text", "")
@@ -76,7 +97,7 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
                     return cand
 
         # 2) Procura após ':' na mesma linha
-        m = re.search(r":\s*(.+)$", _clean_invisibles(texto_raw))
+        m = RE_APOS_DOIS_PONTOS.search(_clean_invisibles(texto_raw))
         if m:
             after_colon = _clean_invisibles(m.group(1))
             if _looks_like_liq_value(after_colon):
@@ -104,13 +125,13 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
         s = _clean_invisibles(s)
         if not s:
             return False
-        return bool(re.search(r"\d", s)) and len(s) >= 5
+        return bool(RE_DIGITO.search(s)) and len(s) >= 5
 
     def extrair_valor_cda(row, next_row=None):
         texto_raw = row.get("Text", "")
         texto = _upper_no_accents(texto_raw)
 
-        has_cda = bool(re.search(r"\bC\.?\s*D\.?\s*A\.?\b", texto))
+        has_cda = bool(RE_CDA.search(texto))
         if not has_cda:
             return ""
 
@@ -120,25 +141,25 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
                 cand = _clean_invisibles(row.get(k, ""))
                 if _looks_like_cda_value(cand):
                     out = cand.replace(" ", "")
-                    out = re.sub(r"\s*-\s*", "-", out)
+                    out = RE_HIFEN_ESPACADO.sub("-", out)
                     return out
 
         # 2) após ':' na mesma linha
-        m = re.search(r":\s*(.+)$", _clean_invisibles(texto_raw))
+        m = RE_APOS_DOIS_PONTOS.search(_clean_invisibles(texto_raw))
         if m:
             after_colon = _clean_invisibles(m.group(1))
             if _looks_like_cda_value(after_colon):
                 out = after_colon.replace(" ", "")
-                out = re.sub(r"\s*-\s*", "-", out)
+                out = RE_HIFEN_ESPACADO.sub("-", out)
                 return out
 
         # 3) próxima linha
         if next_row is not None:
             nxt_text_raw = next_row.get("Text", "")
             nxt_text = _clean_invisibles(nxt_text_raw)
-            if _looks_like_cda_value(nxt_text) and not re.search(r"\bC\.?\s*D\.?\s*A\.?\b", _upper_no_accents(nxt_text)):
+            if _looks_like_cda_value(nxt_text) and not RE_CDA.search(_upper_no_accents(nxt_text)):
                 out = nxt_text.replace(" ", "")
-                out = re.sub(r"\s*-\s*", "-", out)
+                out = RE_HIFEN_ESPACADO.sub("-", out)
                 return out
 
             for k in ("Col_1", "Col_2", "Col_3"):
@@ -146,7 +167,7 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
                     cand = _clean_invisibles(next_row.get(k, ""))
                     if _looks_like_cda_value(cand):
                         out = cand.replace(" ", "")
-                        out = re.sub(r"\s*-\s*", "-", out)
+                        out = RE_HIFEN_ESPACADO.sub("-", out)
                         return out
 
         return ""
@@ -158,14 +179,14 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
         texto = _upper_no_accents(row.get("Text", ""))
         col1 = _clean_invisibles(row.get("Col_1", ""))
 
-        m = re.search(r"DE FECHA\s*:\s*([\d]{2}[/-][\d]{2}[/-][\d]{4})", texto)
+        m = RE_PERC_DE_FECHA.search(texto)
         if m:
             try:
                 return datetime.strptime(m.group(1), "%d/%m/%Y").strftime("%d/%m/%y")
             except ValueError:
                 return datetime.strptime(m.group(1), "%d-%m-%Y").strftime("%d/%m/%y")
 
-        m2 = re.search(r"\b(\d{8})\b", col1)
+        m2 = RE_OITO_DIGITOS.search(col1)
         if m2:
             try:
                 return datetime.strptime(m2.group(1), "%Y%m%d").strftime("%d/%m/%y")
@@ -213,19 +234,19 @@ def _add_columns(df: pd.DataFrame) -> pd.DataFrame:
 
     # Ajuste do CDA (comente se quiser manter o valor completo)
     def ajustar_cda(v):
-        m = re.search(r"\b(\d{2,3})\D+.*?(\d{6,})\b", str(v))
+        m = RE_PERC_CDA_CURTO.search(str(v))
         return f"{m.group(1)}-{m.group(2)}" if m else v
     df["CDA"] = df["CDA"].apply(ajustar_cda)
 
     # Remover sufixos indesejados do No_Liquidacion
-    padroes_remover = ["-25", "-26", "-24", "-23", "-27"]
-    regex = re.compile(r"(" + "|".join(map(re.escape, padroes_remover)) + r")\b")
+    # (SUFIXOS_LIQUIDACION em services/regex_utils.py)
     df["No_Liquidacion"] = df["No_Liquidacion"].apply(
-        lambda x: regex.sub("", str(x)) if pd.notna(x) else x
+        lambda x: RE_SUFIXOS_LIQUIDACION.sub("", str(x)) if pd.notna(x) else x
     )
 
     return df
 
+@instrumentar
 def _consolidar_por_arquivo(df_lines: pd.DataFrame) -> pd.DataFrame:
     dados = []
     for src in df_lines["Source_File"].unique():
@@ -257,16 +278,22 @@ def process_percepcion_streamlit(
 
     dfs = []
     total = len(uploaded_files)
-    for i, f in enumerate(uploaded_files, start=1):
-        fname = getattr(f, "name", f"arquivo_{i}.pdf")
-        lines_df = _extract_first_page_lines_to_df(f.getvalue())
-        if not lines_df.empty:
-            lines_df.insert(0, "Source_File", fname)
-            dfs.append(lines_df)
-        if progress_widget:
-            progress_widget.progress(int(i / total * 100), text=f"Lendo {fname} ({i}/{total})")
-        if status_widget:
-            status_widget.write(f"📄 Primeira página lida: **{fname}**")
+    with etapa("leitura dos PDFs", uploaded_files) as registro:
+        for i, f in enumerate(uploaded_files, start=1):
+            fname = getattr(f, "name", f"arquivo_{i}.pdf")
+            lines_df = obter_com_cache(
+                _extract_first_page_lines_to_df, f.getvalue(),
+                NOME_CACHE_LINHAS, VERSAO_EXTRATOR_LINHAS,
+                cacheavel=_linhas_cacheaveis,
+            )
+            if not lines_df.empty:
+                lines_df.insert(0, "Source_File", fname)
+                dfs.append(lines_df)
+            if progress_widget:
+                progress_widget.progress(int(i / total * 100), text=f"Lendo {fname} ({i}/{total})")
+            if status_widget:
+                status_widget.write(f"📄 Primeira página lida: **{fname}**")
+        registro.saida(dfs)
 
     if not dfs:
         return None
@@ -0,0 +1,196 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from functools import wraps
+from typing import List, Optional
+
+import pandas as pd
+
+try:
+    import psutil as _psutil
+except ImportError:  # opcional: no Linux o RSS vem de /proc
+    _psutil = None
+
+# ==========================================================
+# Perfil por etapa dos pipelines (tempo, linhas, memória)
+# ==========================================================
+# perfil_execucao(fluxo) liga a coleta para o que rodar dentro do `with`
+# (ContextVar: cada sessão/thread do Streamlit tem o seu). Fora dele,
+# @instrumentar e etapa() não medem nada e custam só uma leitura da variável.
+#
+#   @instrumentar                    -> função df -> df vira uma etapa
+#   with etapa("nome", df) as e:     -> bloco solto; e.saida(df) no fim
+#
+# Etapas dentro de etapas ficam com nivel + 1; o total usa só o nível 0.
+# Com COMEX_PERFIL_LOG=<arquivo.jsonl>, cada execução acrescenta uma linha JSON.
+
+PERFIL_LOG = os.environ.get("COMEX_PERFIL_LOG") or None
+
+_perfil_ativo: ContextVar[Optional["Perfil"]] = ContextVar("perfil_ativo", default=None)
+_PAGINA = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def rss_atual() -> Optional[int]:
+    """RSS do processo agora, em bytes (None se não houver como medir)."""
+    try:
+        with open("/proc/self/statm") as fh:
+            return int(fh.read().split()[1]) * _PAGINA
+    except (OSError, ValueError, IndexError):
+        pass
+    if _psutil is not None:
+        return _psutil.Process().memory_info().rss
+    return None
+
+
+def _linhas(obj) -> Optional[int]:
+    if isinstance(obj, tuple):  # ex.: adicionar_pec_sharepoint -> (df, ...)
+        obj = obj[0] if obj else None
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+class Registro:
+    """Uma execução de uma etapa."""
+
+    __slots__ = ("nome", "nivel", "segundos", "linhas_entrada", "linhas_saida", "delta_mem")
+
+    def __init__(self, nome, nivel, linhas_entrada):
+        self.nome = nome
+        self.nivel = nivel
+        self.segundos = 0.0
+        self.linhas_entrada = linhas_entrada
+        self.linhas_saida = None
+        self.delta_mem = None
+
+    def saida(self, obj) -> None:
+        self.linhas_saida = _linhas(obj)
+
+
+class _SemRegistro:
+    """Usado quando não há perfil ativo."""
+
+    __slots__ = ()
+
+    def saida(self, obj) -> None:
+        pass
+
+
+_SEM_REGISTRO = _SemRegistro()
+
+
+class Perfil:
+    def __init__(self, fluxo: str):
+        self.fluxo = fluxo
+        self.inicio = datetime.now()
+        self.registros: List[Registro] = []
+        self.segundos_total = 0.0
+        self._nivel = 0
+
+    def resumo(self) -> pd.DataFrame:
+        """Uma linha por etapa (na ordem da 1ª execução), somando as repetições (ex.: lotes)."""
+        colunas = ["etapa", "nivel", "chamadas", "segundos", "% do total",
+                   "linhas entrada", "linhas saída", "Δ memória (MB)"]
+        if not self.registros:
+            return pd.DataFrame(columns=colunas)
+        df = pd.DataFrame({
+            "etapa": [r.nome for r in self.registros],
+            "nivel": [r.nivel for r in self.registros],
+            "segundos": [r.segundos for r in self.registros],
+            "linhas entrada": [r.linhas_entrada for r in self.registros],
+            "linhas saída": [r.linhas_saida for r in self.registros],
+            "Δ memória (MB)": [None if r.delta_mem is None else r.delta_mem / 2**20 for r in self.registros],
+        })
+        agrupado = df.groupby(["nivel", "etapa"], sort=False).agg(
+            chamadas=("segundos", "size"),
+            segundos=("segundos", "sum"),
+            **{
+                "linhas entrada": ("linhas entrada", lambda s: s.sum(min_count=1)),
+                "linhas saída": ("linhas saída", lambda s: s.sum(min_count=1)),
+                "Δ memória (MB)": ("Δ memória (MB)", lambda s: s.sum(min_count=1)),
+            },
+        ).reset_index()
+        for col in ("linhas entrada", "linhas saída"):
+            agrupado[col] = agrupado[col].astype("Int64")
+        total = self.segundos_total or agrupado.loc[agrupado["nivel"] == 0, "segundos"].sum()
+        agrupado["% do total"] = (100 * agrupado["segundos"] / total).round(1) if total else None
+        agrupado["segundos"] = agrupado["segundos"].round(4)
+        agrupado["Δ memória (MB)"] = agrupado["Δ memória (MB)"].round(1)
+        return agrupado[colunas]
+
+    def como_dict(self) -> dict:
+        resumo = self.resumo().astype(object)
+        return {
+            "fluxo": self.fluxo,
+            "inicio": self.inicio.isoformat(timespec="seconds"),
+            "segundos_total": round(self.segundos_total, 4),
+            "etapas": resumo.where(resumo.notna(), None).to_dict("records"),
+        }
+
+
+def gravar_log(perfil: Perfil, caminho: str) -> None:
+    """Acrescenta o perfil como uma linha JSON em `caminho`."""
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(caminho, "a", encoding="utf-8") as fh:
+        fh.write(json.dumps(perfil.como_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+@contextmanager
+def perfil_execucao(fluxo: str, log: Optional[str] = PERFIL_LOG):
+    """Coleta as etapas do que rodar dentro do `with`; grava em `log` (JSONL) se informado."""
+    perfil = Perfil(fluxo)
+    token = _perfil_ativo.set(perfil)
+    inicio = time.perf_counter()
+    try:
+        yield perfil
+    finally:
+        perfil.segundos_total = time.perf_counter() - inicio
+        _perfil_ativo.reset(token)
+        if log:
+            try:
+                gravar_log(perfil, log)
+            except OSError as e:
+                print(f"⚠️ Não foi possível gravar o perfil em {log}: {e}")
+
+
+@contextmanager
+def etapa(nome: str, entrada=None):
+    """Mede o bloco como uma etapa; `entrada` (df/lista) dá as linhas de entrada."""
+    perfil = _perfil_ativo.get()
+    if perfil is None:
+        yield _SEM_REGISTRO
+        return
+    registro = Registro(nome, perfil._nivel, _linhas(entrada))
+    perfil.registros.append(registro)
+    perfil._nivel += 1
+    mem_antes = rss_atual()
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro.segundos = time.perf_counter() - inicio
+        if registro.linhas_saida is None:  # bloco que só acrescenta colunas
+            registro.linhas_saida = _linhas(entrada)
+        mem_depois = rss_atual()
+        if mem_antes is not None and mem_depois is not None:
+            registro.delta_mem = mem_depois - mem_antes
+        perfil._nivel -= 1
+
+
+def instrumentar(fn):
+    """Decorador: cada chamada de `fn(df, ...)` vira uma etapa com o nome da função."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if _perfil_ativo.get() is None:
+            return fn(*args, **kwargs)
+        with etapa(fn.__name__, args[0] if args else None) as registro:
+            resultado = fn(*args, **kwargs)
+            registro.saida(resultado)
+        return resultado
+    return wrapper
@@ -0,0 +1,151 @@
+import math
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from typing import Callable, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+# ==========================================================
+# PRN de largura fixa a partir das abas do Excel (Transformar .prn)
+# ==========================================================
+# A planilha é recortada UMA vez (fatias posicionais) e cada coluna é
+# formatada inteira: a formatação roda só uma vez por valor distinto da
+# coluna (factorize) e já devolve o texto cortado/preenchido na largura.
+# As regras são as mesmas da leitura célula a célula (get_cell) de antes:
+#   - 1ª aba: linhas 3, 7, 11, ... até 1499 do Excel, colunas C..Z, só onde C
+#     não está vazia;
+#   - 2ª aba: colunas B..N até a linha limite (primeiro #N/A / vazio em B,
+#     menos 4; 1496 se não houver), descartando F vazia/zero.
+
+# Colunas (0-based dentro do recorte) com 2 casas decimais
+DEC2_COLS_1 = {5, 6, 9, 20, 21}  # F, G, J, U, V
+DEC2_COLS_2 = {5}  # F
+
+_ZEROS = {"", "0", "0.0"}
+
+
+def _to_str(x):
+    if x is None:
+        return ""
+    if isinstance(x, float) and math.isnan(x):
+        return ""
+    s = str(x)
+    return "" if s.strip() in {"nan", "NaN"} else s
+
+
+def _format_decimal_2_dot(value):
+    if value is None:
+        return ""
+    txt = str(value).strip()
+    if txt == "":
+        return ""
+    txt_norm = txt.replace(",", ".")
+    try:
+        d = Decimal(txt_norm)
+    except (InvalidOperation, ValueError):
+        return txt
+    d2 = d.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+    return f"{d2}"
+
+
+def ler_aba(xls_file, sheet_name) -> pd.DataFrame:
+    name = getattr(xls_file, "name", "").lower()
+    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
+    return pd.read_excel(xls_file, sheet_name=sheet_name, header=0, dtype=str, engine=engine)
+
+
+# ----------------------------------------------------------
+# Coluna inteira de uma vez
+# ----------------------------------------------------------
+
+def _por_valor(col: pd.Series, fn: Callable) -> np.ndarray:
+    """`fn` aplicada a cada célula, mas calculada uma vez por valor distinto."""
+    codigos, unicos = pd.factorize(col.astype(object), use_na_sentinel=False)
+    return np.array([fn(v) for v in unicos], dtype=object)[codigos]
+
+
+def _vazio_ou_zero(col: pd.Series) -> np.ndarray:
+    return _por_valor(col, lambda v: _to_str(v).strip() in _ZEROS).astype(bool)
+
+
+def _recorte(df: pd.DataFrame, linhas: slice, col_ini: int, n_cols: int) -> pd.DataFrame:
+    """Fatia posicional; colunas que não existem na planilha viram "" (como get_cell)."""
+    bloco = df.iloc[linhas, col_ini:col_ini + n_cols].astype(object)
+    bloco.columns = range(bloco.shape[1])
+    for j in range(bloco.shape[1], n_cols):
+        bloco[j] = ""
+    return bloco.reset_index(drop=True)
+
+
+def recortar_primeira_aba(df: pd.DataFrame) -> pd.DataFrame:
+    """Linhas 3, 7, ..., 1499 (Excel) com C preenchida; colunas C..Z (24)."""
+    bloco = _recorte(df, slice(1, 1498, 4), 2, 24)
+    manter = _por_valor(bloco[0], _to_str) != ""
+    return bloco[manter].reset_index(drop=True)
+
+
+def _linha_limite_segunda_aba(df2: pd.DataFrame) -> int:
+    linha_limite = 0
+    if df2.shape[1] > 1:
+        col_b = df2.iloc[:45999, 1]  # linhas 2..46000 do Excel
+        parar = col_b.isna().to_numpy() | _por_valor(
+            col_b, lambda v: str(v).strip() in {"#N/A", "#N/D"}
+        ).astype(bool)
+        if parar.any():
+            linha_limite = int(parar.argmax()) + 2 - 4
+    if linha_limite <= 0:
+        linha_limite = 1496
+    return linha_limite
+
+
+def recortar_segunda_aba(df2: pd.DataFrame, exigir_col_a: bool = True) -> pd.DataFrame:
+    """
+    Colunas B..N (13) da linha 2 até a linha limite; D zerada vira "" e saem
+    as linhas com F vazia/zero (e, com `exigir_col_a`, também com B vazia/zero).
+    """
+    linha_limite = _linha_limite_segunda_aba(df2)
+    # Linhas além do fim da planilha teriam F = "" e seriam descartadas de qualquer jeito
+    bloco = _recorte(df2, slice(0, max(2, linha_limite) - 1), 1, 13)
+
+    zerada = _por_valor(bloco[3], lambda v: _to_str(v).strip() in {"0", "0.0"}).astype(bool)
+    bloco.loc[zerada, 3] = ""
+    manter = ~_vazio_ou_zero(bloco[5])
+    if exigir_col_a:
+        manter &= ~_vazio_ou_zero(bloco[0])
+    return bloco[manter].reset_index(drop=True)
+
+
+# ----------------------------------------------------------
+# Escrita
+# ----------------------------------------------------------
+
+def formatar_bloco(bloco: pd.DataFrame, dec_cols: Iterable[int] = ()) -> pd.DataFrame:
+    """Mesmo texto do PRN, sem cortar/preencher largura (para a versão XLSX)."""
+    dec_cols = set(dec_cols)
+    return pd.DataFrame({
+        idx: _por_valor(bloco.iloc[:, idx], _format_decimal_2_dot if idx in dec_cols else _to_str)
+        for idx in range(bloco.shape[1])
+    }, index=bloco.index)
+
+
+def linhas_prn(bloco: pd.DataFrame, widths: List[int], dec_cols: Iterable[int] = ()) -> List[str]:
+    """Uma string de largura fixa por linha do recorte."""
+    dec_cols = set(dec_cols)
+    colunas = []
+    for idx, w in enumerate(widths):
+        fmt = _format_decimal_2_dot if idx in dec_cols else _to_str
+        if idx < bloco.shape[1]:
+            colunas.append(_por_valor(bloco.iloc[:, idx], lambda v: fmt(v)[:w].ljust(w)))
+        else:
+            colunas.append(np.full(len(bloco), " " * w, dtype=object))
+    return ["".join(partes) for partes in zip(*colunas)]
+
+
+def prn_bytes(
+    bloco: pd.DataFrame,
+    widths: List[int],
+    dec_cols: Iterable[int] = (),
+    encoding: str = "cp1252",
+) -> bytes:
+    linhas = linhas_prn(bloco, widths, dec_cols)
+    return ("\r\n".join(linhas) + "\r\n").encode(encoding, errors="replace")
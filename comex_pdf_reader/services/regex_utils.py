@@ -0,0 +1,132 @@
+import re
+from typing import Callable, Dict
+
+# ==========================================================
+# Expressões regulares compiladas (compartilhadas pelos parsers)
+# ==========================================================
+# Tudo é compilado uma vez, na importação. Dentro das funções por linha /
+# por documento os parsers só chamam .search/.sub/.findall do objeto pronto,
+# sem passar pelo cache interno do `re` a cada chamada nem remontar padrões
+# em laço (ex.: um re.sub por mês do dicionário).
+
+# ----------------------------------------------------------
+# Genéricos
+# ----------------------------------------------------------
+RE_ESPACOS = re.compile(r"\s+")
+RE_DIGITO = re.compile(r"\d")
+RE_NAO_DIGITO = re.compile(r"\D")
+RE_NUMEROS = re.compile(r"\d+")
+RE_NUMERO_COM_SEPARADORES = re.compile(r"\d[\d.,]*")
+RE_APOS_DOIS_PONTOS = re.compile(r":\s*(.+)$")
+RE_HIFEN_ESPACADO = re.compile(r"\s*-\s*")
+RE_NAO_ALFANUMERICO_MINUSCULO = re.compile(r"[^a-z0-9]")
+
+# ----------------------------------------------------------
+# Datas
+# ----------------------------------------------------------
+RE_DATA_DMY = re.compile(r"\d{2}[-/]\d{2}[-/]\d{4}")
+RE_DATA_YMD = re.compile(r"\d{4}[-/]\d{2}[-/]\d{2}")
+RE_DATA_DMY_OU_YMD = re.compile(r"\d{2}[-/]\d{2}[-/]\d{4}|\d{4}[-/]\d{2}[-/]\d{2}")
+RE_DATA_DMY_BARRA = re.compile(r"\d{2}/\d{2}/\d{4}")
+RE_DATA_DMY_BARRA_PALAVRA = re.compile(r"\b\d{2}/\d{2}/\d{4}\b")
+RE_DATA_ISO_PALAVRA = re.compile(r"\b\d{4}-\d{2}-\d{2}\b")
+RE_DATA_ISO = re.compile(r"\d{4}-\d{2}-\d{2}")
+RE_DATA_DD_MES_BARRA = re.compile(r"\d{1,2}/[A-Za-z]{3}/\d{4}")
+RE_SEPARADOR_DATA = re.compile(r"[-/]")
+
+
+def compilar_meses(mapa: Dict[str, str], ignorar_caixa: bool = False) -> Callable[[str], str]:
+    """
+    Tradutor de nomes de mês numa passada só: uma alternação \\b(chave|...)\\b
+    com todas as chaves do `mapa` (mais longas primeiro). Equivale ao laço
+    `for k, v in mapa.items(): s = re.sub(rf"\\b{k}\\b", v, s)`, pois nenhuma
+    tradução gera outra chave diferente de si mesma.
+    """
+    chaves = sorted(mapa, key=len, reverse=True)
+    padrao = re.compile(
+        r"\b(" + "|".join(map(re.escape, chaves)) + r")\b",
+        re.IGNORECASE if ignorar_caixa else 0,
+    )
+    if ignorar_caixa:
+        tabela = {k.lower(): v for k, v in mapa.items()}
+        return lambda texto: padrao.sub(lambda m: tabela[m.group(1).lower()], texto)
+    return lambda texto: padrao.sub(lambda m: mapa[m.group(1)], texto)
+
+
+# ----------------------------------------------------------
+# Percepciones
+# ----------------------------------------------------------
+RE_CDA = re.compile(r"\bC\.?\s*D\.?\s*A\.?\b")
+RE_PERC_DE_FECHA = re.compile(r"DE FECHA\s*:\s*([\d]{2}[/-][\d]{2}[/-][\d]{4})")
+RE_OITO_DIGITOS = re.compile(r"\b(\d{8})\b")
+RE_PERC_CDA_CURTO = re.compile(r"\b(\d{2,3})\D+.*?(\d{6,})\b")
+SUFIXOS_LIQUIDACION = ["-25", "-26", "-24", "-23", "-27"]
+RE_SUFIXOS_LIQUIDACION = re.compile(r"(" + "|".join(map(re.escape, SUFIXOS_LIQUIDACION)) + r")\b")
+
+# ----------------------------------------------------------
+# Gastos Adicionales
+# ----------------------------------------------------------
+RE_RUC = (
+    re.compile(r"R\.U\.C.*?(\d{11})"),
+    re.compile(r"RUC:\s*(\d{11})"),
+    re.compile(r"RUC N°\s*(\d{11})"),
+)
+RE_FACTURAS_ADICIONALES = tuple(re.compile(p) for p in (
+    r"F\d{3}[-\s]*\d{9}",
+    r"F\d{3}[-\s]*\d{8}",
+    r"F\d{3}[-\s]*\d{5,7}",
+    r"F\d{2}[-\s]*\d{5,7}",
+    r"INV-[A-Z]+-\d{8}",
+    r"Número de Invoice\(Invoice No\.\)\s*:\s*([A-Z]{4}\d{9})",
+    r"\bPECLLP\d{9}\b",
+    r"F\d{3}[-\s]*\d{4}",
+))
+RE_F_DE_EMISION = re.compile(r"F\.?\s*DE\s+EMISI[ÓO]N\s*[:\-]?\s*(\d{4}[-/]\d{2}[-/]\d{2})", re.IGNORECASE)
+RE_YMD_APOS_SEPARADOR = re.compile(r"[:\-]?\s*(\d{4}[-/]\d{2}[-/]\d{2})")
+RE_FECHA_EMISION_DMY = re.compile(r"FECHA DE EMISI[ÓO]N[:\s]*([0-9]{2}[-/][0-9]{2}[-/][0-9]{4})")
+RE_DATA_DD_MMM_YYYY = re.compile(r"\d{2}-[A-Z][a-z]{2}-\d{4}")
+RE_FECHA_ISSUE_DATE = re.compile(r"FECHA EMISI[ÓO]N\(ISSUE DATE\)\s*[:\-]?\s*(\d{4}[-/]\d{2}[-/]\d{2})")
+RE_MONEDA_INLINE = re.compile(r"(MONEDA|CURRENCY)\s*[:\-]?\s*([A-Z\s]+)")
+RE_DOLARES = re.compile(r"(DOLARES.*)")
+RE_NAO_VALOR = re.compile(r"[^0-9,\.]")
+
+# ----------------------------------------------------------
+# Externos
+# ----------------------------------------------------------
+RE_FACTURA_EH = re.compile(r"\bEH\d{8}\b")
+RE_FACTURA_MD = re.compile(r"(MD.*)")
+RE_FACTURA_BRR = re.compile(r"FACTURA COMERCIAL|CREDIT NOTE", re.IGNORECASE)
+RE_ROTULO_DATE = re.compile(r"(?i)DATE\s*:?")
+RE_DATA_MDY_CURTA = re.compile(r"\b(\d{1,2}/\d{1,2}/\d{2})\b")
+RE_DATA_CLH = re.compile(r"\d{1,2} de [A-Za-zçÇñÑ]{3,15} de \d{4}")
+RE_DATA_DD_MES_YY = re.compile(r"\b\d{1,2}-[A-Za-zçÇñÑ]{3,9}-\d{2}\b")
+RE_DATA_5WY = re.compile(r"\b\d{1,2}/[A-Za-z]{3}/\d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b|\b\d{4}-\d{2}-\d{2}\b")
+RE_DATA_7JR = re.compile(r"\b\d{1,2}/[A-Za-z]{3}/\d{4}\b|\b\d{1,2}/\d{1,2}/\d{4}\b")
+RE_DATA_BRR = re.compile(r"\b\d{1,2}/[A-Za-zñÑ]{3,15}/\d{4}\b")
+RE_DATA_5DU = re.compile(r"\b[A-Za-z]{3,4}\.\d{1,2},\d{4}\b")
+RE_SEPARADOR_5DU = re.compile(r"[.,]")
+RE_DATA_TEXTUAL_EN = re.compile(
+    r"\b(\d{1,2})(?:st|nd|rd|th)?\s*,?\s*(January|February|March|April|May|June|July|August"
+    r"|September|October|November|December)\s+(\d{4})\b",
+    re.IGNORECASE,
+)
+RE_DATA_PONTOS = re.compile(r"\b\d{2}\.\d{2}\.\d{4}\b")
+RE_PREFIXO_FACTURA = re.compile(r"\b(Nº|NO|N°|Nº\.|N°\.|Nº:|NO:)\b")
+RE_LETRAS_MOEDA = re.compile(r"[A-Za-z$-]")
+
+# ----------------------------------------------------------
+# Gastos (GL0061 / Estado de Cuenta)
+# ----------------------------------------------------------
+RE_GL_CTA_CABECALHO = re.compile(r"Nº de cta\.\s+(\d{6})")
+RE_GL_IGNORAR = re.compile(
+    r"Electrolux|Planificación|Moneda|Scala|^-{3,}|^={3,}|"
+    r"Saldo Inicial|Saldo final|T O T A L|ACTIVO|Página|Criterios|CUENTAS POR"
+)
+RE_GL_FECHA = re.compile(r"\d{2}/\d{2}/\d{2}")
+RE_GL_VALOR = re.compile(r"[-\d,]+\.\d{2}-?")
+RE_DECIMAL = re.compile(r"\d+\.\d+")
+NUM_ESTADO_CUENTA = r"(\-?\d[\d,]*\.\d{2}\-?)"  # número com milhares e 2 decimais; pode terminar com '-' (negativo)
+RE_SALDOS_ESTADO_CUENTA = re.compile(
+    rf"\s*{NUM_ESTADO_CUENTA}\s+{NUM_ESTADO_CUENTA}\s+{NUM_ESTADO_CUENTA}\s+{NUM_ESTADO_CUENTA}\s*$"
+)
+RE_TRECHO_ASCII = re.compile(r"[\x00-\x7f]+")  # sub("") deixa só os caracteres fora do ASCII
@@ -1,8 +1,18 @@
+import calendar
+import hashlib
+import io
+import os
+import tempfile
+import numpy as np
 import pandas as pd
 import re
 from datetime import datetime
 import streamlit as st
 
+from services.cache_service import CACHE_DIR
+from services.artefatos_service import impressao_digital
+from services.regex_utils import compilar_meses
+
 # ============================================================
 # ADICIONAR TASA SHAREPOINT (MERGE COM TASA SUNAT)
 # ============================================================
@@ -85,6 +95,36 @@ def adicionar_tasa_sharepoint(df: pd.DataFrame, tasa_df: pd.DataFrame | None) ->
 # FUNÇÃO UNIVERSAL PARA CORRIGIR DATAS DO SHAREPOINT
 # ============================================================
 
+PADRAO_DATA_SHAREPOINT = re.compile(
+    r'(\d{1,4}[-/]\d{1,2}[-/]\d{1,4})'
+    r'|(\d{1,2}\s+[A-Za-zÁÉÍÓÚáéíóúñÑçÇâêôãõ]{3,15}\s+\d{2,4})'
+)
+
+FORMATOS_DATA_SHAREPOINT = [
+    "%d/%m/%Y", "%d-%m-%Y",
+    "%Y/%m/%d", "%Y-%m-%d",
+    "%m/%d/%Y", "%m-%d-%Y",
+    "%d/%m/%y", "%d-%m-%y",
+    "%d %b %Y", "%d %B %Y",
+    "%d %b %y", "%d %B %y",
+]
+MESES_SHAREPOINT = {
+    "jan": "Jan", "janeiro": "Jan",
+    "fev": "Feb", "febrero": "Feb",
+    "mar": "Mar", "março": "Mar",
+    "abr": "Apr", "abril": "Apr",
+    "mai": "May", "maio": "May",
+    "jun": "Jun", "junho": "Jun",
+    "jul": "Jul", "julho": "Jul",
+    "ago": "Aug", "agosto": "Aug",
+    "set": "Sep", "septiembre": "Sep",
+    "out": "Oct", "octubre": "Oct",
+    "nov": "Nov", "noviembre": "Nov",
+    "dez": "Dec", "diciembre": "Dec",
+}
+_traduzir_meses_sharepoint = compilar_meses(MESES_SHAREPOINT)
+
+
 def corrigir_data_sharepoint(valor) -> str:
     """
     Converte datas de qualquer formato irregular do SharePoint para dd/mm/yyyy.
@@ -100,47 +140,17 @@ def corrigir_data_sharepoint(valor) -> str:
         return ""
 
     # Extrair provável trecho de data
-    padrao = re.compile(
-        r'(\d{1,4}[-/]\d{1,2}[-/]\d{1,4})'
-        r'|(\d{1,2}\s+[A-Za-zÁÉÍÓÚáéíóúñÑçÇâêôãõ]{3,15}\s+\d{2,4})'
-    )
-    m = padrao.search(s)
+    m = PADRAO_DATA_SHAREPOINT.search(s)
     if m:
         s = m.group(0)
 
-    formatos = [
-        "%d/%m/%Y", "%d-%m-%Y",
-        "%Y/%m/%d", "%Y-%m-%d",
-        "%m/%d/%Y", "%m-%d-%Y",
-        "%d/%m/%y", "%d-%m-%y",
-        "%d %b %Y", "%d %B %Y",
-        "%d %b %y", "%d %B %y",
-    ]
-
-    for fmt in formatos:
+    for fmt in FORMATOS_DATA_SHAREPOINT:
         try:
             return datetime.strptime(s, fmt).strftime("%d/%m/%Y")
         except Exception:
             pass
 
-    meses = {
-        "jan": "Jan", "janeiro": "Jan",
-        "fev": "Feb", "febrero": "Feb",
-        "mar": "Mar", "março": "Mar",
-        "abr": "Apr", "abril": "Apr",
-        "mai": "May", "maio": "May",
-        "jun": "Jun", "junho": "Jun",
-        "jul": "Jul", "julho": "Jul",
-        "ago": "Aug", "agosto": "Aug",
-        "set": "Sep", "septiembre": "Sep",
-        "out": "Oct", "octubre": "Oct",
-        "nov": "Nov", "noviembre": "Nov",
-        "dez": "Dec", "diciembre": "Dec",
-    }
-
-    s_proc = s.lower()
-    for mes_local, mes_en in meses.items():
-        s_proc = re.sub(rf"\b{mes_local}\b", mes_en, s_proc)
+    s_proc = _traduzir_meses_sharepoint(s.lower())
 
     s_proc = s_proc.title()
 
@@ -153,11 +163,126 @@ def corrigir_data_sharepoint(valor) -> str:
     return ""
 
 
+# ============================================================
+# VERSÕES VETORIZADAS (COLUNA INTEIRA)
+# ============================================================
+# Trabalham sobre os valores DISTINTOS da coluna (o extrato repete muito as
+# mesmas datas/importes) e devolvem exatamente o mesmo que o apply célula a
+# célula de clean_number / corrigir_data_sharepoint.
+
+# Mesmas expressões que o datetime.strptime usa para cada diretiva
+_DIRETIVAS_DATA = {
+    "d": r"(?:3[0-1]|[1-2]\d|0[1-9]|[1-9]| [1-9])",
+    "m": r"(?:1[0-2]|0[1-9]|[1-9])",
+    "Y": r"\d\d\d\d",
+    "y": r"\d\d",
+    "b": "(?:" + "|".join(m.lower() for m in calendar.month_abbr if m) + ")",
+    "B": "(?:" + "|".join(m.lower() for m in calendar.month_name if m) + ")",
+}
+
+
+def _regex_formato(fmt: str) -> str:
+    partes = re.split(r"(%[dmYybB]|\s+)", fmt)
+    return "".join(
+        _DIRETIVAS_DATA[p[1]] if p.startswith("%") else r"\s+" if p.isspace() else re.escape(p)
+        for p in partes if p
+    )
+
+
+_REGEX_FORMATOS_SHAREPOINT = [(fmt, _regex_formato(fmt)) for fmt in FORMATOS_DATA_SHAREPOINT]
+_RE_NAO_NUMERICO = r"[^\d,.-]"
+_RE_NUMERO = r"-?(?:\d+\.?\d*|\.\d+)"  # o que float() aceita depois da limpeza
+
+
+def _valores_distintos(serie: pd.Series):
+    """(códigos por linha, Series com o str() de cada valor distinto; None -> "")."""
+    codigos, unicos = pd.factorize(serie.astype(object), use_na_sentinel=False)
+    textos = pd.Series(["" if v is None else str(v) for v in unicos], dtype=object)
+    return codigos, unicos, textos
+
+
+def limpar_importes(serie: pd.Series) -> pd.Series:
+    """clean_number da coluna inteira: texto -> float; o que não for número vira nulo."""
+    if serie.empty:
+        return serie.copy()  # como o apply: coluna vazia mantém o dtype
+    codigos, unicos, textos = _valores_distintos(serie)
+    s = textos.str.strip().str.replace(_RE_NAO_NUMERICO, "", regex=True)
+    ponto, virgula = s.str.contains(".", regex=False), s.str.contains(",", regex=False)
+    s = s.where(~(ponto & virgula), s.str.replace(".", "", regex=False))
+    s = s.str.replace(",", ".", regex=False)
+    valido = s.str.fullmatch(_RE_NUMERO).to_numpy(dtype=bool) & np.array([v is not None for v in unicos], dtype=bool)
+
+    if not valido.any():
+        return pd.Series([None] * len(serie), index=serie.index, dtype=object)
+    numeros = np.full(len(s), np.nan)
+    numeros[valido] = s[valido].astype(float).to_numpy()
+    return pd.Series(numeros[codigos], index=serie.index)
+
+
+def corrigir_datas_sharepoint(serie: pd.Series) -> pd.Series:
+    """
+    corrigir_data_sharepoint da coluna inteira. Cada formato vira um
+    pd.to_datetime(format=...) só sobre os valores ainda não convertidos;
+    o que o pandas recusar ou nenhum formato aceitar (nomes de mês em PT/ES,
+    anos fora do intervalo ...) passa pela função célula a célula.
+    """
+    if serie.empty:
+        return serie.copy()
+    codigos, unicos, textos = _valores_distintos(serie)
+    s = (
+        textos.str.strip()
+        .str.replace("\u200b", "", regex=False)
+        .str.replace("\u00a0", " ", regex=False)
+        .str.strip()
+    )
+    s = s.str.extract(f"({PADRAO_DATA_SHAREPOINT.pattern})", expand=True)[0].fillna(s)
+
+    resultado = np.full(len(s), "", dtype=object)
+    pendente = np.array(s != "", dtype=bool)
+    escalar = np.zeros(len(s), dtype=bool)
+
+    for fmt, regex in _REGEX_FORMATOS_SHAREPOINT:
+        candidatos = pendente & s.str.fullmatch(regex, case=False).to_numpy(dtype=bool)
+        if not candidatos.any():
+            continue
+        datas = pd.to_datetime(s[candidatos], format=fmt, errors="coerce")
+        ok = (datas.notna() & (datas.dt.year >= 1000)).to_numpy(dtype=bool)
+        idx = np.flatnonzero(candidatos)
+        resultado[idx[ok]] = datas[ok].dt.strftime("%d/%m/%Y").to_numpy(dtype=object)
+        escalar[idx[~ok]] = True
+        pendente[candidatos] = False
+
+    for i in np.flatnonzero(escalar | pendente):
+        resultado[i] = corrigir_data_sharepoint(unicos[i])
+    return pd.Series(resultado[codigos].tolist(), index=serie.index)
+
+
 # ============================================================
 # AJUSTAR SHAREPOINT DF (FUNÇÃO PRINCIPAL)
 # ============================================================
 
-def ajustar_sharepoint_df(df: pd.DataFrame) -> pd.DataFrame:
+def ler_sharepoint_excel(fonte) -> pd.DataFrame:
+    """
+    Lê a aba 'all' do Excel do SharePoint (caminho ou buffer), do mesmo
+    jeito no app e na CLI. Levanta ValueError se a aba não existir.
+    """
+    xls = pd.ExcelFile(fonte, engine="openpyxl")
+
+    if "all" not in xls.sheet_names:
+        raise ValueError(
+            f"A aba 'all' não foi encontrada. Abas disponíveis: {xls.sheet_names}"
+        )
+
+    return pd.read_excel(
+        xls,
+        sheet_name="all",
+        header=0,
+        usecols="A:Z",
+        nrows=20000
+    )
+
+
+def ajustar_sharepoint_df(df: pd.DataFrame, tasa_df: pd.DataFrame | None = None) -> pd.DataFrame:
     df = df.copy()
 
     # --------------------------------------------------------
@@ -181,23 +306,9 @@ def ajustar_sharepoint_df(df: pd.DataFrame) -> pd.DataFrame:
         "importe",
     ]
 
-    def clean_number(value):
-        if value is None:
-            return None
-        s = str(value).strip()
-        s = re.sub(r"[^\d,.-]", "", s)
-        if "." in s and "," in s:
-            s = s.replace(".", "").replace(",", ".")
-        elif "," in s:
-            s = s.replace(",", ".")
-        try:
-            return float(s)
-        except Exception:
-            return None
-
     for col in possiveis_nomes_importe:
         if col in df.columns:
-            df[col] = df[col].apply(clean_number)
+            df[col] = limpar_importes(df[col])
 
     # --------------------------------------------------------
     # 3) Resolver data → Fecha_Emision
@@ -219,7 +330,7 @@ def ajustar_sharepoint_df(df: pd.DataFrame) -> pd.DataFrame:
             break
 
     if col_data_original:
-        df["Fecha_Emision"] = df[col_data_original].apply(corrigir_data_sharepoint)
+        df["Fecha_Emision"] = corrigir_datas_sharepoint(df[col_data_original])
     else:
         df["Fecha_Emision"] = ""
 
@@ -238,7 +349,8 @@ def ajustar_sharepoint_df(df: pd.DataFrame) -> pd.DataFrame:
     # --------------------------------------------------------
     # 5) Merge com Tasa SUNAT
     # --------------------------------------------------------
-    tasa_df = st.session_state.get("tasa_df")
+    if tasa_df is None:
+        tasa_df = st.session_state.get("tasa_df")
     df = adicionar_tasa_sharepoint(df, tasa_df)
 
     # --------------------------------------------------------
@@ -257,3 +369,192 @@ def ajustar_sharepoint_df(df: pd.DataFrame) -> pd.DataFrame:
     df = df.loc[:, ~df.columns.duplicated()]
 
     return df
+
+
+# ============================================================
+# SNAPSHOT DO SHAREPOINT JÁ AJUSTADO (CACHE EM DISCO)
+# ============================================================
+# O mesmo extrato semanal costuma ser carregado várias vezes (reruns, outros
+# usuários). O DataFrame final de ajustar_sharepoint_df fica em disco, com
+# chave = SHA-256 do arquivo + impressão digital da Tasa usada no merge; a
+# próxima carga só lê o Parquet. Ao mudar as regras do ajuste, suba a versão.
+SHAREPOINT_DIR = os.path.join(CACHE_DIR, "sharepoint")
+VERSAO_SHAREPOINT = 1
+MAX_SNAPSHOTS_SHAREPOINT = int(os.environ.get("COMEX_SHAREPOINT_SNAPSHOTS", "20"))
+
+try:
+    import pyarrow.parquet
+    _PARQUET = True
+except ImportError:
+    _PARQUET = False
+
+
+def _chave_sharepoint(conteudo: bytes, tasa_df) -> str:
+    digest = hashlib.sha256(conteudo).hexdigest()
+    tasa = "sem_tasa" if tasa_df is None or tasa_df.empty else impressao_digital(tasa_df)[:16]
+    return f"{digest}_{tasa}_v{VERSAO_SHAREPOINT}"
+
+
+def _ler_parquet(caminho) -> pd.DataFrame:
+    # O Arrow devolve texto como "str"; colunas que eram object voltam a ser object
+    df = pd.read_parquet(caminho)
+    meta = pyarrow.parquet.read_schema(caminho).pandas_metadata or {}
+    for col in meta.get("columns", []):
+        nome = col.get("name")
+        if col.get("numpy_type") == "object" and nome in df.columns and df[nome].dtype != object:
+            df[nome] = df[nome].astype(object)
+    return df
+
+
+def _ler_snapshot_sharepoint(chave):
+    # Parquet; o que não volta idêntico do Arrow (colunas mistas ...) fica em pickle
+    for ext, ler in ((".parquet", _ler_parquet), (".pkl", pd.read_pickle)):
+        caminho = os.path.join(SHAREPOINT_DIR, chave + ext)
+        if not os.path.exists(caminho):
+            continue
+        try:
+            df = ler(caminho)
+            os.utime(caminho)  # mais recente = último a sair
+            return df
+        except Exception:
+            return None
+    return None
+
+
+def _limitar_snapshots_sharepoint():
+    try:
+        caminhos = [os.path.join(SHAREPOINT_DIR, n) for n in os.listdir(SHAREPOINT_DIR)
+                    if n.endswith((".parquet", ".pkl"))]
+        caminhos.sort(key=os.path.getmtime, reverse=True)
+        for caminho in caminhos[MAX_SNAPSHOTS_SHAREPOINT:]:
+            os.remove(caminho)
+    except OSError:
+        pass
+
+
+def _gravar_snapshot_sharepoint(chave, df):
+    tmp = None
+    try:
+        os.makedirs(SHAREPOINT_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=SHAREPOINT_DIR, suffix=".tmp")
+        os.close(fd)
+        ext = ".pkl"
+        if _PARQUET:
+            try:
+                df.to_parquet(tmp)
+                if _ler_parquet(tmp).equals(df):
+                    ext = ".parquet"
+            except Exception:
+                pass
+        if ext == ".pkl":
+            df.to_pickle(tmp)
+        os.replace(tmp, os.path.join(SHAREPOINT_DIR, chave + ext))
+    except Exception:
+        # Snapshot é só otimização: na próxima carga o Excel é lido de novo
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+        return
+    _limitar_snapshots_sharepoint()
+
+
+def carregar_sharepoint(conteudo: bytes, tasa_df: pd.DataFrame | None = None) -> pd.DataFrame:
+    """
+    ler_sharepoint_excel + ajustar_sharepoint_df a partir dos bytes do Excel,
+    reaproveitando o snapshot em disco quando o arquivo (e a Tasa) já foram vistos.
+    """
+    if tasa_df is None:
+        tasa_df = st.session_state.get("tasa_df")
+    chave = _chave_sharepoint(conteudo, tasa_df)
+
+    df = _ler_snapshot_sharepoint(chave)
+    if df is not None:
+        return df
+
+    df = ajustar_sharepoint_df(
+        ler_sharepoint_excel(io.BytesIO(conteudo)),
+        tasa_df=pd.DataFrame() if tasa_df is None else tasa_df,
+    )
+    _gravar_snapshot_sharepoint(chave, df)
+    return df
+
+
+# ============================================================
+# MATCH POR SUBSTRING (source_file x name do SharePoint)
+# ============================================================
+# Substitui o merge cartesiano + apply(match): para cada chave do lado
+# dos PDFs acha as chaves do SharePoint tais que `ext in sp or sp in ext`.
+#  - ext in sp : índice invertido de n-gramas das chaves do SharePoint;
+#                candidatas = postings do n-grama mais raro, depois confirma.
+#  - sp in ext : dicionário chave -> linhas, consultando as substrings de ext
+#                só nos comprimentos que existem no SharePoint.
+# Memória ~ linear no total de caracteres das chaves.
+
+_NGRAMA = 3
+
+
+def _indexar_chaves(chaves, q=_NGRAMA):
+    por_chave = {}
+    por_ngrama = {}
+    for j, s in enumerate(chaves):
+        por_chave.setdefault(s, []).append(j)
+        for g in {s[k:k + q] for k in range(len(s) - q + 1)}:
+            por_ngrama.setdefault(g, []).append(j)
+    comprimentos = sorted({len(s) for s in por_chave})
+    return por_chave, por_ngrama, comprimentos
+
+
+def pares_por_substring(chaves_ext, chaves_sp, q=_NGRAMA):
+    """
+    Pares (i, j) com `chaves_ext[i] in chaves_sp[j] or chaves_sp[j] in chaves_ext[i]`,
+    na mesma ordem do merge cartesiano filtrado (i crescente, depois j crescente).
+    """
+    chaves_sp = list(chaves_sp)
+    por_chave, por_ngrama, comprimentos = _indexar_chaves(chaves_sp, q)
+
+    idx_ext, idx_sp = [], []
+    for i, e in enumerate(chaves_ext):
+        achados = set()
+
+        # sp in ext
+        n = len(e)
+        for l in comprimentos:
+            if l > n:
+                break
+            for k in range(n - l + 1):
+                js = por_chave.get(e[k:k + l])
+                if js:
+                    achados.update(js)
+
+        # ext in sp
+        if n < q:
+            candidatos = range(len(chaves_sp))
+        else:
+            postings = []
+            for g in {e[k:k + q] for k in range(n - q + 1)}:
+                p = por_ngrama.get(g)
+                if p is None:
+                    postings = None
+                    break
+                postings.append(p)
+            candidatos = min(postings, key=len) if postings else ()
+        achados.update(j for j in candidatos if e in chaves_sp[j])
+
+        for j in sorted(achados):
+            idx_ext.append(i)
+            idx_sp.append(j)
+
+    return idx_ext, idx_sp
+
+
+def merge_por_substring(df_ext, df_sp, col_ext="key_ext", col_sp="key_sp"):
+    """
+    Equivalente a `df_ext.merge(df_sp, on="_tmp")` (cartesiano) filtrado por
+    `ext in sp or sp in ext`, mas montando só os pares que casam.
+    """
+    idx_ext, idx_sp = pares_por_substring(df_ext[col_ext].tolist(), df_sp[col_sp].tolist())
+
+    esq = df_ext.iloc[idx_ext].reset_index(drop=True)
+    dir_ = df_sp.iloc[idx_sp].reset_index(drop=True)
+    esq["_tmp"] = range(len(idx_ext))
+    dir_["_tmp"] = range(len(idx_sp))
+    return esq.merge(dir_, on="_tmp")
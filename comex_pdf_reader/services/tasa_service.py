@@ -1,10 +1,40 @@
-
 import io
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, timedelta
+
 import pdfplumber
 import pandas as pd
 import requests
 import streamlit as st
+from requests.adapters import HTTPAdapter
+
+from services.cache_service import CACHE_DIR
+
+# ==========================================================
+# Snapshots por mês + downloads concorrentes
+# ==========================================================
+# Cada mês baixado vira um snapshot local (Parquet se houver pyarrow, senão
+# CSV) com as linhas Data x Venta ainda cruas. Mês fechado não muda mais,
+# então só são baixados os meses sem snapshot e o mês em aberto.
+TASA_DIR = os.path.join(CACHE_DIR, "tasa_sunat")
+MAX_CONEXOES_TASA = int(os.environ.get("COMEX_TASA_CONEXOES", "6"))
+DIAS_CARENCIA_MES = 3  # mês só conta como fechado alguns dias depois de acabar
 
+try:
+    import pyarrow  # noqa: F401
+    _FORMATO_SNAPSHOT = "parquet"
+except ImportError:
+    _FORMATO_SNAPSHOT = "csv"
+
+# Pares (coluna de data, coluna de venta) na ordem em que o PDF os traz
+_PARTES_TASA = [
+    ("Data", "Venta"),
+    ("data1", "Venta.1"),
+    ("data2", "Venta.2"),
+    ("data3", "Venta.3"),
+]
 def _get_sunat_conf():
     sunat = st.secrets.get("sunat", {})
     base_url = sunat.get("base_url")
@@ -29,13 +59,148 @@ def _deduplicar_colunas(colunas):
             novas.append(f"{col}.{seen[col]}")
     return novas
 
-def atualizar_dataframe_tasa(anos=None, progress_widget=None, status_widget=None):
+def _caminho_snapshot(ano, mes_idx):
+    return os.path.join(TASA_DIR, f"{ano}-{mes_idx+1:02d}.{_FORMATO_SNAPSHOT}")
+
+
+def _ler_snapshot(ano, mes_idx):
+    caminho = _caminho_snapshot(ano, mes_idx)
+    if not os.path.exists(caminho):
+        return None
+    try:
+        if _FORMATO_SNAPSHOT == "parquet":
+            return pd.read_parquet(caminho)
+        return pd.read_csv(caminho, dtype={"Data": str, "Venta": str})
+    except Exception:
+        return None
+
+
+def _gravar_snapshot(ano, mes_idx, partes):
+    caminho = _caminho_snapshot(ano, mes_idx)
+    tmp = None
+    try:
+        os.makedirs(TASA_DIR, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=TASA_DIR, suffix=".tmp")
+        os.close(fd)
+        if _FORMATO_SNAPSHOT == "parquet":
+            partes.to_parquet(tmp, index=False)
+        else:
+            partes.to_csv(tmp, index=False)
+        os.replace(tmp, caminho)
+    except Exception:
+        # Snapshot é só otimização: na próxima vez o mês é baixado de novo
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _mes_fechado(ano, mes_idx, hoje):
+    ano, mes = int(ano), mes_idx + 1
+    primeiro_do_seguinte = date(ano + mes // 12, mes % 12 + 1, 1)
+    return hoje >= primeiro_do_seguinte + timedelta(days=DIAS_CARENCIA_MES)
+
+
+def _mes_futuro(ano, mes_idx, hoje):
+    return (int(ano), mes_idx + 1) > (hoje.year, hoje.month)
+
+
+def _parsear_pdf_mes(conteudo, ano, mes_idx):
+    """
+    PDF de um mês -> (partes, mensagens).
+    `partes`: DataFrame [parte, Data, Venta] (cru, ainda texto) ou None se não
+    houver tabela. `mensagens`: lista de (nível do widget, texto).
+    """
+    mensagens = []
+    dataframes = []
+    with pdfplumber.open(io.BytesIO(conteudo)) as pdf:
+        if not pdf.pages:
+            mensagens.append(("info", f"[AVISO] PDF vazio para {ano}-{mes_idx+1:02d}"))
+            return None, mensagens
+        for page in pdf.pages:
+            table = page.extract_table()
+            if not table:
+                continue
+            df = pd.DataFrame(table[1:], columns=_deduplicar_colunas(table[0]))
+
+            for col in df.columns:
+                if col.startswith("Dia"):
+                    df[col] = df[col].apply(lambda x: str(x).zfill(2) if pd.notnull(x) else x)
+
+            for col in ["Compra", "Compra1", "Compra2", "Compra3"]:
+                if col in df.columns:
+                    df.drop(columns=[col], inplace=True)
+
+            mes_fmt = f"{mes_idx+1:02d}"
+            df["mes"] = mes_fmt
+            df["ano"] = ano
+
+            for col in df.columns:
+                if col.startswith("Dia"):
+                    df["Data"] = df[col].astype(str) + "/" + df["mes"] + "/" + df["ano"]
+                    break
+
+            if "Dia.1" in df.columns:
+                df["data1"] = df["Dia.1"].astype(str) + "/" + df["mes"] + "/" + df["ano"]
+            if "Dia.2" in df.columns:
+                df["data2"] = df["Dia.2"].astype(str) + "/" + df["mes"] + "/" + df["ano"]
+            if "Dia.3" in df.columns:
+                df["data3"] = df["Dia.3"].astype(str) + "/" + df["mes"] + "/" + df["ano"]
+
+            dataframes.append(df)
+
+    if not dataframes:
+        return None, mensagens
+
+    df_mes = pd.concat(dataframes, ignore_index=True)
+    partes = []
+    for k, (dcol, vcol) in enumerate(_PARTES_TASA):
+        if dcol in df_mes.columns and vcol in df_mes.columns:
+            parte = df_mes[[dcol, vcol]].rename(columns={dcol: "Data", vcol: "Venta"})
+            parte.insert(0, "parte", k)
+            partes.append(parte)
+    if not partes:
+        return pd.DataFrame(columns=["parte", "Data", "Venta"]), mensagens
+    return pd.concat(partes, ignore_index=True), mensagens
+
+
+def _baixar_mes(sessao, base_url, token, ano, mes_idx):
+    """Roda em thread: baixa + parseia um mês. Não toca em widgets."""
+    data = {
+        "token": token,
+        "anioDownload": ano,
+        "mesDownload": str(mes_idx)  # zero-based
+    }
+    try:
+        response = sessao.post(base_url, data=data, timeout=30)
+    except Exception as e:
+        return None, [("error", f"[ERRO] Falha de rede em {ano}-{mes_idx+1:02d}: {e}")]
+
+    if response.status_code != 200 or not response.content:
+        return None, [("warning", f"[AVISO] Sem conteúdo para {ano}-{mes_idx+1:02d}.")]
+
+    try:
+        return _parsear_pdf_mes(response.content, ano, mes_idx)
+    except Exception as e:
+        return None, [("error", f"[ERRO] Falha ao processar PDF de {ano}-{mes_idx+1:02d}: {e}")]
+
+
+def _criar_sessao(headers, cookies, conexoes):
+    sessao = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=conexoes)
+    sessao.mount("https://", adapter)
+    sessao.mount("http://", adapter)
+    sessao.headers.update(headers)
+    sessao.cookies.update(cookies)
+    return sessao
+
+
+def atualizar_dataframe_tasa(anos=None, progress_widget=None, status_widget=None, forcar_download=False):
     """
     Baixa PDFs de Tasa na SUNAT e consolida Data x Venta.
     Args:
         anos: lista de strings (ex: ["2024", "2025", "2026"])
         progress_widget: st.progress
         status_widget: st.empty() - para mensagens
+        forcar_download: ignora os snapshots locais e baixa tudo de novo
     Returns:
         pandas.DataFrame ou None
     """
@@ -56,109 +221,77 @@ def atualizar_dataframe_tasa(anos=None, progress_widget=None, status_widget=None
     if anos is None:
         anos = ["2024", "2025", "2026"]
 
-    dataframes = []
-    total_steps = len(anos) * 12
+    hoje = date.today()
+    meses = [(ano, mes_idx) for ano in anos for mes_idx in range(12)]
+    total_steps = len(meses)
     step = 0
+    partes_por_mes = {}
 
     if status_widget:
         status_widget.write("Atualizando DataFrame de Tasa...")
 
-    for ano in anos:
-        for mes_idx in range(12):  # 0..11
+    # 1) Meses fechados já salvos: lidos do disco. Meses futuros: não há tasa.
+    a_baixar = []
+    for ano, mes_idx in meses:
+        if _mes_futuro(ano, mes_idx, hoje):
             step += 1
-            prog = int(step / total_steps * 100)
-            if progress_widget:
-                progress_widget.progress(prog, text=f"Baixando {ano}-{mes_idx+1:02d}...")
-
-            data = {
-                "token": token,
-                "anioDownload": ano,
-                "mesDownload": str(mes_idx)  # zero-based
-            }
-
-            try:
-                response = requests.post(base_url, headers=headers, cookies=cookies, data=data, timeout=30)
-            except Exception as e:
-                if status_widget:
-                    status_widget.error(f"[ERRO] Falha de rede em {ano}-{mes_idx+1:02d}: {e}")
-                continue
+            continue
+        snap = None if forcar_download else _ler_snapshot(ano, mes_idx)
+        if snap is not None and _mes_fechado(ano, mes_idx, hoje):
+            partes_por_mes[(ano, mes_idx)] = snap
+            step += 1
+        else:
+            a_baixar.append((ano, mes_idx))
 
-            if response.status_code != 200 or not response.content:
-                if status_widget:
-                    status_widget.warning(f"[AVISO] Sem conteúdo para {ano}-{mes_idx+1:02d}.")
-                continue
+    if progress_widget:
+        progress_widget.progress(int(step / total_steps * 100), text=f"Baixando {len(a_baixar)} mês(es)...")
 
-            try:
-                with pdfplumber.open(io.BytesIO(response.content)) as pdf:
-                    if not pdf.pages:
-                        if status_widget:
-                            status_widget.info(f"[AVISO] PDF vazio para {ano}-{mes_idx+1:02d}")
-                        continue
-                    for page in pdf.pages:
-                        table = page.extract_table()
-                        if not table:
-                            continue
-                        df = pd.DataFrame(table[1:], columns=_deduplicar_colunas(table[0]))
-
-                        for col in df.columns:
-                            if col.startswith("Dia"):
-                                df[col] = df[col].apply(lambda x: str(x).zfill(2) if pd.notnull(x) else x)
-
-                        for col in ["Compra", "Compra1", "Compra2", "Compra3"]:
-                            if col in df.columns:
-                                df.drop(columns=[col], inplace=True)
-
-                        mes_fmt = f"{mes_idx+1:02d}"
-                        df["mes"] = mes_fmt
-                        df["ano"] = ano
-
-                        for col in df.columns:
-                            if col.startswith("Dia"):
-                                df["Data"] = df[col].astype(str) + "/" + df["mes"] + "/" + df["ano"]
-                                break
-
-                        if "Dia.1" in df.columns:
-                            df["data1"] = df["Dia.1"].astype(str) + "/" + df["mes"] + "/" + df["ano"]
-                        if "Dia.2" in df.columns:
-                            df["data2"] = df["Dia.2"].astype(str) + "/" + df["mes"] + "/" + df["ano"]
-                        if "Dia.3" in df.columns:
-                            df["data3"] = df["Dia.3"].astype(str) + "/" + df["mes"] + "/" + df["ano"]
-
-                        dataframes.append(df)
-            except Exception as e:
+    # 2) Faltantes + mês em aberto: em paralelo, numa sessão com pool de conexões.
+    #    Widgets só são atualizados aqui na thread principal.
+    if a_baixar:
+        conexoes = max(1, min(MAX_CONEXOES_TASA, len(a_baixar)))
+        with _criar_sessao(headers, cookies, conexoes) as sessao, \
+                ThreadPoolExecutor(max_workers=conexoes) as executor:
+            futuros = {
+                executor.submit(_baixar_mes, sessao, base_url, token, ano, mes_idx): (ano, mes_idx)
+                for ano, mes_idx in a_baixar
+            }
+            for fut in as_completed(futuros):
+                ano, mes_idx = futuros[fut]
+                partes, mensagens = fut.result()
+                step += 1
+                if progress_widget:
+                    progress_widget.progress(
+                        int(step / total_steps * 100), text=f"Baixado {ano}-{mes_idx+1:02d}"
+                    )
                 if status_widget:
-                    status_widget.error(f"[ERRO] Falha ao processar PDF de {ano}-{mes_idx+1:02d}: {e}")
-                continue
+                    for nivel, texto in mensagens:
+                        getattr(status_widget, nivel)(texto)
+                if partes is None:
+                    continue
+                partes_por_mes[(ano, mes_idx)] = partes
+                if _mes_fechado(ano, mes_idx, hoje):
+                    _gravar_snapshot(ano, mes_idx, partes)
 
     if progress_widget:
         progress_widget.progress(100, text="Consolidando dados...")
 
-    if not dataframes:
+    if not partes_por_mes:
         if status_widget:
             status_widget.warning("Nenhum dado extraído dos PDFs.")
         return None
 
-    final_df = pd.concat(dataframes, ignore_index=True)
-
-    parts = []
-    if set(["Data", "Venta"]).issubset(final_df.columns):
-        parts.append(final_df[["Data", "Venta"]])
-
-    mapping = [
-        ("data1", "Venta.1"),
-        ("data2", "Venta.2"),
-        ("data3", "Venta.3"),
-    ]
-    for dcol, vcol in mapping:
-        if dcol in final_df.columns and vcol in final_df.columns:
-            parts.append(final_df[[dcol, vcol]].rename(columns={dcol: "Data", vcol: "Venta"}))
-
-    if not parts:
+    # Mesma ordem de antes: Data/Venta de todos os meses, depois .1, .2, .3
+    todas = pd.concat(
+        [partes_por_mes[m] for m in meses if m in partes_por_mes], ignore_index=True
+    )
+    if todas.empty:
         if status_widget:
             status_widget.warning("Estrutura inesperada no PDF. Colunas 'Venta' não encontradas.")
         return None
 
-    df_merged = pd.concat(parts, ignore_index=True)
+    todas = todas.sort_values("parte", kind="mergesort")
+    df_merged = todas[["Data", "Venta"]].reset_index(drop=True)
 
     df_merged["Venta"] = df_merged["Venta"].replace(r"^\s*$", pd.NA, regex=True)
     df_merged = df_merged[df_merged["Venta"].notna()]
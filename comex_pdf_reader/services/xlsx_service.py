@@ -0,0 +1,256 @@
+import datetime
+from decimal import Decimal
+from io import BytesIO
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+# ==========================================================
+# Exportação XLSX em streaming (openpyxl write_only)
+# ==========================================================
+# As larguras são calculadas ANTES da escrita, direto das colunas do
+# DataFrame, e as linhas são gravadas uma a uma; o workbook nunca fica
+# inteiro em memória e não há segunda passada lendo/formatando células.
+# Os valores são convertidos como o df.to_excel do pandas faz (NaN vazio,
+# inf -> "inf", datas com formato YYYY-MM-DD ...), então o arquivo sai igual.
+
+AZUL = "FF0077B6"
+BRANCO = "FFFFFFFF"
+FILL_CABECALHO = PatternFill(fill_type="solid", start_color=AZUL, end_color=AZUL)
+FONTE_CABECALHO = Font(color=BRANCO, bold=True)
+
+FORMATO_DATA_HORA = "YYYY-MM-DD HH:MM:SS"  # padrões do pd.ExcelWriter
+FORMATO_DATA = "YYYY-MM-DD"
+_LIMITE_TEXTO_EXCEL = 32767
+VAZIO = ""  # na_rep do pandas: a célula existe, mas sem valor
+
+
+# ----------------------------------------------------------
+# Conversão de valores (mesmas regras do pandas.to_excel)
+# ----------------------------------------------------------
+
+def _valor_excel(v):
+    """(valor, formato) de uma célula."""
+    if v is None or (pd.api.types.is_scalar(v) and pd.isna(v)):
+        return VAZIO, None
+    if isinstance(v, (bool, np.bool_)):
+        return bool(v), None
+    if isinstance(v, (int, np.integer)):
+        return int(v), None
+    if isinstance(v, (float, np.floating)):
+        if np.isinf(v):
+            return ("inf" if v > 0 else "-inf"), None
+        return float(v), None
+    if isinstance(v, Decimal):
+        return v, None
+    if isinstance(v, datetime.datetime):
+        return v, FORMATO_DATA_HORA
+    if isinstance(v, datetime.date):
+        return v, FORMATO_DATA
+    if isinstance(v, datetime.timedelta):
+        return v.total_seconds() / 86400, "0"
+    return str(v)[:_LIMITE_TEXTO_EXCEL], None
+
+
+def valores_excel(serie: pd.Series):
+    """
+    Coluna inteira -> (lista de valores, formato padrão por célula ou None).
+    Tipos homogêneos (texto, número, data) são convertidos de uma vez.
+    """
+    dtype = serie.dtype
+    vazio = serie.isna().to_numpy()
+
+    if pd.api.types.is_bool_dtype(dtype) and not vazio.any():
+        return serie.astype(bool).tolist(), None
+    if pd.api.types.is_integer_dtype(dtype) and not vazio.any():
+        return serie.astype("int64").tolist(), None
+    if pd.api.types.is_float_dtype(dtype):
+        arr = serie.to_numpy(dtype="float64", na_value=np.nan)
+        valores = arr.astype(object)
+        valores[np.isnan(arr)] = VAZIO
+        valores[np.isposinf(arr)] = "inf"
+        valores[np.isneginf(arr)] = "-inf"
+        return valores.tolist(), None
+    if pd.api.types.is_datetime64_dtype(dtype):
+        valores = np.array(serie.astype(object).tolist(), dtype=object)
+        valores[vazio] = VAZIO
+        return valores.tolist(), [None if z else FORMATO_DATA_HORA for z in vazio]
+    if pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+        valores = serie.to_numpy(dtype=object, na_value=VAZIO)
+        longos = serie.str.len().to_numpy(dtype="float64", na_value=0) > _LIMITE_TEXTO_EXCEL
+        for i in np.flatnonzero(longos):
+            valores[i] = valores[i][:_LIMITE_TEXTO_EXCEL]
+        return valores.tolist(), None
+
+    # object / misto: célula a célula
+    pares = [_valor_excel(v) for v in serie.tolist()]
+    valores = [p[0] for p in pares]
+    formatos = [p[1] for p in pares]
+    return valores, (formatos if any(formatos) else None)
+
+
+# ----------------------------------------------------------
+# Larguras calculadas antes da escrita
+# ----------------------------------------------------------
+
+def _max_comprimento(valores: List, fmt_num: Optional[str], fmt_int: bool = False) -> int:
+    """Maior texto entre os valores (float, e int se `fmt_int`, formatados com `fmt_num`)."""
+    maior = 0
+    vistos = set()
+    for v in valores:
+        if v is None or v == VAZIO:
+            continue
+        chave = (type(v), v)
+        if chave in vistos:
+            continue
+        vistos.add(chave)
+        if isinstance(v, float) or (fmt_int and isinstance(v, int)):
+            texto = format(v, fmt_num)
+        else:
+            texto = str(v)
+        maior = max(maior, len(texto))
+    return maior
+
+
+def comprimento_coluna(serie: pd.Series, fmt_num: str, fmt_int: bool = False, valores=None) -> int:
+    dtype = serie.dtype
+    if pd.api.types.is_string_dtype(dtype) and not pd.api.types.is_object_dtype(dtype):
+        tam = serie.str.len().max()
+        return 0 if pd.isna(tam) else min(int(tam), _LIMITE_TEXTO_EXCEL)
+    if not pd.api.types.is_object_dtype(dtype):
+        # Tipo homogêneo: basta formatar os valores distintos
+        valores = valores_excel(serie.drop_duplicates())[0]
+    elif valores is None:
+        valores = valores_excel(serie)[0]
+    return _max_comprimento(valores, fmt_num, fmt_int)
+
+
+def larguras_autofit(
+    df: pd.DataFrame,
+    colunas: Optional[List] = None,
+    font_padding: float = 1.2,
+    min_width: float = 8.0,
+    max_width: float = 60.0,
+) -> List[float]:
+    """Autoajuste da tela de PDFs: maior texto (float em .6g) x padding, entre min e max."""
+    larguras = []
+    for j, nome in enumerate(df.columns):
+        valores = colunas[j][0] if colunas else None
+        max_len = max(len(str(nome)), comprimento_coluna(df.iloc[:, j], ".6g", valores=valores))
+        larguras.append(min(max(max_len * font_padding, min_width), max_width))
+    return larguras
+
+
+def larguras_numericas(
+    df: pd.DataFrame,
+    colunas: Optional[List] = None,
+    min_len: int = 10,
+    max_width: float = 60,
+) -> List[float]:
+    """Autoajuste dos relatórios de gastos: números contados como '#,##0.00', +2, até max."""
+    larguras = []
+    for j, nome in enumerate(df.columns):
+        valores = colunas[j][0] if colunas else None
+        max_len = max(
+            min_len,
+            _max_comprimento([_valor_excel(nome)[0]], ",.2f", fmt_int=True),
+            comprimento_coluna(df.iloc[:, j], ",.2f", fmt_int=True, valores=valores),
+        )
+        larguras.append(min(max_len + 2, max_width))
+    return larguras
+
+
+# ----------------------------------------------------------
+# Escrita
+# ----------------------------------------------------------
+
+def novo_workbook() -> Workbook:
+    return Workbook(write_only=True)
+
+
+def workbook_bytes(wb: Workbook) -> bytes:
+    buffer = BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue()
+
+
+def _celula(ws, valor, fmt=None, fill=None, font=None):
+    cell = WriteOnlyCell(ws, value=valor)
+    if fmt:
+        cell.number_format = fmt
+    if fill is not None:
+        cell.fill = fill
+    if font is not None:
+        cell.font = font
+    return cell
+
+
+def escrever_aba(
+    wb: Workbook,
+    df: pd.DataFrame,
+    sheet_name: str,
+    larguras: Optional[List[float]] = None,
+    destacar: Optional[Callable[[object], bool]] = None,
+    formatos: Optional[Dict[str, str]] = None,
+    formatos_data: Optional[Dict[str, str]] = None,
+    colunas: Optional[List] = None,
+    linhas_em_branco: int = 0,
+) -> None:
+    """
+    Grava `df` (sem índice) numa aba nova.
+    - larguras: largura de cada coluna, a partir da A;
+    - destacar(cabecalho): True -> cabeçalho azul com fonte branca em negrito;
+    - formatos: {coluna: number_format} para as células numéricas (ex.: '#,##0.00');
+    - formatos_data: idem para as células com data (ex.: 'dd/mm/yyyy');
+    - colunas: resultado de valores_excel por coluna, se já calculado;
+    - linhas_em_branco: linhas vazias gravadas depois de cada registro.
+    """
+    ws = wb.create_sheet(sheet_name)
+    for i, w in enumerate(larguras or [], start=1):
+        ws.column_dimensions[get_column_letter(i)].width = w
+
+    cabecalho = []
+    for nome in df.columns:
+        valor, fmt = _valor_excel(nome)
+        if destacar is not None and valor is not None and destacar(valor):
+            cabecalho.append(_celula(ws, valor, fmt, FILL_CABECALHO, FONTE_CABECALHO))
+        else:
+            cabecalho.append(_celula(ws, valor, fmt) if fmt else valor)
+    ws.append(cabecalho)
+
+    if colunas is None:
+        colunas = [valores_excel(df.iloc[:, j]) for j in range(df.shape[1])]
+    formatos = formatos or {}
+    formatos_data = formatos_data or {}
+
+    saida = []
+    for j, nome in enumerate(df.columns):
+        valores, fmts = colunas[j]
+        for tipos, fmt_col in (
+            ((int, float), formatos.get(nome)),
+            ((datetime.date,), formatos_data.get(nome)),
+        ):
+            if fmt_col:
+                fmts = [
+                    fmt_col if isinstance(v, tipos) else (fmts[i] if fmts else None)
+                    for i, v in enumerate(valores)
+                ]
+        if fmts:
+            valores = [_celula(ws, v, f) if f else v for v, f in zip(valores, fmts)]
+        saida.append(valores)
+
+    if not linhas_em_branco:
+        for linha in zip(*saida):
+            ws.append(linha)
+        return
+
+    vazia = [VAZIO] * df.shape[1]
+    for linha in zip(*saida):
+        ws.append(linha)
+        for _ in range(linhas_em_branco):
+            ws.append(vazia)
@@ -1,12 +1,30 @@
 # -*- coding: utf-8 -*-
-import re
 import numpy as np
 import streamlit as st
 import pandas as pd
-from io import BytesIO
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import PatternFill, Font
+from services.xlsx_service import (
+    novo_workbook,
+    workbook_bytes,
+    escrever_aba,
+    valores_excel,
+    larguras_numericas,
+)
 from pandas.api.types import is_numeric_dtype
+from services.conciliacao_service import (
+    comparar_saldos,
+    consolidar_estado,
+    consolidar_plantilla,
+    encontrar_coluna,
+    limpiar_plantillas_contra_cuenta,
+    marcar_ajustadas,
+)
+from services.estado_cuenta_service import ler_estado_cuenta
+from services.gl0061_service import ler_arquivos_gl, montar_chave_gl
+from services.regex_utils import (
+    RE_DECIMAL,
+    RE_NAO_ALFANUMERICO_MINUSCULO,
+    RE_NAO_DIGITO,
+)
 
 # -----------------------------------------------------------------------------
 # Estado e helpers
@@ -82,13 +100,13 @@ def _fmt_transno_keep_zeros(x, width: int = 9) -> str:
     else:
         s = str(x).strip()
         s_norm = s.replace(",", ".")
-        if re.fullmatch(r"\d+\.\d+", s_norm):
+        if RE_DECIMAL.fullmatch(s_norm):
             try:
                 s = str(int(float(s_norm)))
             except Exception:
-                s = re.sub(r"\D", "", s)
+                s = RE_NAO_DIGITO.sub("", s)
         else:
-            s = re.sub(r"\D", "", s)
+            s = RE_NAO_DIGITO.sub("", s)
     if not s:
         return ""
     return s.zfill(width)
@@ -140,269 +158,86 @@ def _fmt_date_series_ddmmyyyy(s: pd.Series) -> pd.Series:
 
 
 # -----------------------------------------------------------------------------
-# Limpieza Plantilla Gastos — helper robusto
+# Plantilla de Gastos — leitura de um Excel (Amount numérico, datas e Chave)
 # -----------------------------------------------------------------------------
 
-def limpiar_plantilla_contra_cuenta(
-    df_pg: pd.DataFrame,
-    df_cuenta: pd.DataFrame,
-    chave_col: str = "Chave",
-    tol_soma: float = 0.005
-) -> tuple[pd.DataFrame, dict]:
-    """
-    Remove excedentes na Plantilla por 'Chave' para igualar a contagem às ocorrências no GL0061.
-    - Só afeta chaves presentes na Cuenta.
-    - Mantém a ordem original.
-    - Guard: se contagem e soma por chave batem (dentro da tolerância), não remove nada.
-    """
-    if chave_col not in df_pg.columns:
-        raise ValueError("Plantilla de Gastos não contém a coluna 'Chave'. Rode a etapa da Plantilla antes.")
-    if chave_col not in df_cuenta.columns:
-        raise ValueError("Cuenta (GL0061) não contém a coluna 'Chave'. Rode a etapa de Cuenta antes.")
-
-    def _norm_key_series(s: pd.Series) -> pd.Series:
-        return (
-            s.astype(str)
-             .str.replace("\u2212", "-", regex=False)
-             .str.replace("\xa0", " ", regex=False)
-             .str.replace(r"\s+", " ", regex=True)
-             .str.strip()
-        )
-
-    df_pg = df_pg.copy()
-    df_cuenta = df_cuenta.copy()
-    df_pg["_key_norm"] = _norm_key_series(df_pg[chave_col])
-    df_cuenta["_key_norm"] = _norm_key_series(df_cuenta[chave_col])
+def _ler_plantilla_excel(uploaded_xl) -> pd.DataFrame:
+    """Primeira aba do Excel com Amount numérico, datas normalizadas e a coluna 'Chave'."""
+    name = getattr(uploaded_xl, "name", "").lower()
+    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
 
-    first_original_key = df_pg.groupby("_key_norm")[chave_col].first()
-
-    cnt_pg = df_pg["_key_norm"].value_counts()
-    cnt_cuenta = df_cuenta["_key_norm"].value_counts()
+    # Lê como texto para preservar zeros à esquerda (Amount e datas tratadas depois)
+    df_pg = pd.read_excel(uploaded_xl, sheet_name=0, engine=engine, dtype=str)
 
+    # Detecta coluna Amount (case-insensitive)
     amount_col = None
     for c in df_pg.columns:
-        cl = str(c).strip().lower()
-        if cl == "amount" or "amount" in cl:
+        if str(c).strip().lower() == "amount":
             amount_col = c
             break
-    cuenta_amt_col = "Saldo Real" if "Saldo Real" in df_cuenta.columns else None
-
-    sum_pg = pd.Series(dtype=float)
-    sum_cuenta = pd.Series(dtype=float)
-    if amount_col is not None:
-        sum_pg = pd.to_numeric(df_pg[amount_col], errors="coerce").groupby(df_pg["_key_norm"]).sum(min_count=1)
-    if cuenta_amt_col is not None:
-        sum_cuenta = pd.to_numeric(df_cuenta[cuenta_amt_col], errors="coerce").groupby(df_cuenta["_key_norm"]).sum(min_count=1)
-
-    keep_limit_map = cnt_cuenta.to_dict()
-
-    rank = df_pg.groupby("_key_norm").cumcount() + 1
-    keep_limit = df_pg["_key_norm"].map(keep_limit_map)
-
-    mask_keep = keep_limit.isna() | (rank <= keep_limit.fillna(np.inf))
-
-    if not sum_pg.empty and not sum_cuenta.empty:
-        keys_ok = []
-        for k, cpg in cnt_pg.items():
-            cct = int(cnt_cuenta.get(k, 0))
-            if cpg == cct and cct > 0:
-                spg = float(sum_pg.get(k, 0.0))
-                scu = float(sum_cuenta.get(k, 0.0))
-                if abs(spg - scu) <= tol_soma:
-                    keys_ok.append(k)
-        if keys_ok:
-            mask_keep = mask_keep | df_pg["_key_norm"].isin(keys_ok)
-
-    df_clean = df_pg[mask_keep].copy().reset_index(drop=True)
-    df_clean.drop(columns=["_key_norm"], inplace=True, errors="ignore")
-
-    removed_total = int((~mask_keep).sum())
-    removed_by_key = {}
-    keys_with_drop = []
-    for k, cpg in cnt_pg.items():
-        cct = int(cnt_cuenta.get(k, 0))
-        if cpg > cct and cct > 0:
-            diff = cpg - cct
-            k_disp = str(first_original_key.get(k, k))
-            removed_by_key[k_disp] = diff
-            keys_with_drop.append(k)
-
-    stats = {
-        "rows_original": int(len(df_pg)),
-        "rows_clean": int(len(df_clean)),
-        "rows_removed": removed_total,
-        "keys_with_removal": len(keys_with_drop),
-        "removed_by_key": dict(sorted(removed_by_key.items(), key=lambda kv: kv[1], reverse=True)),
-    }
-    return df_clean, stats
-
-
-# -----------------------------------------------------------------------------
-# Parsers - ESTADO DE CUENTA (.txt)
-# -----------------------------------------------------------------------------
-_NUM = r"(\-?\d[\d,]*\.\d{2}\-?)"  # número com milhares e 2 decimais; pode terminar com '-' (negativo)
-
-
-def _clean_num(s: str) -> float | None:
-    """Converte strings como '12,345.67-' em float (negativo)."""
-    if s is None:
-        return None
-    s = str(s).strip()
-    if s == "":
-        return None
-    neg = s.endswith("-")
-    s = s[:-1] if neg else s
-    s = s.replace(",", "")
-    try:
-        v = float(s)
-        return -v if neg else v
-    except Exception:
+    if amount_col is None:
+        candidates = [c for c in df_pg.columns if "amount" in str(c).strip().lower()]
+        if candidates:
+            amount_col = candidates[0]
+    if amount_col is None:
+        raise ValueError("Coluna 'Amount' não encontrada no arquivo.")
+
+    # Amount numérico
+    df_pg[amount_col] = pd.to_numeric(df_pg[amount_col], errors="coerce")
+
+    # --- Normalização de datas APENAS na Plantilla (forçar dd/mm/yyyy na Chave) ---
+    def norm(s: str) -> str:
+        return RE_NAO_ALFANUMERICO_MINUSCULO.sub("", str(s).strip().lower())
+
+    # Localiza colunas alvo
+    date_targets = {"transactiondate": None, "duedate": None, "invoicedate": None}
+    for c in df_pg.columns:
+        nc = norm(c)
+        if nc == "transactiondate":
+            date_targets["transactiondate"] = c
+        elif nc in ("duedate", "due_date"):
+            date_targets["duedate"] = c
+        elif nc in ("invoicedate", "invoice_date"):
+            date_targets["invoicedate"] = c
+
+    found_date_cols = []
+    for key, col in date_targets.items():
+        if col and col in df_pg.columns:
+            # Converte qualquer mistura (serial Excel, '2026-01-02 00:00:00', etc.) -> datetime64[ns]
+            df_pg[col] = _to_datetime_from_mixed_excel_and_strings(df_pg[col])
+            found_date_cols.append(col)
+
+    # Helper para achar colunas por variações de nome
+    def _find_col_ci(df: pd.DataFrame, targets: list[str]):
+        cols_map = {RE_NAO_ALFANUMERICO_MINUSCULO.sub("", str(c).lower()): c for c in df.columns}
+        for t in targets:
+            key = RE_NAO_ALFANUMERICO_MINUSCULO.sub("", t.lower())
+            if key in cols_map:
+                return cols_map[key]
         return None
 
+    cuenta_col = _find_col_ci(df_pg, ["Cuenta"])
+    tno_col = _find_col_ci(df_pg, ["TransactionNo", "Transaction No", "TransNo", "Transaction_Number"])
+    amount_col_ci = amount_col
 
-def parse_estado_cuenta_txt(texto: str) -> pd.DataFrame:
-    """
-    Lê um relatório 'Listado de Saldos' em texto e retorna um DataFrame com:
-    ['CTA','Descripción','Sal OB','Saldo OB','Período','Saldo CB']
-    """
-    linhas = texto.splitlines()
-
-    start_idx = 0
-    for i, ln in enumerate(linhas):
-        if "CTA" in ln and "Descripci" in ln:
-            start_idx = i + 1
-            break
-
-    dados = []
-    tail_re = re.compile(rf"\s*{_NUM}\s+{_NUM}\s+{_NUM}\s+{_NUM}\s*$")
-
-    for ln in linhas[start_idx:]:
-        raw = ln.rstrip()
-        if not raw:
-            continue
-        if set(raw.strip()) in [{"="}, {"-"}] or "Scala" in raw or "Electrolux" in raw:
-            continue
-
-        m = tail_re.search(raw)
-        if not m:
-            continue
-
-        left = raw[: m.start()].rstrip()
-        if not left:
-            continue
-
-        parts = left.split()
-        cta = parts[0] if parts else ""
-        descr = left[len(cta):].strip() if parts else left.strip()
+    # Formata data da CHAVE explicitamente em dd/mm/yyyy
+    tdate_col = date_targets.get("transactiondate")
+    tdate_str = _fmt_date_series_ddmmyyyy(df_pg[tdate_col]) if tdate_col else pd.Series([""] * len(df_pg))
 
-        sal_ob, saldo_ob, periodo, saldo_cb = (_clean_num(x) for x in m.groups())
-        dados.append([cta, descr, sal_ob, saldo_ob, periodo, saldo_cb])
+    tno_str = df_pg[tno_col].apply(_fmt_transno_keep_zeros) if tno_col else ""
+    cuenta_str = df_pg[cuenta_col].apply(_str_or_empty) if cuenta_col else ""
+    amount_str = df_pg[amount_col_ci].apply(_fmt_num_2dec_point) if amount_col_ci else ""
 
-    cols = ["CTA", "Descripción", "Sal OB", "Saldo OB", "Período", "Saldo CB"]
-    df = pd.DataFrame(dados, columns=cols)
+    def _ensure_series(x, n):
+        return x if isinstance(x, pd.Series) else pd.Series([""] * n)
 
-    for c in ["Sal OB", "Saldo OB", "Período", "Saldo CB"]:
-        df[c] = pd.to_numeric(df[c], errors="coerce")
-    return df
-
-
-# -----------------------------------------------------------------------------
-# PARSER GL0061 — colunas fixas
-# -----------------------------------------------------------------------------
-
-def parse_cuenta_gl(texto: str) -> pd.DataFrame:
-    """
-    Parser para arquivos GL0061 (colunas fixas em linha), com:
-    CTA | CC | PROD | CNT | TDW | Fecha | Transacción | Debe | Haber | Saldo Real | Saldo | Texto
-
-    Ajustes:
-    - Debe/Haber aceitam número com negativo no final (ex.: "9,200.29-") e preservam o sinal.
-    """
-    linhas = texto.splitlines()
-    dados = []
-
-    cta_header = None
-    reg_header = re.compile(r"Nº de cta\.\s+(\d{6})")
-    for ln in linhas[:50]:
-        m = reg_header.search(ln)
-        if m:
-            cta_header = m.group(1)
-            break
-    if not cta_header:
-        raise ValueError("CTA não encontrada no cabeçalho do arquivo GL0061.")
-
-    def clean_num(v: str | None) -> float:
-        if not v:
-            return 0.0
-        s = str(v).strip()
-        neg = s.endswith("-")
-        if neg:
-            s = s[:-1]
-        s = s.replace(",", "")
-        try:
-            val = float(s)
-        except Exception:
-            val = 0.0
-        return -val if neg else val
-
-    ignore = re.compile(
-        r"Electrolux|Planificación|Moneda|Scala|^-{3,}|^={3,}|"
-        r"Saldo Inicial|Saldo final|T O T A L|ACTIVO|Página|Criterios|CUENTAS POR"
+    df_pg["Chave"] = (
+        _ensure_series(cuenta_str, len(df_pg)) + "|" +
+        _ensure_series(tdate_str, len(df_pg)) + "|" +
+        _ensure_series(tno_str, len(df_pg)) + "|" +
+        _ensure_series(amount_str, len(df_pg))
     )
-
-    cols = [
-        "CTA", "CC", "PROD", "CNT", "TDW",
-        "Fecha", "Transacción",
-        "Debe", "Haber",
-        "Saldo Real", "Saldo",
-        "Texto"
-    ]
-
-    for ln in linhas:
-        if ignore.search(ln):
-            continue
-        if len(ln.strip()) == 0:
-            continue
-        if not re.search(r"\d{2}/\d{2}/\d{2}", ln):
-            continue
-
-        cc = ln[0:5].strip()
-        prod = ln[5:13].strip()
-        cnt = ln[13:23].strip()
-        tdw = ln[23:31].strip()
-        fecha = ln[31:40].strip()
-        ntran = ln[40:50].strip()
-
-        nums = re.findall(r"[-\d,]+\.\d{2}-?", ln)
-        if len(nums) < 3:
-            continue
-
-        debe = clean_num(nums[-3])
-        haber = clean_num(nums[-2])
-        saldo_impresso = clean_num(nums[-1])
-
-        saldo_real = round(debe - haber, 2)
-
-        texto_pos = ln.rfind(nums[-1])
-        texto = ln[texto_pos + len(nums[-1]):].strip() if texto_pos != -1 else ""
-
-        if not cc.isdigit():
-            cc = ""
-
-        dados.append([
-            cta_header, cc, prod, cnt, tdw,
-            fecha, ntran, debe, haber,
-            saldo_real, saldo_impresso,
-            texto
-        ])
-
-    df = pd.DataFrame(dados, columns=cols)
-
-    for date_col in ["Fecha", "Fechado"]:
-        if date_col in df.columns:
-            df[date_col] = pd.to_datetime(df[date_col], errors="coerce", dayfirst=True).dt.date
-
-    return df
+    return df_pg
 
 
 # -----------------------------------------------------------------------------
@@ -416,64 +251,33 @@ def to_xlsx_bytes_format(
     date_cols: list[str] | None = None
 ) -> bytes:
     """
-    Exporta para XLSX aplicando:
+    Exporta para XLSX (streaming) aplicando:
       - número: #,##0.00
       - data: dd/mm/yyyy
     """
     numeric_cols = numeric_cols or []
     date_cols = date_cols or []
 
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df_to_save = df.copy()
-        for dc in date_cols:
-            if dc in df_to_save.columns:
-                df_to_save[dc] = pd.to_datetime(df_to_save[dc], errors="coerce")
-
-        df_to_save.to_excel(writer, index=False, sheet_name=sheet_name)
-        ws = writer.book[sheet_name]
-
-        BLUE = "FF0077B6"
-        WHITE = "FFFFFFFF"
-        fill_blue = PatternFill(fill_type="solid", start_color=BLUE, end_color=BLUE)
-        font_white_bold = Font(color=WHITE, bold=True)
-        for cell in ws[1]:
-            cell.fill = fill_blue
-            cell.font = font_white_bold
-
-        for col_name in numeric_cols:
-            if col_name not in df_to_save.columns:
-                continue
-            col_idx = df_to_save.columns.get_loc(col_name) + 1
-            for row in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row, column=col_idx)
-                if isinstance(cell.value, (int, float)) and cell.value is not None:
-                    cell.number_format = '#,##0.00'
-
-        for col_name in date_cols:
-            if col_name not in df_to_save.columns:
-                continue
-            col_idx = df_to_save.columns.get_loc(col_name) + 1
-            for row in range(2, ws.max_row + 1):
-                cell = ws.cell(row=row, column=col_idx)
-                if cell.value:
-                    cell.number_format = 'dd/mm/yyyy'
-
-        for col_idx in range(1, ws.max_column + 1):
-            max_len = 10
-            for row in range(1, ws.max_row + 1):
-                v = ws.cell(row=row, column=col_idx).value
-                if v is None:
-                    continue
-                if isinstance(v, (int, float)):
-                    s = f"{v:,.2f}"
-                else:
-                    s = str(v)
-                max_len = max(max_len, len(s))
-            ws.column_dimensions[get_column_letter(col_idx)].width = min(max_len + 2, 60)
-
-    buffer.seek(0)
-    return buffer.getvalue()
+    df_to_save = df.copy()
+    for dc in date_cols:
+        if dc in df_to_save.columns:
+            df_to_save[dc] = pd.to_datetime(df_to_save[dc], errors="coerce")
+
+    formatos = {c: "#,##0.00" for c in numeric_cols if c in df_to_save.columns}
+    formatos_data = {c: "dd/mm/yyyy" for c in date_cols if c in df_to_save.columns}
+
+    # Larguras calculadas antes de gravar (sem reler as células depois)
+    colunas = [valores_excel(df_to_save.iloc[:, j]) for j in range(df_to_save.shape[1])]
+    wb = novo_workbook()
+    escrever_aba(
+        wb, df_to_save, sheet_name,
+        larguras=larguras_numericas(df_to_save, colunas),
+        destacar=lambda _cabecalho: True,
+        formatos=formatos,
+        formatos_data=formatos_data,
+        colunas=colunas,
+    )
+    return workbook_bytes(wb)
 
 
 # -----------------------------------------------------------------------------
@@ -530,16 +334,21 @@ def render():
         try:
             df_pg_orig = st.session_state.get("aag_plantilla_df_orig", None)
             df_ct = st.session_state.get("aag_cuenta_df", None)
+            # Uma entrada por arquivo carregado (sessões antigas só têm a Plantilla junta)
+            plantillas = st.session_state.get("aag_plantillas_orig") or {"Plantilla de Gastos": df_pg_orig}
 
             if df_pg_orig is None or df_pg_orig.empty:
                 st.error("Antes de limpar, carregue e execute a **Plantilla de Gastos**.")
             elif df_ct is None or df_ct.empty:
                 st.error("Antes de limpar, carregue e processe o **Archivo de Cuenta (GL0061)**.")
             else:
-                df_pg_clean, stats = limpiar_plantilla_contra_cuenta(df_pg_orig, df_ct, chave_col="Chave")
+                # Cada Plantilla (mês/empresa) é limpa por conta própria contra o GL0061
+                limpas, df_stats = limpiar_plantillas_contra_cuenta(plantillas, df_ct, chave_col="Chave")
+                df_pg_clean = pd.concat(list(limpas.values()), ignore_index=True)
                 st.session_state["aag_plantilla_df_clean"] = df_pg_clean.copy()
                 st.session_state["aag_state"]["last_action"] = "limpieza_pg"
 
+                stats = df_stats[["rows_original", "rows_clean", "rows_removed"]].sum()
                 c1, c2, c3 = st.columns(3)
                 with c1:
                     st.metric("Linhas (Original)", f"{stats['rows_original']:,}".replace(",", "."))
@@ -548,6 +357,17 @@ def render():
                 with c3:
                     st.metric("Removidas", f"{stats['rows_removed']:,}".replace(",", "."))
 
+                if len(df_stats) > 1:
+                    st.dataframe(
+                        df_stats.drop(columns="removed_by_key").rename(columns={
+                            "rows_original": "Linhas (Original)",
+                            "rows_clean": "Linhas (Limpo)",
+                            "rows_removed": "Removidas",
+                            "keys_with_removal": "Chaves com remoção",
+                        }),
+                        width="stretch", hide_index=True,
+                    )
+
                 if stats["rows_removed"] == 0:
                     st.info("Nenhuma divergência de contagem encontrada. Nada foi removido.")
 
@@ -572,59 +392,28 @@ def render():
                     # Tolerância de comparação (igual à do botão Analise)
                     tol = st.number_input("Valor de Tolerância", min_value=0.00, value=0.01, step=0.01, key="limpieza_tol")
 
-                    def _norm_conta(x) -> str:
-                        s = re.sub(r"\D", "", str(x))
-                        s = s.lstrip("0")
-                        return s if s else ""
-
                     # --- Consolida Estado de Cuenta (CTA x Período) ---
                     try:
                         if "CTA" not in df_ec.columns or "Período" not in df_ec.columns:
                             st.error("Estado de Cuenta não contém as colunas esperadas: 'CTA' e 'Período'.")
                             return  
 
-                        df_ec_proc = df_ec.copy()
-                        df_ec_proc["CTA"] = df_ec_proc["CTA"].apply(_norm_conta)
-                        df_ec_proc["Período"] = pd.to_numeric(df_ec_proc["Período"], errors="coerce").fillna(0.0)
-                        df_ec_proc = df_ec_proc[df_ec_proc["CTA"].astype(str).str.len() > 0]
-
-                        df_ec_agg = (
-                            df_ec_proc.groupby("CTA", as_index=False)["Período"]
-                            .sum()
-                            .rename(columns={"CTA": "Cuenta", "Período": "Saldo_Estado_Cuenta"})
-                        )
+                        df_ec_agg = consolidar_estado(df_ec)
                     except Exception as e:
                         st.error("Erro ao consolidar Estado de Cuenta (pós-limpeza).")
                         st.exception(e)
                         st.stop()
 
-                    # Helper para localizar colunas (case-insensitive, substrings)
-                    def _find_col(df: pd.DataFrame, target: str):
-                        for c in df.columns:
-                            if str(c).strip().lower() == target:
-                                return c
-                        cand = [c for c in df.columns if target in str(c).strip().lower()]
-                        return cand[0] if cand else None
-
                     # --- Consolida Plantilla LIMPA (Cuenta x Amount) ---
                     try:
-                        cuenta_col_clean = _find_col(df_pg_clean, "cuenta")
-                        amount_col_clean = _find_col(df_pg_clean, "amount")
+                        cuenta_col_clean = encontrar_coluna(df_pg_clean, "cuenta")
+                        amount_col_clean = encontrar_coluna(df_pg_clean, "amount")
 
                         if cuenta_col_clean is None or amount_col_clean is None:
                             st.error("Plantilla (limpa) não contém as colunas esperadas: 'Cuenta' e 'Amount'.")
                             st.stop()
 
-                        df_pg_c = df_pg_clean.copy()
-                        df_pg_c[amount_col_clean] = pd.to_numeric(df_pg_c[amount_col_clean], errors="coerce").fillna(0.0)
-                        df_pg_c["__conta__"] = df_pg_c[cuenta_col_clean].apply(_norm_conta)
-                        df_pg_c = df_pg_c[df_pg_c["__conta__"].astype(str).str.len() > 0]
-
-                        df_pg_clean_agg = (
-                            df_pg_c.groupby("__conta__", as_index=False)[amount_col_clean]
-                            .sum()
-                            .rename(columns={"__conta__": "Cuenta", amount_col_clean: "Saldo_Plantilla_Gastos"})
-                        )
+                        df_pg_clean_agg = consolidar_plantilla(df_pg_clean, cuenta_col_clean, amount_col_clean)
                     except Exception as e:
                         st.error("Erro ao consolidar Plantilla (limpa).")
                         st.exception(e)
@@ -632,58 +421,24 @@ def render():
 
                     # --- Consolida Plantilla ORIGINAL (para identificar contas ajustadas) ---
                     df_pg_orig_agg = None
-                    contas_ajustadas = pd.DataFrame(columns=["Cuenta", "Ajustada"])
                     try:
                         if df_pg_orig is not None and not df_pg_orig.empty:
-                            cuenta_col_orig = _find_col(df_pg_orig, "cuenta")
-                            amount_col_orig = _find_col(df_pg_orig, "amount")
+                            cuenta_col_orig = encontrar_coluna(df_pg_orig, "cuenta")
+                            amount_col_orig = encontrar_coluna(df_pg_orig, "amount")
 
                             if cuenta_col_orig and amount_col_orig:
-                                df_pg_o = df_pg_orig.copy()
-                                df_pg_o[amount_col_orig] = pd.to_numeric(df_pg_o[amount_col_orig], errors="coerce").fillna(0.0)
-                                df_pg_o["__conta__"] = df_pg_o[cuenta_col_orig].apply(_norm_conta)
-                                df_pg_o = df_pg_o[df_pg_o["__conta__"].astype(str).str.len() > 0]
-
-                                df_pg_orig_agg = (
-                                    df_pg_o.groupby("__conta__", as_index=False)[amount_col_orig]
-                                    .sum()
-                                    .rename(columns={"__conta__": "Cuenta", amount_col_orig: "Saldo_Plantilla_Original"})
+                                df_pg_orig_agg = consolidar_plantilla(
+                                    df_pg_orig, cuenta_col_orig, amount_col_orig, "Saldo_Plantilla_Original"
                                 )
-
-                                # Junta original × limpa para detectar se a conta mudou
-                                df_cmp_adj = pd.merge(df_pg_orig_agg, df_pg_clean_agg, on="Cuenta", how="outer")
-                                for c in ["Saldo_Plantilla_Original", "Saldo_Plantilla_Gastos"]:
-                                    df_cmp_adj[c] = pd.to_numeric(df_cmp_adj[c], errors="coerce").fillna(0.0)
-
-                                # Ajustada = saldo mudou após a limpeza (considera tolerância)
-                                contas_ajustadas = df_cmp_adj.assign(
-                                    Ajustada=(df_cmp_adj["Saldo_Plantilla_Original"] - df_cmp_adj["Saldo_Plantilla_Gastos"]).abs() > float(tol)
-                                )[["Cuenta", "Ajustada"]]
                     except Exception as e:
                         st.error("Erro ao calcular contas ajustadas.")
                         st.exception(e)
                         st.stop()
 
-                    # --- Merge final (Estado × Plantilla LIMPA) e cálculo de diferença ---
-                    df_cmp = pd.merge(df_ec_agg, df_pg_clean_agg, on="Cuenta", how="outer")
-                    for c in ["Saldo_Estado_Cuenta", "Saldo_Plantilla_Gastos"]:
-                        df_cmp[c] = pd.to_numeric(df_cmp[c], errors="coerce").fillna(0.0)
-
-                    df_cmp["Diferença"] = (df_cmp["Saldo_Plantilla_Gastos"] - df_cmp["Saldo_Estado_Cuenta"]).round(2)
-
-                    # Marca divergência pela tolerância
-                    df_cmp["_div"] = df_cmp["Diferença"].abs() > float(tol)
-
-                    # Junta a flag de Ajustada (se disponível)
-                    if not contas_ajustadas.empty:
-                        df_cmp = pd.merge(df_cmp, contas_ajustadas, on="Cuenta", how="left")
-                        df_cmp["Ajustada"] = df_cmp["Ajustada"].fillna(False)
-                    else:
-                        df_cmp["Ajustada"] = False
-
-                    # Ordena por número de conta
-                    df_cmp["_cuenta_num"] = pd.to_numeric(df_cmp["Cuenta"], errors="coerce")
-                    df_cmp = df_cmp.sort_values(by="_cuenta_num", ascending=True).drop(columns=["_cuenta_num"]).reset_index(drop=True)
+                    # --- Merge final (Estado × Plantilla LIMPA), diferença e flag de Ajustada ---
+                    # (só agregados: trocar tolerância ou filtro não reconsolida as linhas)
+                    df_cmp = comparar_saldos(df_ec_agg, df_pg_clean_agg, tol)
+                    df_cmp = marcar_ajustadas(df_cmp, df_pg_orig_agg, df_pg_clean_agg, tol)
 
                     # ---- Filtros ----
                     col_f1, col_f2 = st.columns(2)
@@ -812,13 +567,10 @@ def render():
             pbar = st.progress(0, text="Lendo arquivo .txt...")
             try:
                 raw_bytes = uploaded.getvalue()
-                try:
-                    text = raw_bytes.decode("utf-8")
-                except UnicodeDecodeError:
-                    text = raw_bytes.decode("latin-1")
 
+                # Lido em blocos (UTF-8, senão latin-1), sem montar a lista de linhas inteira
                 pbar.progress(35, text="Convertendo para DataFrame...")
-                df_base = parse_estado_cuenta_txt(text)
+                df_base = ler_estado_cuenta(raw_bytes)
 
                 if df_base is None or df_base.empty:
                     st.warning("Nenhuma linha válida encontrada no arquivo.")
@@ -908,111 +660,57 @@ def render():
     elif mode == "plantilla":
         upl_key_pg = st.session_state["aag_state"].setdefault("uploader_key_pg", "aag_pg_upl_1")
 
-        st.caption("Carregue o arquivo **Excel** da *Plantilla de Gastos* (primeira aba será lida).")
-        uploaded_xl = st.file_uploader(
-            "Selecionar arquivo (.xlsx ou .xls)",
+        st.caption(
+            "Carregue o(s) arquivo(s) **Excel** da *Plantilla de Gastos* (primeira aba será lida). "
+            "Vários arquivos (meses, empresas) são limpos um a um na **Limpieza Plantilla Gastos**."
+        )
+        uploaded_xls = st.file_uploader(
+            "Selecionar arquivo(s) (.xlsx ou .xls)",
             type=["xlsx", "xls"],
-            accept_multiple_files=False,
+            accept_multiple_files=True,
             key=upl_key_pg,
             help="As colunas de data serão convertidas para dd/mm/aaaa e Amount formatado como número.",
         )
 
         col_run, col_clear = st.columns([2, 1])
         with col_run:
-            run_clicked = st.button("▶️ Executar", type="primary", width="stretch", disabled=(uploaded_xl is None))
+            run_clicked = st.button("▶️ Executar", type="primary", width="stretch", disabled=not uploaded_xls)
         with col_clear:
             clear_clicked = st.button("Limpar", width="stretch")
 
         if clear_clicked:
             st.session_state["aag_state"]["uploader_key_pg"] = upl_key_pg + "_x"
-            for k in ("aag_plantilla_df_orig", "aag_plantilla_df_clean"):
+            for k in ("aag_plantilla_df_orig", "aag_plantillas_orig", "aag_plantilla_df_clean"):
                 if k in st.session_state:
                     del st.session_state[k]
             st.rerun()
 
-        if run_clicked and uploaded_xl is not None:
+        if run_clicked and uploaded_xls:
             pbar = st.progress(0, text="Lendo arquivo Excel...")
             try:
-                name = getattr(uploaded_xl, "name", "").lower()
-                engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-
-                # Lê como texto para preservar zeros à esquerda (Amount e datas tratadas depois)
-                df_pg = pd.read_excel(uploaded_xl, sheet_name=0, engine=engine, dtype=str)
-
-                # Detecta coluna Amount (case-insensitive)
-                amount_col = None
-                for c in df_pg.columns:
-                    if str(c).strip().lower() == "amount":
-                        amount_col = c
-                        break
-                if amount_col is None:
-                    candidates = [c for c in df_pg.columns if "amount" in str(c).strip().lower()]
-                    if candidates:
-                        amount_col = candidates[0]
-                if amount_col is None:
-                    st.error("Coluna 'Amount' não encontrada no arquivo.")
-                    return
-
-                # Amount numérico
-                df_pg[amount_col] = pd.to_numeric(df_pg[amount_col], errors="coerce")
-
-                # --- Normalização de datas APENAS na Plantilla (forçar dd/mm/yyyy na Chave) ---
-                def norm(s: str) -> str:
-                    return re.sub(r"[^a-z0-9]", "", str(s).strip().lower())
-
-                # Localiza colunas alvo
-                date_targets = {"transactiondate": None, "duedate": None, "invoicedate": None}
-                for c in df_pg.columns:
-                    nc = norm(c)
-                    if nc == "transactiondate":
-                        date_targets["transactiondate"] = c
-                    elif nc in ("duedate", "due_date"):
-                        date_targets["duedate"] = c
-                    elif nc in ("invoicedate", "invoice_date"):
-                        date_targets["invoicedate"] = c
-
-                found_date_cols = []
-                for key, col in date_targets.items():
-                    if col and col in df_pg.columns:
-                        # Converte qualquer mistura (serial Excel, '2026-01-02 00:00:00', etc.) -> datetime64[ns]
-                        df_pg[col] = _to_datetime_from_mixed_excel_and_strings(df_pg[col])
-                        found_date_cols.append(col)
-
-                # Helper para achar colunas por variações de nome
-                def _find_col_ci(df: pd.DataFrame, targets: list[str]):
-                    cols_map = {re.sub(r"[^a-z0-9]", "", str(c).lower()): c for c in df.columns}
-                    for t in targets:
-                        key = re.sub(r"[^a-z0-9]", "", t.lower())
-                        if key in cols_map:
-                            return cols_map[key]
-                    return None
-
-                cuenta_col = _find_col_ci(df_pg, ["Cuenta"])
-                tno_col = _find_col_ci(df_pg, ["TransactionNo", "Transaction No", "TransNo", "Transaction_Number"])
-                amount_col_ci = amount_col
-
-                # Formata data da CHAVE explicitamente em dd/mm/yyyy
-                tdate_col = date_targets.get("transactiondate")
-                tdate_str = _fmt_date_series_ddmmyyyy(df_pg[tdate_col]) if tdate_col else pd.Series([""] * len(df_pg))
-
-                tno_str = df_pg[tno_col].apply(_fmt_transno_keep_zeros) if tno_col else ""
-                cuenta_str = df_pg[cuenta_col].apply(_str_or_empty) if cuenta_col else ""
-                amount_str = df_pg[amount_col_ci].apply(_fmt_num_2dec_point) if amount_col_ci else ""
-
-                def _ensure_series(x, n):
-                    return x if isinstance(x, pd.Series) else pd.Series([""] * n)
-
-                df_pg["Chave"] = (
-                    _ensure_series(cuenta_str, len(df_pg)) + "|" +
-                    _ensure_series(tdate_str, len(df_pg)) + "|" +
-                    _ensure_series(tno_str, len(df_pg)) + "|" +
-                    _ensure_series(amount_str, len(df_pg))
-                )
+                # Uma Plantilla por arquivo (a Limpieza trata cada uma contra o GL0061);
+                # Analise e downloads usam todas juntas
+                plantillas = {}
+                for i, uploaded_xl in enumerate(uploaded_xls, start=1):
+                    nome = getattr(uploaded_xl, "name", "") or f"Plantilla {i}"
+                    if nome in plantillas:  # mesmo nome em pastas diferentes
+                        nome = f"{nome} ({i})"
+                    pbar.progress(int((i - 1) / len(uploaded_xls) * 70), text=f"Lendo {nome} ({i}/{len(uploaded_xls)})...")
+                    try:
+                        plantillas[nome] = _ler_plantilla_excel(uploaded_xl)
+                    except ValueError as e:
+                        st.error(f"{nome}: {e}")
+                        return
+                df_pg = pd.concat(list(plantillas.values()), ignore_index=True)
 
+                st.session_state["aag_plantillas_orig"] = plantillas
                 st.session_state["aag_plantilla_df_orig"] = df_pg.copy()
 
                 pbar.progress(70, text="Preparando visualização...")
-                st.success("Arquivo carregado com sucesso.")
+                st.success(
+                    "Arquivo carregado com sucesso." if len(plantillas) == 1
+                    else f"{len(plantillas)} arquivos carregados com sucesso."
+                )
                 pbar.progress(100, text="Concluído.")
             except Exception as e:
                 st.error("Erro ao processar o arquivo Excel.")
@@ -1083,11 +781,6 @@ def render():
 
         tol = st.number_input("Valor de Tolerância", min_value=0.00, value=0.01, step=0.01)
 
-        def _norm_conta(x) -> str:
-            s = re.sub(r"\D", "", str(x))
-            s = s.lstrip("0")
-            return s if s else ""
-
         pbar = st.progress(0, text="Consolidando Estado de Cuenta...")
 
         try:
@@ -1095,16 +788,7 @@ def render():
                 st.error("Estado de Cuenta não contém as colunas esperadas: 'CTA' e 'Período'.")
                 return
 
-            df_ec_proc = df_ec.copy()
-            df_ec_proc["CTA"] = df_ec_proc["CTA"].apply(_norm_conta)
-            df_ec_proc["Período"] = pd.to_numeric(df_ec_proc["Período"], errors="coerce").fillna(0.0)
-            df_ec_proc = df_ec_proc[df_ec_proc["CTA"].astype(str).str.len() > 0]
-
-            df_ec_agg = (
-                df_ec_proc.groupby("CTA", as_index=False)["Período"]
-                .sum()
-                .rename(columns={"CTA": "Cuenta", "Período": "Saldo_Estado_Cuenta"})
-            )
+            df_ec_agg = consolidar_estado(df_ec)
 
             pbar.progress(40, text="Consolidando Plantilla de Gastos...")
         except Exception as e:
@@ -1113,30 +797,14 @@ def render():
             return
 
         try:
-            def _find_col(df, target):
-                for c in df.columns:
-                    if str(c).strip().lower() == target:
-                        return c
-                cand = [c for c in df.columns if target in str(c).strip().lower()]
-                return cand[0] if cand else None
-
-            cuenta_col = _find_col(df_pg, "cuenta")
-            amount_col = _find_col(df_pg, "amount")
+            cuenta_col = encontrar_coluna(df_pg, "cuenta")
+            amount_col = encontrar_coluna(df_pg, "amount")
 
             if cuenta_col is None or amount_col is None:
                 st.error("Plantilla não contém as colunas esperadas: 'Cuenta' e 'Amount'.")
                 return
 
-            df_pg_proc = df_pg.copy()
-            df_pg_proc[amount_col] = pd.to_numeric(df_pg_proc[amount_col], errors="coerce").fillna(0.0)
-            df_pg_proc["__conta__"] = df_pg_proc[cuenta_col].apply(_norm_conta)
-            df_pg_proc = df_pg_proc[df_pg_proc["__conta__"].astype(str).str.len() > 0]
-
-            df_pg_agg = (
-                df_pg_proc.groupby("__conta__", as_index=False)[amount_col]
-                .sum()
-                .rename(columns={"__conta__": "Cuenta", amount_col: "Saldo_Plantilla_Gastos"})
-            )
+            df_pg_agg = consolidar_plantilla(df_pg, cuenta_col, amount_col)
 
             pbar.progress(70, text="Comparando saldos...")
         except Exception as e:
@@ -1145,16 +813,7 @@ def render():
             return
 
         try:
-            df_cmp = pd.merge(df_ec_agg, df_pg_agg, on="Cuenta", how="outer")
-            for c in ["Saldo_Estado_Cuenta", "Saldo_Plantilla_Gastos"]:
-                df_cmp[c] = pd.to_numeric(df_cmp[c], errors="coerce").fillna(0.0)
-
-            df_cmp["Diferença"] = (df_cmp["Saldo_Plantilla_Gastos"] - df_cmp["Saldo_Estado_Cuenta"]).round(2)
-
-            df_cmp["_div"] = df_cmp["Diferença"].abs() > float(tol)
-
-            df_cmp["_cuenta_num"] = pd.to_numeric(df_cmp["Cuenta"], errors="coerce")
-            df_cmp = df_cmp.sort_values(by="_cuenta_num", ascending=True).drop(columns=["_cuenta_num"]).reset_index(drop=True)
+            df_cmp = comparar_saldos(df_ec_agg, df_pg_agg, tol)
 
             pbar.progress(90, text="Preparando visualização...")
 
@@ -1254,41 +913,30 @@ def render():
 
         if run_clicked and uploaded:
             dfs = []
-            for up in uploaded:
+            # Parse em paralelo (pool de processos); arquivos já vistos saem do cache
+            with st.spinner(f"Lendo {len(uploaded)} arquivo(s) GL0061..."):
+                lidos = list(ler_arquivos_gl(uploaded))
+            for nome, df_part, erro in lidos:
+                if erro is not None:
+                    st.error(f"Erro ao interpretar o arquivo GL0061: {nome or '(sem nome)'}")
+                    st.exception(erro)
+                    continue
+
+                if df_part is None or df_part.empty:
+                    st.error(f"Nenhuma linha reconhecida no arquivo GL0061: {nome or '(sem nome)'}")
+                    continue
+
                 try:
-                    raw = up.getvalue()
-                    try:
-                        text = raw.decode("utf-8")
-                    except Exception:
-                        text = raw.decode("latin-1")
-        
-                    # Parse de cada arquivo
-                    try:
-                        df_part = parse_cuenta_gl(text)
-                    except Exception as e:
-                        st.error(f"Erro ao interpretar o arquivo GL0061: {getattr(up, 'name', '(sem nome)')}")
-                        st.exception(e)
-                        continue
-        
-                    if df_part is None or df_part.empty:
-                        st.error(f"Nenhuma linha reconhecida no arquivo GL0061: {getattr(up, 'name', '(sem nome)')}")
-                        continue
-        
                     # Montagem da Chave no MESMO formato que você já usa (com '|')
-                    cta_str   = df_part["CTA"].apply(_str_or_empty) if "CTA" in df_part.columns else pd.Series([""] * len(df_part))
-                    fecha_str = df_part["Fecha"].apply(_fmt_date_ddmmyyyy) if "Fecha" in df_part.columns else pd.Series([""] * len(df_part))
-                    tran_str  = df_part["Transacción"].apply(_fmt_transno_keep_zeros) if "Transacción" in df_part.columns else pd.Series([""] * len(df_part))
-                    sreal_str = df_part["Saldo Real"].apply(_fmt_num_2dec_point) if "Saldo Real" in df_part.columns else pd.Series([""] * len(df_part))
-        
-                    df_part["Chave"] = cta_str + "|" + fecha_str + "|" + tran_str + "|" + sreal_str
-        
+                    df_part["Chave"] = montar_chave_gl(df_part)
+
                     # (Opcional) coluna para rastrear arquivo de origem
-                    df_part["Arquivo"] = getattr(up, "name", "")
-        
+                    df_part["Arquivo"] = nome
+
                     dfs.append(df_part)
-        
+
                 except Exception as e:
-                    st.error(f"Falha ao processar o arquivo: {getattr(up, 'name', '(sem nome)')}")
+                    st.error(f"Falha ao processar o arquivo: {nome or '(sem nome)'}")
                     st.exception(e)
         
             if not dfs:
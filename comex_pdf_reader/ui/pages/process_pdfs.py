@@ -75,10 +75,14 @@ if not EXTERNOS_AVAILABLE:
 # -----------------------------
 # Utilidades
 # -----------------------------
-from io import BytesIO
 import pandas as pd
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import PatternFill, Font
+from services.xlsx_service import (
+    novo_workbook,
+    workbook_bytes,
+    escrever_aba,
+    valores_excel,
+    larguras_autofit,
+)
 
 def make_arrow_safe(df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -102,94 +106,56 @@ USE_PRN_WIDTHS = True  # <- altere para False se quiser voltar ao autoajuste
 PRN_WIDTHS_1 = [10, 25, 6, 6, 6, 16, 16, 2, 5, 16, 3, 2, 30, 6, 3, 3, 8, 3, 6, 4, 16, 16, 3, 6]  # 24 colunas
 PRN_WIDTHS_2 = [6, 3, 3, 8, 3, 16, 16, 2, 30, 6, 15, 20, 5]  # 13 colunas
 
+# Cabeçalhos pintados de azul nos XLSX
+EXACT_HEADERS = {
+    "source_file","Proveedor","Proveedor Iscala","Factura","Tipo Doc","Cód. de Autorización",
+    "Tipo de Factura","Fecha de Emisión","Moneda","Cod. Moneda","Amount","Tasa","Cuenta",
+    "Error","R.U.C","Op. Gravada","COD PROVEEDOR","Declaracion","Fecha","Ad_Valorem",
+    "Imp_Prom_Municipal","Imp_Gene_a_las_Ventas","IGV","Percepcion","PEC","COD Moneda",
+    "Source_File","No_Liquidacion","CDA","Monto","COD MONEDA","Lineaabajo",
+}
 
-def set_fixed_widths(ws, widths, start_col: int = 1, add_excel_padding: bool = True):
+
+def fixed_widths(widths, add_excel_padding: bool = True):
     """
-    Define larguras fixas por coluna.
+    Larguras fixas por coluna.
     Quando add_excel_padding=True, soma ~0.71 para que o Excel exiba o mesmo número do PRN
     na caixa 'Column width' (ex.: gravar 10.71 para a UI mostrar 10.00).
     """
     PADDING = 0.71 if add_excel_padding else 0.0
-    for i, w in enumerate(widths, start=start_col):
-        col_letter = get_column_letter(i)
-        ws.column_dimensions[col_letter].width = float(w) + PADDING
+    return [float(w) + PADDING for w in widths]
 
 
-def _autofit_worksheet(ws, font_padding: float = 1.2, min_width: float = 8.0, max_width: float = 60.0):
-    if ws.max_column is None or ws.max_row is None:
-        return
-    for col_idx, col in enumerate(
-        ws.iter_cols(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column),
-        start=1
-    ):
-        header = col[0].value if col and col[0] is not None else ""
-        max_len = len(str(header)) if header is not None else 0
-        for cell in col[1:]:
-            val = cell.value
-            if val is None:
-                continue
-            # para cálculo de comprimento apenas
-            text = f"{val:.6g}" if isinstance(val, float) else str(val)
-            max_len = max(max_len, len(text))
-        width = min(max(max_len * font_padding, min_width), max_width)
-        ws.column_dimensions[get_column_letter(col_idx)].width = width
-
-
-def header_paint(ws):
-    BLUE = "FF0077B6"
-    WHITE = "FFFFFFFF"
-    fill_blue = PatternFill(fill_type="solid", start_color=BLUE, end_color=BLUE)
-    font_white_bold = Font(color=WHITE, bold=True)
-    exact_headers = {
-        "source_file","Proveedor","Proveedor Iscala","Factura","Tipo Doc","Cód. de Autorización",
-        "Tipo de Factura","Fecha de Emisión","Moneda","Cod. Moneda","Amount","Tasa","Cuenta",
-        "Error","R.U.C","Op. Gravada","COD PROVEEDOR","Declaracion","Fecha","Ad_Valorem",
-        "Imp_Prom_Municipal","Imp_Gene_a_las_Ventas","IGV","Percepcion","PEC","COD Moneda",
-        "Source_File","No_Liquidacion","CDA","Monto","COD MONEDA","Lineaabajo",
-    }
-    for cell in ws[1]:
-        if cell.value is None:
-            continue
-        header_text = str(cell.value).strip()
-        if header_text in exact_headers:
-            cell.fill = fill_blue
-            cell.font = font_white_bold
+def _xlsx_widths(df: pd.DataFrame, colunas=None, prn_counts=(24, 13)):
+    """Larguras PRN quando a contagem de colunas bate; senão autoajuste (calculado antes de gravar)."""
+    if USE_PRN_WIDTHS and df.shape[1] in prn_counts:
+        return fixed_widths(PRN_WIDTHS_1 if df.shape[1] == 24 else PRN_WIDTHS_2)
+    return larguras_autofit(df, colunas)
 
 
-def to_xlsx_bytes(df: pd.DataFrame, sheet_name: str = "Tasa") -> bytes:
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
-        ws = writer.book[sheet_name]
-        # Se quisermos espelhar PRN quando a contagem for 24 ou 13, aplicamos; senão, autoajuste
-        if USE_PRN_WIDTHS:
-            if df.shape[1] == 24:
-                set_fixed_widths(ws, PRN_WIDTHS_1, start_col=1)
-            elif df.shape[1] == 13:
-                set_fixed_widths(ws, PRN_WIDTHS_2, start_col=1)
-            else:
-                _autofit_worksheet(ws)
-        else:
-            _autofit_worksheet(ws)
-        header_paint(ws)
-    buffer.seek(0)
-    return buffer.getvalue()
-
-# -----------------------------------------------------------------------------
-# DF com linhas em branco entre cada registro (para XLSX de Externos)
-# -----------------------------------------------------------------------------
-def df_with_blank_spacers(df: pd.DataFrame, blank_rows: int = 3) -> pd.DataFrame:
-    if df is None or df.empty:
-        return df.copy()
-    blocks = []
-    blank = pd.DataFrame([[None] * len(df.columns)], columns=df.columns)
-    for _, row in df.iterrows():
-        blocks.append(pd.DataFrame([row.values], columns=df.columns))
-        for _ in range(blank_rows):
-            blocks.append(blank.copy())
-    out = pd.concat(blocks, ignore_index=True)
-    return out
+def _is_painted_header(value) -> bool:
+    return str(value).strip() in EXACT_HEADERS
+
 
+def _write_sheet(wb, df: pd.DataFrame, sheet_name: str, prn_counts=(24, 13), paint: bool = True,
+                 colunas=None, blank_rows: int = 0):
+    if colunas is None:
+        colunas = [valores_excel(df.iloc[:, j]) for j in range(df.shape[1])]
+    escrever_aba(
+        wb, df, sheet_name,
+        larguras=_xlsx_widths(df, colunas, prn_counts),
+        destacar=_is_painted_header if paint else None,
+        colunas=colunas,
+        linhas_em_branco=blank_rows,
+    )
+    return colunas
+
+
+def to_xlsx_bytes(df: pd.DataFrame, sheet_name: str = "Tasa") -> bytes:
+    wb = novo_workbook()
+    # Espelha PRN quando a contagem for 24 ou 13; senão, autoajuste
+    _write_sheet(wb, df, sheet_name)
+    return workbook_bytes(wb)
 
 def to_xlsx_bytes_externos_duas_abas(
     df_normal: pd.DataFrame,
@@ -197,28 +163,14 @@ def to_xlsx_bytes_externos_duas_abas(
     sheet_spaced: str = "Externos_Espacado",
     blank_rows: int = 3
 ) -> bytes:
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        # Aba 1 (normal)
-        df_normal.to_excel(writer, index=False, sheet_name=sheet_normal)
-        ws1 = writer.book[sheet_normal]
-        if USE_PRN_WIDTHS and df_normal.shape[1] == 24:
-            set_fixed_widths(ws1, PRN_WIDTHS_1, start_col=1)
-        else:
-            _autofit_worksheet(ws1)
-        header_paint(ws1)
-
-        # Aba 2 (espacada)
-        df_spaced = df_with_blank_spacers(df_normal, blank_rows=blank_rows)
-        df_spaced.to_excel(writer, index=False, sheet_name=sheet_spaced)
-        ws2 = writer.book[sheet_spaced]
-        if USE_PRN_WIDTHS and df_spaced.shape[1] == 24:
-            set_fixed_widths(ws2, PRN_WIDTHS_1, start_col=1)
-        else:
-            _autofit_worksheet(ws2)
-        header_paint(ws2)
-    buffer.seek(0)
-    return buffer.getvalue()
+    wb = novo_workbook()
+    # Aba 1 (normal) - aqui só 24 colunas usam larguras PRN
+    colunas = _write_sheet(wb, df_normal, sheet_normal, prn_counts=(24,))
+
+    # Aba 2 (espacada): mesmas colunas já convertidas, com `blank_rows` linhas
+    # vazias depois de cada registro (sem montar um DataFrame espaçado)
+    _write_sheet(wb, df_normal, sheet_spaced, prn_counts=(24,), colunas=colunas, blank_rows=blank_rows)
+    return workbook_bytes(wb)
 
 ACTIONS = {"externos": "Externos","gastos": "Gastos Adicionales","duas": "Duas","percepciones": "Percepciones"}
 
@@ -229,210 +181,214 @@ def _ensure_state():
         st.session_state.uploader_key = "uploader_none"
     if "tasa_df" not in st.session_state:
         st.session_state.tasa_df = None
+    # Refresh do navegador: o job em andamento (ou o último resultado) volta pela URL
+    if "job_pdf" not in st.session_state and st.query_params.get("job"):
+        job = job_service.ler_job(st.query_params["job"])
+        if job is None:
+            # Id inválido ou job já apagado: não fica na URL
+            st.query_params.pop("job", None)
+        else:
+            st.session_state.job_pdf = job["id"]
+            if st.session_state.acao_selecionada is None:
+                _select_action(job["acao"])
 
 def _select_action(action_key: str):
     st.session_state.acao_selecionada = action_key
     st.session_state.uploader_key = f"uploader_{action_key}"
 
+# ============================
+# Downloads memorizados
+# ============================
+# Os bytes (CSV/XLSX) ficam no cache de artefatos pela impressão digital
+# do DataFrame: são montados uma vez por resultado e reruns não regeram nada.
+from services.artefatos_service import impressao_digital, obter_artefato
+
+MIME_XLSX = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+# acao -> (mensagem de sucesso, rótulo dos botões, nome do arquivo, aba, prefixo das keys)
+RESULTADOS = {
+    "duas": ("Fluxo DUAS concluído!", "DUAS", "duas_consolidado", "DUAS", "duas"),
+    "percepciones": ("Percepciones concluído!", "Percepciones", "percepciones", "Percepciones", "percepciones"),
+    "externos": ("Externos concluído!", "Externos", "externos", "Externos", "externos"),
+    "gastos": ("Gastos Adicionales concluído!", "Adicionales", "gastos_adicionales", "Adicionales", "adicionales"),
+}
+
+
+def _botoes_download(df, digital, rotulo_csv, rotulo_xlsx, arquivo, key, tipo_xlsx, gerar_xlsx):
+    col_csv, col_xlsx = st.columns(2)
+    with col_csv:
+        st.download_button(
+            rotulo_csv,
+            data=obter_artefato(digital, "csv", lambda: df.to_csv(index=False).encode("utf-8")),
+            file_name=f"{arquivo}.csv",
+            mime="text/csv",
+            width="stretch",
+            key=f"{key}_csv",
+            on_click="ignore",
+        )
+    with col_xlsx:
+        st.download_button(
+            rotulo_xlsx,
+            data=obter_artefato(digital, tipo_xlsx, gerar_xlsx),
+            file_name=f"{arquivo}.xlsx",
+            mime=MIME_XLSX,
+            width="stretch",
+            key=f"{key}_xlsx",
+            on_click="ignore",
+        )
+
+
+def _guardar_resultado(acao: str, df: pd.DataFrame, perfil=None, job_id=None):
+    """Resultado do fluxo fica na sessão (com a impressão digital) para sobreviver aos reruns."""
+    df = make_arrow_safe(df)
+    st.session_state.resultado_pdf = {
+        "acao": acao, "df": df, "digital": impressao_digital(df), "perfil": perfil, "job": job_id,
+    }
+
+
+def _mostrar_perfil(perfil):
+    """Tabela de tempo / linhas / memória por etapa; subetapas recuadas pelo nível."""
+    resumo = perfil.resumo()
+    if resumo.empty:
+        return
+    with st.expander(f"⏱️ Perfil por etapa ({perfil.segundos_total:.2f}s no total)"):
+        resumo["etapa"] = ["\u2003" * n + e for n, e in zip(resumo["nivel"], resumo["etapa"])]
+        st.dataframe(make_arrow_safe(resumo.drop(columns="nivel")), width="stretch", hide_index=True)
+
+
+def _mostrar_resultado(resultado):
+    sucesso, rotulo, arquivo, aba, key = RESULTADOS[resultado["acao"]]
+    df = resultado["df"]
+    st.success(sucesso)
+    st.dataframe(df.head(50), width="stretch")
+    # XLSX com duas abas (normal + espaçada)
+    _botoes_download(
+        df, resultado["digital"],
+        f"Baixar CSV ({rotulo})", f"Baixar XLSX ({rotulo})", arquivo, key,
+        f"xlsx:{aba}",
+        lambda: to_xlsx_bytes_externos_duas_abas(
+            df_normal=df, sheet_normal=aba, sheet_spaced=f"{aba}_Espacado", blank_rows=3
+        ),
+    )
+    if resultado.get("perfil") is not None:
+        _mostrar_perfil(resultado["perfil"])
+
+# ============================
+# Jobs em segundo plano
+# ============================
+# O pipeline roda em services/job_service.py; aqui só se acompanha o job.
+# O id fica na sessão e na URL (?job=...), então trocar de aba/página ou
+# recarregar o navegador não perde o processamento nem o resultado.
+from services import job_service
+
+SEM_DADOS = {
+    "duas": "Nenhuma tabela válida encontrada nos PDFs para o fluxo DUAS.",
+    "percepciones": "Nenhuma informação válida encontrada nos PDFs para Percepciones.",
+    "externos": "Nenhuma informação válida encontrada nos PDFs para Externos.",
+    "gastos": "Nenhuma informação válida encontrada nos PDFs para Gastos Adicionales.",
+}
+
+
+@st.fragment(run_every=1.0)
+def _acompanhar_job(job_id: str):
+    """Reexecuta sozinho a cada 1s sem travar o resto da página; no fim, recarrega a página."""
+    job = job_service.ler_job(job_id)
+    if job is None or job["estado"] not in job_service.ATIVOS:
+        st.rerun()
+    nome = ACTIONS[job["acao"]]
+    if job["estado"] == job_service.NA_FILA:
+        st.progress(0, text=f"{nome}: aguardando na fila ({job['total']} PDFs)...")
+    else:
+        st.progress(job["pct"], text=job["mensagem"] or f"{nome}: processando...")
+    st.caption(
+        f"Job `{job['id']}` rodando no servidor: pode trocar de aba ou recarregar a página."
+    )
+
+
+def _mostrar_job(job: dict):
+    estado = job["estado"]
+    if estado in job_service.ATIVOS:
+        _acompanhar_job(job["id"])
+        return
+
+    if estado == job_service.CONCLUIDO:
+        resultado = st.session_state.get("resultado_pdf")
+        if resultado is not None and resultado.get("job") == job["id"]:
+            return
+        salvo = job_service.resultado_job(job["id"])
+        df = None if salvo is None else salvo["df"]
+        if df is not None and not df.empty:
+            _guardar_resultado(job["acao"], df, salvo["perfil"], job["id"])
+        else:
+            st.warning(SEM_DADOS[job["acao"]])
+        return
+
+    # Erro ou servidor reiniciado no meio: os PDFs continuam na pasta do job
+    if estado == job_service.ERRO:
+        st.error(f"O processamento falhou: {job['erro']}")
+        if job.get("traceback"):
+            with st.expander("Detalhes técnicos do erro"):
+                st.code(job["traceback"])
+    else:
+        st.warning(
+            f"O processamento foi interrompido em {job['pct']}% ({job['total']} PDFs). "
+            "Os arquivos já lidos não serão lidos de novo."
+        )
+    col_retomar, col_descartar = st.columns([2, 1])
+    with col_retomar:
+        if st.button("🔁 Retomar", key="job_retomar", width="stretch"):
+            job_service.retomar(job["id"])
+            st.rerun()
+    with col_descartar:
+        if st.button("Descartar", key="job_descartar", width="stretch"):
+            job_service.descartar(job["id"])
+            st.session_state.pop("job_pdf", None)
+            st.query_params.pop("job", None)
+            st.rerun()
+
 # ================== HELPERS (PRN) ==================
-import math
-from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
-
-def _to_str(x):
-    if x is None:
-        return ""
-    if isinstance(x, float) and math.isnan(x):
-        return ""
-    s = str(x)
-    return "" if s.strip() in {"nan", "NaN"} else s
-
-def _format_decimal_2_dot(value):
-    if value is None:
-        return ""
-    txt = str(value).strip()
-    if txt == "":
-        return ""
-    txt_norm = txt.replace(",", ".")
-    try:
-        d = Decimal(txt_norm)
-    except (InvalidOperation, ValueError):
-        return txt
-    d2 = d.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    return f"{d2}"
-
-def _fixed_width_line(values, widths, fmt=None):
-    out = []
-    for idx, (v, w) in enumerate(zip(values, widths)):
-        sv = fmt(idx, v) if fmt else _to_str(v)
-        sv = sv[:w]
-        out.append(sv + (" " * max(0, w - len(sv))))
-    return "".join(out)
-
-def _df_to_prn_bytes(rows_values, widths, encoding="cp1252", fmt=None):
-    lines = [_fixed_width_line(vals, widths, fmt=fmt) for vals in rows_values]
-    text = "\r\n".join(lines) + "\r\n"
-    return text.encode(encoding, errors="replace")
+# Recorte e formatação colunar ficam em services/prn_service.py
+from services.prn_service import (
+    DEC2_COLS_1,
+    DEC2_COLS_2,
+    _to_str,
+    formatar_bloco,
+    ler_aba,
+    recortar_primeira_aba,
+    recortar_segunda_aba,
+    linhas_prn,
+    prn_bytes,
+)
 
 # ------------------- EXTERNOS: 1ª ABA -> PRN -------------------
 def gerar_externos_prn_primeira_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df = pd.read_excel(xls_file, sheet_name=0, header=0, dtype=str, engine=engine)
-
-    def get_cell(r, c):
-        row_idx = r - 2
-        col_idx = c - 1
-        try:
-            if 0 <= row_idx < len(df.index) and 0 <= col_idx < len(df.columns):
-                return df.iloc[row_idx, col_idx]
-        except Exception:
-            return ""
-        return ""
-
-    widths = PRN_WIDTHS_1[:]  # 24 colunas
-    rows_values = []
-    for r in range(3, 1501, 4):
-        val_c = _to_str(get_cell(r, 3))
-        if val_c != "":
-            row_vals = [get_cell(r, c) for c in range(3, 27)]
-            rows_values.append(row_vals)
-
-    DEC2_COLS = {5, 6, 9, 20, 21}  # F, G, J, U, V (0-based)
-    def fmt(col_idx, value):
-        if col_idx in DEC2_COLS:
-            return _format_decimal_2_dot(value)
-        return _to_str(value)
-
-    prn_bytes = _df_to_prn_bytes(rows_values, widths, encoding="cp1252", fmt=fmt)
-    return prn_bytes
+    df = ler_aba(xls_file, 0)
+    return prn_bytes(recortar_primeira_aba(df), PRN_WIDTHS_1, DEC2_COLS_1)  # 24 colunas
 
 # ------------------- EXTERNOS: 2ª ABA -> PRN -------------------
 def gerar_externos_prn_segunda_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df2 = pd.read_excel(xls_file, sheet_name=1, header=0, dtype=str, engine=engine)
-
-    def get_cell2(r, c):
-        row_idx = r - 2
-        col_idx = c - 1
-        try:
-            if 0 <= row_idx < len(df2.index) and 0 <= col_idx < len(df2.columns):
-                return df2.iloc[row_idx, col_idx]
-        except Exception:
-            return ""
-        return ""
-
-    linha_limite = 0
-    for r in range(2, 46001):
-        val_b = get_cell2(r, 2)
-        if (val_b is None) or (str(val_b).strip() in {"#N/A", "#N/D"}) or (pd.isna(val_b)):
-            linha_limite = r - 4
-            break
-    if linha_limite <= 0:
-        linha_limite = 1496
-
-    rows_raw = []
-    for r in range(2, max(2, linha_limite) + 1):
-        row_vals = [get_cell2(r, c) for c in range(2, 15)]  # 13 colunas
-        rows_raw.append(row_vals)
-
-    rows_clean = []
-    for vals in rows_raw:
-        d_val = _to_str(vals[3])
-        if d_val.strip() in {"0", "0.0"}:
-            vals[3] = ""
-        f_val = _to_str(vals[5]).strip()
-        if f_val in {"", "0", "0.0"}:
-            continue
-        
-        f_val = _to_str(vals[0]).strip()
-        if f_val in {"", "0", "0.0"}:
-            continue
-            
-        rows_clean.append(vals)
-
-    widths2 = PRN_WIDTHS_2[:]  # 13 colunas
-    DEC2_COLS = {5}  # apenas F (0-based)
-    def fmt(col_idx, value):
-        if col_idx in DEC2_COLS:
-            return _format_decimal_2_dot(value)
-        return _to_str(value)
-
-    prn_bytes = _df_to_prn_bytes(rows_clean, widths2, encoding="cp1252", fmt=fmt)
-    return prn_bytes
+    df2 = ler_aba(xls_file, 1)
+    return prn_bytes(recortar_segunda_aba(df2), PRN_WIDTHS_2, DEC2_COLS_2)  # 13 colunas
 
 # ------------------- ADICIONALES: 1ª ABA -> PRN -------------------
 def gerar_adicionales_prn_primeira_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df = pd.read_excel(xls_file, sheet_name=0, header=0, dtype=str, engine=engine)
-
-    def get_cell(r, c):
-        row_idx = r - 2
-        col_idx = c - 1
-        try:
-            if 0 <= row_idx < len(df.index) and 0 <= col_idx < len(df.columns):
-                return df.iloc[row_idx, col_idx]
-        except Exception:
-            return ""
-        return ""
-
-    widths = PRN_WIDTHS_1[:]  # 24 colunas
-    rows_values = []
-    for r in range(3, 1501, 4):
-        val_c = _to_str(get_cell(r, 3))
-        if val_c != "":
-            row_vals = [get_cell(r, c) for c in range(3, 27)]
-            rows_values.append(row_vals)
-
-    DEC2_COLS = {5, 6, 9, 20, 21}
-    def fmt(col_idx, value):
-        if col_idx in DEC2_COLS:
-            return _format_decimal_2_dot(value)
-        return _to_str(value)
-
-    prn_bytes = _df_to_prn_bytes(rows_values, widths, encoding="cp1252", fmt=fmt)
-    return prn_bytes
+    return gerar_externos_prn_primeira_aba(xls_file)  # mesma regra
 
 # ------------------- ADICIONALES: 1ª ABA -> ZIP (PRN por linha) -------------------
 def gerar_adicionales_zip_primeira_aba(xls_file, zip_name="Adicionales_PRNs.zip"):
     from zipfile import ZipFile, ZIP_DEFLATED
     from io import BytesIO
 
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df = pd.read_excel(xls_file, sheet_name=0, header=0, dtype=str, engine=engine)
-
-    def get_cell(r, c):
-        row_idx = r - 2
-        col_idx = c - 1
-        try:
-            if 0 <= row_idx < len(df.index) and 0 <= col_idx < len(df.columns):
-                return df.iloc[row_idx, col_idx]
-        except Exception:
-            return ""
-        return ""
-
-    widths = PRN_WIDTHS_1[:]  # 24 colunas
+    bloco = recortar_primeira_aba(ler_aba(xls_file, 0))
+    linhas = linhas_prn(bloco, PRN_WIDTHS_1, DEC2_COLS_1)  # 24 colunas
+
     buffer_zip = BytesIO()
     with ZipFile(buffer_zip, mode="w", compression=ZIP_DEFLATED) as zf:
-        seq = 1
-        DEC2_COLS = {5, 6, 9, 20, 21}
-        def fmt(col_idx, value):
-            if col_idx in DEC2_COLS:
-                return _format_decimal_2_dot(value)
-            return _to_str(value)
-
-        for r in range(3, 1501, 4):
-            val_c = _to_str(get_cell(r, 3))
-            if val_c == "":
-                continue
-            row_vals = [get_cell(r, c) for c in range(3, 27)]
-            prn_bytes = _df_to_prn_bytes([row_vals], widths, encoding="cp1252", fmt=fmt)
+        for seq, (val_c, linha) in enumerate(zip(bloco[0], linhas), start=1):
+            val_c = _to_str(val_c)
             safe_prefix = (val_c or "linha").replace("\\", "_").replace("/", "_").replace(" ", "")
             filename = f"{safe_prefix}_{seq}.prn"
-            zf.writestr(filename, prn_bytes)
-            seq += 1
+            zf.writestr(filename, (linha + "\r\n").encode("cp1252", errors="replace"))
 
     buffer_zip.seek(0)
     return buffer_zip.getvalue(), zip_name
@@ -442,106 +398,27 @@ def gerar_adicionales_prn_segunda_aba(xls_file):
     return gerar_externos_prn_segunda_aba(xls_file)  # mesma regra
 
 # ================== HELPERS XLSX (novos) ==================
-def _rows_to_xlsx_bytes(rows, headers, sheet_name, decimal_cols_idx=None):
-    """Converte 'rows' (lista de listas) em XLSX com headers, aplicando 2 casas nas colunas indicadas."""
-    decimal_cols_idx = decimal_cols_idx or set()
-
-    # normaliza e aplica 2 casas onde necessário
-    rows_fmt = []
-    for r in rows:
-        r2 = []
-        for i, v in enumerate(r):
-            if i in decimal_cols_idx:
-                r2.append(_format_decimal_2_dot(v))
-            else:
-                r2.append(_to_str(v))
-        rows_fmt.append(r2)
-
-    df_out = pd.DataFrame(rows_fmt, columns=headers)
-    buffer = BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df_out.to_excel(writer, index=False, sheet_name=sheet_name)
-        ws = writer.book[sheet_name]
-        # Aplica PRN widths quando possível
-        if USE_PRN_WIDTHS:
-            if len(headers) == 24:
-                set_fixed_widths(ws, PRN_WIDTHS_1, start_col=1)
-            elif len(headers) == 13:
-                set_fixed_widths(ws, PRN_WIDTHS_2, start_col=1)
-            else:
-                _autofit_worksheet(ws)
-        else:
-            _autofit_worksheet(ws)
-        header_paint(ws)
-    buffer.seek(0)
-    return buffer.getvalue()
+def _bloco_to_xlsx_bytes(bloco, headers, sheet_name, decimal_cols_idx=None):
+    """Converte o recorte da planilha em XLSX com headers, aplicando 2 casas nas colunas indicadas."""
+    df_out = formatar_bloco(bloco, decimal_cols_idx or set()).astype(str)
+    df_out.columns = headers
+    wb = novo_workbook()
+    # Aplica PRN widths quando possível
+    _write_sheet(wb, df_out, sheet_name)
+    return workbook_bytes(wb)
 
 # EXTERNOS 1ª aba -> XLSX
 def gerar_externos_xlsx_primeira_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df = pd.read_excel(xls_file, sheet_name=0, header=0, dtype=str, engine=engine)
-
-    def get_cell(r, c):
-        ri = r - 2
-        ci = c - 1
-        try:
-            if 0 <= ri < len(df.index) and 0 <= ci < len(df.columns):
-                return df.iloc[ri, ci]
-        except Exception:
-            return ""
-        return ""
-
-    rows = []
-    for r in range(3, 1501, 4):
-        if _to_str(get_cell(r, 3)) != "":
-            rows.append([get_cell(r, c) for c in range(3, 27)])  # 24 colunas
+    bloco = recortar_primeira_aba(ler_aba(xls_file, 0))  # 24 colunas
     headers = [f"Col_{chr(65+i)}" for i in range(24)]  # A..X
-    decimal_cols = {5, 6, 9, 20, 21}  # F,G,J,U,V
-    return _rows_to_xlsx_bytes(rows, headers, "Externos", decimal_cols)
+    return _bloco_to_xlsx_bytes(bloco, headers, "Externos", DEC2_COLS_1)
 
 # EXTERNOS 2ª aba -> XLSX
 def gerar_externos_xlsx_segunda_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df2 = pd.read_excel(xls_file, sheet_name=1, header=0, dtype=str, engine=engine)
-
-    def get_cell2(r, c):
-        ri = r - 2
-        ci = c - 1
-        try:
-            if 0 <= ri < len(df2.index) and 0 <= ci < len(df2.columns):
-                return df2.iloc[ri, ci]
-        except Exception:
-            return ""
-        return ""
-
-    linha_limite = 0
-    for r in range(2, 46001):
-        val_b = get_cell2(r, 2)
-        if (val_b is None) or (str(val_b).strip() in {"#N/A", "#N/D"}) or (pd.isna(val_b)):
-            linha_limite = r - 4
-            break
-    if linha_limite <= 0:
-        linha_limite = 1496
-
-    rows_raw = []
-    for r in range(2, max(2, linha_limite) + 1):
-        rows_raw.append([get_cell2(r, c) for c in range(2, 15)])  # 13 colunas
-
-    rows_clean = []
-    for vals in rows_raw:
-        d_val = _to_str(vals[3])
-        if d_val.strip() in {"0", "0.0"}:
-            vals[3] = ""
-        f_val = _to_str(vals[5]).strip()
-        if f_val in {"", "0", "0.0"}:
-            continue
-        rows_clean.append(vals)
-
+    # Aqui a coluna B vazia/zero não descarta a linha (diferente do PRN)
+    bloco = recortar_segunda_aba(ler_aba(xls_file, 1), exigir_col_a=False)  # 13 colunas
     headers = [f"Col_{chr(65+i)}" for i in range(13)]  # A..M
-    decimal_cols = {5}  # F
-    return _rows_to_xlsx_bytes(rows_clean, headers, "aexternos", decimal_cols)
+    return _bloco_to_xlsx_bytes(bloco, headers, "aexternos", DEC2_COLS_2)
 
 # ADICIONALES 1ª aba -> XLSX
 def gerar_adicionales_xlsx_primeira_aba(xls_file):
@@ -553,31 +430,8 @@ def gerar_adicionales_xlsx_segunda_aba(xls_file):
 
 # ======================= DUAS - 1ª ABA → PRN =======================
 def gerar_duas_prn_primeira_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df = pd.read_excel(xls_file, sheet_name=0, header=0, dtype=str, engine=engine)
-
-    def get_cell(r, c):
-        ri = r - 2
-        ci = c - 1
-        try:
-            if 0 <= ri < len(df.index) and 0 <= ci < len(df.columns):
-                return df.iloc[ri, ci]
-        except Exception:
-            return ""
-        return ""
-
-    widths = PRN_WIDTHS_1[:]  # 24 colunas
-    rows = []
-    for r in range(3, 1501, 4):
-        if _to_str(get_cell(r, 3)) != "":
-            rows.append([get_cell(r, c) for c in range(3, 27)])
-
-    DEC2_COLS = {5, 6, 9, 20, 21}
-    def fmt(col_idx, value):
-        return _format_decimal_2_dot(value) if col_idx in DEC2_COLS else _to_str(value)
-
-    return _df_to_prn_bytes(rows, widths, encoding="cp1252", fmt=fmt)
+    # Mesma regra usada para Externos/Adicionales 1ª aba
+    return gerar_externos_prn_primeira_aba(xls_file)
 
 # ======================= DUAS - 2ª ABA → PRN =======================
 def gerar_duas_prn_segunda_aba(xls_file):
@@ -591,71 +445,15 @@ def gerar_duas_zip_primeira_aba(xls_file, zip_name="Duas_PRNs.zip"):
 
 # ======================= DUAS - 1ª ABA → XLSX =======================
 def gerar_duas_xlsx_primeira_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df = pd.read_excel(xls_file, sheet_name=0, header=0, dtype=str, engine=engine)
-
-    def get_cell(r, c):
-        ri = r - 2
-        ci = c - 1
-        try:
-            if 0 <= ri < len(df.index) and 0 <= ci < len(df.columns):
-                return df.iloc[ri, ci]
-        except Exception:
-            return ""
-        return ""
-
-    rows = []
-    for r in range(3, 1501, 4):
-        if _to_str(get_cell(r, 3)) != "":
-            rows.append([get_cell(r, c) for c in range(3, 27)])  # 24 colunas
-
+    bloco = recortar_primeira_aba(ler_aba(xls_file, 0))  # 24 colunas
     headers = [f"Col_{chr(65+i)}" for i in range(24)]  # A..X
-    decimal_cols = {5, 6, 9, 20, 21}  # F,G,J,U,V
-    return _rows_to_xlsx_bytes(rows, headers, "Duas", decimal_cols)
+    return _bloco_to_xlsx_bytes(bloco, headers, "Duas", DEC2_COLS_1)
 
 # ======================= DUAS - 2ª ABA → XLSX =======================
 def gerar_duas_xlsx_segunda_aba(xls_file):
-    name = getattr(xls_file, "name", "").lower()
-    engine = "openpyxl" if name.endswith(".xlsx") else "xlrd"
-    df2 = pd.read_excel(xls_file, sheet_name=1, header=0, dtype=str, engine=engine)
-
-    def get_cell2(r, c):
-        ri = r - 2
-        ci = c - 1
-        try:
-            if 0 <= ri < len(df2.index) and 0 <= ci < len(df2.columns):
-                return df2.iloc[ri, ci]
-        except Exception:
-            return ""
-        return ""
-
-    linha_limite = 0
-    for r in range(2, 46001):
-        val_b = get_cell2(r, 2)
-        if (val_b is None) or (str(val_b).strip() in {"#N/A", "#N/D"}) or (pd.isna(val_b)):
-            linha_limite = r - 4
-            break
-    if linha_limite <= 0:
-        linha_limite = 1496
-
-    rows_raw = []
-    for r in range(2, max(2, linha_limite) + 1):
-        rows_raw.append([get_cell2(r, c) for c in range(2, 15)])  # 13 colunas
-
-    rows_clean = []
-    for vals in rows_raw:
-        d_val = _to_str(vals[3])
-        if d_val.strip() in {"0", "0.0"}:
-            vals[3] = ""
-        f_val = _to_str(vals[5]).strip()
-        if f_val in {"", "0", "0.0"}:
-            continue
-        rows_clean.append(vals)
-
+    bloco = recortar_segunda_aba(ler_aba(xls_file, 1), exigir_col_a=False)  # 13 colunas
     headers = [f"Col_{chr(65+i)}" for i in range(13)]  # A..M
-    decimal_cols = {5}  # F
-    return _rows_to_xlsx_bytes(rows_clean, headers, "ADuas", decimal_cols)
+    return _bloco_to_xlsx_bytes(bloco, headers, "ADuas", DEC2_COLS_2)
 
 # -----------------------------
 # Página
@@ -718,201 +516,44 @@ def render():
             if clear_clicked:
                 st.session_state.acao_selecionada = None
                 st.session_state.uploader_key = "uploader_none"
+                st.session_state.pop("resultado_pdf", None)
+                st.session_state.pop("job_pdf", None)
+                st.query_params.pop("job", None)
                 st.rerun()
 
             if run_clicked and uploaded_files:
+                st.session_state.pop("resultado_pdf", None)
                 acao = st.session_state.acao_selecionada
-                nome_acao = ACTIONS[acao]
-                status = st.empty()
-                progress = st.progress(0, text=f"Iniciando fluxo {nome_acao}...")
-
-                if acao == "duas":
-                    cambio_df = st.session_state.get("tasa_df")
-                    if cambio_df is None or getattr(cambio_df, "empty", True):
-                        st.warning("Para calcular **Tasa**, primeiro atualize no tab **🌐 Tasa SUNAT**. O processamento seguirá sem Tasa.")
-                    if not DUAS_AVAILABLE:
-                        st.error("DUAS indisponível: confira dependências e arquivo `services/duas_service.py`.")
-                    else:
-                        df_final = process_duas_streamlit(
-                            uploaded_files=uploaded_files,
-                            progress_widget=progress,
-                            status_widget=status,
-                            cambio_df=cambio_df
-                        )
-                    if df_final is not None and not df_final.empty:
-                        st.success("Fluxo DUAS concluído!")
-                        df_final = make_arrow_safe(df_final)
-                        st.dataframe(df_final.head(50), width="stretch")
-                        col_csv, col_xlsx = st.columns(2)
-                        with col_csv:
-                            st.download_button(
-                                "Baixar CSV (DUAS)",
-                                data=df_final.to_csv(index=False).encode("utf-8"),
-                                file_name="duas_consolidado.csv",
-                                mime="text/csv",
-                                width="stretch",
-                                key="duas_csv"
-                            )
-                        # ✅ ALTERADO: XLSX com DUAS abas
-                        with col_xlsx:
-                            xlsx_bytes = to_xlsx_bytes_externos_duas_abas(
-                                df_normal=df_final,
-                                sheet_normal="DUAS",
-                                sheet_spaced="DUAS_Espacado",
-                                blank_rows=3
-                            )
-                            st.download_button(
-                                "Baixar XLSX (DUAS)",
-                                data=xlsx_bytes,
-                                file_name="duas_consolidado.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                width="stretch",
-                                key="duas_xlsx",
-                            )
-                    else:
-                        st.warning("Nenhuma tabela válida encontrada nos PDFs para o fluxo DUAS.")
-
-                elif acao == "percepciones":
-                    if not PERC_AVAILABLE:
-                        st.error("Percepciones indisponível: confira dependências e `services/percepcion_service.py`.")
-                    else:
-                        df_final = process_percepcion_streamlit(
-                            uploaded_files=uploaded_files,
-                            progress_widget=progress,
-                            status_widget=status
-                        )
-                    if df_final is not None and not df_final.empty:
-                        st.success("Percepciones concluído!")
-                        df_final = make_arrow_safe(df_final)
-                        st.dataframe(df_final.head(50), width="stretch")
-                        col_csv, col_xlsx = st.columns(2)
-                        with col_csv:
-                            st.download_button(
-                                "Baixar CSV (Percepciones)",
-                                data=df_final.to_csv(index=False).encode("utf-8"),
-                                file_name="percepciones.csv",
-                                mime="text/csv",
-                                width="stretch",
-                                key="percepciones_csv"
-                            )
-                        # ✅ ALTERADO: XLSX com DUAS abas
-                        with col_xlsx:
-                            xlsx_bytes = to_xlsx_bytes_externos_duas_abas(
-                                df_normal=df_final,
-                                sheet_normal="Percepciones",
-                                sheet_spaced="Percepciones_Espacado",
-                                blank_rows=3
-                            )
-                            st.download_button(
-                                "Baixar XLSX (Percepciones)",
-                                data=xlsx_bytes,
-                                file_name="percepciones.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                width="stretch",
-                                key="percepciones_xlsx",
-                            )
-                    else:
-                        st.warning("Nenhuma informação válida encontrada nos PDFs para Percepciones.")
-
-                elif acao == "externos":
-                    if not EXTERNOS_AVAILABLE:
-                        st.error("Externos indisponível: confira dependências e `services/externos_service.py`.")
-                    else:
-                        cambio_df = st.session_state.get("tasa_df")
-                        df_final = process_externos_streamlit(
-                            uploaded_files=uploaded_files,
-                            progress_widget=progress,
-                            status_widget=status,
-                            cambio_df=cambio_df
-                        )
-                    if df_final is not None and not df_final.empty:
-                        st.success("Externos concluído!")
-                        df_final = make_arrow_safe(df_final)
-                        st.dataframe(df_final.head(50), width="stretch")
-                        col_csv, col_xlsx = st.columns(2)
-                        with col_csv:
-                            st.download_button(
-                                "Baixar CSV (Externos)",
-                                data=df_final.to_csv(index=False).encode("utf-8"),
-                                file_name="externos.csv",
-                                mime="text/csv",
-                                width="stretch",
-                                key="externos_csv"
-                            )
-                        with col_xlsx:
-                            xlsx_bytes = to_xlsx_bytes_externos_duas_abas(
-                                df_normal=df_final,
-                                sheet_normal="Externos",
-                                sheet_spaced="Externos_Espacado",
-                                blank_rows=3
-                            )
-                            st.download_button(
-                                "Baixar XLSX (Externos)",
-                                data=xlsx_bytes,
-                                file_name="externos.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                width="stretch",
-                                key="externos_xlsx"
-                            )
-                    else:
-                        st.warning("Nenhuma informação válida encontrada nos PDFs para Externos.")
+                cambio_df = st.session_state.get("tasa_df")
+                disponivel, erro = {
+                    "duas": (DUAS_AVAILABLE, "DUAS indisponível: confira dependências e arquivo `services/duas_service.py`."),
+                    "percepciones": (PERC_AVAILABLE, "Percepciones indisponível: confira dependências e `services/percepcion_service.py`."),
+                    "externos": (EXTERNOS_AVAILABLE, "Externos indisponível: confira dependências e `services/externos_service.py`."),
+                    "gastos": (ADICIONALES_AVAILABLE, "Gastos Adicionales indisponível: confira dependências e `services/adicionales_service.py`."),
+                }[acao]
+
+                if acao == "duas" and (cambio_df is None or getattr(cambio_df, "empty", True)):
+                    st.warning("Para calcular **Tasa**, primeiro atualize no tab **🌐 Tasa SUNAT**. O processamento seguirá sem Tasa.")
+                if not disponivel:
+                    st.error(erro)
+                else:
+                    # Roda em segundo plano: a página só acompanha o job
+                    job_id = job_service.submeter(
+                        acao, uploaded_files,
+                        cambio_df=cambio_df,
+                        sharepoint_df=st.session_state.get("sharepoint_df"),
+                    )
+                    st.session_state.job_pdf = job_id
+                    st.query_params["job"] = job_id
 
-            
-                elif acao == "gastos":
-                    df_final = None  # ✅ OBRIGATÓRIO: garante que sempre exista neste escopo
-                
-                    if not ADICIONALES_AVAILABLE:
-                        st.error(
-                            "Gastos Adicionales indisponível: confira dependências "
-                            "e `services/adicionales_service.py`."
-                        )
-                    else:
-                        cambio_df = st.session_state.get("tasa_df")
-                        df_final = process_adicionales_streamlit(
-                            uploaded_files=uploaded_files,
-                            progress_widget=progress,
-                            status_widget=status,
-                            cambio_df=cambio_df
-                        )
-                
-                    # ✅ ÚNICO bloco de uso do df_final
-                    if df_final is not None and not df_final.empty:
-                        st.success("Gastos Adicionales concluído!")
-                        df_final = make_arrow_safe(df_final)
-                        st.dataframe(df_final.head(50), width="stretch")
-                
-                        col_csv, col_xlsx = st.columns(2)
-                
-                        with col_csv:
-                            st.download_button(
-                                "Baixar CSV (Adicionales)",
-                                data=df_final.to_csv(index=False).encode("utf-8"),
-                                file_name="gastos_adicionales.csv",
-                                mime="text/csv",
-                                width="stretch",
-                                key="adicionales_csv"
-                            )
-                
-                        with col_xlsx:
-                            xlsx_bytes = to_xlsx_bytes_externos_duas_abas(
-                                df_normal=df_final,
-                                sheet_normal="Adicionales",
-                                sheet_spaced="Adicionales_Espacado",
-                                blank_rows=3
-                            )
-                            st.download_button(
-                                "Baixar XLSX (Adicionales)",
-                                data=xlsx_bytes,
-                                file_name="gastos_adicionales.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                width="stretch",
-                                key="adicionales_xlsx"
-                            )
-                
-                    else:
-                        st.warning(
-                            "Nenhuma informação válida encontrada nos PDFs para Gastos Adicionales."
-                        )
+            job = job_service.ler_job(st.session_state.job_pdf) if st.session_state.get("job_pdf") else None
+            if job is not None and job["acao"] == st.session_state.acao_selecionada:
+                _mostrar_job(job)
+
+            # Resultado da última execução deste fluxo (continua na tela nos reruns)
+            resultado = st.session_state.get("resultado_pdf")
+            if resultado is not None and resultado["acao"] == st.session_state.acao_selecionada:
+                _mostrar_resultado(resultado)
 
     # -------------------------
     # 🌐 Tasa SUNAT
@@ -928,26 +569,11 @@ def render():
                 st.session_state.tasa_df = df.copy()
                 st.success("Tasa consolidada com sucesso (armazenada para uso no DUAS/Externos).")
                 st.dataframe(df.head(30), width="stretch")
-                col_csv, col_xlsx = st.columns(2)
-                with col_csv:
-                    st.download_button(
-                        "Baixar CSV",
-                        data=df.to_csv(index=False).encode("utf-8"),
-                        file_name="tasa_consolidada.csv",
-                        mime="text/csv",
-                        width="stretch",
-                        key="tasa_csv"
-                    )
-                with col_xlsx:
-                    xlsx_bytes = to_xlsx_bytes(df, sheet_name="Tasa")
-                    st.download_button(
-                        "Baixar XLSX",
-                        data=xlsx_bytes,
-                        file_name="tasa_consolidada.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        width="stretch",
-                        key="tasa_xlsx"
-                    )
+                _botoes_download(
+                    df, impressao_digital(df),
+                    "Baixar CSV", "Baixar XLSX", "tasa_consolidada", "tasa",
+                    "xlsx:Tasa", lambda: to_xlsx_bytes(df, sheet_name="Tasa"),
+                )
             else:
                 st.warning("Não foi possível obter dados da Tasa. Verifique credenciais/token/cookie.")
 
@@ -975,30 +601,9 @@ def render():
     
         if uploaded_excel:
             try:
-                import io
-                import pandas as pd
-    
-                uploaded_excel.seek(0)
-                xls = pd.ExcelFile(
-                    io.BytesIO(uploaded_excel.read()),
-                    engine="openpyxl"
-                )
-    
-                if "all" not in xls.sheet_names:
-                    raise ValueError(
-                        f"A aba 'all' não foi encontrada. Abas disponíveis: {xls.sheet_names}"
-                    )
-    
-                df_all = pd.read_excel(
-                    xls,
-                    sheet_name="all",
-                    header=0,
-                    usecols="A:Z",
-                    nrows=20000
-                )
-    
-                from services.sharepoint_utils import ajustar_sharepoint_df
-                df_all = ajustar_sharepoint_df(df_all)
+                # Mesmo arquivo (e mesma Tasa) = snapshot em disco, sem reler o Excel
+                from services.sharepoint_utils import carregar_sharepoint
+                df_all = carregar_sharepoint(uploaded_excel.getvalue())
     
                 st.session_state["sharepoint_df"] = df_all
     
@@ -1006,40 +611,18 @@ def render():
                 st.dataframe(df_all, width="stretch", height=500)
     
                 st.subheader("⬇️ Downloads do Arquivo SharePoint")
-                col_csv, col_xlsx = st.columns(2)
-    
-                with col_csv:
-                    st.download_button(
-                        "Baixar CSV (SharePoint)",
-                        data=df_all.to_csv(index=False).encode("utf-8"),
-                        file_name="sharepoint_all.csv",
-                        mime="text/csv",
-                        width="stretch",
-                        key="sharepoint_csv"
-                    )
-    
-                with col_xlsx:
-                    buffer = BytesIO()
-                    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-                        df_all.to_excel(writer, index=False, sheet_name="SharePoint")
-                        ws = writer.book["SharePoint"]
-    
-                        if USE_PRN_WIDTHS and df_all.shape[1] in (24, 13):
-                            widths = PRN_WIDTHS_1 if df_all.shape[1] == 24 else PRN_WIDTHS_2
-                            set_fixed_widths(ws, widths, start_col=1)
-                        else:
-                            _autofit_worksheet(ws)
-    
-                    buffer.seek(0)
-                    st.download_button(
-                        "Baixar XLSX (SharePoint)",
-                        data=buffer,
-                        file_name="sharepoint_all.xlsx",
-                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        width="stretch",
-                        key="sharepoint_xlsx"
-                    )
-    
+
+                def _sharepoint_xlsx(df=df_all):
+                    wb = novo_workbook()
+                    _write_sheet(wb, df, "SharePoint", paint=False)
+                    return workbook_bytes(wb)
+
+                _botoes_download(
+                    df_all, impressao_digital(df_all),
+                    "Baixar CSV (SharePoint)", "Baixar XLSX (SharePoint)", "sharepoint_all", "sharepoint",
+                    "xlsx:SharePoint", _sharepoint_xlsx,
+                )
+
             except ValueError as e:
                 st.error(f"❌ {e}")
     